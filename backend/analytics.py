@@ -14,6 +14,8 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+import dashboard_rollups
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,45 +30,22 @@ class BusinessAnalytics:
     # ============================================
     
     async def get_user_growth(self, days: int = 30) -> dict:
-        """Get user registration growth over time."""
-        start_date = datetime.now(timezone.utc) - timedelta(days=days)
-        users_collection = self.db.get_collection("users")
-        
-        # Total users
-        total_users = await users_collection.count_documents({})
-        
-        # New users in period
-        new_users = await users_collection.count_documents({
-            "created_at": {"$gte": start_date}
-        })
-        
-        # Verified users
-        verified_users = await users_collection.count_documents({
-            "email_verified": True
-        })
+        """Get user registration growth over time (from the dashboard rollups)."""
+        start_date = dashboard_rollups.day_start(datetime.now(timezone.utc) - timedelta(days=days))
         
-        # Active users (logged in last 7 days)
-        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-        active_users = await users_collection.count_documents({
-            "last_login": {"$gte": week_ago}
-        })
+        users = (await dashboard_rollups.get_gauges(self.db)).get("users", {})
+        total_users = users.get("total", 0)
+        verified_users = users.get("verified", 0)
+        active_users = users.get("active_7d", 0)
         
         # Daily breakdown
-        pipeline = [
-            {"$match": {"created_at": {"$gte": start_date}}},
-            {"$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": "$created_at"
-                    }
-                },
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"_id": 1}}
+        daily = await dashboard_rollups.get_buckets(self.db, dashboard_rollups.DAY, start_date)
+        daily_signups = [
+            {"_id": bucket["start"].strftime("%Y-%m-%d"), "count": bucket["users"]["signups"]}
+            for bucket in daily
+            if bucket.get("users", {}).get("signups")
         ]
-        
-        daily_signups = await users_collection.aggregate(pipeline).to_list(days)
+        new_users = sum(day["count"] for day in daily_signups)
         
         return {
             "total_users": total_users,
@@ -109,90 +88,37 @@ class BusinessAnalytics:
     # ============================================
     
     async def get_trading_volume(self, days: int = 30) -> dict:
-        """Get trading volume metrics."""
-        start_date = datetime.now(timezone.utc) - timedelta(days=days)
-        orders_collection = self.db.get_collection("orders")
-        
-        # Total trades
-        total_trades = await orders_collection.count_documents({
-            "created_at": {"$gte": start_date}
-        })
-        
-        # Trading volume
-        pipeline = [
-            {"$match": {"created_at": {"$gte": start_date}, "status": "filled"}},
-            {"$group": {
-                "_id": None,
-                "total_volume": {"$sum": {"$multiply": ["$amount", "$price"]}},
-                "avg_trade_size": {"$avg": {"$multiply": ["$amount", "$price"]}},
-                "buy_volume": {
-                    "$sum": {
-                        "$cond": [
-                            {"$eq": ["$side", "buy"]},
-                            {"$multiply": ["$amount", "$price"]},
-                            0
-                        ]
-                    }
-                },
-                "sell_volume": {
-                    "$sum": {
-                        "$cond": [
-                            {"$eq": ["$side", "sell"]},
-                            {"$multiply": ["$amount", "$price"]},
-                            0
-                        ]
-                    }
-                }
-            }}
-        ]
+        """Get trading volume metrics for orders filled in the period (from the dashboard rollups)."""
+        start_date = dashboard_rollups.day_start(datetime.now(timezone.utc) - timedelta(days=days))
+        daily = await dashboard_rollups.get_buckets(self.db, dashboard_rollups.DAY, start_date)
         
-        result = await orders_collection.aggregate(pipeline).to_list(1)
-        volume_data = result[0] if result else {
-            "total_volume": 0,
-            "avg_trade_size": 0,
-            "buy_volume": 0,
-            "sell_volume": 0
-        }
+        volume_data = dashboard_rollups.sum_buckets(daily, "orders")
+        total_trades = volume_data.get("trades", 0)
+        total_volume = volume_data.get("volume", 0)
         
         # Most traded pairs
-        pipeline_pairs = [
-            {"$match": {"created_at": {"$gte": start_date}, "status": "filled"}},
-            {"$group": {
-                "_id": "$trading_pair",
-                "volume": {"$sum": {"$multiply": ["$amount", "$price"]}},
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"volume": -1}},
-            {"$limit": 10}
-        ]
-        
-        top_pairs = await orders_collection.aggregate(pipeline_pairs).to_list(10)
+        top_pairs = sorted(
+            ({"_id": pair, "volume": data.get("volume", 0), "count": data.get("trades", 0)}
+             for pair, data in volume_data.get("pairs", {}).items()),
+            key=lambda pair: pair["volume"],
+            reverse=True
+        )[:10]
         
         # Daily trading volume
-        pipeline_daily = [
-            {"$match": {"created_at": {"$gte": start_date}, "status": "filled"}},
-            {"$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": "$created_at"
-                    }
-                },
-                "volume": {"$sum": {"$multiply": ["$amount", "$price"]}},
-                "trades": {"$sum": 1}
-            }},
-            {"$sort": {"_id": 1}}
+        daily_volume = [
+            {"_id": bucket["start"].strftime("%Y-%m-%d"), "volume": bucket["orders"].get("volume", 0),
+             "trades": bucket["orders"].get("trades", 0)}
+            for bucket in daily
+            if bucket.get("orders", {}).get("trades")
         ]
         
-        daily_volume = await orders_collection.aggregate(pipeline_daily).to_list(days)
-        
         return {
             "period_days": days,
             "total_trades": total_trades,
-            "total_volume": round(volume_data["total_volume"], 2),
-            "avg_trade_size": round(volume_data["avg_trade_size"], 2),
-            "buy_volume": round(volume_data["buy_volume"], 2),
-            "sell_volume": round(volume_data["sell_volume"], 2),
+            "total_volume": round(total_volume, 2),
+            "avg_trade_size": round(total_volume / total_trades, 2) if total_trades else 0,
+            "buy_volume": round(volume_data.get("buy_volume", 0), 2),
+            "sell_volume": round(volume_data.get("sell_volume", 0), 2),
             "top_trading_pairs": top_pairs,
             "daily_volume": daily_volume
         }
@@ -202,72 +128,32 @@ class BusinessAnalytics:
     # ============================================
     
     async def get_revenue_metrics(self, days: int = 30) -> dict:
-        """Calculate revenue from trading fees, withdrawal fees, etc."""
-        start_date = datetime.now(timezone.utc) - timedelta(days=days)
-        transactions_collection = self.db.get_collection("transactions")
+        """Calculate revenue from trading fees, withdrawal fees, etc. (from the dashboard rollups)."""
+        start_date = dashboard_rollups.day_start(datetime.now(timezone.utc) - timedelta(days=days))
+        daily = await dashboard_rollups.get_buckets(self.db, dashboard_rollups.DAY, start_date)
         
-        # Trading fees
-        pipeline_fees = [
-            {"$match": {
-                "type": "fee",
-                "created_at": {"$gte": start_date}
-            }},
-            {"$group": {
-                "_id": None,
-                "total_fees": {"$sum": {"$abs": "$amount"}},
-                "count": {"$sum": 1}
-            }}
-        ]
+        # Fee transactions, and fees charged on withdrawal requests
+        fee_data = dashboard_rollups.sum_buckets(daily, "transactions")
+        withdrawal_fee_data = dashboard_rollups.sum_buckets(daily, "withdrawals")
+        trading_fees = fee_data.get("fees", 0)
+        withdrawal_fees = withdrawal_fee_data.get("fees", 0)
         
-        fee_result = await transactions_collection.aggregate(pipeline_fees).to_list(1)
-        fee_data = fee_result[0] if fee_result else {"total_fees": 0, "count": 0}
-        
-        # Withdrawal fees
-        withdrawals_collection = self.db.get_collection("withdrawals")
-        pipeline_withdrawal_fees = [
-            {"$match": {
-                "created_at": {"$gte": start_date},
-                "status": {"$in": ["completed", "processing"]}
-            }},
-            {"$group": {
-                "_id": None,
-                "total_fees": {"$sum": "$fee"},
-                "count": {"$sum": 1}
-            }}
-        ]
-        
-        withdrawal_fee_result = await withdrawals_collection.aggregate(pipeline_withdrawal_fees).to_list(1)
-        withdrawal_fee_data = withdrawal_fee_result[0] if withdrawal_fee_result else {"total_fees": 0, "count": 0}
-        
-        total_revenue = fee_data["total_fees"] + withdrawal_fee_data["total_fees"]
+        total_revenue = trading_fees + withdrawal_fees
         
         # Daily revenue breakdown
-        pipeline_daily = [
-            {"$match": {
-                "type": "fee",
-                "created_at": {"$gte": start_date}
-            }},
-            {"$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": "$created_at"
-                    }
-                },
-                "revenue": {"$sum": {"$abs": "$amount"}}
-            }},
-            {"$sort": {"_id": 1}}
+        daily_revenue = [
+            {"_id": bucket["start"].strftime("%Y-%m-%d"), "revenue": bucket["transactions"]["fees"]}
+            for bucket in daily
+            if bucket.get("transactions", {}).get("fee_count")
         ]
         
-        daily_revenue = await transactions_collection.aggregate(pipeline_daily).to_list(days)
-        
         return {
             "period_days": days,
             "total_revenue": round(total_revenue, 2),
-            "trading_fees": round(fee_data["total_fees"], 2),
-            "withdrawal_fees": round(withdrawal_fee_data["total_fees"], 2),
-            "trading_fee_count": fee_data["count"],
-            "withdrawal_fee_count": withdrawal_fee_data["count"],
+            "trading_fees": round(trading_fees, 2),
+            "withdrawal_fees": round(withdrawal_fees, 2),
+            "trading_fee_count": fee_data.get("fee_count", 0),
+            "withdrawal_fee_count": withdrawal_fee_data.get("requested", 0),
             "avg_revenue_per_day": round(total_revenue / days, 2) if days > 0 else 0,
             "daily_revenue": daily_revenue
         }
@@ -349,27 +235,21 @@ class BusinessAnalytics:
     
     async def get_performance_metrics(self) -> dict:
         """Get system performance metrics."""
-        # Database performance
-        users_collection = self.db.get_collection("users")
-        orders_collection = self.db.get_collection("orders")
+        gauges = await dashboard_rollups.get_gauges(self.db)
         
-        # Collection sizes
-        total_users = await users_collection.count_documents({})
-        total_orders = await orders_collection.count_documents({})
-        
-        # Recent activity (last hour)
-        hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
-        recent_orders = await orders_collection.count_documents({
-            "created_at": {"$gte": hour_ago}
-        })
+        # Recent activity (last full hour and the one in progress)
+        now = datetime.now(timezone.utc)
+        hours = await dashboard_rollups.get_buckets(
+            self.db, dashboard_rollups.HOUR, dashboard_rollups.hour_start(now - timedelta(hours=1))
+        )
         
         return {
             "database": {
-                "total_users": total_users,
-                "total_orders": total_orders,
-                "orders_last_hour": recent_orders
+                "total_users": gauges.get("users", {}).get("total", 0),
+                "total_orders": gauges.get("orders_total", 0),
+                "orders_last_hour": dashboard_rollups.sum_buckets(hours, "orders").get("trades", 0)
             },
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": now.isoformat()
         }
     
     # ============================================
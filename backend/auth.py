@@ -11,9 +11,12 @@ Security Audit Fixes Applied:
 """
 
 from jose import JWTError, jwt
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict
+import hashlib
 import secrets
+import time
 import bcrypt
 import logging
 import pyotp
@@ -106,35 +109,108 @@ def create_refresh_token(data: dict, device_fingerprint: Optional[str] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+class DecodedTokenCache:
+    """
+    Bounded LRU of validated JWT claims, keyed by SHA-256 of the token.
+
+    A token's claims can't change, so once its signature, audience and issuer have been
+    verified the result is reused until the token's ``exp``. Only successful decodes are
+    cached; invalid tokens are verified (and rejected) every time.
+    """
+
+    def __init__(self, max_entries: int = 10000, enabled: bool = True):
+        self.max_entries = max(1, max_entries)
+        self.enabled = enabled
+        self._entries: "OrderedDict[bytes, Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        key = self._key(token)
+        payload = self._entries.get(key)
+        if payload is None:
+            self.misses += 1
+            return None
+        if payload["exp"] <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: Dict) -> None:
+        if not self.enabled or not isinstance(payload.get("exp"), (int, float)):
+            return
+        key = self._key(token)
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+token_cache = DecodedTokenCache(
+    max_entries=settings.jwt_decode_cache_size,
+    enabled=settings.jwt_decode_cache_enabled,
+)
+
+
 def decode_token(token: str, expected_type: Optional[str] = None) -> Optional[Dict]:
     """
     Decode and verify JWT. Validates aud/iss claims.
     Optionally validates token type (access/refresh).
-    Returns payload or None.
+    Returns payload or None. Verified claims are reused from ``token_cache`` until ``exp``.
     """
-    try:
-        payload = jwt.decode(
-            token,
-            SECRET_KEY,
-            algorithms=[ALGORITHM],
-            audience=JWT_AUDIENCE,
-            issuer=JWT_ISSUER,
-            options={
-                "require_aud": False,
-                "require_iss": False,
-            }
-        )
-        if expected_type and payload.get("type") != expected_type:
-            logger.debug(f"Token type mismatch: expected={expected_type}, got={payload.get('type')}")
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(
+                token,
+                SECRET_KEY,
+                algorithms=[ALGORITHM],
+                audience=JWT_AUDIENCE,
+                issuer=JWT_ISSUER,
+                options={
+                    "require_aud": False,
+                    "require_iss": False,
+                }
+            )
+        except JWTError as e:
+            logger.debug(f"Invalid token: {str(e)}")
             return None
-        return payload
-    except JWTError as e:
-        logger.debug(f"Invalid token: {str(e)}")
+        token_cache.put(token, payload)
+    if expected_type and payload.get("type") != expected_type:
+        logger.debug(f"Token type mismatch: expected={expected_type}, got={payload.get('type')}")
         return None
+    # Callers get their own copy; the cached claims must not be mutated
+    return dict(payload)
 
 
 def get_token_jti(token: str) -> Optional[str]:
     """Extract jti from a token without full validation (for blacklisting)."""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload.get("jti")
     try:
         payload = jwt.decode(
             token,
@@ -0,0 +1,192 @@
+"""
+Per-process cache of the state every authenticated request checks.
+
+``get_current_user_id`` needs two facts besides the JWT itself: that the token has not been
+revoked, and when the user last changed their password. Both are stable for long stretches,
+so this keeps, in bounded LRUs:
+
+- ``user_id -> password_changed_at`` for ``ttl_seconds``;
+- access token ``jti``s recently confirmed *not* revoked, for ``negative_ttl_seconds``.
+  Revocations themselves are never cached; the blacklist stays the source of truth.
+
+Changing a password or revoking a token invalidates the local entry immediately and is
+published on ``AUTH_EVENTS_CHANNEL`` so other workers drop theirs. A publish that fails is
+retried in the background, and this process's revocation filter is desynchronized (its
+subscription is probably missing events too). Without a native Redis connection
+(``REDIS_URL``) other workers only catch up when their entries expire, so the TTLs bound how
+long a revoked session can linger there.
+
+A lookup that started before an invalidation must not re-cache what it read, so fills carry
+the epoch from ``begin()`` and are dropped if anything was invalidated in between.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+AUTH_EVENTS_CHANNEL = "auth:events"
+
+MISSING = object()
+# Unpublished invalidations kept for retry, and how often they are retried
+MAX_UNPUBLISHED = 1000
+PUBLISH_RETRY_SECONDS = 2.0
+
+
+class AuthContextCache:
+    """Password-change timestamps and negative blacklist results, with pub/sub invalidation."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        ttl_seconds: float = 30.0,
+        negative_ttl_seconds: float = 5.0,
+        max_entries: int = 10000,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl_seconds
+        self.negative_ttl = negative_ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._password_changed: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._unrevoked: "OrderedDict[str, float]" = OrderedDict()
+        self._epoch = 0
+        self._listening = False
+        self._unpublished: List[Dict[str, Any]] = []
+        self._retry_task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.publish_failures = 0
+
+    def begin(self) -> int:
+        """Epoch to pass back to the ``remember_*`` call that follows a lookup."""
+        return self._epoch
+
+    def password_changed_at(self, user_id: str) -> Any:
+        """The cached value (possibly None), or ``MISSING`` when it has to be looked up."""
+        entry = self._password_changed.get(user_id) if self.enabled else None
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return MISSING
+        self._password_changed.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def is_known_unrevoked(self, jti: str) -> bool:
+        expires = self._unrevoked.get(jti) if self.enabled else None
+        if expires is None or expires < time.monotonic():
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def remember_password_changed_at(self, user_id: str, value: Any, epoch: int) -> None:
+        if self.enabled and epoch == self._epoch:
+            self._put(self._password_changed, user_id, (time.monotonic() + self.ttl, value))
+
+    def remember_unrevoked(self, jti: str, epoch: int) -> None:
+        if self.enabled and epoch == self._epoch:
+            self._put(self._unrevoked, jti, time.monotonic() + self.negative_ttl)
+
+    def _put(self, entries: OrderedDict, key: str, value: Any) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[str] = None, jti: Optional[str] = None) -> None:
+        """Drop local entries for a user and/or a token."""
+        self._epoch += 1
+        self.invalidations += 1
+        if user_id:
+            self._password_changed.pop(user_id, None)
+        if jti:
+            self._unrevoked.pop(jti, None)
+
+    async def password_changed(self, user_id: str) -> None:
+        """Call after ``password_changed_at`` is written: invalidates here and in other workers."""
+        self.invalidate(user_id=user_id)
+        await self._publish({"user_id": user_id})
+
+    async def token_revoked(self, jti: str, expires_at: Optional[float] = None) -> None:
+        """
+        Call after a token is blacklisted: invalidates here and in other workers.
+        ``expires_at`` (unix time) lets other workers add it to their revocation filter.
+        """
+        self.invalidate(jti=jti)
+        await self._publish({"jti": jti, "expires_at": expires_at})
+
+    async def _publish(self, event: Dict[str, Any]) -> None:
+        if not self._listening:
+            return
+        from redis_enhanced import redis_enhanced
+        if await redis_enhanced.publish(AUTH_EVENTS_CHANNEL, event):
+            return
+        self.publish_failures += 1
+        logger.warning("Auth cache invalidation was not published; retrying in the background")
+        from revocation_filter import revocation_filter
+        revocation_filter.desync()
+        self._unpublished.append(event)
+        del self._unpublished[:-MAX_UNPUBLISHED]
+        if self._retry_task is None or self._retry_task.done():
+            self._retry_task = asyncio.create_task(self._retry_unpublished())
+
+    async def _retry_unpublished(self) -> None:
+        from redis_enhanced import redis_enhanced
+        while self._unpublished and self._listening:
+            await asyncio.sleep(PUBLISH_RETRY_SECONDS)
+            now = time.time()
+            while self._unpublished:
+                event = self._unpublished[0]
+                if event.get("expires_at") and event["expires_at"] < now:
+                    self._unpublished.pop(0)  # the token expired; nobody needs the revocation
+                    continue
+                if not await redis_enhanced.publish(AUTH_EVENTS_CHANNEL, event):
+                    break
+                self._unpublished.pop(0)
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        self.invalidate(user_id=event.get("user_id"), jti=event.get("jti"))
+
+    async def start(self) -> None:
+        """Subscribe to invalidations from other workers when a native Redis connection exists."""
+        if not self.enabled or self._listening:
+            return
+        from redis_enhanced import redis_enhanced
+        self._listening = await redis_enhanced.listen(AUTH_EVENTS_CHANNEL, self._on_event)
+
+    async def stop(self) -> None:
+        if self._retry_task is not None:
+            self._retry_task.cancel()
+            self._retry_task = None
+        if self._listening:
+            from redis_enhanced import redis_enhanced
+            await redis_enhanced.unlisten(AUTH_EVENTS_CHANNEL, self._on_event)
+            self._listening = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "cross_process": self._listening,
+            "users": len(self._password_changed),
+            "unrevoked_tokens": len(self._unrevoked),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "publish_failures": self.publish_failures,
+            "unpublished": len(self._unpublished),
+        }
+
+
+auth_cache = AuthContextCache(
+    enabled=settings.auth_cache_enabled,
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+    negative_ttl_seconds=settings.auth_cache_negative_ttl_seconds,
+    max_entries=settings.auth_cache_max_entries,
+)
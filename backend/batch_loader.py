@@ -0,0 +1,70 @@
+"""
+Batched lookups of related documents for list endpoints.
+
+A ``BatchLoader`` resolves documents of one collection by one key field. Every ``load``
+issued in the same event loop tick is answered by a single ``{key: {"$in": [...]}}`` query
+(DataLoader-style), and results, including misses, are cached for the loader's lifetime.
+Create one loader per request so the cache never outlives the data it was read for:
+
+    wallets = BatchLoader(db.get_collection("wallets"), key_field="user_id")
+    for user, wallet in zip(users, await wallets.load_many([u["id"] for u in users])):
+        ...
+
+A page of N rows then costs one query for the page and one per related collection,
+instead of one per row.
+"""
+
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class BatchLoader:
+    """Coalesces lookups of ``collection`` by ``key_field`` into ``$in`` queries."""
+
+    def __init__(self, collection, key_field: str = "id", projection: Optional[Dict[str, Any]] = None):
+        self.collection = collection
+        self.key_field = key_field
+        self.projection = projection
+        # Inclusion projections still need the key to match documents back to their keys
+        if projection and any(value for name, value in projection.items() if name != "_id"):
+            self.projection = {**projection, key_field: 1}
+        self._cache: Dict[Any, asyncio.Future] = {}
+        self._queue: List[Any] = []
+        self.queries = 0
+
+    def load(self, key: Any) -> "asyncio.Future[Optional[Dict[str, Any]]]":
+        """The document whose ``key_field`` is ``key`` (None if there is none)."""
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._cache[key] = future
+            if not self._queue:
+                loop.call_soon(self._dispatch)
+            self._queue.append(key)
+        return future
+
+    async def load_many(self, keys: Iterable[Any]) -> List[Optional[Dict[str, Any]]]:
+        """Documents for ``keys`` in the same order, with one query for all uncached keys."""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        asyncio.ensure_future(self._fetch(keys))
+
+    async def _fetch(self, keys: List[Any]) -> None:
+        self.queries += 1
+        try:
+            query = {self.key_field: {"$in": keys}}
+            cursor = self.collection.find(query, self.projection) if self.projection else self.collection.find(query)
+            docs = await cursor.to_list(length=None)
+        except Exception as exc:
+            # Don't cache the failure; a later load retries
+            for key in keys:
+                self._cache.pop(key, None).set_exception(exc)
+            return
+        found = {doc.get(self.key_field): doc for doc in docs}
+        for key in keys:
+            future = self._cache[key]
+            if not future.done():
+                future.set_result(found.get(key))
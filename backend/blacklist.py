@@ -9,11 +9,14 @@ Security Audit Fixes:
 """
 
 import logging
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 import redis.asyncio as redis
+from auth_cache import auth_cache
 from config import settings
+from revocation_filter import revocation_filter
 
 logger = logging.getLogger(__name__)
 
@@ -64,12 +67,18 @@ async def blacklist_token(token: str, expires_in: int):
         # Fallback: blacklist the full token
         jti = token
     
+    # Into this process's filter first, so there is no window where the store has it and we don't
+    ttl = max(expires_in, 60)
+    expires_at = time.time() + ttl
+    revocation_filter.add(jti, expires_at)
+    
     client = await get_redis_client()
     if client:
         try:
             # H8 FIX: Store only jti, not full token
-            await client.set(f"blacklist:jti:{jti}", "revoked", ex=max(expires_in, 60))
+            await client.set(f"blacklist:jti:{jti}", "revoked", ex=ttl)
             logger.debug(f"Token jti blacklisted in Redis (expires in {expires_in}s)")
+            await auth_cache.token_revoked(jti, expires_at)
             return
         except Exception as e:
             logger.error(f"Redis blacklist failed: {str(e)}")
@@ -80,26 +89,33 @@ async def blacklist_token(token: str, expires_in: int):
             # H8 FIX: Store only jti, not full token
             await db.get_collection("blacklisted_tokens").insert_one({
                 "jti": jti,
-                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=max(expires_in, 60))
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl)
             })
             logger.debug("Token jti blacklisted in MongoDB fallback")
+            await auth_cache.token_revoked(jti, expires_at)
         except Exception as e:
             logger.error(f"MongoDB blacklist fallback failed: {str(e)}")
 
 
-async def is_token_blacklisted(token: str) -> bool:
+async def is_token_blacklisted(token: str, jti: Optional[str] = None) -> bool:
     """
     H8 FIX: Check if token is blacklisted by jti (not full token).
     Uses Redis or MongoDB for efficient lookup.
+    Pass ``jti`` when the token has already been decoded.
     """
     # Extract jti from token
-    from auth import get_token_jti
-    jti = get_token_jti(token)
+    if not jti:
+        from auth import get_token_jti
+        jti = get_token_jti(token)
     if not jti:
         logger.warning("Could not extract jti from token for blacklist check")
         # Fallback: check full token
         jti = token
     
+    # Nearly every token is not revoked; the filter says so without a round trip
+    if not revocation_filter.might_be_revoked(jti):
+        return False
+    
     client = await get_redis_client()
     if client:
         try:
@@ -1,7 +1,10 @@
 from functools import wraps
 from fastapi import Request, Response
-from redis_cache import redis_cache
-import json
+from tiered_cache import tiered_cache
+
+PORTFOLIO_NAMESPACE = "portfolio"
+tiered_cache.configure(PORTFOLIO_NAMESPACE, ttl_seconds=120, local_ttl_seconds=30, max_entries=5000, l2=True)
+
 
 def cache(ttl: int):
     def decorator(func):
@@ -22,13 +25,13 @@ def cache(ttl: int):
                 raise Exception("user_id not found in arguments")
 
             key = f"portfolio:{user_id}"
-            cached_response = await redis_cache.get(key)
+            cached_response = await tiered_cache.get(PORTFOLIO_NAMESPACE, key)
 
             if cached_response:
-                return json.loads(cached_response)
+                return cached_response
 
             response = await func(*args, **kwargs)
-            await redis_cache.set(key, json.dumps(response), ttl=ttl)
+            await tiered_cache.set(PORTFOLIO_NAMESPACE, key, response, ttl=ttl)
             return response
         return wrapper
     return decorator
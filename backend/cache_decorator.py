@@ -1,7 +1,7 @@
 """
 Enhanced API Response Caching Decorator
 Provides flexible caching for endpoints with TTL support
-Integrates with Redis for distributed caching
+Stores through the tiered cache: in-process L1 in front of Redis (L2)
 """
 
 import hashlib
@@ -12,11 +12,16 @@ from typing import Callable, Optional, Any, Union, List
 from datetime import datetime, timedelta
 import asyncio
 
-from redis_cache import redis_cache
+from tiered_cache import tiered_cache
 from fastapi.responses import JSONResponse
 
 logger = logging.getLogger(__name__)
 
+# Endpoint responses are shared across workers through Redis; the in-process copy is kept
+# briefly so one worker never serves another's stale response for long
+ENDPOINT_NAMESPACE = "endpoints"
+tiered_cache.configure(ENDPOINT_NAMESPACE, ttl_seconds=300, local_ttl_seconds=30, max_entries=5000, l2=True)
+
 
 class CacheConfig:
     """Configuration for endpoint caching"""
@@ -138,7 +143,7 @@ def cached_endpoint(
             
             # Try to get from cache
             try:
-                cached_value = await redis_cache.get(cache_key)
+                cached_value = await tiered_cache.get(ENDPOINT_NAMESPACE, cache_key)
                 if cached_value:
                     logger.debug(f"🎯 Cache HIT: {cache_key}")
                     return cached_value
@@ -158,7 +163,7 @@ def cached_endpoint(
                         should_cache = False
                 
                 if should_cache:
-                    await redis_cache.set(cache_key, result, ttl_seconds)
+                    await tiered_cache.set(ENDPOINT_NAMESPACE, cache_key, result, ttl_seconds)
                     logger.debug(f"💾 Cached: {cache_key} (TTL: {ttl_seconds}s)")
             
             except Exception as e:
@@ -179,6 +184,7 @@ def cached_endpoint(
 async def invalidate_cache_pattern(pattern: str) -> int:
     """
     Invalidate cache entries matching pattern.
+    Drops this worker's in-process copies; Redis copies run out their TTL.
     
     Args:
         pattern: Pattern to match in cache keys
@@ -187,7 +193,7 @@ async def invalidate_cache_pattern(pattern: str) -> int:
         Number of keys invalidated
     """
     try:
-        count = await redis_cache.invalidate(pattern)
+        count = tiered_cache.invalidate(ENDPOINT_NAMESPACE, pattern)
         logger.info(f"🧹 Invalidated {count} cache entries matching '{pattern}'")
         return count
     except Exception as e:
@@ -210,7 +216,7 @@ async def cache_warmer(
         ttl_seconds: Time to live
     """
     try:
-        await redis_cache.set(cache_key, value, ttl_seconds)
+        await tiered_cache.set(ENDPOINT_NAMESPACE, cache_key, value, ttl_seconds)
         logger.info(f"🔥 Cache warmed: {cache_key}")
     except Exception as e:
         logger.error(f"❌ Cache warming failed: {str(e)}")
@@ -277,6 +277,202 @@ class Settings(BaseSettings):
         description="CoinCap WebSocket URL for real-time prices"
     )
     coincap_rate_limit: int = Field(default=50, description="CoinCap API rate limit per minute")
+    price_cache_write_behind: bool = Field(
+        default=True,
+        description="Apply exchange ticks in memory only and persist them to Redis from a batched background flusher"
+    )
+    price_cache_flush_interval_ms: int = Field(
+        default=250,
+        description="Interval between batched Redis flushes of dirty symbols in write-behind mode"
+    )
+    price_stream_conflation_ms: int = Field(
+        default=100,
+        description="Window for conflating per-symbol ticks into one batched update for realtime clients (0 disables)"
+    )
+    price_stream_cluster_mode: bool = Field(
+        default=False,
+        description="Elect one worker via a Redis lock to ingest exchange streams and fan ticks out to the others over pub/sub (requires REDIS_URL)"
+    )
+    price_stream_leader_ttl_seconds: int = Field(
+        default=15,
+        description="TTL of the price stream leader lock; the leader renews it every third of this interval"
+    )
+    price_shm_enabled: bool = Field(
+        default=False,
+        description="Publish live prices to a host-local shared-memory table so every worker reads them without Redis"
+    )
+    price_shm_path: str = Field(
+        default="/dev/shm/cryptovault-prices",
+        description="File backing the shared-memory price table (should live on tmpfs)"
+    )
+    price_shm_slots: int = Field(
+        default=256,
+        description="Number of fixed symbol slots in the shared-memory price table"
+    )
+    order_trigger_engine_enabled: bool = Field(
+        default=True,
+        description="Evaluate resting limit/stop/take-profit orders against live prices in this process"
+    )
+    alert_engine_enabled: bool = Field(
+        default=True,
+        description="Evaluate active price alerts against live prices in this process"
+    )
+    audit_write_behind: bool = Field(
+        default=True,
+        description="Queue audit log entries in-process and write them to MongoDB in batches"
+    )
+    audit_batch_size: int = Field(
+        default=500,
+        description="Maximum audit entries per insert_many batch"
+    )
+    audit_flush_interval_ms: int = Field(
+        default=250,
+        description="Maximum time an audit entry waits in the queue before being written"
+    )
+    audit_queue_max_size: int = Field(
+        default=10000,
+        description="Audit entries held in memory before new entries spill to disk"
+    )
+    audit_spill_path: str = Field(
+        default="/tmp/cryptovault-audit-spill.jsonl",
+        description="JSON-lines file for audit entries that could not be written (replayed on recovery); empty disables spilling"
+    )
+    wallet_lanes_distributed: bool = Field(
+        default=False,
+        description="Also serialize per-user wallet mutations across workers with a Redis lock (requires REDIS_URL)"
+    )
+    wallet_lane_lock_ttl_ms: int = Field(
+        default=10000,
+        description="Expiry of a per-user Redis wallet lock, bounding how long a crashed worker can hold it"
+    )
+    wallet_lane_wait_timeout_ms: int = Field(
+        default=5000,
+        description="How long a wallet mutation waits for its user's lane before failing with 409"
+    )
+    ledger_compactor_enabled: bool = Field(
+        default=True,
+        description="Periodically reconcile wallets against the balance ledger and write snapshots"
+    )
+    ledger_snapshot_interval_seconds: float = Field(
+        default=300.0,
+        description="How often the ledger compactor looks for wallets due a snapshot"
+    )
+    ledger_snapshot_min_entries: int = Field(
+        default=50,
+        description="Ledger entries since the last snapshot before a wallet is compacted again"
+    )
+    deposit_ingest_enabled: bool = Field(
+        default=True,
+        description="Apply NOWPayments IPNs in batches through the deposit ingest queue"
+    )
+    deposit_ingest_batch_size: int = Field(
+        default=100,
+        description="Maximum IPNs applied in one deposit ingest batch"
+    )
+    deposit_ingest_flush_interval_ms: int = Field(
+        default=50,
+        description="How long IPNs are collected before a batch is applied"
+    )
+    deposit_ingest_wait_timeout_seconds: float = Field(
+        default=10.0,
+        description="How long a webhook waits for its batch before answering 500 so the provider retries"
+    )
+    deposit_ingest_recovery_stale_seconds: float = Field(
+        default=300.0,
+        description="Age a deposit credit claim must reach before recovery takes it over and posts it"
+    )
+    password_hash_workers: int = Field(
+        default=4,
+        description="Threads dedicated to bcrypt hashing and verification"
+    )
+    password_hash_max_queue: int = Field(
+        default=64,
+        description="Password hash operations that may wait for a thread before new ones get 503"
+    )
+    jwt_decode_cache_enabled: bool = Field(
+        default=True,
+        description="Reuse verified JWT claims for repeated tokens until they expire"
+    )
+    jwt_decode_cache_size: int = Field(
+        default=10000,
+        description="Maximum verified tokens held in the JWT decode cache"
+    )
+    auth_cache_enabled: bool = Field(
+        default=True,
+        description="Cache password-change times and recent blacklist misses for authenticated requests"
+    )
+    auth_cache_ttl_seconds: float = Field(
+        default=30.0,
+        description="How long a user's password-change time is served from the auth cache"
+    )
+    auth_cache_negative_ttl_seconds: float = Field(
+        default=5.0,
+        description="How long a token confirmed not revoked skips the blacklist lookup"
+    )
+    auth_cache_max_entries: int = Field(
+        default=10000,
+        description="Maximum users (and, separately, tokens) held in the auth cache"
+    )
+    revocation_filter_enabled: bool = Field(
+        default=True,
+        description="Answer blacklist checks for tokens that are certainly not revoked from an in-memory Bloom filter"
+    )
+    revocation_filter_partition_seconds: float = Field(
+        default=21600.0,
+        description="Width of each revocation filter partition by token expiry; partitions drop once all their tokens expire"
+    )
+    revocation_filter_capacity: int = Field(
+        default=20000,
+        description="Revocations each filter partition is sized for before its false-positive rate climbs"
+    )
+    revocation_filter_error_rate: float = Field(
+        default=0.001,
+        description="Target false-positive rate of each revocation filter partition"
+    )
+    revocation_filter_resync_seconds: float = Field(
+        default=300.0,
+        description="How often the revocation filter is rebuilt from the blacklist store"
+    )
+    revocation_filter_require_pubsub: bool = Field(
+        default=True,
+        description="Only trust the revocation filter while subscribed to revocations from other workers (disable for a single worker without REDIS_URL)"
+    )
+    tiered_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        description="Estimated bytes the in-process (L1) cache may hold across all namespaces"
+    )
+    tiered_cache_l2_enabled: bool = Field(
+        default=True,
+        description="Read and write through to Redis for cache namespaces backed by L2"
+    )
+    tiered_cache_namespace_ttls: str = Field(
+        default="",
+        description="Per-namespace default TTL overrides as name=seconds pairs, e.g. 'responses=60,endpoints=300'"
+    )
+    dashboard_rollups_enabled: bool = Field(
+        default=True,
+        description="Maintain hourly/daily admin dashboard buckets in a background job"
+    )
+    dashboard_rollup_interval_seconds: float = Field(
+        default=60.0,
+        description="How often new activity is rolled into the dashboard buckets"
+    )
+    dashboard_rollup_settle_seconds: float = Field(
+        default=30.0,
+        description="How far behind now each dashboard rollup stops, so in-flight writes land first"
+    )
+    ws_delta_keyframe_interval_seconds: float = Field(
+        default=30.0,
+        description="Interval between full price snapshot keyframes for delta-mode realtime clients"
+    )
+    ws_delta_tick_size_bps: float = Field(
+        default=1.0,
+        description="Minimum relative price move (basis points) before a symbol is sent to delta-mode clients"
+    )
+    ws_json_encoder: str = Field(
+        default="orjson",
+        description="JSON encoder for realtime broadcast frames: orjson (when installed) or json"
+    )
     use_mock_prices: bool = Field(default=False, description="Use mock price data for testing")
     allow_mock_payment_fallback: bool = Field(
         default=False,
@@ -0,0 +1,358 @@
+"""
+Pre-aggregated admin dashboard metrics.
+
+A background job keeps two kinds of derived documents so dashboard endpoints read a handful
+of small documents instead of counting and grouping whole collections on every page load:
+
+- ``dashboard_buckets``: one document per UTC hour and per UTC day (``granularity`` is
+  ``hour`` or ``day``, ``start`` is the bucket start) with one sub-document per source:
+  ``users`` (signups), ``transactions`` (count, completed volume, fees), ``orders`` (filled
+  trades and volume, per trading pair) and ``withdrawals`` (requests, amount, fees).
+- ``dashboard_rollup_state``: per-source watermarks, and the ``gauges`` document with
+  point-in-time figures that are not time series (totals, pending withdrawal states, ...).
+
+Each run re-aggregates only the hours between a source's watermark (rounded down to the
+hour) and ``now - settle``, replaces those hour sub-documents, and re-sums the day buckets
+they fall in from their hours. Every write is a recompute rather than an increment, so a
+run that dies half way is simply repeated by the next one. Documents stamped more than an
+hour before they are inserted are missed; ``rebuild_all`` (``python dashboard_rollups.py``)
+recomputes everything.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ReplaceOne, UpdateOne
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_COLLECTION = "dashboard_buckets"
+STATE_COLLECTION = "dashboard_rollup_state"
+HOUR = "hour"
+DAY = "day"
+PENDING_WITHDRAWAL_STATES = ("pending", "pending_approval", "processing")
+
+_COMPLETED = {"$eq": ["$status", "completed"]}
+_TRADE_VALUE = {"$multiply": ["$amount", {"$ifNull": ["$fill_price", "$price"]}]}
+
+# Per source: collection, time field, filter, accumulators and an optional per-key breakdown
+SOURCES: Dict[str, Dict[str, Any]] = {
+    "users": {
+        "collection": "users",
+        "time_field": "created_at",
+        "match": {},
+        "metrics": {"signups": {"$sum": 1}},
+    },
+    "transactions": {
+        "collection": "transactions",
+        "time_field": "created_at",
+        "match": {},
+        "metrics": {
+            "count": {"$sum": 1},
+            "completed": {"$sum": {"$cond": [_COMPLETED, 1, 0]}},
+            "volume": {"$sum": {"$cond": [_COMPLETED, "$amount", 0]}},
+            "fees": {"$sum": {"$cond": [{"$eq": ["$type", "fee"]}, {"$abs": "$amount"}, 0]}},
+            "fee_count": {"$sum": {"$cond": [{"$eq": ["$type", "fee"]}, 1, 0]}},
+        },
+    },
+    "orders": {
+        "collection": "orders",
+        "time_field": "filled_at",
+        "match": {"status": "filled"},
+        "metrics": {
+            "trades": {"$sum": 1},
+            "volume": {"$sum": _TRADE_VALUE},
+            "buy_volume": {"$sum": {"$cond": [{"$eq": ["$side", "buy"]}, _TRADE_VALUE, 0]}},
+            "sell_volume": {"$sum": {"$cond": [{"$eq": ["$side", "sell"]}, _TRADE_VALUE, 0]}},
+        },
+        "breakdown": ("pairs", "$trading_pair"),
+    },
+    "withdrawals": {
+        "collection": "withdrawals",
+        "time_field": "created_at",
+        "match": {},
+        "metrics": {
+            "requested": {"$sum": 1},
+            "amount": {"$sum": "$amount"},
+            "fees": {"$sum": {"$ifNull": ["$fee", 0]}},
+        },
+    },
+}
+
+
+def _utc(value: datetime) -> datetime:
+    # Mongo hands back naive UTC datetimes
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def hour_start(value: datetime) -> datetime:
+    return _utc(value).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(value: datetime) -> datetime:
+    return hour_start(value).replace(hour=0)
+
+
+def _key(value: Any) -> str:
+    # Field names can't contain "." or start with "$"
+    return str(value or "unknown").replace(".", "_").replace("$", "_")
+
+
+def _merge(into: Dict[str, Any], values: Dict[str, Any]) -> None:
+    """Add numeric fields of ``values`` into ``into``, recursing into sub-documents."""
+    for name, value in values.items():
+        if isinstance(value, dict):
+            _merge(into.setdefault(name, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            into[name] = into.get(name, 0) + value
+
+
+def sum_buckets(buckets: Iterable[Dict[str, Any]], source: str) -> Dict[str, Any]:
+    """Totals of one source across buckets."""
+    totals: Dict[str, Any] = {}
+    for bucket in buckets:
+        _merge(totals, bucket.get(source) or {})
+    return totals
+
+
+async def _aggregate_hours(db, name: str, since: Optional[datetime], until: datetime) -> Dict[datetime, Dict[str, Any]]:
+    """One source's sub-document for every hour in ``[hour_start(since), until]`` that has data."""
+    source = SOURCES[name]
+    time_field = source["time_field"]
+    time_range: Dict[str, Any] = {"$lte": until}
+    if since is not None:
+        time_range["$gte"] = hour_start(since)
+    group_id: Dict[str, Any] = {"hour": {"$dateToString": {"format": "%Y-%m-%dT%H", "date": f"${time_field}"}}}
+    breakdown = source.get("breakdown")
+    if breakdown:
+        group_id["key"] = breakdown[1]
+    pipeline = [
+        {"$match": {**source["match"], time_field: time_range}},
+        {"$group": {"_id": group_id, **source["metrics"]}},
+    ]
+
+    hours: Dict[datetime, Dict[str, Any]] = {}
+    async for group in db.get_collection(source["collection"]).aggregate(pipeline):
+        hour = datetime.strptime(group["_id"]["hour"], "%Y-%m-%dT%H").replace(tzinfo=timezone.utc)
+        values = {metric: group.get(metric) or 0 for metric in source["metrics"]}
+        doc = hours.setdefault(hour, {})
+        _merge(doc, values)
+        if breakdown:
+            doc.setdefault(breakdown[0], {})[_key(group["_id"].get("key"))] = values
+    return hours
+
+
+async def _rebuild_days(db, days: Iterable[datetime], updated_at: datetime) -> int:
+    """Replace each day bucket with the sum of its hour buckets."""
+    days = sorted(set(days))
+    if not days:
+        return 0
+    buckets = db.get_collection(BUCKETS_COLLECTION)
+    per_day: Dict[datetime, Dict[str, Any]] = defaultdict(dict)
+    cursor = buckets.find(
+        {"granularity": HOUR, "start": {"$gte": days[0], "$lt": days[-1] + timedelta(days=1)}},
+        {"_id": 0},
+    )
+    wanted = set(days)
+    async for bucket in cursor:
+        day = day_start(bucket["start"])
+        if day in wanted:
+            for name in SOURCES:
+                if bucket.get(name):
+                    _merge(per_day[day].setdefault(name, {}), bucket[name])
+    await buckets.bulk_write([
+        ReplaceOne(
+            {"granularity": DAY, "start": day},
+            {"granularity": DAY, "start": day, **per_day.get(day, {}), "updated_at": updated_at},
+            upsert=True,
+        )
+        for day in days
+    ], ordered=False)
+    return len(days)
+
+
+async def refresh_gauges(db) -> Dict[str, Any]:
+    """Recompute the point-in-time dashboard figures and store them as the ``gauges`` document."""
+    now = datetime.now(timezone.utc)
+    users = db.get_collection("users")
+    gauges: Dict[str, Any] = {
+        "users": {
+            "total": await users.estimated_document_count(),
+            "active": await users.count_documents({"is_active": True}),
+            "verified": await users.count_documents({"email_verified": True}),
+            "suspended": await users.count_documents({"is_suspended": True}),
+            "active_7d": await users.count_documents({"last_login": {"$gte": now - timedelta(days=7)}}),
+        },
+        "transactions_total": await db.get_collection("transactions").estimated_document_count(),
+        "orders_total": await db.get_collection("orders").estimated_document_count(),
+        "pending_deposits": await db.get_collection("deposits").count_documents({"status": "pending"}),
+    }
+
+    withdrawals = {state: {"count": 0, "amount": 0, "high_value": 0} for state in PENDING_WITHDRAWAL_STATES}
+    pipeline = [
+        {"$match": {"status": {"$in": list(PENDING_WITHDRAWAL_STATES)}}},
+        {"$group": {
+            "_id": "$status",
+            "count": {"$sum": 1},
+            "amount": {"$sum": "$amount"},
+            "high_value": {"$sum": {"$cond": [{"$eq": ["$requires_multi_approval", True]}, 1, 0]}},
+        }},
+    ]
+    async for group in db.get_collection("withdrawals").aggregate(pipeline):
+        withdrawals[group["_id"]] = {metric: group.get(metric) or 0 for metric in ("count", "amount", "high_value")}
+    gauges["withdrawals"] = withdrawals
+    gauges["refreshed_at"] = now
+
+    await db.get_collection(STATE_COLLECTION).replace_one({"_id": "gauges"}, gauges, upsert=True)
+    return gauges
+
+
+async def get_gauges(db) -> Dict[str, Any]:
+    """The latest gauges, computed on the spot if the rollup job has never run."""
+    gauges = await db.get_collection(STATE_COLLECTION).find_one({"_id": "gauges"})
+    if not gauges:
+        gauges = await refresh_gauges(db)
+    return gauges
+
+
+async def get_buckets(db, granularity: str, since: datetime, until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Buckets of one granularity starting in ``[since, until)``, oldest first."""
+    start: Dict[str, Any] = {"$gte": since}
+    if until is not None:
+        start["$lt"] = until
+    cursor = db.get_collection(BUCKETS_COLLECTION).find(
+        {"granularity": granularity, "start": start}, {"_id": 0}
+    ).sort("start", 1)
+    buckets = []
+    async for bucket in cursor:
+        bucket["start"] = _utc(bucket["start"])
+        buckets.append(bucket)
+    return buckets
+
+
+async def roll_up(db, settle_seconds: float = 30.0, now: Optional[datetime] = None) -> int:
+    """
+    Bring the buckets up to ``now - settle_seconds`` and refresh the gauges.
+
+    Returns the number of hour buckets recomputed.
+    """
+    now = now or datetime.now(timezone.utc)
+    until = now - timedelta(seconds=settle_seconds)
+    state_collection = db.get_collection(STATE_COLLECTION)
+    watermarks = await state_collection.find_one({"_id": "watermarks"}) or {}
+
+    hour_ops = []
+    days = set()
+    for name in SOURCES:
+        since = watermarks.get(name)
+        hours = await _aggregate_hours(db, name, _utc(since) if since else None, until)
+        for hour, doc in hours.items():
+            hour_ops.append(UpdateOne(
+                {"granularity": HOUR, "start": hour},
+                {"$set": {name: doc, "updated_at": now}},
+                upsert=True,
+            ))
+            days.add(day_start(hour))
+    if hour_ops:
+        await db.get_collection(BUCKETS_COLLECTION).bulk_write(hour_ops, ordered=False)
+        await _rebuild_days(db, days, now)
+
+    # Only advanced once the buckets are written; a failed run is redone from the old marks
+    await state_collection.update_one(
+        {"_id": "watermarks"},
+        {"$set": {name: until for name in SOURCES}},
+        upsert=True,
+    )
+    await refresh_gauges(db)
+    return len(hour_ops)
+
+
+async def rebuild_all(db) -> int:
+    """Drop the watermarks and recompute every bucket from the source collections."""
+    await db.get_collection(STATE_COLLECTION).delete_one({"_id": "watermarks"})
+    return await roll_up(db, settle_seconds=0)
+
+
+class DashboardRollupJob:
+    """Periodically rolls new activity into the dashboard buckets."""
+
+    def __init__(self, interval_seconds: float = 60.0, settle_seconds: float = 30.0):
+        self.interval = interval_seconds
+        self.settle = settle_seconds
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self.is_running = False
+
+        self.runs = 0
+        self.hours_recomputed = 0
+        self.last_run: Optional[datetime] = None
+
+    def start(self, db) -> None:
+        if self.is_running:
+            return
+        self._db = db
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info("Dashboard rollup job started (every %.0fs)", self.interval)
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        # First pass right away so a fresh deployment backfills before anyone opens the dashboard
+        while self.is_running:
+            try:
+                await self.run_once()
+            except Exception as exc:
+                logger.warning("Dashboard rollup failed: %s", exc)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        recomputed = await roll_up(self._db, self.settle)
+        self.runs += 1
+        self.hours_recomputed += recomputed
+        self.last_run = datetime.now(timezone.utc)
+        return recomputed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "runs": self.runs,
+            "hours_recomputed": self.hours_recomputed,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+
+dashboard_rollup_job = DashboardRollupJob(
+    interval_seconds=settings.dashboard_rollup_interval_seconds,
+    settle_seconds=settings.dashboard_rollup_settle_seconds,
+)
+
+
+if __name__ == "__main__":
+    # Backfill/rebuild: python dashboard_rollups.py
+    from database import initialize_database
+
+    async def main():
+        db_conn = await initialize_database(
+            mongo_url=settings.mongo_url,
+            db_name=settings.db_name
+        )
+        hours = await rebuild_all(db_conn.db)
+        logger.info("Rebuilt %d hourly dashboard buckets", hours)
+        await db_conn.disconnect()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -122,6 +122,22 @@ async def create_indexes(db: AsyncIOMotorDatabase):
         
         logger.info("✅ Wallets indexes created")
         
+        # ============================================
+        # LEDGER COLLECTIONS
+        # ============================================
+        ledger_collection = db.get_collection("ledger_entries")
+        
+        # One entry per (user, sequence number); also the per-user replay order
+        await ledger_collection.create_index([("user_id", ASCENDING), ("seq", ASCENDING)], unique=True)
+        await ledger_collection.create_index([("reference", ASCENDING)])
+        
+        snapshots_collection = db.get_collection("wallet_snapshots")
+        
+        await snapshots_collection.create_index([("user_id", ASCENDING), ("seq", DESCENDING)], unique=True)
+        await snapshots_collection.create_index([("user_id", ASCENDING), ("as_of", DESCENDING)])
+        
+        logger.info("✅ Ledger indexes created")
+        
         # ============================================
         # ORDERS COLLECTION
         # ============================================
@@ -147,6 +163,9 @@ async def create_indexes(db: AsyncIOMotorDatabase):
             ("created_at", DESCENDING)
         ])
         
+        # Dashboard rollups scan fills by time
+        await orders_collection.create_index([("filled_at", ASCENDING)], sparse=True)
+        
         # Index for pending orders (for advanced order execution)
         await orders_collection.create_index([
             ("status", ASCENDING),
@@ -185,16 +204,24 @@ async def create_indexes(db: AsyncIOMotorDatabase):
         
         await transactions_collection.create_index([("id", ASCENDING)], unique=True)
         
-        # Compound index for user transaction history
+        # Compound index for user transaction history (id breaks ties for keyset pagination)
         await transactions_collection.create_index([
             ("user_id", ASCENDING),
-            ("created_at", DESCENDING)
+            ("created_at", DESCENDING),
+            ("id", DESCENDING)
         ])
         
         await transactions_collection.create_index([
             ("user_id", ASCENDING),
             ("type", ASCENDING),
-            ("created_at", DESCENDING)
+            ("created_at", DESCENDING),
+            ("id", DESCENDING)
+        ])
+        
+        # Admin transaction list (keyset pagination across all users)
+        await transactions_collection.create_index([
+            ("created_at", DESCENDING),
+            ("id", DESCENDING)
         ])
         
         await transactions_collection.create_index([
@@ -208,6 +235,27 @@ async def create_indexes(db: AsyncIOMotorDatabase):
         
         logger.info("✅ Transactions indexes created")
         
+        # ============================================
+        # TRANSACTION STATS ROLLUPS
+        # ============================================
+        await db.get_collection("transaction_stats").create_index([("user_id", ASCENDING)], unique=True)
+        await db.get_collection("transaction_stats_daily").create_index([
+            ("user_id", ASCENDING),
+            ("day", DESCENDING)
+        ], unique=True)
+        
+        logger.info("✅ Transaction stats indexes created")
+        
+        # ============================================
+        # DASHBOARD ROLLUPS
+        # ============================================
+        await db.get_collection("dashboard_buckets").create_index([
+            ("granularity", ASCENDING),
+            ("start", ASCENDING)
+        ], unique=True)
+        
+        logger.info("✅ Dashboard rollup indexes created")
+        
         # ============================================
         # DEPOSITS COLLECTION
         # ============================================
@@ -217,10 +265,11 @@ async def create_indexes(db: AsyncIOMotorDatabase):
         await deposits_collection.create_index([("order_id", ASCENDING)], unique=True)
         await deposits_collection.create_index([("payment_id", ASCENDING)])
         
-        # Compound index for user deposits
+        # Compound index for user deposits (id breaks ties for keyset pagination)
         await deposits_collection.create_index([
             ("user_id", ASCENDING),
-            ("created_at", DESCENDING)
+            ("created_at", DESCENDING),
+            ("id", DESCENDING)
         ])
         
         await deposits_collection.create_index([
@@ -235,6 +284,9 @@ async def create_indexes(db: AsyncIOMotorDatabase):
             expireAfterSeconds=0,
             partialFilterExpression={"status": "pending", "expires_at": {"$exists": True}}
         )
+
+        # Deposits whose credit was claimed by an IPN batch but not yet posted
+        await deposits_collection.create_index([("credit_batch", ASCENDING)], sparse=True)
         
         logger.info("✅ Deposits indexes created")
         
@@ -245,10 +297,11 @@ async def create_indexes(db: AsyncIOMotorDatabase):
         
         await withdrawals_collection.create_index([("id", ASCENDING)], unique=True)
         
-        # Compound index for user withdrawals
+        # Compound index for user withdrawals (id breaks ties for keyset pagination)
         await withdrawals_collection.create_index([
             ("user_id", ASCENDING),
-            ("created_at", DESCENDING)
+            ("created_at", DESCENDING),
+            ("id", DESCENDING)
         ])
         
         await withdrawals_collection.create_index([
@@ -263,6 +316,9 @@ async def create_indexes(db: AsyncIOMotorDatabase):
             ("created_at", ASCENDING)
         ])
         
+        # Dashboard rollups scan requests by time
+        await withdrawals_collection.create_index([("created_at", ASCENDING)])
+        
         # Multi-approver workflow: track approval status
         await withdrawals_collection.create_index([
             ("status", ASCENDING),
@@ -286,15 +342,18 @@ async def create_indexes(db: AsyncIOMotorDatabase):
         
         await transfers_collection.create_index([("id", ASCENDING)], unique=True)
         
-        # Compound index for user transfers (both sent and received)
+        # Compound index for user transfers (both sent and received); the two $or branches
+        # are merged in (created_at, id) order for keyset pagination
         await transfers_collection.create_index([
             ("sender_id", ASCENDING),
-            ("created_at", DESCENDING)
+            ("created_at", DESCENDING),
+            ("id", DESCENDING)
         ])
         
         await transfers_collection.create_index([
             ("recipient_id", ASCENDING),
-            ("created_at", DESCENDING)
+            ("created_at", DESCENDING),
+            ("id", DESCENDING)
         ])
         
         await transfers_collection.create_index([
@@ -336,6 +395,9 @@ async def create_indexes(db: AsyncIOMotorDatabase):
             ("condition", ASCENDING)
         ])
         
+        # Alert engine reconciliation (alerts changed since the last pass)
+        await alerts_collection.create_index([("updated_at", ASCENDING)])
+        
         logger.info("✅ Price alerts indexes created")
         
         # ============================================
@@ -345,16 +407,18 @@ async def create_indexes(db: AsyncIOMotorDatabase):
         
         await notifications_collection.create_index([("id", ASCENDING)], unique=True)
         
-        # Compound index for user notifications
+        # Compound index for user notifications (id breaks ties for keyset pagination)
         await notifications_collection.create_index([
             ("user_id", ASCENDING),
-            ("created_at", DESCENDING)
+            ("created_at", DESCENDING),
+            ("id", DESCENDING)
         ])
         
         await notifications_collection.create_index([
             ("user_id", ASCENDING),
             ("read", ASCENDING),
-            ("created_at", DESCENDING)
+            ("created_at", DESCENDING),
+            ("id", DESCENDING)
         ])
         
         await notifications_collection.create_index([
@@ -408,6 +472,25 @@ async def create_indexes(db: AsyncIOMotorDatabase):
         
         logger.info("✅ Audit logs indexes created")
         
+        # ============================================
+        # ADMIN AUDIT LOGS COLLECTION
+        # ============================================
+        admin_audit_logs_collection = db.get_collection("admin_audit_logs")
+        
+        # Keyset pagination for the admin audit log viewer, unfiltered and per admin
+        await admin_audit_logs_collection.create_index([
+            ("timestamp", DESCENDING),
+            ("id", DESCENDING)
+        ])
+        
+        await admin_audit_logs_collection.create_index([
+            ("admin_id", ASCENDING),
+            ("timestamp", DESCENDING),
+            ("id", DESCENDING)
+        ])
+        
+        logger.info("✅ Admin audit logs indexes created")
+        
         # ============================================
         # LOGIN ATTEMPTS COLLECTION
         # ============================================
@@ -5,6 +5,7 @@ from typing import Optional
 import logging
 
 from auth import decode_token
+from auth_cache import MISSING, auth_cache
 from blacklist import is_token_blacklisted
 
 logger = logging.getLogger(__name__)
@@ -68,6 +69,7 @@ async def get_current_user_id(request: Request) -> str:
     Extract and validate user ID from JWT token.
     H2 FIX: Check if password was changed after token was issued.
     If password changed after token issued, reject token (all old sessions invalid).
+    Blacklist misses and password-change times come from ``auth_cache`` when fresh.
     """
     # Try to get token from Authorization header first
     auth_header = request.headers.get("Authorization")
@@ -86,14 +88,6 @@ async def get_current_user_id(request: Request) -> str:
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Check if token is blacklisted
-    if await is_token_blacklisted(token):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token has been revoked",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
     # Decode and validate token - MUST be an access token (C5 fix)
     payload = decode_token(token, expected_type="access")
     if not payload:
@@ -103,6 +97,19 @@ async def get_current_user_id(request: Request) -> str:
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Check if token is blacklisted (recent "not revoked" answers are cached briefly)
+    jti = payload.get("jti")
+    if not (jti and auth_cache.is_known_unrevoked(jti)):
+        epoch = auth_cache.begin()
+        if await is_token_blacklisted(token, jti=jti):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        if jti:
+            auth_cache.remember_unrevoked(jti, epoch)
+    
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(
@@ -115,21 +122,23 @@ async def get_current_user_id(request: Request) -> str:
     token_issued_at = payload.get("iat")  # Token issued at
     if token_issued_at:
         try:
-            # Get database connection
-            db = get_db()
-            users_collection = db.get_collection("users")
-            user_doc = await users_collection.find_one({"id": user_id})
+            password_changed_at = auth_cache.password_changed_at(user_id)
+            if password_changed_at is MISSING:
+                epoch = auth_cache.begin()
+                db = get_db()
+                users_collection = db.get_collection("users")
+                user_doc = await users_collection.find_one({"id": user_id}, {"_id": 0, "password_changed_at": 1})
+                password_changed_at = user_doc.get("password_changed_at") if user_doc else None
+                auth_cache.remember_password_changed_at(user_id, password_changed_at, epoch)
             
-            if user_doc and "password_changed_at" in user_doc and user_doc["password_changed_at"]:
-                password_changed_at = user_doc["password_changed_at"]
-                # If password was changed AFTER token was issued, invalidate session
-                if password_changed_at.timestamp() > token_issued_at:
-                    logger.info(f"Rejecting token: password changed after token issued for user {user_id}")
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Session invalidated due to password change. Please login again.",
-                        headers={"WWW-Authenticate": "Bearer"},
-                    )
+            # If password was changed AFTER token was issued, invalidate session
+            if password_changed_at and password_changed_at.timestamp() > token_issued_at:
+                logger.info(f"Rejecting token: password changed after token issued for user {user_id}")
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Session invalidated due to password change. Please login again.",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
         except HTTPException:
             raise
         except Exception as e:
@@ -0,0 +1,311 @@
+"""
+Append-only wallet ledger.
+
+Every balance change is posted through ``post_balance_change``: one conditional
+``find_one_and_update`` applies the ``$inc`` to ``wallets.balances`` (with an optional
+minimum-balance guard) and advances the wallet's ``ledger_seq`` by one per currency touched;
+the matching immutable entries are then appended to ``ledger_entries`` with those per-user
+sequence numbers. ``wallets`` therefore always holds the balance as of ``ledger_seq``, the
+last applied sequence.
+
+``wallet_snapshots`` holds periodic compactions of the ledger (``balances`` at ``seq``),
+folded from the previous snapshot and the entries since by ``LedgerCompactor``. Historical balances and reconciliation start from the nearest
+snapshot and replay only the entries after it, instead of scanning the whole history.
+
+Callers are expected to hold the user's wallet lane (``wallet_lanes``) around the read that
+decides the change and the post itself.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+
+from config import settings
+from wallet_lanes import wallet_lanes
+
+logger = logging.getLogger(__name__)
+
+LEDGER_COLLECTION = "ledger_entries"
+SNAPSHOT_COLLECTION = "wallet_snapshots"
+# Differences below this are float noise, not drift
+DRIFT_TOLERANCE = 1e-8
+
+
+async def post_balance_change(
+    db,
+    user_id: str,
+    changes: Dict[str, float],
+    *,
+    kind: str,
+    reference: Optional[str] = None,
+    description: Optional[str] = None,
+    guard: Optional[Dict[str, float]] = None,
+    upsert: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    Apply ``changes`` ({currency: delta}) to the user's wallet and append one ledger entry per currency.
+
+    ``guard`` ({currency: minimum}) is part of the update filter, so the change only applies
+    while those balances are high enough. ``upsert`` creates a missing wallet (ignored when a
+    guard is given). Returns the wallet after the change (``balances`` and ``ledger_seq``), or
+    None when the guard failed or there is no wallet.
+    """
+    changes = {currency: delta for currency, delta in changes.items() if delta}
+    upsert = upsert and not guard
+    now = datetime.now(timezone.utc)
+
+    query: Dict[str, Any] = {"user_id": user_id}
+    for currency, minimum in (guard or {}).items():
+        query[f"balances.{currency}"] = {"$gte": minimum}
+    increments: Dict[str, Any] = {f"balances.{currency}": delta for currency, delta in changes.items()}
+    increments["ledger_seq"] = len(changes)
+    update: Dict[str, Any] = {"$inc": increments, "$set": {"updated_at": now}}
+    if upsert:
+        update["$setOnInsert"] = {"id": str(uuid.uuid4()), "created_at": now}
+
+    wallet = await db.get_collection("wallets").find_one_and_update(
+        query,
+        update,
+        projection={"_id": 0, "balances": 1, "ledger_seq": 1},
+        return_document=ReturnDocument.AFTER,
+        upsert=upsert,
+    )
+    if wallet is None or not changes:
+        return wallet
+
+    balances = wallet.get("balances", {})
+    first_seq = wallet["ledger_seq"] - len(changes) + 1
+    entries = [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "seq": first_seq + offset,
+            "currency": currency,
+            "amount": delta,
+            "balance_after": balances.get(currency, 0.0),
+            "kind": kind,
+            "reference": reference,
+            "description": description,
+            "created_at": now,
+        }
+        for offset, (currency, delta) in enumerate(sorted(changes.items()))
+    ]
+    try:
+        await db.get_collection(LEDGER_COLLECTION).insert_many(entries, ordered=False)
+        if first_seq == 1:
+            # First post for this wallet: record the pre-ledger balances as the opening snapshot
+            opening = {currency: balances.get(currency, 0.0) - delta for currency, delta in changes.items()}
+            await _write_snapshot(db, user_id, 0, {**balances, **opening}, now)
+    except Exception as exc:
+        # The balance already moved; never fail the caller (a retry would apply it twice).
+        # Reconciliation reports the gap in the sequence.
+        logger.error(
+            "Ledger append failed for user %s seq %d-%d (%s): %s",
+            user_id, first_seq, wallet["ledger_seq"], kind, exc,
+        )
+    return wallet
+
+
+async def _write_snapshot(db, user_id: str, seq: int, balances: Dict[str, float], as_of: datetime) -> Dict[str, Any]:
+    snapshot = {"user_id": user_id, "seq": seq, "balances": balances, "as_of": as_of}
+    await db.get_collection(SNAPSHOT_COLLECTION).update_one(
+        {"user_id": user_id, "seq": seq},
+        {"$setOnInsert": snapshot},
+        upsert=True,
+    )
+    return snapshot
+
+
+async def _replay(db, user_id: str, base: Dict[str, float], query: Dict[str, Any]) -> tuple:
+    balances = dict(base)
+    replayed = 0
+    cursor = db.get_collection(LEDGER_COLLECTION).find(
+        {"user_id": user_id, **query}, {"_id": 0, "currency": 1, "amount": 1}
+    )
+    async for entry in cursor:
+        balances[entry["currency"]] = balances.get(entry["currency"], 0.0) + entry["amount"]
+        replayed += 1
+    return balances, replayed
+
+
+async def balance_at(db, user_id: str, at: datetime) -> Optional[Dict[str, Any]]:
+    """
+    Balances as of ``at``: the latest snapshot taken at or before ``at`` plus later entries up
+    to ``at``. Returns None when the ledger has no history for the user that far back.
+    """
+    snapshot = await db.get_collection(SNAPSHOT_COLLECTION).find_one(
+        {"user_id": user_id, "as_of": {"$lte": at}},
+        {"_id": 0},
+        sort=[("seq", -1)],
+    )
+    if snapshot is None:
+        return None
+    balances, replayed = await _replay(
+        db, user_id, snapshot["balances"], {"seq": {"$gt": snapshot["seq"]}, "created_at": {"$lte": at}}
+    )
+    return {
+        "user_id": user_id,
+        "at": at,
+        "balances": balances,
+        "snapshot_seq": snapshot["seq"],
+        "entries_replayed": replayed,
+    }
+
+
+async def reconcile(db, user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Check the wallet against its latest snapshot plus the ledger entries after it.
+
+    Reports sequence gaps (entries that were never appended) and per-currency drift (balance
+    changes made outside ``post_balance_change``). Only the entries since the snapshot are read.
+    """
+    wallet = await db.get_collection("wallets").find_one(
+        {"user_id": user_id}, {"_id": 0, "balances": 1, "ledger_seq": 1}
+    )
+    if not wallet:
+        return None
+    ledger_seq = wallet.get("ledger_seq", 0)
+    snapshot = await db.get_collection(SNAPSHOT_COLLECTION).find_one(
+        {"user_id": user_id, "seq": {"$lte": ledger_seq}},
+        {"_id": 0},
+        sort=[("seq", -1)],
+    )
+    if snapshot is None:
+        # Never posted through the ledger: the wallet itself is the only record
+        return {"user_id": user_id, "ledger_seq": ledger_seq, "snapshot_seq": None,
+                "missing_entries": ledger_seq, "drift": {}, "ok": ledger_seq == 0,
+                "expected": wallet.get("balances", {})}
+
+    expected, replayed = await _replay(
+        db, user_id, snapshot["balances"], {"seq": {"$gt": snapshot["seq"], "$lte": ledger_seq}}
+    )
+    actual = wallet.get("balances", {})
+    drift = {
+        currency: actual.get(currency, 0.0) - expected.get(currency, 0.0)
+        for currency in set(actual) | set(expected)
+        if abs(actual.get(currency, 0.0) - expected.get(currency, 0.0)) > DRIFT_TOLERANCE
+    }
+    missing = (ledger_seq - snapshot["seq"]) - replayed
+    return {
+        "user_id": user_id,
+        "ledger_seq": ledger_seq,
+        "snapshot_seq": snapshot["seq"],
+        "missing_entries": missing,
+        "drift": drift,
+        "ok": missing == 0 and not drift,
+        "expected": expected,
+    }
+
+
+async def compact_wallet(db, user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Fold the entries since the latest snapshot into a new snapshot at the wallet's ``ledger_seq``.
+
+    The snapshot is built from the ledger, not copied from the wallet, so out-of-band drift
+    keeps being reported instead of being absorbed. Wallets that never posted through the
+    ledger get an opening snapshot of their current balances; wallets with sequence gaps are
+    left for investigation. Returns the reconciliation report (None without a wallet).
+    """
+    report = await reconcile(db, user_id)
+    if report is None:
+        return None
+    seq = report["ledger_seq"]
+    if report["snapshot_seq"] is None:
+        wallet = await db.get_collection("wallets").find_one({"user_id": user_id}, {"_id": 0, "balances": 1})
+        balances = wallet.get("balances", {})
+    elif report["missing_entries"] == 0 and seq > report["snapshot_seq"]:
+        balances = report["expected"]
+    else:
+        return report
+    await _write_snapshot(db, user_id, seq, balances, datetime.now(timezone.utc))
+    await db.get_collection("wallets").update_one({"user_id": user_id}, {"$max": {"snapshot_seq": seq}})
+    report["snapshot_written"] = True
+    return report
+
+
+class LedgerCompactor:
+    """Periodically reconciles and snapshots wallets that have accumulated ledger entries."""
+
+    def __init__(self, interval_seconds: float = 300.0, min_entries: int = 50):
+        self.interval = interval_seconds
+        self.min_entries = max(1, min_entries)
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self.is_running = False
+
+        self.snapshots_written = 0
+        self.drift_detected = 0
+        self.last_run: Optional[datetime] = None
+
+    def start(self, db) -> None:
+        if self.is_running:
+            return
+        self._db = db
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info("Ledger compactor started (every %.0fs, >= %d entries)", self.interval, self.min_entries)
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while self.is_running:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.compact_once()
+            except Exception as exc:
+                logger.warning("Ledger compaction failed: %s", exc)
+
+    async def compact_once(self) -> int:
+        """Snapshot every wallet with at least ``min_entries`` entries since its last snapshot."""
+        due = self._db.get_collection("wallets").find(
+            {"$expr": {"$gte": [
+                {"$subtract": [{"$ifNull": ["$ledger_seq", 0]}, {"$ifNull": ["$snapshot_seq", 0]}]},
+                self.min_entries,
+            ]}},
+            {"_id": 0, "user_id": 1},
+        )
+        written = 0
+        async for wallet in due:
+            user_id = wallet["user_id"]
+            # In the user's lane, so no post is half-applied while we fold and snapshot
+            async with wallet_lanes.lane(user_id):
+                report = await compact_wallet(self._db, user_id)
+            if report is None:
+                continue
+            if not report["ok"]:
+                self.drift_detected += 1
+                logger.warning(
+                    "Ledger mismatch for user %s: missing=%s drift=%s",
+                    user_id, report["missing_entries"], report["drift"],
+                )
+            if report.get("snapshot_written"):
+                written += 1
+        self.snapshots_written += written
+        self.last_run = datetime.now(timezone.utc)
+        return written
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "snapshots_written": self.snapshots_written,
+            "drift_detected": self.drift_detected,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+
+ledger_compactor = LedgerCompactor(
+    interval_seconds=settings.ledger_snapshot_interval_seconds,
+    min_entries=settings.ledger_snapshot_min_entries,
+)
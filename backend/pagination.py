@@ -0,0 +1,79 @@
+"""
+Keyset (cursor) pagination for history endpoints.
+
+Pages are ordered by ``(time_field, id)`` descending and the next page starts strictly after
+the last document returned, so every page is one index range scan no matter how deep it is
+(``skip`` has to walk and discard every earlier document). The cursor handed to clients is
+an opaque URL-safe token; each paginated collection has a ``(..., time_field, id)`` index in
+``database_indexes.py``.
+
+``skip`` is still accepted as a deprecated fallback for clients that have not switched yet;
+it is ignored whenever a cursor is given.
+"""
+
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(value: datetime, doc_id: str) -> str:
+    """Opaque token for the position right after ``(value, doc_id)``."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    raw = json.dumps({"t": value.isoformat(), "id": doc_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, str]:
+    """Inverse of ``encode_cursor``. Malformed tokens are a 400, not a 500."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["t"]), str(data["id"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+
+def keyset_query(query: Dict[str, Any], cursor: str, time_field: str = "created_at") -> Dict[str, Any]:
+    """Restrict ``query`` to documents that sort after the cursor position."""
+    value, doc_id = decode_cursor(cursor)
+    after = {"$or": [
+        {time_field: {"$lt": value}},
+        {time_field: value, "id": {"$lt": doc_id}},
+    ]}
+    return {"$and": [query, after]} if query else after
+
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    *,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    time_field: str = "created_at",
+    projection: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of ``query`` newest first, plus the cursor for the next page (None on the last).
+
+    One extra document is read to tell whether another page exists, so no count is needed
+    to page through the results.
+    """
+    if cursor:
+        query = keyset_query(query, cursor, time_field)
+    find = collection.find(query, projection) if projection else collection.find(query)
+    find = find.sort([(time_field, -1), ("id", -1)])
+    if skip and not cursor:
+        find = find.skip(skip)
+    docs = await find.limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last[time_field], last["id"])
+    return docs, next_cursor
@@ -0,0 +1,114 @@
+"""
+Password hashing off the event loop.
+
+bcrypt at 12 rounds costs ~250 ms of CPU per hash or check. Run inline in an async handler
+that stalls every other request and WebSocket broadcast on the worker, so login, signup and
+password changes go through ``password_hasher`` instead: the work runs on a small dedicated
+thread pool (bcrypt releases the GIL while hashing), and at most ``workers + max_queue``
+operations are admitted at once. Beyond that callers get an immediate 503 with
+``Retry-After`` rather than queueing behind a login storm.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from auth import get_password_hash, verify_password
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasher:
+    """Bounded thread pool for bcrypt work, with admission control and queue metrics."""
+
+    def __init__(self, workers: int = 4, max_queue: int = 64, retry_after_seconds: int = 2):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+        self.completed = 0
+        self.rejected = 0
+        self.peak_queue = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    @property
+    def queued(self) -> int:
+        return self._in_flight - self._running
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a CPU-bound password function on the pool, or 503 when it is saturated."""
+        if self._in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            logger.warning("Password hashing saturated (%d in flight); rejecting", self._in_flight)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy. Please try again shortly.",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        self._in_flight += 1
+        self.peak_queue = max(self.peak_queue, self.queued)
+        submitted = time.perf_counter()
+
+        def timed() -> Any:
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self.total_wait += started - submitted
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.total_run += time.perf_counter() - started
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), timed)
+        finally:
+            self._in_flight -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": self.queued,
+            "peak_queue": self.peak_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.total_run / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+)
@@ -18,6 +18,8 @@ from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
 from datetime import datetime, timedelta
 import logging
 
+from tiered_cache import TieredCache, tiered_cache
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
@@ -30,14 +32,14 @@ T = TypeVar('T')
 class ResponseCache:
     """
     In-memory response cache with TTL support.
-    For production, use Redis via redis_enhanced module.
+    Entries live in a namespace of the shared tiered cache (O(1) LRU eviction).
     """
     
-    def __init__(self, max_size: int = 1000):
-        self._cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, max_size: int = 1000, namespace: str = "responses", engine: Optional[TieredCache] = None):
+        self._engine = engine or tiered_cache
+        self._namespace = namespace
         self._max_size = max_size
-        self._hits = 0
-        self._misses = 0
+        self._engine.configure(namespace, ttl_seconds=60, max_entries=max_size)
     
     def _generate_key(self, prefix: str, *args, **kwargs) -> str:
         """Generate cache key from function arguments."""
@@ -46,50 +48,27 @@ class ResponseCache:
     
     def get(self, key: str) -> Optional[Any]:
         """Get cached value if not expired."""
-        if key in self._cache:
-            entry = self._cache[key]
-            if time.time() < entry["expires_at"]:
-                self._hits += 1
-                return entry["value"]
-            else:
-                del self._cache[key]
-        self._misses += 1
-        return None
+        return self._engine.get_local(self._namespace, key)
     
-    def set(self, key: str, value: Any, ttl_seconds: int = 60) -> None:
-        """Set cache value with TTL."""
-        # Evict oldest entries if cache is full
-        if len(self._cache) >= self._max_size:
-            oldest_key = min(self._cache.keys(), key=lambda k: self._cache[k]["created_at"])
-            del self._cache[oldest_key]
-        
-        self._cache[key] = {
-            "value": value,
-            "created_at": time.time(),
-            "expires_at": time.time() + ttl_seconds
-        }
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        """Set cache value with TTL (the namespace default when omitted)."""
+        self._engine.set_local(self._namespace, key, value, ttl_seconds)
     
     def invalidate(self, pattern: str = None) -> int:
         """Invalidate cache entries matching pattern."""
-        if pattern is None:
-            count = len(self._cache)
-            self._cache.clear()
-            return count
-        
-        keys_to_delete = [k for k in self._cache if pattern in k]
-        for k in keys_to_delete:
-            del self._cache[k]
-        return len(keys_to_delete)
+        return self._engine.invalidate(self._namespace, pattern)
     
     def stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
-        total = self._hits + self._misses
+        ns = self._engine.namespace_stats(self._namespace)
         return {
-            "size": len(self._cache),
+            "size": ns["entries"],
             "max_size": self._max_size,
-            "hits": self._hits,
-            "misses": self._misses,
-            "hit_rate": round(self._hits / total * 100, 2) if total > 0 else 0
+            "hits": ns["hits"],
+            "misses": ns["misses"],
+            "hit_rate": ns["hit_rate"],
+            "bytes": ns["bytes"],
+            "evictions": ns["evictions"],
         }
 
 
@@ -97,9 +76,10 @@ class ResponseCache:
 response_cache = ResponseCache(max_size=500)
 
 
-def cached(ttl_seconds: int = 60, prefix: str = ""):
+def cached(ttl_seconds: Optional[int] = None, prefix: str = ""):
     """
     Decorator for caching function responses.
+    Without ``ttl_seconds`` entries use the "responses" namespace TTL (60s by default).
     
     Usage:
         @cached(ttl_seconds=300, prefix="crypto")
@@ -121,7 +101,7 @@ def cached(ttl_seconds: int = 60, prefix: str = ""):
             # Execute function and cache result
             result = await func(*args, **kwargs)
             response_cache.set(cache_key, result, ttl_seconds)
-            logger.debug(f"Cache miss for {cache_prefix}, cached for {ttl_seconds}s")
+            logger.debug(f"Cache miss for {cache_prefix}, cached")
             
             return result
         return wrapper
@@ -11,10 +11,10 @@ Auto-disables on repeated failures to prevent log spam.
 
 import json
 import logging
-import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from config import settings
+from tiered_cache import tiered_cache
 
 logger = logging.getLogger(__name__)
 
@@ -44,8 +44,8 @@ class RedisCache:
         self._upstash_url = _UPSTASH_URL
         self._upstash_token = _UPSTASH_TOKEN
 
-        # In-memory fallback
-        self.memory_cache: Dict[str, tuple] = {}
+        # In-memory fallback lives in the shared tiered cache's "redis" namespace
+        tiered_cache.configure("redis", max_entries=10000)
 
         # TTL defaults
         self.DEFAULT_TTL = 300
@@ -117,6 +117,30 @@ class RedisCache:
                 return await self._upstash_delete(key)
         return self._mem_delete(key)
 
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Write several keys with the same TTL in a single round-trip."""
+        if not items:
+            return True
+        if self.use_redis:
+            if _USE_STANDARD:
+                return await self._std_set_many(items, ttl or self.DEFAULT_TTL)
+            if _USE_UPSTASH:
+                return await self._upstash_set_many(items, ttl or self.DEFAULT_TTL)
+        for key, value in items.items():
+            self._mem_set(key, value, ttl or self.DEFAULT_TTL)
+        return True
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Read several keys in a single round-trip; missing keys come back as None."""
+        if not keys:
+            return []
+        if self.use_redis:
+            if _USE_STANDARD:
+                return await self._std_mget(keys)
+            if _USE_UPSTASH:
+                return await self._upstash_mget(keys)
+        return [self._mem_get(key) for key in keys]
+
     async def exists(self, key: str) -> bool:
         return (await self.get(key)) is not None
 
@@ -165,6 +189,38 @@ class RedisCache:
             self._record_failure()
             return self._mem_set(key, value, ttl)
 
+    async def _std_set_many(self, items: Dict[str, Any], ttl: int) -> bool:
+        try:
+            client = await self._get_client()
+            if not client:
+                for key, value in items.items():
+                    self._mem_set(key, value, ttl)
+                return True
+            pipe = client.pipeline(transaction=False)
+            for key, value in items.items():
+                serialized = json.dumps(value) if not isinstance(value, str) else value
+                pipe.setex(key, ttl, serialized)
+            await pipe.execute()
+            self._record_success()
+            return True
+        except Exception:
+            self._record_failure()
+            for key, value in items.items():
+                self._mem_set(key, value, ttl)
+            return True
+
+    async def _std_mget(self, keys: List[str]) -> List[Optional[Any]]:
+        try:
+            client = await self._get_client()
+            if not client:
+                return [self._mem_get(key) for key in keys]
+            results = await client.mget(keys)
+            self._record_success()
+            return [self._decode(result) for result in results]
+        except Exception:
+            self._record_failure()
+            return [self._mem_get(key) for key in keys]
+
     async def _std_delete(self, key: str) -> bool:
         try:
             client = await self._get_client()
@@ -236,6 +292,46 @@ class RedisCache:
             self._record_failure()
             return self._mem_set(key, value, ttl)
 
+    async def _upstash_set_many(self, items: Dict[str, Any], ttl: int) -> bool:
+        try:
+            import httpx
+            commands = [
+                ["SETEX", key, str(ttl), json.dumps(value) if not isinstance(value, str) else value]
+                for key, value in items.items()
+            ]
+            async with httpx.AsyncClient(timeout=5) as client:
+                resp = await client.post(
+                    f"{self._upstash_url}/pipeline",
+                    headers={"Authorization": f"Bearer {self._upstash_token}", "Content-Type": "application/json"},
+                    json=commands,
+                )
+                if resp.status_code == 200:
+                    self._record_success()
+                    return True
+                self._record_failure()
+        except Exception:
+            self._record_failure()
+        for key, value in items.items():
+            self._mem_set(key, value, ttl)
+        return True
+
+    async def _upstash_mget(self, keys: List[str]) -> List[Optional[Any]]:
+        try:
+            import httpx
+            async with httpx.AsyncClient(timeout=5) as client:
+                resp = await client.post(
+                    self._upstash_url,
+                    headers={"Authorization": f"Bearer {self._upstash_token}", "Content-Type": "application/json"},
+                    json=["MGET", *keys],
+                )
+                if resp.status_code == 200:
+                    self._record_success()
+                    return [self._decode(result) for result in resp.json().get("result") or [None] * len(keys)]
+                self._record_failure()
+        except Exception:
+            self._record_failure()
+        return [self._mem_get(key) for key in keys]
+
     async def _upstash_delete(self, key: str) -> bool:
         try:
             import httpx
@@ -267,24 +363,14 @@ class RedisCache:
     # ==================================================
 
     def _mem_get(self, key: str) -> Optional[Any]:
-        if key in self.memory_cache:
-            value, expiry = self.memory_cache[key]
-            if time.time() < expiry:
-                return value
-            del self.memory_cache[key]
-        return None
+        return tiered_cache.get_local("redis", key)
 
     def _mem_set(self, key: str, value: Any, ttl: int) -> bool:
-        self.memory_cache[key] = (value, time.time() + ttl)
-        if len(self.memory_cache) > 1000:
-            self._cleanup_memory()
+        tiered_cache.set_local("redis", key, value, ttl)
         return True
 
     def _mem_delete(self, key: str) -> bool:
-        if key in self.memory_cache:
-            del self.memory_cache[key]
-            return True
-        return False
+        return tiered_cache.delete_local("redis", key)
 
     def _mem_incr(self, key: str, amount: int) -> int:
         current = self._mem_get(key) or 0
@@ -295,11 +381,14 @@ class RedisCache:
         self._mem_set(key, new_value, self.DEFAULT_TTL)
         return new_value
 
-    def _cleanup_memory(self):
-        now = time.time()
-        expired = [k for k, (_, exp) in self.memory_cache.items() if exp < now]
-        for k in expired:
-            del self.memory_cache[k]
+    @staticmethod
+    def _decode(result: Optional[str]) -> Optional[Any]:
+        if result is None:
+            return None
+        try:
+            return json.loads(result)
+        except (json.JSONDecodeError, TypeError):
+            return result
 
     # ==================================================
     # HELPER METHODS
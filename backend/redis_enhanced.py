@@ -1,10 +1,14 @@
 """
 Enhanced Redis Service with Pub/Sub, Lua Scripts, and Atomic Operations
 Builds upon the existing redis_cache.py with advanced production features.
+
+Persistent subscriptions (``listen``) and leader locks use a native redis:// connection
+(REDIS_URL); the Upstash REST API cannot hold a subscription open.
 """
 import logging
 import json
 import asyncio
+import time
 from typing import Optional, Any, Dict, List, Callable
 import httpx
 from config import settings
@@ -15,20 +19,32 @@ logger = logging.getLogger(__name__)
 class RedisEnhanced:
     """
     Enhanced Redis service with pub/sub, Lua scripts, and atomic operations.
-    Uses Upstash REST API for serverless Redis operations.
-    Auto-disables on repeated failures to prevent log spam.
+    Uses Upstash REST API for serverless Redis operations, or a native redis://
+    connection when REDIS_URL is set.
+    Pauses for ``failure_cooldown_seconds`` after repeated failures to prevent log spam,
+    then tries Redis again.
     """
     
-    def __init__(self):
-        self.use_redis = settings.is_redis_available()
+    def __init__(self, failure_cooldown_seconds: float = 30.0):
+        self._configured = settings.is_redis_available()
+        self._disabled_until: Optional[float] = None
+        self.failure_cooldown_seconds = failure_cooldown_seconds
         self.redis_url = settings.upstash_redis_rest_url
         self.redis_token = settings.upstash_redis_rest_token
+        self._standard_url = settings.redis_url
+        self._client = None  # async redis.Redis client for redis:// (lazy init)
         self._consecutive_failures = 0
         self._max_failures = 3
         
         # Pub/Sub subscribers
         self.subscribers: Dict[str, List[Callable]] = {}
         self.pubsub_task: Optional[asyncio.Task] = None
+        self._pubsub = None
+        self._listen_channels: Dict[str, List[Callable]] = {}
+        # True only while the listen loop holds a live subscription; the epoch advances on
+        # every (re)subscribe so listeners can tell they may have missed messages in between
+        self.pubsub_connected = False
+        self.pubsub_epoch = 0
         
         # Lua scripts (registered on first use)
         self.lua_scripts = {
@@ -52,20 +68,79 @@ class RedisEnhanced:
                 local old_value = redis.call('GET', KEYS[1])
                 redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
                 return old_value
+            """,
+            "renew_lock": """
+                if redis.call('GET', KEYS[1]) == ARGV[1] then
+                    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+                end
+                return 0
+            """,
+            "release_lock": """
+                if redis.call('GET', KEYS[1]) == ARGV[1] then
+                    return redis.call('DEL', KEYS[1])
+                end
+                return 0
             """
         }
         
         logger.info(f"Enhanced Redis initialized (enabled={self.use_redis})")
     
+    @property
+    def use_redis(self) -> bool:
+        """False while unconfigured or while the failure breaker is open (it closes after the cooldown)."""
+        if not self._configured:
+            return False
+        if self._disabled_until is not None and time.monotonic() >= self._disabled_until:
+            logger.info("Enhanced Redis re-enabled after cooldown")
+            self._disabled_until = None
+            self._consecutive_failures = 0
+        return self._disabled_until is None
+
+    @use_redis.setter
+    def use_redis(self, enabled: bool) -> None:
+        self._configured = enabled
+        self._disabled_until = None
+
     def _record_failure(self):
         self._consecutive_failures += 1
         if self._consecutive_failures >= self._max_failures and self.use_redis:
-            logger.warning(f"Enhanced Redis disabled after {self._consecutive_failures} consecutive failures.")
-            self.use_redis = False
+            logger.warning(
+                f"Enhanced Redis paused for {self.failure_cooldown_seconds:.0f}s after "
+                f"{self._consecutive_failures} consecutive failures."
+            )
+            self._disabled_until = time.monotonic() + self.failure_cooldown_seconds
+            # Reconnect on the next attempt rather than reuse a broken connection
+            self._client = None
 
     def _record_success(self):
         self._consecutive_failures = 0
     
+    @property
+    def supports_pubsub(self) -> bool:
+        """True when a native Redis connection is configured for subscriptions and locks."""
+        return bool(self._standard_url)
+    
+    async def _get_client(self):
+        """Lazy-init the async redis client for standard redis:// connections."""
+        if self._client is not None:
+            return self._client
+        if not self._standard_url:
+            return None
+        try:
+            import redis.asyncio as aioredis
+            client = aioredis.from_url(
+                self._standard_url,
+                decode_responses=True,
+                socket_connect_timeout=5,
+                health_check_interval=30,
+            )
+            await client.ping()
+            self._client = client
+            return self._client
+        except Exception as e:
+            logger.warning(f"Enhanced Redis native connection failed: {e}")
+            return None
+    
     # ============================================
     # PUB/SUB OPERATIONS
     # ============================================
@@ -82,6 +157,15 @@ class RedisEnhanced:
         try:
             message_json = json.dumps(message)
             
+            if self.supports_pubsub:
+                client = await self._get_client()
+                if client is None:
+                    self._record_failure()
+                    return False
+                await client.publish(channel, message_json)
+                self._record_success()
+                return True
+            
             async with httpx.AsyncClient(timeout=5) as client:
                 response = await client.post(
                     self.redis_url,
@@ -123,6 +207,123 @@ class RedisEnhanced:
             self.subscribers[channel].remove(callback)
             logger.info(f"📡 Unsubscribed from channel: {channel}")
     
+    async def listen(self, channel: str, callback: Callable[[Dict], Any]) -> bool:
+        """
+        Subscribe to a channel across processes over a native Redis connection.
+        
+        Messages published by any process (including this one) are decoded from JSON and
+        passed to ``callback``. Returns False when no redis:// connection is configured.
+        """
+        if not self.supports_pubsub:
+            logger.warning(f"Cannot listen on {channel}: REDIS_URL is not configured")
+            return False
+        
+        self._listen_channels.setdefault(channel, []).append(callback)
+        if self._pubsub is not None:
+            await self._pubsub.subscribe(channel)
+        if self.pubsub_task is None or self.pubsub_task.done():
+            self.pubsub_task = asyncio.create_task(self._pubsub_loop())
+        logger.info(f"📡 Listening on Redis channel: {channel}")
+        return True
+    
+    async def unlisten(self, channel: str, callback: Callable) -> None:
+        """Remove a cross-process listener; stops the subscription when none remain."""
+        callbacks = self._listen_channels.get(channel, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if callbacks:
+            return
+        self._listen_channels.pop(channel, None)
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(channel)
+            except Exception as e:
+                logger.debug(f"Unsubscribe error on {channel}: {e}")
+        if not self._listen_channels and self.pubsub_task:
+            self.pubsub_task.cancel()
+            self.pubsub_task = None
+    
+    async def _pubsub_loop(self):
+        """Read messages for all listened channels, reconnecting with backoff on errors."""
+        backoff = 1.0
+        while self._listen_channels:
+            try:
+                client = await self._get_client()
+                if client is None:
+                    raise ConnectionError("Redis unavailable")
+                self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+                await self._pubsub.subscribe(*self._listen_channels.keys())
+                self.pubsub_epoch += 1
+                self.pubsub_connected = True
+                backoff = 1.0
+                
+                async for message in self._pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    channel = message.get("channel")
+                    try:
+                        payload = json.loads(message.get("data"))
+                    except (json.JSONDecodeError, TypeError):
+                        continue
+                    for callback in list(self._listen_channels.get(channel, [])):
+                        try:
+                            if asyncio.iscoroutinefunction(callback):
+                                await callback(payload)
+                            else:
+                                callback(payload)
+                        except Exception as e:
+                            logger.error(f"Listener callback error on {channel}: {e}")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.pubsub_connected = False
+                logger.warning(f"Redis pub/sub loop error: {e}. Reconnecting in {backoff:.0f}s")
+                self._client = None
+                await asyncio.sleep(backoff)
+                backoff = min(30.0, backoff * 2)
+            finally:
+                self.pubsub_connected = False
+                if self._pubsub is not None:
+                    try:
+                        await self._pubsub.aclose()
+                    except Exception:
+                        pass
+                    self._pubsub = None
+    
+    # ============================================
+    # DISTRIBUTED LOCKS (leader election)
+    # ============================================
+    
+    async def acquire_lock(self, key: str, owner: str, ttl_ms: int) -> bool:
+        """
+        Acquire ``key`` for ``owner`` or extend it if ``owner`` already holds it.
+        Returns True while ``owner`` holds the lock.
+        """
+        client = await self._get_client()
+        if client is None:
+            return False
+        try:
+            if await client.set(key, owner, nx=True, px=ttl_ms):
+                return True
+            renewed = await client.eval(self.lua_scripts["renew_lock"], 1, key, owner, str(ttl_ms))
+            return bool(renewed)
+        except Exception as e:
+            logger.warning(f"Lock acquire failed for {key}: {e}")
+            self._client = None
+            return False
+    
+    async def release_lock(self, key: str, owner: str) -> bool:
+        """Release ``key`` only if ``owner`` still holds it."""
+        client = await self._get_client()
+        if client is None:
+            return False
+        try:
+            released = await client.eval(self.lua_scripts["release_lock"], 1, key, owner)
+            return bool(released)
+        except Exception as e:
+            logger.debug(f"Lock release failed for {key}: {e}")
+            return False
+    
     async def broadcast_update(self, event_type: str, data: Dict[str, Any]):
         """
         Broadcast update to all subscribers.
@@ -15,7 +15,11 @@ import logging
 import uuid
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timezone
+from batch_loader import BatchLoader
 from config import settings
+from ledger import post_balance_change
+from transaction_stats import insert_transactions
+from wallet_lanes import wallet_lanes
 
 logger = logging.getLogger(__name__)
 
@@ -143,8 +147,6 @@ class ReferralService:
     ) -> Dict[str, Any]:
         users_col = self.db.get_collection("users")
         referrals_col = self.db.get_collection("referrals")
-        wallets_col = self.db.get_collection("wallets")
-        transactions_col = self.db.get_collection("transactions")
 
         if validation is None:
             validation = await self.validate_referral_code(referee_id, referral_code)
@@ -178,17 +180,14 @@ class ReferralService:
         await referrals_col.insert_one(referral_doc)
 
         # 2. Credit referee wallet (flat $10)
-        await self._credit_wallet(wallets_col, referee_id, referee_bonus)
+        await self._credit_wallet(referee_id, referee_bonus, referral_doc["id"])
 
         # 3. Credit referrer wallet (tier-based bonus)
-        await self._credit_wallet(wallets_col, referrer_id, referrer_bonus)
+        await self._credit_wallet(referrer_id, referrer_bonus, referral_doc["id"])
 
         # 4. Record transactions for audit trail
-        for uid, amount, desc in [
-            (referee_id, referee_bonus, "Referral signup bonus (new user)"),
-            (referrer_id, referrer_bonus, f"Referral reward - {tier['name']} tier (friend joined)"),
-        ]:
-            await transactions_col.insert_one({
+        await insert_transactions(self.db, [
+            {
                 "id": str(uuid.uuid4()),
                 "user_id": uid,
                 "type": "referral_bonus",
@@ -202,7 +201,12 @@ class ReferralService:
                     "tier": tier["name"],
                 },
                 "created_at": now,
-            })
+            }
+            for uid, amount, desc in [
+                (referee_id, referee_bonus, "Referral signup bonus (new user)"),
+                (referrer_id, referrer_bonus, f"Referral reward - {tier['name']} tier (friend joined)"),
+            ]
+        ])
 
         # 5. Update user stats
         new_total = current_referrals + 1
@@ -275,25 +279,14 @@ class ReferralService:
     # Wallet credit helper
     # ------------------------------------------------------------------
 
-    async def _credit_wallet(self, wallets_col, user_id: str, amount: float):
-        wallet = await wallets_col.find_one({"user_id": user_id})
-        if wallet:
-            current = wallet.get("balances", {}).get("USD", 0.0)
-            await wallets_col.update_one(
-                {"user_id": user_id},
-                {"$set": {
-                    "balances.USD": current + amount,
-                    "updated_at": datetime.now(timezone.utc),
-                }},
+    async def _credit_wallet(self, user_id: str, amount: float, reference: str):
+        async with wallet_lanes.lane(user_id):
+            await post_balance_change(
+                self.db, user_id, {"USD": amount},
+                kind="referral_bonus",
+                reference=reference,
+                upsert=True,
             )
-        else:
-            await wallets_col.insert_one({
-                "id": str(uuid.uuid4()),
-                "user_id": user_id,
-                "balances": {"USD": amount},
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
-            })
 
     # ------------------------------------------------------------------
     # Stats & leaderboard
@@ -316,10 +309,10 @@ class ReferralService:
         total_earnings = user.get("referral_earnings", 0)
         tier = get_tier(total_referrals)
 
-        recent_cursor = referrals_col.find({"referrer_id": user_id}).sort("created_at", -1).limit(10)
+        recent = await referrals_col.find({"referrer_id": user_id}).sort("created_at", -1).limit(10).to_list(10)
+        referees = BatchLoader(users_col, projection={"_id": 0, "name": 1})
         recent_referrals = []
-        async for ref in recent_cursor:
-            referee = await users_col.find_one({"id": ref["referee_id"]})
+        for ref, referee in zip(recent, await referees.load_many(ref["referee_id"] for ref in recent)):
             recent_referrals.append({
                 "referee_name": (referee.get("name", "Anonymous")[:2] + "***") if referee else "Unknown",
                 "status": ref["status"],
@@ -0,0 +1,274 @@
+"""
+In-memory Bloom filter of revoked token JTIs in front of the blacklist store.
+
+Almost every token checked is not revoked, and a Bloom filter answers "definitely not in the
+set" with a few hash computations, so ``is_token_blacklisted`` only goes to Redis/Mongo for
+probable hits. The filter is split into partitions by the revoked token's expiry
+(``partition_seconds`` wide); a partition is dropped whole once every token in it has
+expired, so the filter never has to delete and stays sized to live revocations.
+
+Sync: a full rebuild from the blacklist store on start and every ``resync_seconds``,
+revocations in this process added synchronously by ``blacklist_token``, and revocations in
+other processes added from the ``auth:events`` channel. The filter is only *trusted* (used to
+skip the store) once a rebuild has succeeded and, unless ``require_pubsub`` is off for a
+single-worker deployment, the channel is live: trust drops the moment the subscription errors,
+and after it reconnects the filter is rebuilt (revocations may have been published in between)
+before it is trusted again. A failed publish of a local revocation also forces a rebuild, as
+the subscription is probably missing other workers' revocations too.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from auth_cache import AUTH_EVENTS_CHANNEL
+from config import settings
+from redis_enhanced import redis_enhanced
+
+logger = logging.getLogger(__name__)
+
+BLACKLIST_KEY_PREFIX = "blacklist:jti:"
+# How often the sync loop checks whether the subscription was lost or re-established
+SYNC_CHECK_SECONDS = 1.0
+# Delay before retrying a failed rebuild
+REBUILD_RETRY_SECONDS = 5.0
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing of one blake2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationFilter:
+    """Time-partitioned Bloom filter of revoked JTIs, synchronized from the blacklist store."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        partition_seconds: float = 6 * 3600.0,
+        capacity_per_partition: int = 20000,
+        error_rate: float = 0.001,
+        resync_seconds: float = 300.0,
+        require_pubsub: bool = True,
+    ):
+        self.enabled = enabled
+        self.partition_seconds = partition_seconds
+        self.capacity = capacity_per_partition
+        self.error_rate = error_rate
+        self.resync_seconds = resync_seconds
+        self.require_pubsub = require_pubsub
+        self._partitions: Dict[int, BloomFilter] = {}
+        self._rebuilding: Optional[List[Tuple[str, float]]] = None
+        self._synced = False
+        self._synced_epoch: Optional[int] = None
+        self._desyncs = 0
+        self._listening = False
+        self._task: Optional[asyncio.Task] = None
+
+        self.skipped = 0
+        self.probable_hits = 0
+        self.rebuilds = 0
+        self.last_rebuild: Optional[float] = None
+
+    def _subscription_epoch(self) -> Optional[int]:
+        """Epoch of the live auth events subscription, or None while not subscribed."""
+        if self._listening and redis_enhanced.pubsub_connected:
+            return redis_enhanced.pubsub_epoch
+        return None
+
+    @property
+    def trusted(self) -> bool:
+        if not (self.enabled and self._synced):
+            return False
+        if not self.require_pubsub:
+            return True
+        # Built while the current subscription was already live, so nothing was missed since
+        epoch = self._subscription_epoch()
+        return epoch is not None and epoch == self._synced_epoch
+
+    def _needs_rebuild(self) -> bool:
+        if not self._synced:
+            return True
+        epoch = self._subscription_epoch()
+        return self.require_pubsub and epoch is not None and epoch != self._synced_epoch
+
+    def desync(self) -> None:
+        """Stop trusting the filter until the next rebuild (revocations may have been missed)."""
+        if self._synced:
+            logger.warning("Revocation filter desynchronized; checking the store until rebuilt")
+        self._synced = False
+        self._desyncs += 1
+
+    def add(self, jti: str, expires_at: float) -> None:
+        """Record a revocation (``expires_at`` is a unix timestamp)."""
+        self._add(self._partitions, jti, expires_at)
+        if self._rebuilding is not None:
+            self._rebuilding.append((jti, expires_at))
+
+    def _add(self, partitions: Dict[int, BloomFilter], jti: str, expires_at: float) -> None:
+        index = int(expires_at // self.partition_seconds)
+        partition = partitions.get(index)
+        if partition is None:
+            partition = partitions[index] = BloomFilter(self.capacity, self.error_rate)
+        partition.add(jti)
+
+    def might_be_revoked(self, jti: str) -> bool:
+        """False only when ``jti`` is certainly not revoked; always True while untrusted."""
+        if not self.trusted:
+            return True
+        self._expire()
+        if any(jti in partition for partition in self._partitions.values()):
+            self.probable_hits += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def _expire(self) -> None:
+        current = int(time.time() // self.partition_seconds)
+        for index in [index for index in self._partitions if index < current]:
+            del self._partitions[index]
+
+    async def _load(self) -> List[Tuple[str, float]]:
+        """Every live revocation in the blacklist store (Redis keys and the Mongo fallback)."""
+        from blacklist import _get_db, get_redis_client
+
+        now = time.time()
+        revoked: List[Tuple[str, float]] = []
+        client = await get_redis_client()
+        if settings.is_redis_available() and not client:
+            raise ConnectionError("Redis blacklist unavailable")
+        if client:
+            keys: List[str] = []
+            async for key in client.scan_iter(match=BLACKLIST_KEY_PREFIX + "*", count=1000):
+                keys.append(key)
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                pipe = client.pipeline(transaction=False)
+                for key in batch:
+                    pipe.pttl(key)
+                for key, ttl_ms in zip(batch, await pipe.execute()):
+                    if ttl_ms and ttl_ms > 0:
+                        revoked.append((key[len(BLACKLIST_KEY_PREFIX):], now + ttl_ms / 1000))
+
+        # blacklist_token falls back to Mongo when Redis errors, so both are always read
+        db = _get_db()
+        if db is None:
+            raise ConnectionError("Database unavailable")
+        cursor = db.get_collection("blacklisted_tokens").find(
+            {"expires_at": {"$gt": datetime.fromtimestamp(now, tz=timezone.utc)}},
+            {"_id": 0, "jti": 1, "expires_at": 1},
+        )
+        async for doc in cursor:
+            expires_at = doc["expires_at"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            revoked.append((doc["jti"], expires_at.timestamp()))
+        return revoked
+
+    async def rebuild(self) -> int:
+        """Replace the filter with one built from the store. Returns the revocations loaded."""
+        # Subscribe first, then read: revocations after this point arrive as events
+        epoch = self._subscription_epoch()
+        desyncs = self._desyncs
+        self._rebuilding = []
+        try:
+            revoked = await self._load()
+            partitions: Dict[int, BloomFilter] = {}
+            # Revocations added while the store was being read may not be in it yet
+            for jti, expires_at in revoked + self._rebuilding:
+                self._add(partitions, jti, expires_at)
+            self._partitions = partitions
+        finally:
+            self._rebuilding = None
+        # A desync during the read means the store may already be behind; rebuild again
+        self._synced = desyncs == self._desyncs
+        self._synced_epoch = epoch
+        self.rebuilds += 1
+        self.last_rebuild = time.time()
+        return len(revoked)
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        jti = event.get("jti")
+        expires_at = event.get("expires_at")
+        if jti and expires_at:
+            self.add(jti, float(expires_at))
+
+    async def start(self) -> None:
+        if not self.enabled or self._task:
+            return
+        if redis_enhanced.supports_pubsub:
+            self._listening = await redis_enhanced.listen(AUTH_EVENTS_CHANNEL, self._on_event)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._listening:
+            await redis_enhanced.unlisten(AUTH_EVENTS_CHANNEL, self._on_event)
+            self._listening = False
+        self._synced = False
+        self._synced_epoch = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                loaded = await self.rebuild()
+                logger.debug("Revocation filter rebuilt with %d JTIs", loaded)
+            except Exception as exc:
+                # Keep serving from the last good filter while it is still trusted
+                logger.warning("Revocation filter rebuild failed: %s", exc)
+                await asyncio.sleep(REBUILD_RETRY_SECONDS)
+                continue
+            # Resync periodically, or as soon as the subscription is re-established
+            deadline = time.monotonic() + self.resync_seconds
+            while time.monotonic() < deadline and not self._needs_rebuild():
+                await asyncio.sleep(SYNC_CHECK_SECONDS)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "trusted": self.trusted,
+            "partitions": len(self._partitions),
+            "revocations": sum(p.count for p in self._partitions.values()),
+            "store_lookups_skipped": self.skipped,
+            "probable_hits": self.probable_hits,
+            "rebuilds": self.rebuilds,
+        }
+
+
+revocation_filter = RevocationFilter(
+    enabled=settings.revocation_filter_enabled,
+    partition_seconds=settings.revocation_filter_partition_seconds,
+    capacity_per_partition=settings.revocation_filter_capacity,
+    error_rate=settings.revocation_filter_error_rate,
+    resync_seconds=settings.revocation_filter_resync_seconds,
+    require_pubsub=settings.revocation_filter_require_pubsub,
+)
@@ -19,8 +19,15 @@ from admin_auth import (
     get_current_admin, create_admin_token, verify_password,
     hash_password, log_admin_action, ADMIN_PERMISSIONS
 )
+from batch_loader import BatchLoader
 from config import settings
+import dashboard_rollups
 from socketio_server import socketio_manager
+from ledger import balance_at as ledger_balance_at, post_balance_change, reconcile as ledger_reconcile
+from pagination import fetch_page
+from password_hashing import password_hasher
+from transaction_stats import insert_transactions
+from wallet_lanes import wallet_lanes
 
 logger = logging.getLogger(__name__)
 
@@ -116,7 +123,7 @@ async def admin_login_request_otp(
         )
     
     # Verify password
-    if not verify_password(credentials.password, admin["password_hash"]):
+    if not await password_hasher.run(verify_password, credentials.password, admin["password_hash"]):
         logger.warning(f"Admin login failed for: {credentials.email}")
         await log_admin_action(
             admin_id=admin["id"],
@@ -410,56 +417,49 @@ async def get_admin_profile(current_admin: dict = Depends(get_current_admin)):
 
 @router.get("/dashboard/stats")
 async def get_dashboard_stats(current_admin: dict = Depends(get_current_admin)):
-    """Get real-time dashboard statistics."""
+    """Get dashboard statistics from the pre-aggregated rollups (at most a minute behind)."""
     enforce_permission(current_admin, "reports:read")
     db = get_db()
     
     now = datetime.now(timezone.utc)
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     week_start = today_start - timedelta(days=7)
-    month_start = today_start - timedelta(days=30)
+    
+    gauges = await dashboard_rollups.get_gauges(db)
+    days = await dashboard_rollups.get_buckets(db, dashboard_rollups.DAY, week_start)
+    today = [bucket for bucket in days if bucket["start"] >= today_start]
     
     # User statistics
-    total_users = await db.users.count_documents({})
-    active_users = await db.users.count_documents({"is_active": True})
-    verified_users = await db.users.count_documents({"email_verified": True})
-    suspended_users = await db.users.count_documents({"is_suspended": True})
-    new_users_today = await db.users.count_documents({"created_at": {"$gte": today_start}})
-    new_users_week = await db.users.count_documents({"created_at": {"$gte": week_start}})
+    users = gauges.get("users", {})
+    total_users = users.get("total", 0)
+    new_users_today = dashboard_rollups.sum_buckets(today, "users").get("signups", 0)
+    new_users_week = dashboard_rollups.sum_buckets(days, "users").get("signups", 0)
     
     # Transaction statistics
-    total_transactions = await db.transactions.count_documents({})
-    transactions_today = await db.transactions.count_documents({"created_at": {"$gte": today_start}})
-    
-    # Volume calculation
-    pipeline = [
-        {"$match": {"created_at": {"$gte": today_start}, "status": "completed"}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]
-    volume_result = await db.transactions.aggregate(pipeline).to_list(1)
-    volume_today = volume_result[0]["total"] if volume_result else 0
+    transactions_today = dashboard_rollups.sum_buckets(today, "transactions")
     
     # Pending items
-    pending_withdrawals = await db.withdrawals.count_documents({"status": "pending"})
-    pending_deposits = await db.deposits.count_documents({"status": "pending"})
+    pending_withdrawals = gauges.get("withdrawals", {}).get("pending", {}).get("count", 0)
+    pending_deposits = gauges.get("pending_deposits", 0)
     
     # Active sessions
     active_connections = socketio_manager.get_stats().get("active_connections", 0)
     
+    refreshed_at = gauges.get("refreshed_at")
     return {
         "users": {
             "total": total_users,
-            "active": active_users,
-            "verified": verified_users,
-            "suspended": suspended_users,
+            "active": users.get("active", 0),
+            "verified": users.get("verified", 0),
+            "suspended": users.get("suspended", 0),
             "new_today": new_users_today,
             "new_week": new_users_week,
             "growth_rate": round((new_users_week / max(total_users - new_users_week, 1)) * 100, 2)
         },
         "transactions": {
-            "total": total_transactions,
-            "today": transactions_today,
-            "volume_today": round(volume_today, 2)
+            "total": gauges.get("transactions_total", 0),
+            "today": transactions_today.get("count", 0),
+            "volume_today": round(transactions_today.get("volume", 0), 2)
         },
         "pending": {
             "withdrawals": pending_withdrawals,
@@ -469,6 +469,7 @@ async def get_dashboard_stats(current_admin: dict = Depends(get_current_admin)):
         "system": {
             "active_connections": active_connections,
             "server_time": now.isoformat(),
+            "stats_as_of": refreshed_at.isoformat() if refreshed_at else None,
             "environment": settings.environment
         }
     }
@@ -485,45 +486,40 @@ async def get_dashboard_charts(
     now = datetime.now(timezone.utc)
     
     if period == "day":
-        start_date = now - timedelta(days=1)
+        granularity = dashboard_rollups.HOUR
+        start_date = dashboard_rollups.hour_start(now - timedelta(days=1))
         group_format = "%Y-%m-%d %H:00"
     elif period == "week":
-        start_date = now - timedelta(weeks=1)
+        granularity = dashboard_rollups.DAY
+        start_date = dashboard_rollups.day_start(now - timedelta(weeks=1))
         group_format = "%Y-%m-%d"
     elif period == "month":
-        start_date = now - timedelta(days=30)
+        granularity = dashboard_rollups.DAY
+        start_date = dashboard_rollups.day_start(now - timedelta(days=30))
         group_format = "%Y-%m-%d"
     else:
-        start_date = now - timedelta(days=365)
+        granularity = dashboard_rollups.DAY
+        start_date = dashboard_rollups.day_start(now - timedelta(days=365))
         group_format = "%Y-%m"
     
-    # User registrations over time
-    user_pipeline = [
-        {"$match": {"created_at": {"$gte": start_date}}},
-        {"$group": {
-            "_id": {"$dateToString": {"format": group_format, "date": "$created_at"}},
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"_id": 1}}
-    ]
-    user_data = await db.users.aggregate(user_pipeline).to_list(100)
-    
-    # Transaction volume over time
-    tx_pipeline = [
-        {"$match": {"created_at": {"$gte": start_date}, "status": "completed"}},
-        {"$group": {
-            "_id": {"$dateToString": {"format": group_format, "date": "$created_at"}},
-            "volume": {"$sum": "$amount"},
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"_id": 1}}
-    ]
-    tx_data = await db.transactions.aggregate(tx_pipeline).to_list(100)
+    # Buckets are oldest first; months fold their day buckets together
+    registrations: Dict[str, int] = {}
+    volume: Dict[str, Dict[str, float]] = {}
+    for bucket in await dashboard_rollups.get_buckets(db, granularity, start_date):
+        label = bucket["start"].strftime(group_format)
+        signups = bucket.get("users", {}).get("signups", 0)
+        if signups:
+            registrations[label] = registrations.get(label, 0) + signups
+        transactions = bucket.get("transactions", {})
+        if transactions.get("completed"):
+            point = volume.setdefault(label, {"volume": 0, "count": 0})
+            point["volume"] += transactions.get("volume", 0)
+            point["count"] += transactions["completed"]
     
     return {
         "period": period,
-        "user_registrations": [{"date": d["_id"], "count": d["count"]} for d in user_data],
-        "transaction_volume": [{"date": d["_id"], "volume": d["volume"], "count": d["count"]} for d in tx_data]
+        "user_registrations": [{"date": date, "count": count} for date, count in registrations.items()],
+        "transaction_volume": [{"date": date, **point} for date, point in volume.items()]
     }
 
 
@@ -573,9 +569,11 @@ async def list_users(
     users = await cursor.to_list(limit)
     total = await db.users.count_documents(query)
     
+    wallets = BatchLoader(db.wallets, key_field="user_id", projection={"_id": 0, "balances": 1})
+    user_wallets = await wallets.load_many(user["id"] for user in users)
+    
     enriched_users = []
-    for user in users:
-        wallet = await db.wallets.find_one({"user_id": user["id"]})
+    for user, wallet in zip(users, user_wallets):
         enriched_users.append({
             **user,
             "_id": str(user.get("_id", "")),
@@ -708,23 +706,26 @@ async def adjust_wallet(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    wallet = await db.wallets.find_one({"user_id": adjustment.user_id})
-    if not wallet:
-        raise HTTPException(status_code=404, detail="Wallet not found")
-    
-    current_balance = wallet.get("balances", {}).get(adjustment.currency, 0)
-    new_balance = current_balance + adjustment.amount
-    
-    if new_balance < 0:
-        raise HTTPException(status_code=400, detail=f"Adjustment would result in negative balance")
-    
-    await db.wallets.update_one(
-        {"user_id": adjustment.user_id},
-        {"$set": {f"balances.{adjustment.currency}": new_balance}}
-    )
-    
     tx_id = secrets.token_hex(16)
-    await db.transactions.insert_one({
+    async with wallet_lanes.lane(adjustment.user_id):
+        wallet = await db.wallets.find_one({"user_id": adjustment.user_id})
+        if not wallet:
+            raise HTTPException(status_code=404, detail="Wallet not found")
+
+        current_balance = wallet.get("balances", {}).get(adjustment.currency, 0)
+        new_balance = current_balance + adjustment.amount
+
+        if new_balance < 0:
+            raise HTTPException(status_code=400, detail=f"Adjustment would result in negative balance")
+
+        await post_balance_change(
+            db, adjustment.user_id, {adjustment.currency: adjustment.amount},
+            kind="admin_adjustment",
+            reference=tx_id,
+            description=f"Admin adjustment: {adjustment.reason}",
+        )
+    
+    await insert_transactions(db, [{
         "id": tx_id,
         "user_id": adjustment.user_id,
         "type": adjustment.transaction_type,
@@ -739,7 +740,7 @@ async def adjust_wallet(
             "new_balance": new_balance
         },
         "created_at": datetime.now(timezone.utc)
-    })
+    }])
     
     await log_admin_action(
         admin_id=current_admin["id"],
@@ -759,17 +760,51 @@ async def adjust_wallet(
     return {"message": "Wallet adjusted successfully", "transaction_id": tx_id, "previous_balance": current_balance, "new_balance": new_balance}
 
 
+@router.get("/wallets/{user_id}/balance-at")
+async def get_wallet_balance_at(
+    user_id: str,
+    at: datetime = Query(..., description="Point in time (ISO 8601)"),
+    current_admin: dict = Depends(get_current_admin)
+):
+    """Historical wallet balances from the nearest ledger snapshot plus later entries."""
+    enforce_permission(current_admin, "wallets:read")
+    db = get_db()
+
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    result = await ledger_balance_at(db, user_id, at)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No ledger history for this wallet at that time")
+    return {**result, "at": at.isoformat()}
+
+
+@router.get("/wallets/{user_id}/reconcile")
+async def reconcile_wallet(
+    user_id: str,
+    current_admin: dict = Depends(get_current_admin)
+):
+    """Compare a wallet with its latest ledger snapshot plus the entries since."""
+    enforce_permission(current_admin, "wallets:read")
+    db = get_db()
+
+    report = await ledger_reconcile(db, user_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    return report
+
+
 # ============================================
 # TRANSACTIONS MANAGEMENT
 # ============================================
 
 @router.get("/transactions")
 async def list_all_transactions(
-    skip: int = Query(0, ge=0),
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = Query(50, ge=1, le=200),
     user_id: Optional[str] = None,
     type: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_admin: dict = Depends(get_current_admin)
 ):
     """List all transactions with filtering"""
@@ -784,11 +819,10 @@ async def list_all_transactions(
     if status:
         query["status"] = status
     
-    cursor = db.transactions.find(query).sort("created_at", -1).skip(skip).limit(limit)
-    transactions = await cursor.to_list(limit)
-    total = await db.transactions.count_documents(query)
+    transactions, next_cursor = await fetch_page(db.transactions, query, limit=limit, cursor=cursor, skip=skip)
+    total = None if cursor else await db.transactions.count_documents(query)
     
-    return {"transactions": transactions, "total": total, "skip": skip, "limit": limit}
+    return {"transactions": transactions, "total": total, "skip": skip, "limit": limit, "next_cursor": next_cursor}
 
 
 # ============================================
@@ -844,10 +878,11 @@ async def broadcast_message(message: BroadcastMessage, current_admin: dict = Dep
 
 @router.get("/audit-logs")
 async def get_audit_logs(
-    skip: int = Query(0, ge=0),
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = Query(50, ge=1, le=200),
     admin_id: Optional[str] = None,
     action: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_admin: dict = Depends(get_current_admin)
 ):
     """Get admin audit logs"""
@@ -860,11 +895,12 @@ async def get_audit_logs(
     if action:
         query["action"] = action
     
-    cursor = db.admin_audit_logs.find(query).sort("timestamp", -1).skip(skip).limit(limit)
-    logs = await cursor.to_list(limit)
-    total = await db.admin_audit_logs.count_documents(query)
+    logs, next_cursor = await fetch_page(
+        db.admin_audit_logs, query, limit=limit, cursor=cursor, skip=skip, time_field="timestamp"
+    )
+    total = None if cursor else await db.admin_audit_logs.count_documents(query)
     
-    return {"logs": logs, "total": total, "skip": skip, "limit": limit}
+    return {"logs": logs, "total": total, "skip": skip, "limit": limit, "next_cursor": next_cursor}
 
 
 # ============================================
@@ -899,11 +935,12 @@ async def create_admin(
         raise HTTPException(status_code=400, detail="Email already registered")
     
     admin_id = secrets.token_hex(16)
+    password_hash = await password_hasher.run(hash_password, admin_data.password)
     
     await db.admins.insert_one({
         "id": admin_id,
         "email": admin_data.email.lower(),
-        "password_hash": hash_password(admin_data.password),
+        "password_hash": password_hash,
         "name": admin_data.name,
         "role": admin_data.role,
         "permissions": ADMIN_PERMISSIONS.get(admin_data.role, []),
@@ -958,10 +995,12 @@ async def get_pending_withdrawals(
         {"status": {"$in": ["pending", "pending_approval"]}}
     )
 
-    # Enrich with user email
+    # Enrich with user email (one query for the whole page)
+    users = BatchLoader(users_collection, projection={"_id": 0, "email": 1, "name": 1})
+    withdrawal_users = await users.load_many(w["user_id"] for w in withdrawals)
+    
     enriched = []
-    for w in withdrawals:
-        user = await users_collection.find_one({"id": w["user_id"]}, {"_id": 0, "email": 1, "name": 1})
+    for w, user in zip(withdrawals, withdrawal_users):
         enriched.append({
             "id": w["id"],
             "user_id": w["user_id"],
@@ -997,30 +1036,14 @@ async def get_withdrawal_stats(
     """Get withdrawal approval statistics for dashboard overview."""
     enforce_permission(current_admin, "manage_withdrawals")
     
-    withdrawals_collection = db.get_collection("withdrawals")
-    
-    pending_count = await withdrawals_collection.count_documents({"status": "pending"})
-    pending_approval_count = await withdrawals_collection.count_documents({"status": "pending_approval"})
-    processing_count = await withdrawals_collection.count_documents({"status": "processing"})
-    
-    # Sum of pending amounts
-    pipeline = [
-        {"$match": {"status": {"$in": ["pending", "pending_approval"]}}},
-        {"$group": {"_id": None, "total_amount": {"$sum": "$amount"}}},
-    ]
-    agg_result = await withdrawals_collection.aggregate(pipeline).to_list(1)
-    total_pending_amount = agg_result[0]["total_amount"] if agg_result else 0
-
-    # High-value count
-    high_value_count = await withdrawals_collection.count_documents({
-        "status": {"$in": ["pending", "pending_approval"]},
-        "requires_multi_approval": True,
-    })
+    withdrawals = (await dashboard_rollups.get_gauges(db)).get("withdrawals", {})
+    pending = withdrawals.get("pending", {})
+    pending_approval = withdrawals.get("pending_approval", {})
 
     return {
-        "pending": pending_count,
-        "pending_approval": pending_approval_count,
-        "processing": processing_count,
-        "total_pending_amount": total_pending_amount,
-        "high_value_count": high_value_count,
+        "pending": pending.get("count", 0),
+        "pending_approval": pending_approval.get("count", 0),
+        "processing": withdrawals.get("processing", {}).get("count", 0),
+        "total_pending_amount": pending.get("amount", 0) + pending_approval.get("amount", 0),
+        "high_value_count": pending.get("high_value", 0) + pending_approval.get("high_value", 0),
     }
@@ -8,6 +8,8 @@ import uuid
 import logging
 
 from dependencies import get_current_user_id, get_db, get_limiter
+from services.alert_engine import alert_engine, stream_symbol
+from services.audit_service import log_audit
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/alerts", tags=["alerts"])
@@ -33,25 +35,6 @@ class AlertUpdate(BaseModel):
     notifyEmail: Optional[bool] = None
 
 
-# ============================================
-# HELPER FUNCTIONS
-# ============================================
-
-async def log_audit(db, user_id: str, action: str, resource: Optional[str] = None,
-                    ip_address: Optional[str] = None, details: Optional[dict] = None):
-    """Log audit event."""
-    from models import AuditLog
-    
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource=resource,
-        ip_address=ip_address,
-        details=details
-    )
-    await db.get_collection("audit_logs").insert_one(audit_log.dict())
-
-
 # ============================================
 # CRUD ENDPOINTS
 # ============================================
@@ -137,6 +120,7 @@ async def create_alert(
     }
     
     await alerts_collection.insert_one(alert_doc)
+    alert_engine.upsert_alert(alert_doc)
     
     # Log audit
     await log_audit(
@@ -241,6 +225,7 @@ async def update_alert(
     
     # Get updated alert
     updated_alert = await alerts_collection.find_one({"id": alert_id})
+    alert_engine.upsert_alert(updated_alert)
     
     logger.info(f"✅ Alert updated: {alert_id}")
     
@@ -280,6 +265,7 @@ async def delete_alert(
         raise HTTPException(status_code=404, detail="Alert not found")
     
     await alerts_collection.delete_one({"id": alert_id})
+    alert_engine.remove_alert(alert_id)
     
     # Log audit
     await log_audit(
@@ -294,57 +280,72 @@ async def delete_alert(
 
 
 # ============================================
-# ALERT TRIGGERING (called by price service)
+# ALERT TRIGGERING
 # ============================================
 
 async def check_and_trigger_alerts(db, symbol: str, current_price: float):
     """
     Check if any alerts should be triggered based on current price.
-    This function is called by the price feed service.
+
+    Live prices are evaluated by services.alert_engine (subscribed to the price stream);
+    this entry point runs the same evaluation on demand for a single symbol.
     """
+    if alert_engine.is_running:
+        alert_engine.evaluate(stream_symbol(symbol), current_price)
+        alerts = await alert_engine.flush()
+        return [
+            {
+                "alert_id": alert["id"],
+                "user_id": alert["user_id"],
+                "symbol": alert["symbol"],
+                "target_price": alert["target_price"],
+                "condition": alert["condition"],
+                "current_price": current_price,
+                "notify_push": alert["notify_push"],
+                "notify_email": alert["notify_email"]
+            }
+            for alert in alerts
+        ]
+
+    from pymongo import UpdateOne
+
     alerts_collection = db.get_collection("price_alerts")
     
-    # Find all active alerts for this symbol
+    # Engine not running: find crossed alerts with a query instead of scanning every active alert
     alerts = await alerts_collection.find({
         "symbol": symbol.upper(),
         "is_active": True,
-        "triggered_at": None
+        "triggered_at": None,
+        "$or": [
+            {"condition": "above", "target_price": {"$lte": current_price}},
+            {"condition": "below", "target_price": {"$gte": current_price}},
+        ]
     }).to_list(1000)
-    
+
+    if not alerts:
+        return []
+
+    now = datetime.now(timezone.utc)
+    await alerts_collection.bulk_write([
+        UpdateOne(
+            {"id": alert["id"], "is_active": True, "triggered_at": None},
+            {"$set": {"triggered_at": now, "is_active": False, "triggered_price": current_price}}
+        )
+        for alert in alerts
+    ], ordered=False)
+
     triggered = []
-    
     for alert in alerts:
-        should_trigger = False
-        
-        if alert["condition"] == "above" and current_price >= alert["target_price"]:
-            should_trigger = True
-        elif alert["condition"] == "below" and current_price <= alert["target_price"]:
-            should_trigger = True
-        
-        if should_trigger:
-            # Mark as triggered
-            await alerts_collection.update_one(
-                {"id": alert["id"]},
-                {
-                    "$set": {
-                        "triggered_at": datetime.now(timezone.utc),
-                        "is_active": False,
-                        "triggered_price": current_price
-                    }
-                }
-            )
-            
-            triggered.append({
-                "alert_id": alert["id"],
-                "user_id": alert["user_id"],
-                "symbol": alert["symbol"],
-                "target_price": alert["target_price"],
-                "condition": alert["condition"],
-                "current_price": current_price,
-                "notify_push": alert.get("notify_push", True),
-                "notify_email": alert.get("notify_email", True)
-            })
-            
-            logger.info(f"🔔 Alert triggered: {alert['symbol']} {alert['condition']} ${alert['target_price']} (now: ${current_price})")
+        triggered.append({
+            "alert_id": alert["id"],
+            "user_id": alert["user_id"],
+            "symbol": alert["symbol"],
+            "target_price": alert["target_price"],
+            "condition": alert["condition"],
+            "current_price": current_price,
+            "notify_push": alert.get("notify_push", True),
+            "notify_email": alert.get("notify_email", True)
+        })
+        logger.info(f"🔔 Alert triggered: {alert['symbol']} {alert['condition']} ${alert['target_price']} (now: ${current_price})")
     
     return triggered
@@ -6,7 +6,6 @@ from datetime import datetime, timedelta, timezone
 from urllib.parse import quote_plus
 import uuid
 import bcrypt
-from typing import Optional
 import logging
 import asyncio
 import re
@@ -26,7 +25,6 @@ from email_service import (
     get_token_expiration
 )
 from auth import (
-    verify_password, get_password_hash,
     create_access_token, create_refresh_token,
     decode_token, generate_backup_codes, generate_2fa_secret,
     generate_device_fingerprint, verify_2fa_code, get_token_jti
@@ -34,7 +32,10 @@ from auth import (
 from referral_service import ReferralService
 from dependencies import get_current_user_id, get_db
 from blacklist import blacklist_token, is_token_blacklisted
+from auth_cache import auth_cache
+from password_hashing import password_hasher
 from redis_cache import redis_cache
+from services.audit_service import log_audit
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -83,38 +84,6 @@ def set_auth_cookies(response: Response, access_token: str, refresh_token: str)
     )
 
 
-async def log_audit(
-    db, user_id: str, action: str, 
-    resource: Optional[str] = None,
-    ip_address: Optional[str] = None, 
-    details: Optional[dict] = None,
-    request_id: Optional[str] = None
-):
-    """Log audit event."""
-    from models import AuditLog
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info(
-        f"Audit log: {action}",
-        extra={
-            "type": "audit_log",
-            "user_id": user_id,
-            "action": action,
-            "resource": resource,
-            "ip_address": ip_address,
-            "request_id": request_id
-        }
-    )
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource=resource,
-        ip_address=ip_address,
-        details=details
-    )
-    await db.get_collection("audit_logs").insert_one(audit_log.dict())
-
-
 @router.post("/signup")
 async def signup(
     user_data: UserCreate,
@@ -158,7 +127,7 @@ async def signup(
     user = User(
         email=user_data.email,
         name=user_data.name,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=await password_hasher.hash(user_data.password),
         email_verified=auto_verify,  # Auto-verify when email is mocked
         email_verification_code=verification_code,
         email_verification_token=verification_token,
@@ -364,7 +333,7 @@ async def login(
         )
     
     if not user_doc:
-        verify_password("dummy_password", bcrypt.gensalt().decode())
+        await password_hasher.verify("dummy_password", bcrypt.gensalt().decode())
         raise HTTPException(status_code=401, detail="Invalid credentials")
     user = User(**user_doc)
 
@@ -385,7 +354,7 @@ async def login(
         "timestamp": datetime.now(timezone.utc),
         "success": False
     }
-    if not verify_password(credentials.password, user.password_hash):
+    if not await password_hasher.verify(credentials.password, user.password_hash):
         # H4 FIX: Increment login rate limit counter on failed attempt
         # M10 FIX: Also increment per-IP cooldown tracker
         
@@ -691,9 +660,9 @@ async def change_password(
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     user = User(**user_doc)
-    if not verify_password(current_password, user.password_hash):
+    if not await password_hasher.verify(current_password, user.password_hash):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
-    new_hashed_password = get_password_hash(new_password)
+    new_hashed_password = await password_hasher.hash(new_password)
 
     # H2 FIX: Store password_changed_at to invalidate all existing tokens
     await users_collection.update_one(
@@ -703,6 +672,7 @@ async def change_password(
             "password_changed_at": datetime.now(timezone.utc),
         }}
     )
+    await auth_cache.password_changed(user_id)
     await log_audit(db, user_id, "PASSWORD_CHANGED", ip_address=request.client.host)
 
     # Issue fresh tokens for this session only
@@ -1008,7 +978,7 @@ async def reset_password(
 
     validate_password_policy(data.new_password)
 
-    new_password_hash = get_password_hash(data.new_password)
+    new_password_hash = await password_hasher.hash(data.new_password)
 
     await users_collection.update_one(
         {"id": user.id},
@@ -1081,7 +1051,7 @@ async def verify_2fa(
     # M8 FIX: Hash backup codes before storing (don't store plaintext)
     backup_codes_plaintext = generate_backup_codes()
     # Hash each backup code for storage
-    hashed_backup_codes = [get_password_hash(code) for code in backup_codes_plaintext]
+    hashed_backup_codes = list(await asyncio.gather(*(password_hasher.hash(code) for code in backup_codes_plaintext)))
     
     await users_collection.update_one(
         {"id": user_id},
@@ -1137,7 +1107,7 @@ async def disable_2fa(
         raise HTTPException(status_code=404, detail="User not found")
     
     user = User(**user_doc)
-    if not verify_password(password, user.password_hash):
+    if not await password_hasher.verify(password, user.password_hash):
         raise HTTPException(
             status_code=401,
             detail="Invalid password"
@@ -1164,7 +1134,7 @@ async def get_backup_codes(
     users_collection = db.get_collection("users")
     # M8 FIX: Hash backup codes before storing
     backup_codes_plaintext = generate_backup_codes()
-    hashed_backup_codes = [get_password_hash(code) for code in backup_codes_plaintext]
+    hashed_backup_codes = list(await asyncio.gather(*(password_hasher.hash(code) for code in backup_codes_plaintext)))
     
     await users_collection.update_one(
         {"id": user_id},
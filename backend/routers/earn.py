@@ -11,6 +11,9 @@ from pydantic import BaseModel, Field
 from dependencies import get_current_user_id, get_db
 from config import settings
 from coincap_service import coincap_service
+from ledger import post_balance_change
+from transaction_stats import insert_transactions
+from wallet_lanes import wallet_lanes
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/earn", tags=["earn"])
@@ -66,6 +69,12 @@ async def _token_usd_price(token: str) -> float:
     if not coin_id:
         raise HTTPException(status_code=400, detail=f"Unsupported token for pricing: {token}")
 
+    # Host shared-memory price table (memory read) before the upstream HTTP lookup
+    from services import price_stream_service
+    shared_price = price_stream_service.get_shared_price(normalized)
+    if shared_price:
+        return shared_price
+
     try:
         prices = await coincap_service.get_prices([coin_id])
         for item in prices:
@@ -161,59 +170,57 @@ async def create_stake(payload: CreateStakeRequest, user_id: str = Depends(get_c
         raise HTTPException(status_code=400, detail=f"Minimum stake for this product is {min_amount} {product['token']}")
 
     token = str(product["token"]).upper()
-    wallets = db.get_collection("wallets")
-    wallet = await wallets.find_one({"user_id": user_id})
-    token_balance = float((wallet or {}).get("balances", {}).get(token, 0))
-    usd_balance = float((wallet or {}).get("balances", {}).get("USD", 0))
-
-    token_price = await _token_usd_price(token)
-    usd_required = round(payload.amount * token_price, 8)
-    funding_currency = token
-    funding_amount = payload.amount
-
-    if token_balance >= payload.amount:
-        wallet_inc = {f"balances.{token}": -payload.amount}
-    elif usd_balance >= usd_required:
-        # Fallback to USD funding so users with fiat deposits can still use Earn products.
-        funding_currency = "USD"
-        funding_amount = usd_required
-        wallet_inc = {"balances.USD": -usd_required}
-    else:
-        raise HTTPException(status_code=400, detail=f"Insufficient balance. Requires {payload.amount} {token} or ${usd_required} USD")
-
-    lock_days = product.get("lockDays") if product.get("type") == "locked" else None
-
-    stake_doc = {
-        "id": str(uuid.uuid4()),
-        "user_id": user_id,
-        "product_id": product["id"],
-        "product": product["name"],
-        "token": token,
-        "amount": payload.amount,
-        "apy": product["apy"],
-        "lock_period": product["lockPeriod"],
-        "lock_days": lock_days,
-        "funding_currency": funding_currency,
-        "funding_amount": funding_amount,
-        "status": "active",
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc),
-    }
-
-    stakes = db.get_collection("stakes")
-    await stakes.insert_one(stake_doc)
-
-    await wallets.update_one(
-        {"user_id": user_id},
-        {
-            "$inc": wallet_inc,
-            "$set": {"updated_at": datetime.now(timezone.utc)},
-        },
-        upsert=True,
-    )
-
-    transactions = db.get_collection("transactions")
-    await transactions.insert_one({
+    async with wallet_lanes.lane(user_id):
+        wallets = db.get_collection("wallets")
+        wallet = await wallets.find_one({"user_id": user_id})
+        token_balance = float((wallet or {}).get("balances", {}).get(token, 0))
+        usd_balance = float((wallet or {}).get("balances", {}).get("USD", 0))
+
+        token_price = await _token_usd_price(token)
+        usd_required = round(payload.amount * token_price, 8)
+        funding_currency = token
+        funding_amount = payload.amount
+
+        if token_balance < payload.amount:
+            if usd_balance < usd_required:
+                raise HTTPException(status_code=400, detail=f"Insufficient balance. Requires {payload.amount} {token} or ${usd_required} USD")
+            # Fallback to USD funding so users with fiat deposits can still use Earn products.
+            funding_currency = "USD"
+            funding_amount = usd_required
+
+        lock_days = product.get("lockDays") if product.get("type") == "locked" else None
+
+        stake_doc = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "product_id": product["id"],
+            "product": product["name"],
+            "token": token,
+            "amount": payload.amount,
+            "apy": product["apy"],
+            "lock_period": product["lockPeriod"],
+            "lock_days": lock_days,
+            "funding_currency": funding_currency,
+            "funding_amount": funding_amount,
+            "status": "active",
+            "created_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc),
+        }
+
+        funded = await post_balance_change(
+            db, user_id, {funding_currency: -funding_amount},
+            kind="stake_create",
+            reference=stake_doc["id"],
+            description=f"Staked into {product['name']}",
+            guard={funding_currency: funding_amount},
+        )
+        if funded is None:
+            raise HTTPException(status_code=400, detail=f"Insufficient balance. Requires {payload.amount} {token} or ${usd_required} USD")
+
+        stakes = db.get_collection("stakes")
+        await stakes.insert_one(stake_doc)
+
+    await insert_transactions(db, [{
         "id": str(uuid.uuid4()),
         "user_id": user_id,
         "type": "stake_create",
@@ -223,7 +230,7 @@ async def create_stake(payload: CreateStakeRequest, user_id: str = Depends(get_c
         "reference": stake_doc["id"],
         "description": f"Staked into {product['name']} ({payload.amount} {token})",
         "created_at": datetime.now(timezone.utc),
-    })
+    }])
 
     return {"success": True, "stake": {**stake_doc, "rewards": 0.0, "startDate": stake_doc["created_at"].isoformat(), "lockPeriod": stake_doc["lock_period"]}}
 
@@ -232,51 +239,49 @@ async def create_stake(payload: CreateStakeRequest, user_id: str = Depends(get_c
 async def redeem_stake(payload: CloseStakeRequest, user_id: str = Depends(get_current_user_id), db=Depends(get_db)):
     _ensure_earn_enabled()
 
-    stakes = db.get_collection("stakes")
-    stake = await stakes.find_one({"id": payload.stake_id, "user_id": user_id, "status": "active"})
-    if not stake:
-        raise HTTPException(status_code=404, detail="Active stake not found")
-
-    rewards = _calculate_rewards(stake)
-    token = str(stake.get("token", "USD")).upper()
-    principal = float(stake.get("amount", 0))
-    total_credit = principal + rewards
-
-    lock_days = stake.get("lock_days")
-    if lock_days:
-        created_at = _parse_dt(stake.get("created_at"))
-        days_elapsed = (datetime.now(timezone.utc) - created_at).days
-        if days_elapsed < int(lock_days):
-            raise HTTPException(status_code=400, detail="This locked stake is not yet redeemable")
-
-    credit_currency = str(stake.get("funding_currency") or token).upper()
-    if credit_currency == "USD":
-        total_credit = round(total_credit * (await _token_usd_price(token)), 8)
-
-    await stakes.update_one(
-        {"id": payload.stake_id},
-        {
-            "$set": {
-                "status": "closed",
-                "rewards_paid": rewards,
-                "closed_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
-            }
-        },
-    )
-
-    wallets = db.get_collection("wallets")
-    await wallets.update_one(
-        {"user_id": user_id},
-        {
-            "$inc": {f"balances.{credit_currency}": total_credit},
-            "$set": {"updated_at": datetime.now(timezone.utc)},
-        },
-        upsert=True,
-    )
-
-    transactions = db.get_collection("transactions")
-    await transactions.insert_one({
+    async with wallet_lanes.lane(user_id):
+        stakes = db.get_collection("stakes")
+        stake = await stakes.find_one({"id": payload.stake_id, "user_id": user_id, "status": "active"})
+        if not stake:
+            raise HTTPException(status_code=404, detail="Active stake not found")
+
+        rewards = _calculate_rewards(stake)
+        token = str(stake.get("token", "USD")).upper()
+        principal = float(stake.get("amount", 0))
+        total_credit = principal + rewards
+
+        lock_days = stake.get("lock_days")
+        if lock_days:
+            created_at = _parse_dt(stake.get("created_at"))
+            days_elapsed = (datetime.now(timezone.utc) - created_at).days
+            if days_elapsed < int(lock_days):
+                raise HTTPException(status_code=400, detail="This locked stake is not yet redeemable")
+
+        credit_currency = str(stake.get("funding_currency") or token).upper()
+        if credit_currency == "USD":
+            total_credit = round(total_credit * (await _token_usd_price(token)), 8)
+
+        await stakes.update_one(
+            {"id": payload.stake_id},
+            {
+                "$set": {
+                    "status": "closed",
+                    "rewards_paid": rewards,
+                    "closed_at": datetime.now(timezone.utc),
+                    "updated_at": datetime.now(timezone.utc),
+                }
+            },
+        )
+
+        await post_balance_change(
+            db, user_id, {credit_currency: total_credit},
+            kind="stake_redeem",
+            reference=payload.stake_id,
+            description=f"Redeemed stake principal + rewards ({rewards} {token})",
+            upsert=True,
+        )
+
+    await insert_transactions(db, [{
         "id": str(uuid.uuid4()),
         "user_id": user_id,
         "type": "stake_redeem",
@@ -286,7 +291,7 @@ async def redeem_stake(payload: CloseStakeRequest, user_id: str = Depends(get_cu
         "reference": payload.stake_id,
         "description": f"Redeemed stake principal + rewards ({rewards} {token})",
         "created_at": datetime.now(timezone.utc),
-    })
+    }])
 
     return {
         "success": True,
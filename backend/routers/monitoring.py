@@ -207,6 +207,30 @@ async def reset_circuit_breaker(name: str):
         return {"error": "Circuit breakers not available"}
 
 
+@router.get("/auth-cache")
+async def get_auth_cache_stats():
+    """
+    Hit/miss counters for the authentication hot path caches
+    """
+    from auth import token_cache
+    from auth_cache import auth_cache
+    from revocation_filter import revocation_filter
+    return {
+        "jwt_decode": token_cache.get_stats(),
+        "auth_context": auth_cache.get_stats(),
+        "revocation_filter": revocation_filter.get_stats(),
+    }
+
+
+@router.get("/cache")
+async def get_tiered_cache_stats():
+    """
+    L1/L2 hit rates, memory use and evictions for every cache namespace
+    """
+    from tiered_cache import tiered_cache
+    return tiered_cache.get_stats()
+
+
 @router.get("/health/detailed")
 async def detailed_health_check():
     """
@@ -311,7 +335,16 @@ async def detailed_health_check():
         }
     except Exception as e:
         health["services"]["email"] = {"status": "degraded", "error": str(e)}
-    
+
+    # Password hashing pool (queue depth and admission rejections)
+    try:
+        from password_hashing import password_hasher
+        hashing = password_hasher.get_stats()
+        saturated = hashing["in_flight"] >= hashing["workers"] + hashing["max_queue"]
+        health["services"]["password_hashing"] = {"status": "degraded" if saturated else "healthy", **hashing}
+    except Exception as e:
+        health["services"]["password_hashing"] = {"status": "degraded", "error": str(e)}
+
     # 6. Sentry Health
     if settings.is_sentry_available():
         health["services"]["sentry"] = {
@@ -11,6 +11,14 @@ import asyncio
 
 from dependencies import get_current_user_id, get_db
 from models import Notification, NotificationCreate
+from pagination import fetch_page
+from services.realtime_encoding import (
+    FORMAT_JSON,
+    SharedFrame,
+    negotiate_format,
+    send_frame,
+    send_message,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/notifications", tags=["notifications"])
@@ -22,10 +30,13 @@ class ConnectionManager:
     
     def __init__(self):
         self.active_connections: Dict[str, List[WebSocket]] = {}
+        self.connection_formats: Dict[WebSocket, str] = {}
     
     async def connect(self, websocket: WebSocket, user_id: str):
         """Connect a WebSocket for a user."""
-        await websocket.accept()
+        wire_format, subprotocol = negotiate_format(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        self.connection_formats[websocket] = wire_format
         
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
@@ -35,6 +46,7 @@ class ConnectionManager:
     
     def disconnect(self, websocket: WebSocket, user_id: str):
         """Disconnect a WebSocket for a user."""
+        self.connection_formats.pop(websocket, None)
         if user_id in self.active_connections:
             if websocket in self.active_connections[user_id]:
                 self.active_connections[user_id].remove(websocket)
@@ -45,13 +57,24 @@ class ConnectionManager:
         
         logger.info(f"❌ WebSocket disconnected for user {user_id}")
     
+    async def send(self, websocket: WebSocket, message: dict):
+        """Send a direct message in the connection's wire format."""
+        await send_message(websocket, message, self.connection_formats.get(websocket, FORMAT_JSON))
+    
     async def send_personal_message(self, message: dict, user_id: str):
         """Send a message to all connections of a specific user."""
+        await self._send_shared(SharedFrame(message), user_id)
+    
+    async def _send_shared(self, shared: SharedFrame, user_id: str):
+        """Send a message encoded at most once per wire format to a user's connections."""
         if user_id in self.active_connections:
             disconnected = []
-            for connection in self.active_connections[user_id]:
+            for connection in list(self.active_connections[user_id]):
                 try:
-                    await connection.send_json(message)
+                    await send_frame(
+                        connection,
+                        shared.get(self.connection_formats.get(connection, FORMAT_JSON))
+                    )
                 except Exception as e:
                     logger.error(f"Failed to send message to {user_id}: {e}")
                     disconnected.append(connection)
@@ -62,8 +85,9 @@ class ConnectionManager:
     
     async def broadcast(self, message: dict):
         """Broadcast a message to all connected users."""
+        shared = SharedFrame(message)
         for user_id in list(self.active_connections.keys()):
-            await self.send_personal_message(message, user_id)
+            await self._send_shared(shared, user_id)
 
 
 # Global connection manager instance
@@ -128,21 +152,24 @@ async def create_notification(
 
 @router.get("")
 async def get_notifications(
-    skip: int = 0,
+    skip: int = 0,  # Deprecated: use cursor
     limit: int = 50,
     unread_only: bool = False,
+    cursor: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
     db = Depends(get_db)
 ):
-    """Get user's notifications with pagination."""
+    """Get user's notifications, newest first. Pass ``next_cursor`` back as ``cursor`` for the next page."""
     notifications_collection = db.get_collection("notifications")
     
     query = {"user_id": user_id}
     if unread_only:
         query["read"] = False
     
-    notifications = await notifications_collection.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    total = await notifications_collection.count_documents(query)
+    notifications, next_cursor = await fetch_page(
+        notifications_collection, query, limit=limit, cursor=cursor, skip=skip
+    )
+    total = None if cursor else await notifications_collection.count_documents(query)
     unread_count = await notifications_collection.count_documents({"user_id": user_id, "read": False})
     
     return {
@@ -150,7 +177,8 @@ async def get_notifications(
         "total": total,
         "unread": unread_count,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 
@@ -243,6 +271,9 @@ async def websocket_notifications(
     - ws(s)://<api-host>/api/notifications/ws?token=<access_token>
     - OR send Authorization: Bearer <access_token> header
 
+    Add the ``msgpack`` subprotocol (or ``&format=msgpack``) to receive binary
+    MessagePack frames instead of JSON text.
+
     Messages will be in format:
     {
         "type": "notification|price_alert|trade|system",
@@ -278,7 +309,7 @@ async def websocket_notifications(
     await manager.connect(websocket, user_id)
     
     # Send connection confirmation
-    await websocket.send_json({
+    await manager.send(websocket, {
         "type": "system",
         "data": {
             "message": "Connected to notification stream",
@@ -293,7 +324,7 @@ async def websocket_notifications(
             
             # Handle ping/pong for keeping connection alive
             if data == "ping":
-                await websocket.send_json({
+                await manager.send(websocket, {
                     "type": "pong",
                     "timestamp": datetime.now(timezone.utc).isoformat()
                 })
@@ -9,8 +9,9 @@ import logging
 
 from models import Portfolio, Holding, HoldingCreate
 from dependencies import get_current_user_id, get_db
-from cache import cache
+from cache import cache, PORTFOLIO_NAMESPACE
 from redis_cache import redis_cache
+from tiered_cache import tiered_cache
 from services import price_stream_service
 from coincap_service import coincap_service
 
@@ -29,11 +30,15 @@ router = APIRouter(prefix="/portfolio", tags=["portfolio"])
 
 async def get_price_for_symbol(symbol: str) -> Optional[float]:
     """
-    Get current price for a symbol from Redis cache.
+    Get current price for a symbol from the host's shared-memory price table, then Redis.
     Falls back to in-memory cache if Redis unavailable.
     """
     try:
-        # Try Redis first
+        shared_price = price_stream_service.get_shared_price(symbol)
+        if shared_price is not None:
+            return shared_price
+
+        # Try Redis next
         cache_key = f"crypto:price:{symbol.lower()}"
         cached_price = await redis_cache.get(cache_key)
 
@@ -83,12 +88,16 @@ async def get_portfolio(
     total_balance = 0
     updated_holdings = []
 
-    # Batch get prices from Redis
+    # Shared-memory prices first; batch get the rest from Redis
     symbols = [h.get("symbol", "").lower() for h in holdings]
-    price_keys = [f"crypto:price:{s}" for s in symbols]
-    cached_prices = await redis_cache.mget(price_keys) if price_keys else []
+    price_map = {symbol: price_stream_service.get_shared_price(symbol) for symbol in symbols}
+    missing = [symbol for symbol, price in price_map.items() if price is None]
+    cached_prices = await redis_cache.mget([f"crypto:price:{s}" for s in missing]) if missing else []
 
-    price_map = {symbol: float(price) if price else None for symbol, price in zip(symbols, cached_prices)}
+    for symbol, price in zip(missing, cached_prices):
+        if isinstance(price, dict):
+            price = price.get("price")
+        price_map[symbol] = float(price) if price else None
 
     for holding in holdings:
         symbol = holding.get("symbol", "").upper()
@@ -206,7 +215,7 @@ async def add_holding(
     )
 
     # Invalidate portfolio cache
-    await redis_cache.delete(f"portfolio:{user_id}")
+    await tiered_cache.delete(PORTFOLIO_NAMESPACE, f"portfolio:{user_id}")
 
     return {"message": "Holding added successfully", "holding": new_holding}
 
@@ -232,6 +241,6 @@ async def delete_holding(
     )
 
     # Invalidate portfolio cache
-    await redis_cache.delete(f"portfolio:{user_id}")
+    await tiered_cache.delete(PORTFOLIO_NAMESPACE, f"portfolio:{user_id}")
 
     return {"message": "Holding deleted successfully"}
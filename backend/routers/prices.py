@@ -89,7 +89,16 @@ async def get_price(symbol: str, response: Response) -> Dict[str, Any]:
         response.headers.update(get_cache_headers(ttl_seconds=60))
         
         async with RequestTimer(f"get-price:{symbol}"):
-            # Try cache first (lowercase for consistency)
+            # Host shared-memory table first: a memory read, no network round-trip
+            shared_price = price_stream_service.get_shared_price(symbol)
+            if shared_price is not None:
+                return {
+                    "symbol": symbol.lower(),
+                    "price": str(shared_price),
+                    "source": "shared_memory"
+                }
+
+            # Try cache next (lowercase for consistency)
             cache_key = f"crypto:price:{symbol.lower()}"
             cached_price = await redis_cache.get(cache_key)
             
@@ -181,7 +190,13 @@ async def get_bulk_prices(symbols: str) -> Dict[str, Any]:
         prices = {}
 
         for symbol in symbol_list:
-            # Try cache first
+            shared_price = price_stream_service.get_shared_price(symbol)
+            if shared_price is not None:
+                prices[symbol] = str(shared_price)
+                price_stream_metrics.record_cache_hit()
+                continue
+
+            # Try cache next
             cache_key = f"crypto:price:{symbol}"
             cached_price = await redis_cache.get(cache_key)
 
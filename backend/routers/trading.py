@@ -7,25 +7,22 @@ from typing import Optional
 import logging
 import uuid
 
-from models import Order, OrderCreate, Transaction
+from models import Order, OrderCreate
 from dependencies import get_current_user_id, get_db, get_limiter
-from services.transactions_utils import broadcast_transaction_event
+from services.order_fills import (
+    MIN_TRADING_FEE,
+    TRADING_FEE_PERCENTAGE,
+    calculate_trading_fee,
+    execute_fill,
+    release_reserve,
+    reserve_funds,
+)
+from services.order_trigger_engine import order_trigger_engine
+from services.audit_service import build_audit_entry, log_audit, log_audit_line
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/orders", tags=["trading"])
 
-# Trading fee configuration
-TRADING_FEE_PERCENTAGE = 0.1  # 0.1% trading fee
-MIN_TRADING_FEE = 0.01  # Minimum $0.01 fee
-
-
-def calculate_trading_fee(amount: float, price: float, fee_percentage: float = TRADING_FEE_PERCENTAGE) -> float:
-    """Calculate trading fee with minimum fee threshold."""
-    total_value = amount * price
-    fee = total_value * (fee_percentage / 100)
-    return max(fee, MIN_TRADING_FEE)
-
-
 # Enhanced order models for advanced order types
 class AdvancedOrderCreate(BaseModel):
     trading_pair: str
@@ -38,32 +35,6 @@ class AdvancedOrderCreate(BaseModel):
     expire_time: Optional[datetime] = None  # For GTD orders
 
 
-async def log_audit(db, user_id, action, resource=None, ip_address=None, details=None, request_id=None):
-    """Log audit event."""
-    from models import AuditLog
-
-    logger.info(
-        f"Audit log: {action}",
-        extra={
-            "type": "audit_log",
-            "user_id": user_id,
-            "action": action,
-            "resource": resource,
-            "ip_address": ip_address,
-            "request_id": request_id
-        }
-    )
-
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource=resource,
-        ip_address=ip_address,
-        details=details
-    )
-    await db.get_collection("audit_logs").insert_one(audit_log.dict())
-
-
 @router.get("")
 async def get_orders(
     user_id: str = Depends(get_current_user_id),
@@ -88,10 +59,6 @@ async def create_order(
     if not settings.feature_trading_enabled:
         raise HTTPException(status_code=503, detail="Trading is currently disabled")
 
-    orders_collection = db.get_collection("orders")
-    transactions_collection = db.get_collection("transactions")
-    wallets_collection = db.get_collection("wallets")
-
     # Validate order data
     if order_data.amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
@@ -99,61 +66,6 @@ async def create_order(
     if order_data.price <= 0:
         raise HTTPException(status_code=400, detail="Price must be greater than 0")
 
-    # Calculate trading fee
-    trading_fee = calculate_trading_fee(order_data.amount, order_data.price)
-    total_value = order_data.amount * order_data.price
-
-    # Get user wallet
-    wallet = await wallets_collection.find_one({"user_id": user_id})
-    if not wallet:
-        raise HTTPException(status_code=404, detail="Wallet not found. Please create a wallet first.")
-
-    # Check balance for buy orders
-    if order_data.side.lower() == "buy":
-        required_amount = total_value + trading_fee
-        current_balance = wallet.get("balances", {}).get("USD", 0)
-
-        if current_balance < required_amount:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient balance. Required: ${required_amount:.2f} (including ${trading_fee:.2f} fee), Available: ${current_balance:.2f}"
-            )
-
-        # Atomically update wallet balances
-        crypto_symbol = order_data.trading_pair.split("/")[0]
-        await wallets_collection.update_one(
-            {"user_id": user_id},
-            {
-                "$inc": {
-                    f"balances.USD": -required_amount,
-                    f"balances.{crypto_symbol}": order_data.amount
-                },
-                "$set": {"updated_at": datetime.now(timezone.utc)}
-            }
-        )
-    else:  # sell order
-        crypto_symbol = order_data.trading_pair.split("/")[0]
-        current_crypto = wallet.get("balances", {}).get(crypto_symbol, 0)
-
-        if current_crypto < order_data.amount:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient {crypto_symbol}. Required: {order_data.amount}, Available: {current_crypto}"
-            )
-
-        # Atomically update wallet balances
-        net_proceeds = total_value - trading_fee
-        await wallets_collection.update_one(
-            {"user_id": user_id},
-            {
-                "$inc": {
-                    f"balances.{crypto_symbol}": -order_data.amount,
-                    f"balances.USD": net_proceeds
-                },
-                "$set": {"updated_at": datetime.now(timezone.utc)}
-            }
-        )
-
     # Create order
     order = Order(
         user_id=user_id,
@@ -165,36 +77,9 @@ async def create_order(
         status="filled",
         filled_at=datetime.now(timezone.utc)
     )
-
-    await orders_collection.insert_one(order.dict())
-
-    # Create trade transaction
-    transaction = Transaction(
-        user_id=user_id,
-        type="trade",
-        amount=order_data.amount if order_data.side.lower() == "buy" else -order_data.amount,
-        symbol=order_data.trading_pair,
-        description=f"{order_data.side.upper()} {order_data.amount} {order_data.trading_pair} @ ${order_data.price}"
-    )
-    transaction_payload = transaction.dict()
-    await transactions_collection.insert_one(transaction_payload)
-
-    # Create fee transaction
-    fee_transaction = Transaction(
-        user_id=user_id,
-        type="fee",
-        amount=-trading_fee,
-        symbol="USD",
-        description=f"Trading fee for order {order.id[:8]}"
-    )
-    fee_payload = fee_transaction.dict()
-    await transactions_collection.insert_one(fee_payload)
-
-    await broadcast_transaction_event(user_id, transaction_payload)
-    await broadcast_transaction_event(user_id, fee_payload)
-
-    await log_audit(
-        db, user_id, "ORDER_CREATED",
+    trading_fee = calculate_trading_fee(order_data.amount, order_data.price)
+    audit_entry = build_audit_entry(
+        user_id, "ORDER_CREATED",
         resource=order.id,
         ip_address=request.client.host,
         details={
@@ -206,6 +91,20 @@ async def create_order(
         }
     )
 
+    # One guarded wallet update, then order + trade/fee transactions + audit in one batch
+    trading_fee, total_value = await execute_fill(
+        db,
+        user_id=user_id,
+        order_id=order.id,
+        trading_pair=order_data.trading_pair,
+        side=order_data.side,
+        amount=order_data.amount,
+        price=order_data.price,
+        order_doc=order.dict(),
+        audit_entry=audit_entry,
+    )
+    log_audit_line(user_id, "ORDER_CREATED", resource=order.id, ip_address=request.client.host)
+
     logger.info(f"✅ Order created: {order.id} - {order_data.side.upper()} {order_data.amount} {order_data.trading_pair} @ ${order_data.price}")
 
     return {
@@ -314,21 +213,25 @@ async def create_advanced_order(
         trading_fee = calculate_trading_fee(order_data.amount, order_data.price)
         required_amount = (order_data.amount * order_data.price) + trading_fee
 
-        wallet = await wallets_collection.find_one({"user_id": user_id})
-        if not wallet:
-            raise HTTPException(status_code=404, detail="Wallet not found")
-
-        current_balance = wallet.get("balances", {}).get("USD", 0)
-        if current_balance < required_amount:
+        # Reserve funds (deduct from available balance); the fill is paid from the reserve
+        if not await reserve_funds(db, user_id, order_id, required_amount):
+            wallet = await wallets_collection.find_one({"user_id": user_id})
+            if not wallet:
+                raise HTTPException(status_code=404, detail="Wallet not found")
+            current_balance = wallet.get("balances", {}).get("USD", 0)
             raise HTTPException(
                 status_code=400,
                 detail=f"Insufficient balance. Required: ${required_amount:.2f}, Available: ${current_balance:.2f}"
             )
-
-        # Reserve funds (deduct from available balance)
         order_doc["reserved_amount"] = required_amount
 
-    await orders_collection.insert_one(order_doc)
+    try:
+        await orders_collection.insert_one(order_doc)
+    except Exception:
+        if order_doc.get("reserved_amount"):
+            await release_reserve(db, user_id, order_id, order_doc["reserved_amount"], "unsaved")
+        raise
+    order_trigger_engine.add_order(order_doc)
 
     await log_audit(
         db, user_id, "ADVANCED_ORDER_CREATED",
@@ -361,7 +264,6 @@ async def cancel_order(
 ):
     """Cancel a pending order and release reserved funds."""
     orders_collection = db.get_collection("orders")
-    wallets_collection = db.get_collection("wallets")
 
     order = await orders_collection.find_one({"id": order_id, "user_id": user_id})
 
@@ -371,24 +273,10 @@ async def cancel_order(
     if order["status"] != "pending":
         raise HTTPException(status_code=400, detail="Only pending orders can be cancelled")
 
-    # Release reserved funds if applicable
-    if order.get("reserved_amount") and order.get("side", "").lower() == "buy":
-        wallet = await wallets_collection.find_one({"user_id": user_id})
-        if wallet:
-            current_balance = wallet.get("balances", {}).get("USD", 0)
-            await wallets_collection.update_one(
-                {"user_id": user_id},
-                {
-                    "$set": {
-                        "balances.USD": current_balance + order["reserved_amount"],
-                        "updated_at": datetime.now(timezone.utc)
-                    }
-                }
-            )
-
-    # Update order status
-    await orders_collection.update_one(
-        {"id": order_id},
+    # Claim the order with the same status guard the trigger engine fills with, so a cancel
+    # and a fill can never both win
+    result = await orders_collection.update_one(
+        {"id": order_id, "user_id": user_id, "status": "pending"},
         {
             "$set": {
                 "status": "cancelled",
@@ -396,6 +284,14 @@ async def cancel_order(
             }
         }
     )
+    if result.modified_count != 1:
+        raise HTTPException(status_code=400, detail="Only pending orders can be cancelled")
+
+    order_trigger_engine.remove_order(order_id)
+
+    # Release reserved funds if applicable
+    if order.get("reserved_amount") and order.get("side", "").lower() == "buy":
+        await release_reserve(db, user_id, order_id, order["reserved_amount"], "cancelled")
 
     await log_audit(
         db, user_id, "ORDER_CANCELLED",
@@ -1,23 +1,47 @@
 """Transaction history endpoints."""
 
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from datetime import datetime, timezone
 from typing import Optional, Literal
 import logging
 import csv
+import json
+import zlib
 from io import StringIO
 
 from dependencies import get_current_user_id, get_db
+from pagination import fetch_page
 from services.transactions_utils import format_transaction, normalize_type_filter
 from services.rate_limit_utils import enforce_rate_limit
+from services.audit_service import log_audit, update_audit_details
+from transaction_stats import get_user_stats
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
 MAX_EXPORT_LIMIT = 5000
 TRANSACTIONS_RATE_LIMIT = 100
+# Transactions read, encoded and sent per chunk while streaming an export
+EXPORT_BATCH_SIZE = 500
+EXPORT_CSV_FIELDS = [
+    "id",
+    "type",
+    "rawType",
+    "amount",
+    "currency",
+    "symbol",
+    "status",
+    "description",
+    "reference",
+    "createdAt",
+]
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
 
 
 async def enforce_transactions_limit(user_id: str) -> None:
@@ -25,45 +49,92 @@ async def enforce_transactions_limit(user_id: str) -> None:
 
 
 class TransactionExportRequest(BaseModel):
-    """Export transactions to CSV or JSON."""
+    """Export transactions to CSV, NDJSON or JSON, optionally gzip-compressed."""
 
-    format: Literal["csv", "json"] = "csv"
+    format: Literal["csv", "ndjson", "json"] = "csv"
     type: Optional[str] = None
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     limit: int = Field(default=MAX_EXPORT_LIMIT, ge=1, le=MAX_EXPORT_LIMIT)
+    gzip: bool = False
 
 
-async def log_audit(
-    db,
-    user_id: str,
-    action: str,
-    resource: Optional[str] = None,
-    ip_address: Optional[str] = None,
-    details: Optional[dict] = None,
-) -> None:
-    """Log audit event."""
-    from models import AuditLog
-
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource=resource,
-        ip_address=ip_address,
-        details=details,
-    )
-    await db.get_collection("audit_logs").insert_one(audit_log.dict())
+def _encode_csv(rows, header: bool = False) -> str:
+    output = StringIO()
+    writer = csv.DictWriter(output, fieldnames=EXPORT_CSV_FIELDS)
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+async def _export_batches(collection, query: dict, limit: int):
+    """Formatted transactions, newest first, one cursor batch at a time."""
+    cursor = collection.find(query).sort("created_at", -1).limit(limit).batch_size(EXPORT_BATCH_SIZE)
+    batch = []
+    try:
+        async for tx in cursor:
+            batch.append(format_transaction(tx))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        await cursor.close()
+
+
+async def stream_export(batches, fmt: str, compress: bool = False, on_complete=None):
+    """
+    Encode batches of formatted transactions as they arrive and yield each as one chunk.
+
+    JSON keeps the ``{"transactions": [...], "count": n}`` document shape, written
+    incrementally. With ``compress`` the chunks form one gzip stream, flushed per batch so
+    the client is never more than a batch behind. ``on_complete(count)`` runs after the last
+    row has been produced.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+    def emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        if compressor:
+            return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data
+
+    count = 0
+    if fmt == "csv":
+        yield emit(_encode_csv([], header=True))
+    elif fmt == "json":
+        yield emit('{"transactions": [')
+
+    async for rows in batches:
+        if fmt == "csv":
+            text = _encode_csv(rows)
+        elif fmt == "ndjson":
+            text = "".join(json.dumps(row, default=str) + "\n" for row in rows)
+        else:
+            text = ("," if count else "") + ",".join(json.dumps(row, default=str) for row in rows)
+        count += len(rows)
+        yield emit(text)
+
+    if fmt == "json":
+        yield emit(f'], "count": {count}}}')
+    if compressor:
+        yield compressor.flush()
+    if on_complete:
+        await on_complete(count)
 
 
 @router.get("")
 async def get_transactions(
-    skip: int = 0,
+    skip: int = 0,  # Deprecated: use cursor
     limit: int = 50,
     type: Optional[str] = None,  # deposit, withdrawal, trade, fee
+    cursor: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
     db = Depends(get_db)
 ):
-    """Get user's transaction history."""
+    """Get user's transaction history, newest first. Pass ``next_cursor`` back as ``cursor`` for the next page."""
     await enforce_transactions_limit(user_id)
     transactions_collection = db.get_collection("transactions")
     
@@ -74,17 +145,18 @@ async def get_transactions(
         query.update(type_filter)
     
     # Get transactions
-    transactions = await transactions_collection.find(
-        query
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    transactions, next_cursor = await fetch_page(
+        transactions_collection, query, limit=limit, cursor=cursor, skip=skip
+    )
     
-    total = await transactions_collection.count_documents(query)
+    total = None if cursor else await transactions_collection.count_documents(query)
     
     return {
         "transactions": [format_transaction(tx) for tx in transactions],
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 
@@ -118,7 +190,13 @@ async def export_transactions(
     user_id: str = Depends(get_current_user_id),
     db = Depends(get_db)
 ):
-    """Export transactions in CSV or JSON format."""
+    """
+    Export transactions in CSV, NDJSON or JSON format.
+
+    The export is streamed: the cursor is read in batches of EXPORT_BATCH_SIZE and each batch
+    is encoded and sent as it arrives, so memory stays flat and the first bytes leave after
+    one batch. Set ``gzip`` to download a compressed file.
+    """
     await enforce_transactions_limit(user_id)
     if payload.start_date and payload.end_date and payload.start_date > payload.end_date:
         raise HTTPException(status_code=400, detail="start_date must be before end_date")
@@ -139,82 +217,74 @@ async def export_transactions(
         query["created_at"] = date_filter
 
     limit = min(payload.limit, MAX_EXPORT_LIMIT)
-    transactions = await transactions_collection.find(query).sort("created_at", -1).limit(limit).to_list(limit)
-    formatted = [format_transaction(tx) for tx in transactions]
+    ip_address = request.client.host if request.client else None
 
-    await log_audit(
+    # Audit before any data leaves so an aborted download is still recorded; the row count is
+    # only known once the stream finishes.
+    audit_entry = await log_audit(
         db,
         user_id,
         "TRANSACTIONS_EXPORTED",
-        ip_address=request.client.host if request.client else None,
+        ip_address=ip_address,
         details={
             "format": payload.format,
-            "count": len(formatted),
+            "count": None,
             "type": payload.type,
+            "gzip": payload.gzip,
+            "status": "started",
         }
     )
 
-    if payload.format == "json":
-        return {"transactions": formatted, "count": len(formatted)}
+    async def audit_export(count: int) -> None:
+        await update_audit_details(db, audit_entry, {"count": count, "status": "completed"})
+
+    filename = f"transactions_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.{payload.format}"
+    media_type = EXPORT_MEDIA_TYPES[payload.format]
+    if payload.gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
 
-    output = StringIO()
-    fieldnames = [
-        "id",
-        "type",
-        "rawType",
-        "amount",
-        "currency",
-        "symbol",
-        "status",
-        "description",
-        "reference",
-        "createdAt",
-    ]
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    writer.writerows(formatted)
-
-    filename = f"transactions_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.csv"
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
+        stream_export(
+            _export_batches(transactions_collection, query, limit),
+            payload.format,
+            compress=payload.gzip,
+            on_complete=audit_export,
+        ),
+        media_type=media_type,
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 
 @router.get("/summary/stats")
 async def get_transaction_stats(
+    days: Optional[int] = Query(None, ge=1, le=366),
     user_id: str = Depends(get_current_user_id),
     db = Depends(get_db)
 ):
-    """Get transaction statistics summary."""
+    """
+    Get transaction statistics summary (completed transactions only).
+
+    Served from the incrementally maintained rollups in ``transaction_stats``: one document
+    for all-time stats, or one daily bucket per day when ``days`` is given.
+    """
     await enforce_transactions_limit(user_id)
-    transactions_collection = db.get_collection("transactions")
-    
-    # Aggregate by type
-    pipeline = [
-        {"$match": {"user_id": user_id, "status": "completed"}},
-        {
-            "$group": {
-                "_id": "$type",
-                "total_amount": {"$sum": "$amount"},
-                "count": {"$sum": 1}
-            }
-        }
-    ]
-    
-    results = await transactions_collection.aggregate(pipeline).to_list(10)
+    rollup = await get_user_stats(db, user_id, days=days)
     
     stats = {}
-    for result in results:
-        tx_type = result["_id"]
+    for tx_type, entry in rollup.items():
         stats[tx_type] = {
-            "totalAmount": result["total_amount"],
-            "count": result["count"]
+            "totalAmount": entry["total_amount"],
+            "count": entry["count"],
+            "byCurrency": {
+                currency: {"totalAmount": c["total_amount"], "count": c["count"]}
+                for currency, c in entry.get("currencies", {}).items()
+            }
         }
     
     return {
         "stats": stats,
+        "days": days,
         "totalDeposits": stats.get("deposit", {}).get("totalAmount", 0),
         "totalWithdrawals": stats.get("withdrawal", {}).get("totalAmount", 0),
         "totalTrades": stats.get("trade", {}).get("count", 0)
@@ -23,6 +23,11 @@ from config import settings
 from services.gas_fees import gas_fee_service
 from email_service import email_service
 from services.transactions_utils import broadcast_transaction_event
+from services.audit_service import log_audit
+from ledger import post_balance_change
+from pagination import fetch_page
+from transaction_stats import insert_transactions
+from wallet_lanes import wallet_lanes
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/transfers", tags=["transfers"])
@@ -83,36 +88,6 @@ class FeeEstimateResponse(BaseModel):
     recommended: str
 
 
-# ============================================
-# HELPER FUNCTIONS
-# ============================================
-
-async def log_audit(db, user_id: str, action: str, resource: Optional[str] = None,
-                    ip_address: Optional[str] = None, details: Optional[dict] = None):
-    """Log audit event."""
-    from models import AuditLog
-
-    logger.info(
-        f"Audit log: {action}",
-        extra={
-            "type": "audit_log",
-            "user_id": user_id,
-            "action": action,
-            "resource": resource,
-            "ip_address": ip_address
-        }
-    )
-
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource=resource,
-        ip_address=ip_address,
-        details=details
-    )
-    await db.get_collection("audit_logs").insert_one(audit_log.dict())
-
-
 # ============================================
 # P2P TRANSFER ENDPOINTS
 # ============================================
@@ -191,7 +166,6 @@ async def create_p2p_transfer(
     ```
     """
     users_collection = db.get_collection("users")
-    transactions_collection = db.get_collection("transactions")
     ip_address = request.client.host if request.client else "unknown"
 
     # Get sender
@@ -234,239 +208,228 @@ async def create_p2p_transfer(
     
     total_to_deduct = transfer.amount + gas_fee
 
-    # Get current balances (from wallets collection)
-    wallets_collection = db.get_collection("wallets")
-    sender_wallet = await wallets_collection.find_one({"user_id": user_id})
-    
-    if not sender_wallet:
-        # Create wallet if doesn't exist
-        sender_wallet = {
-            "id": str(uuid.uuid4()),
-            "user_id": user_id,
-            "balances": {transfer.currency: 0.0},
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc)
-        }
-        await wallets_collection.insert_one(sender_wallet)
+    async with wallet_lanes.lanes(user_id, recipient["id"]):
+        # Get current balances (from wallets collection)
+        wallets_collection = db.get_collection("wallets")
+        sender_wallet = await wallets_collection.find_one({"user_id": user_id})
 
-    sender_balance = sender_wallet.get("balances", {}).get(transfer.currency, 0.0)
+        if not sender_wallet:
+            # Create wallet if doesn't exist
+            sender_wallet = {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "balances": {transfer.currency: 0.0},
+                "created_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc)
+            }
+            await wallets_collection.insert_one(sender_wallet)
 
-    # Validate balance (including gas fee)
-    if sender_balance < total_to_deduct:
-        logger.warning(
-            f"Insufficient balance: user {user_id} has {sender_balance} {transfer.currency}, "
-            f"needs {total_to_deduct} (amount: {transfer.amount}, fee: {gas_fee})"
-        )
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Insufficient balance. You need {total_to_deduct:.8f} {transfer.currency} "
-                   f"(amount + gas fee)"
-        )
+        sender_balance = sender_wallet.get("balances", {}).get(transfer.currency, 0.0)
 
-    # Generate transfer ID
-    transfer_id = str(uuid.uuid4())
-    timestamp = datetime.now(timezone.utc)
-
-    # Create sender transaction (debit - amount + fee)
-    sender_txn = {
-        "id": str(uuid.uuid4()),
-        "user_id": user_id,
-        "type": "p2p_send",
-        "amount": -transfer.amount,
-        "currency": transfer.currency,
-        "status": "completed",
-        "metadata": {
-            "transfer_id": transfer_id,
-            "recipient_id": recipient["id"],
-            "recipient_email": recipient["email"],
-            "recipient_name": recipient.get("name", "CryptoVault User"),
-            "note": transfer.note,
-            "gas_fee": gas_fee,
-            "gas_fee_display": gas_fee_display,
-            "priority": transfer.priority
-        },
-        "created_at": timestamp,
-        "updated_at": timestamp
-    }
+        # Validate balance (including gas fee)
+        if sender_balance < total_to_deduct:
+            logger.warning(
+                f"Insufficient balance: user {user_id} has {sender_balance} {transfer.currency}, "
+                f"needs {total_to_deduct} (amount: {transfer.amount}, fee: {gas_fee})"
+            )
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Insufficient balance. You need {total_to_deduct:.8f} {transfer.currency} "
+                       f"(amount + gas fee)"
+            )
+
+        # Generate transfer ID
+        transfer_id = str(uuid.uuid4())
+        timestamp = datetime.now(timezone.utc)
 
-    # Create fee transaction (if applicable)
-    fee_txn = None
-    if gas_fee > 0:
-        fee_txn = {
+        # Create sender transaction (debit - amount + fee)
+        sender_txn = {
             "id": str(uuid.uuid4()),
             "user_id": user_id,
-            "type": "gas_fee",
-            "amount": -gas_fee,
+            "type": "p2p_send",
+            "amount": -transfer.amount,
             "currency": transfer.currency,
             "status": "completed",
             "metadata": {
                 "transfer_id": transfer_id,
-                "fee_type": "p2p_transfer",
+                "recipient_id": recipient["id"],
+                "recipient_email": recipient["email"],
+                "recipient_name": recipient.get("name", "CryptoVault User"),
+                "note": transfer.note,
+                "gas_fee": gas_fee,
+                "gas_fee_display": gas_fee_display,
                 "priority": transfer.priority
             },
             "created_at": timestamp,
             "updated_at": timestamp
         }
 
-    # Create recipient transaction (credit - full amount, no fee deducted)
-    recipient_txn = {
-        "id": str(uuid.uuid4()),
-        "user_id": recipient["id"],
-        "type": "p2p_receive",
-        "amount": transfer.amount,
-        "currency": transfer.currency,
-        "status": "completed",
-        "metadata": {
-            "transfer_id": transfer_id,
-            "sender_id": user_id,
-            "sender_email": sender["email"],
-            "sender_name": sender.get("name", "CryptoVault User"),
-            "note": transfer.note
-        },
-        "created_at": timestamp,
-        "updated_at": timestamp
-    }
-
-    try:
-        # Execute atomic transfer
-        txns_to_insert = [sender_txn, recipient_txn]
-        if fee_txn:
-            txns_to_insert.append(fee_txn)
-        await transactions_collection.insert_many(txns_to_insert)
-
-        await broadcast_transaction_event(user_id, sender_txn)
-        await broadcast_transaction_event(recipient["id"], recipient_txn)
-        if fee_txn:
-            await broadcast_transaction_event(user_id, fee_txn)
-
-        # Update sender wallet balance (deduct amount + fee)
-        new_sender_balance = sender_balance - total_to_deduct
-        await wallets_collection.update_one(
-            {"user_id": user_id},
-            {"$set": {
-                f"balances.{transfer.currency}": new_sender_balance,
-                "updated_at": timestamp
-            }}
-        )
-
-        # Update recipient wallet balance (credit full amount)
-        recipient_wallet = await wallets_collection.find_one({"user_id": recipient["id"]})
-        if not recipient_wallet:
-            recipient_wallet = {
+        # Create fee transaction (if applicable)
+        fee_txn = None
+        if gas_fee > 0:
+            fee_txn = {
                 "id": str(uuid.uuid4()),
-                "user_id": recipient["id"],
-                "balances": {transfer.currency: 0.0},
+                "user_id": user_id,
+                "type": "gas_fee",
+                "amount": -gas_fee,
+                "currency": transfer.currency,
+                "status": "completed",
+                "metadata": {
+                    "transfer_id": transfer_id,
+                    "fee_type": "p2p_transfer",
+                    "priority": transfer.priority
+                },
                 "created_at": timestamp,
                 "updated_at": timestamp
             }
-            await wallets_collection.insert_one(recipient_wallet)
-
-        recipient_balance = recipient_wallet.get("balances", {}).get(transfer.currency, 0.0)
-        new_recipient_balance = recipient_balance + transfer.amount
-        await wallets_collection.update_one(
-            {"user_id": recipient["id"]},
-            {"$set": {
-                f"balances.{transfer.currency}": new_recipient_balance,
-                "updated_at": timestamp
-            }}
-        )
 
-        # Log audit
-        await log_audit(
-            db,
-            user_id=user_id,
-            action="p2p_transfer",
-            resource=transfer_id,
-            ip_address=ip_address,
-            details={
+        # Create recipient transaction (credit - full amount, no fee deducted)
+        recipient_txn = {
+            "id": str(uuid.uuid4()),
+            "user_id": recipient["id"],
+            "type": "p2p_receive",
+            "amount": transfer.amount,
+            "currency": transfer.currency,
+            "status": "completed",
+            "metadata": {
                 "transfer_id": transfer_id,
-                "amount": transfer.amount,
-                "currency": transfer.currency,
-                "recipient": recipient["email"],
-                "gas_fee": gas_fee,
-                "priority": transfer.priority
-            }
-        )
-
-        logger.info(
-            f"P2P Transfer completed",
-            extra={
-                "type": "p2p_transfer",
-                "user_id": user_id,
-                "recipient_id": recipient["id"],
-                "amount": transfer.amount,
-                "currency": transfer.currency,
-                "gas_fee": gas_fee,
-                "transfer_id": transfer_id
-            }
-        )
+                "sender_id": user_id,
+                "sender_email": sender["email"],
+                "sender_name": sender.get("name", "CryptoVault User"),
+                "note": transfer.note
+            },
+            "created_at": timestamp,
+            "updated_at": timestamp
+        }
 
-        # Send email notifications (async, non-blocking)
         try:
-            # Email to sender
-            await email_service.send_p2p_transfer_sent(
-                to_email=sender["email"],
-                sender_name=sender.get("name", "CryptoVault User"),
-                recipient_name=recipient.get("name", "CryptoVault User"),
-                recipient_email=recipient["email"],
-                amount=f"{transfer.amount:.8f}".rstrip('0').rstrip('.'),
-                asset=transfer.currency,
-                gas_fee=gas_fee_display,
-                transaction_id=transfer_id,
-                note=transfer.note
+            # Update sender wallet balance (deduct amount + fee)
+            debited = await post_balance_change(
+                db, user_id, {transfer.currency: -total_to_deduct},
+                kind="p2p_send",
+                reference=transfer_id,
+                description=f"P2P transfer to {recipient['email']} (gas fee {gas_fee})",
+                guard={transfer.currency: total_to_deduct},
             )
-            
-            # Email to recipient
-            await email_service.send_p2p_transfer_received(
-                to_email=recipient["email"],
-                recipient_name=recipient.get("name", "CryptoVault User"),
-                sender_name=sender.get("name", "CryptoVault User"),
-                sender_email=sender["email"],
-                amount=f"{transfer.amount:.8f}".rstrip('0').rstrip('.'),
-                asset=transfer.currency,
-                transaction_id=transfer_id,
-                note=transfer.note
+            if debited is None:
+                raise ValueError("sender balance changed during transfer")
+
+            # Update recipient wallet balance (credit full amount, creating the wallet if needed)
+            await post_balance_change(
+                db, recipient["id"], {transfer.currency: transfer.amount},
+                kind="p2p_receive",
+                reference=transfer_id,
+                description=f"P2P transfer from {sender['email']}",
+                upsert=True,
             )
-        except Exception as email_error:
-            # Log but don't fail the transfer
-            logger.warning(f"Failed to send transfer emails: {str(email_error)}")
-
-        return {
-            "message": "Transfer completed successfully",
-            "transfer": {
-                "id": transfer_id,
-                "amount": transfer.amount,
-                "currency": transfer.currency,
-                "recipient_email": recipient["email"],
-                "recipient_name": recipient.get("name"),
-                "gas_fee": gas_fee,
-                "gas_fee_display": gas_fee_display,
-                "total_deducted": total_to_deduct,
-                "status": "completed",
-                "created_at": timestamp.isoformat()
-            }
-        }
 
-    except Exception as e:
-        logger.error(
-            f"P2P transfer failed: {str(e)}",
-            extra={
-                "type": "p2p_transfer_error",
-                "user_id": user_id,
-                "transfer_id": transfer_id
-            },
-            exc_info=True
+            # Record the transfer
+            txns_to_insert = [sender_txn, recipient_txn]
+            if fee_txn:
+                txns_to_insert.append(fee_txn)
+            await insert_transactions(db, txns_to_insert)
+
+            await broadcast_transaction_event(user_id, sender_txn)
+            await broadcast_transaction_event(recipient["id"], recipient_txn)
+            if fee_txn:
+                await broadcast_transaction_event(user_id, fee_txn)
+
+            # Log audit
+            await log_audit(
+                db,
+                user_id=user_id,
+                action="p2p_transfer",
+                resource=transfer_id,
+                ip_address=ip_address,
+                details={
+                    "transfer_id": transfer_id,
+                    "amount": transfer.amount,
+                    "currency": transfer.currency,
+                    "recipient": recipient["email"],
+                    "gas_fee": gas_fee,
+                    "priority": transfer.priority
+                }
+            )
+
+            logger.info(
+                f"P2P Transfer completed",
+                extra={
+                    "type": "p2p_transfer",
+                    "user_id": user_id,
+                    "recipient_id": recipient["id"],
+                    "amount": transfer.amount,
+                    "currency": transfer.currency,
+                    "gas_fee": gas_fee,
+                    "transfer_id": transfer_id
+                }
+            )
+        except Exception as e:
+            logger.error(
+                f"P2P transfer failed: {str(e)}",
+                extra={
+                    "type": "p2p_transfer_error",
+                    "user_id": user_id,
+                    "transfer_id": transfer_id
+                },
+                exc_info=True
+            )
+            raise HTTPException(
+                status_code=500,
+                detail="Transfer failed. Please try again."
+            )
+
+    # Send email notifications (async, non-blocking)
+    try:
+        # Email to sender
+        await email_service.send_p2p_transfer_sent(
+            to_email=sender["email"],
+            sender_name=sender.get("name", "CryptoVault User"),
+            recipient_name=recipient.get("name", "CryptoVault User"),
+            recipient_email=recipient["email"],
+            amount=f"{transfer.amount:.8f}".rstrip('0').rstrip('.'),
+            asset=transfer.currency,
+            gas_fee=gas_fee_display,
+            transaction_id=transfer_id,
+            note=transfer.note
         )
-        raise HTTPException(
-            status_code=500,
-            detail="Transfer failed. Please try again."
+        
+        # Email to recipient
+        await email_service.send_p2p_transfer_received(
+            to_email=recipient["email"],
+            recipient_name=recipient.get("name", "CryptoVault User"),
+            sender_name=sender.get("name", "CryptoVault User"),
+            sender_email=sender["email"],
+            amount=f"{transfer.amount:.8f}".rstrip('0').rstrip('.'),
+            asset=transfer.currency,
+            transaction_id=transfer_id,
+            note=transfer.note
         )
+    except Exception as email_error:
+        # Log but don't fail the transfer
+        logger.warning(f"Failed to send transfer emails: {str(email_error)}")
+
+    return {
+        "message": "Transfer completed successfully",
+        "transfer": {
+            "id": transfer_id,
+            "amount": transfer.amount,
+            "currency": transfer.currency,
+            "recipient_email": recipient["email"],
+            "recipient_name": recipient.get("name"),
+            "gas_fee": gas_fee,
+            "gas_fee_display": gas_fee_display,
+            "total_deducted": total_to_deduct,
+            "status": "completed",
+            "created_at": timestamp.isoformat()
+        }
+    }
 
 
 @router.get("/p2p/history")
 async def get_p2p_history(
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
     db = Depends(get_db)
 ):
@@ -474,8 +437,9 @@ async def get_p2p_history(
     Get P2P transfer history for the current user.
     
     **Query Parameters:**
-    - `skip`: Number of records to skip (default: 0)
+    - `cursor`: `next_cursor` from the previous page (omit for the first page)
     - `limit`: Maximum number of records to return (default: 50)
+    - `skip`: Deprecated offset, ignored when `cursor` is given (default: 0)
     
     **Response:**
     ```json
@@ -504,13 +468,11 @@ async def get_p2p_history(
         ]
     }
 
-    transfers = await transactions_collection.find(query) \
-        .sort("created_at", -1) \
-        .skip(skip) \
-        .limit(limit) \
-        .to_list(limit)
+    transfers, next_cursor = await fetch_page(
+        transactions_collection, query, limit=limit, cursor=cursor, skip=skip
+    )
 
-    total = await transactions_collection.count_documents(query)
+    total = None if cursor else await transactions_collection.count_documents(query)
 
     # Format response
     formatted_transfers = []
@@ -535,5 +497,6 @@ async def get_p2p_history(
         "transfers": formatted_transfers,
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
@@ -27,9 +27,15 @@ import uuid
 import logging
 
 from dependencies import get_current_user_id, get_db, get_limiter
-from nowpayments_service import nowpayments_service, PaymentStatus
+from nowpayments_service import nowpayments_service
 from config import settings
 from services.transactions_utils import broadcast_transaction_event
+from services.audit_service import log_audit
+from ledger import post_balance_change
+from pagination import fetch_page
+from transaction_stats import insert_transactions
+from services.deposit_ingest import deposit_ingest
+from wallet_lanes import wallet_lanes
 from email_service import email_service
 from admin_auth import get_current_admin
 
@@ -52,36 +58,6 @@ class WithdrawRequest(BaseModel):
     address: str
 
 
-# ============================================
-# HELPER FUNCTIONS
-# ============================================
-
-async def log_audit(db, user_id: str, action: str, resource: Optional[str] = None, 
-                    ip_address: Optional[str] = None, details: Optional[dict] = None):
-    """Log audit event."""
-    from models import AuditLog
-    
-    logger.info(
-        f"Audit log: {action}",
-        extra={
-            "type": "audit_log",
-            "user_id": user_id,
-            "action": action,
-            "resource": resource,
-            "ip_address": ip_address
-        }
-    )
-    
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource=resource,
-        ip_address=ip_address,
-        details=details
-    )
-    await db.get_collection("audit_logs").insert_one(audit_log.dict())
-
-
 # ============================================
 # WALLET BALANCE ENDPOINTS
 # ============================================
@@ -293,19 +269,21 @@ async def get_deposit_status(
 
 @router.get("/deposits")
 async def get_deposit_history(
-    skip: int = 0,
+    skip: int = 0,  # Deprecated: use cursor
     limit: int = 20,
+    cursor: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
     db = Depends(get_db)
 ):
-    """Get user's deposit history."""
+    """Get user's deposit history, newest first. Pass ``next_cursor`` back as ``cursor`` for the next page."""
     deposits_collection = db.get_collection("deposits")
     
-    deposits = await deposits_collection.find(
-        {"user_id": user_id}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    deposits, next_cursor = await fetch_page(
+        deposits_collection, {"user_id": user_id}, limit=limit, cursor=cursor, skip=skip
+    )
     
-    total = await deposits_collection.count_documents({"user_id": user_id})
+    # Counting is a scan of its own; only the first page pays for it
+    total = None if cursor else await deposits_collection.count_documents({"user_id": user_id})
     
     return {
         "deposits": [
@@ -321,7 +299,8 @@ async def get_deposit_history(
         ],
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 
@@ -343,6 +322,8 @@ async def nowpayments_webhook(
     - Proper content-type handling
     - Comprehensive error handling and logging
     - Idempotent processing
+    - Batched application: IPNs are applied together by ``deposit_ingest`` and duplicate
+      deliveries are collapsed, so provider retry storms don't multiply database work
     """
     try:
         # Log webhook receipt
@@ -385,12 +366,11 @@ async def nowpayments_webhook(
             logger.warning("⚠️ No signature provided - processing anyway (development mode)")
         
         # Log full payload for debugging
-        logger.info(f"Webhook payload: {json.dumps(payload, indent=2)}")
+        logger.debug(f"Webhook payload: {json.dumps(payload)}")
         
         payment_id = payload.get("payment_id")
         payment_status = payload.get("payment_status")
         order_id = payload.get("order_id")
-        actually_paid = payload.get("actually_paid", 0)
         
         # Validate required fields
         if not payment_id or not payment_status or not order_id:
@@ -399,158 +379,9 @@ async def nowpayments_webhook(
         
         logger.info(f"📬 Processing webhook: Order {order_id} - Status: {payment_status} - Payment ID: {payment_id}")
         
-        # Send webhook received notification to admin
-        try:
-            from services.telegram_bot import telegram_bot
-            await telegram_bot.notify_webhook_received(
-                order_id=order_id,
-                payment_status=payment_status,
-                payment_id=payment_id
-            )
-        except Exception as e:
-            logger.warning(f"Failed to send webhook Telegram notification: {e}")
-        
-        # Find deposit record
-        deposits_collection = db.get_collection("deposits")
-        deposit = await deposits_collection.find_one({"order_id": order_id})
-        
-        if not deposit:
-            logger.warning(f"⚠️ Deposit not found for order: {order_id}")
-            # Return 200 to acknowledge receipt (prevents retries for invalid orders)
-            return {"status": "ignored", "reason": "Order not found", "order_id": order_id}
-        
-        # Check if already processed (idempotency)
-        if deposit.get("status") == payment_status and deposit.get("webhook_processed"):
-            logger.info(f"ℹ️ Webhook already processed for order: {order_id}")
-            return {"status": "already_processed", "order_id": order_id}
-        
-        # Update deposit status
-        await deposits_collection.update_one(
-            {"order_id": order_id},
-            {
-                "$set": {
-                    "status": payment_status,
-                    "actually_paid": actually_paid,
-                    "webhook_processed": True,
-                    "webhook_received_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                }
-            }
-        )
-        
-        # If payment is finished/confirmed, credit the user's wallet
-        if payment_status in PaymentStatus.SUCCESS_STATUSES:
-            wallets_collection = db.get_collection("wallets")
-            user_id = deposit["user_id"]
-            amount = deposit["amount"]
-            
-            logger.info(f"💰 Processing successful payment: ${amount} for user {user_id}")
-            
-            # A1 FIX: Use atomic $inc operator for wallet balance updates
-            # Prevents race conditions where two concurrent deposits could result in lost updates
-            # Single atomic operation instead of find-then-set pattern
-            result = await wallets_collection.update_one(
-                {"user_id": user_id},
-                {
-                    "$inc": {"balances.USD": amount},
-                    "$set": {"updated_at": datetime.now(timezone.utc)},
-                    "$setOnInsert": {
-                        "id": str(uuid.uuid4()),
-                        "balances": {"USD": amount},
-                        "created_at": datetime.now(timezone.utc)
-                    }
-                },
-                upsert=True  # Create wallet if it doesn't exist
-            )
-            
-            if result.upserted_id:
-                logger.info(f"✅ New wallet created with balance: ${amount}")
-            else:
-                logger.info(f"✅ Wallet updated with deposit: +${amount}")
-            
-            # Create transaction record
-            transactions_collection = db.get_collection("transactions")
-            deposit_transaction = {
-                "id": str(uuid.uuid4()),
-                "user_id": user_id,
-                "type": "deposit",
-                "amount": amount,
-                "currency": "USD",
-                "status": "completed",
-                "reference": order_id,
-                "description": f"Deposit via {deposit['pay_currency']}",
-                "created_at": datetime.now(timezone.utc)
-            }
-            await transactions_collection.insert_one(deposit_transaction)
-            await broadcast_transaction_event(user_id, deposit_transaction)
-            
-            # Log audit
-            await log_audit(
-                db, user_id, "DEPOSIT_COMPLETED",
-                resource=order_id,
-                details={
-                    "amount": amount,
-                    "payment_status": payment_status,
-                    "payment_id": payment_id,
-                    "actually_paid": actually_paid
-                }
-            )
-            
-            logger.info(f"✅ Deposit completed: {order_id} - ${amount} credited to user {user_id}")
-            
-            # Send completion notification to admin
-            try:
-                from services.telegram_bot import telegram_bot
-                users_collection = db.get_collection("users")
-                user = await users_collection.find_one({"id": user_id})
-                user_email = user.get("email", "Unknown") if user else "Unknown"
-                
-                # Get updated wallet balance
-                wallet = await wallets_collection.find_one({"user_id": user_id})
-                new_balance = wallet.get("balances", {}).get("USD", 0) if wallet else amount
-                
-                await telegram_bot.notify_deposit_completed(
-                    user_id=user_id,
-                    user_email=user_email,
-                    amount=amount,
-                    currency=deposit['pay_currency'],
-                    order_id=order_id,
-                    payment_id=payment_id,
-                    new_balance=new_balance
-                )
-            except Exception as e:
-                logger.warning(f"Failed to send completion Telegram notification: {e}")
-                
-        elif payment_status in PaymentStatus.FAILED_STATUSES:
-            logger.warning(f"⚠️ Payment failed/expired: {order_id} - Status: {payment_status}")
-            
-            # Send failure notification to admin
-            try:
-                from services.telegram_bot import telegram_bot
-                users_collection = db.get_collection("users")
-                user = await users_collection.find_one({"id": deposit["user_id"]})
-                user_email = user.get("email", "Unknown") if user else "Unknown"
-                
-                await telegram_bot.notify_deposit_failed(
-                    user_id=deposit["user_id"],
-                    user_email=user_email,
-                    amount=deposit["amount"],
-                    currency=deposit['pay_currency'],
-                    order_id=order_id,
-                    payment_id=payment_id,
-                    reason=f"Payment status: {payment_status}"
-                )
-            except Exception as e:
-                logger.warning(f"Failed to send failure Telegram notification: {e}")
-        else:
-            logger.info(f"ℹ️ Payment pending: {order_id} - Status: {payment_status}")
-        
-        return {
-            "status": "success",
-            "order_id": order_id,
-            "payment_status": payment_status,
-            "processed_at": datetime.now(timezone.utc).isoformat()
-        }
+        # Applied with the rest of its batch; duplicates of a queued IPN share its outcome
+        result = await deposit_ingest.submit(db, payload)
+        return {**result, "processed_at": datetime.now(timezone.utc).isoformat()}
         
     except HTTPException:
         raise
@@ -640,72 +471,72 @@ async def create_withdrawal(
     if not data.address or len(data.address.strip()) < 10:
         raise HTTPException(status_code=400, detail="Valid withdrawal address is required")
     
-    # Check user's wallet balance
-    wallets_collection = db.get_collection("wallets")
-    wallet = await wallets_collection.find_one({"user_id": user_id})
-    
-    if not wallet:
-        raise HTTPException(status_code=404, detail="Wallet not found")
-    
-    current_balance = wallet.get("balances", {}).get(data.currency.upper(), 0)
-    
-    # Calculate withdrawal fee (1% with minimum $1)
-    fee_percentage = 1.0  # 1%
-    withdrawal_fee = max(data.amount * (fee_percentage / 100), 1.0)
-    total_amount = data.amount + withdrawal_fee
-    
-    if current_balance < total_amount:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Insufficient balance. Required: ${total_amount:.2f} (including ${withdrawal_fee:.2f} fee), Available: ${current_balance:.2f}"
-        )
-    
-    # Check if high-value withdrawal requiring multi-approval
-    # Threshold: $5,000 requires at least 2 admin approvals
-    MULTI_APPROVAL_THRESHOLD = 5000.0
-    requires_multi_approval = data.amount >= MULTI_APPROVAL_THRESHOLD
-    
-    # Create withdrawal record
-    withdrawals_collection = db.get_collection("withdrawals")
-    withdrawal_id = str(uuid.uuid4())
-    
-    withdrawal_record = {
-        "id": withdrawal_id,
-        "user_id": user_id,
-        "amount": data.amount,
-        "currency": data.currency.upper(),
-        "address": data.address.strip(),
-        "status": "pending_approval" if requires_multi_approval else "pending",
-        "fee": withdrawal_fee,
-        "net_amount": data.amount,
-        "total_amount": total_amount,
-        "transaction_hash": None,
-        "requires_multi_approval": requires_multi_approval,
-        "required_approvals": 2 if requires_multi_approval else 0,
-        "approval_count": 0,
-        "approvals": [],  # [{admin_id, approved_at, ip_address}]
-        "rejections": [],
-        "created_at": datetime.now(timezone.utc),
-        "processed_at": None,
-        "completed_at": None,
-        "notes": f"High-value withdrawal (${data.amount:,.2f}) - requires 2 admin approvals" if requires_multi_approval else None,
-    }
-    
-    await withdrawals_collection.insert_one(withdrawal_record)
-    
-    # Deduct from wallet balance (hold the funds)
-    await wallets_collection.update_one(
-        {"user_id": user_id},
-        {
-            "$set": {
-                f"balances.{data.currency.upper()}": current_balance - total_amount,
-                "updated_at": datetime.now(timezone.utc)
-            }
+    async with wallet_lanes.lane(user_id):
+        # Check user's wallet balance
+        wallets_collection = db.get_collection("wallets")
+        wallet = await wallets_collection.find_one({"user_id": user_id})
+
+        if not wallet:
+            raise HTTPException(status_code=404, detail="Wallet not found")
+
+        current_balance = wallet.get("balances", {}).get(data.currency.upper(), 0)
+
+        # Calculate withdrawal fee (1% with minimum $1)
+        fee_percentage = 1.0  # 1%
+        withdrawal_fee = max(data.amount * (fee_percentage / 100), 1.0)
+        total_amount = data.amount + withdrawal_fee
+
+        if current_balance < total_amount:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Insufficient balance. Required: ${total_amount:.2f} (including ${withdrawal_fee:.2f} fee), Available: ${current_balance:.2f}"
+            )
+
+        # Check if high-value withdrawal requiring multi-approval
+        # Threshold: $5,000 requires at least 2 admin approvals
+        MULTI_APPROVAL_THRESHOLD = 5000.0
+        requires_multi_approval = data.amount >= MULTI_APPROVAL_THRESHOLD
+
+        # Create withdrawal record
+        withdrawals_collection = db.get_collection("withdrawals")
+        withdrawal_id = str(uuid.uuid4())
+
+        withdrawal_record = {
+            "id": withdrawal_id,
+            "user_id": user_id,
+            "amount": data.amount,
+            "currency": data.currency.upper(),
+            "address": data.address.strip(),
+            "status": "pending_approval" if requires_multi_approval else "pending",
+            "fee": withdrawal_fee,
+            "net_amount": data.amount,
+            "total_amount": total_amount,
+            "transaction_hash": None,
+            "requires_multi_approval": requires_multi_approval,
+            "required_approvals": 2 if requires_multi_approval else 0,
+            "approval_count": 0,
+            "approvals": [],  # [{admin_id, approved_at, ip_address}]
+            "rejections": [],
+            "created_at": datetime.now(timezone.utc),
+            "processed_at": None,
+            "completed_at": None,
+            "notes": f"High-value withdrawal (${data.amount:,.2f}) - requires 2 admin approvals" if requires_multi_approval else None,
         }
-    )
-    
+
+        # Deduct from wallet balance (hold the funds)
+        held = await post_balance_change(
+            db, user_id, {data.currency.upper(): -total_amount},
+            kind="withdrawal",
+            reference=withdrawal_id,
+            description=f"Withdrawal to {data.address[:12]}... (incl. ${withdrawal_fee:.2f} fee)",
+            guard={data.currency.upper(): total_amount},
+        )
+        if held is None:
+            raise HTTPException(status_code=400, detail="Insufficient balance")
+
+        await withdrawals_collection.insert_one(withdrawal_record)
+
     # Create transaction record
-    transactions_collection = db.get_collection("transactions")
     withdrawal_transaction = {
         "id": str(uuid.uuid4()),
         "user_id": user_id,
@@ -717,7 +548,6 @@ async def create_withdrawal(
         "description": f"Withdrawal to {data.address[:12]}...",
         "created_at": datetime.now(timezone.utc)
     }
-    await transactions_collection.insert_one(withdrawal_transaction)
     
     # Create fee transaction record
     fee_transaction = {
@@ -731,7 +561,7 @@ async def create_withdrawal(
         "description": f"Withdrawal fee for {withdrawal_id[:8]}...",
         "created_at": datetime.now(timezone.utc)
     }
-    await transactions_collection.insert_one(fee_transaction)
+    await insert_transactions(db, [withdrawal_transaction, fee_transaction])
 
     await broadcast_transaction_event(user_id, withdrawal_transaction)
     await broadcast_transaction_event(user_id, fee_transaction)
@@ -932,36 +762,34 @@ async def reject_withdrawal(
     if not withdrawal:
         raise HTTPException(status_code=404, detail="Withdrawal not found")
 
-    if withdrawal["status"] not in ("pending_approval", "pending"):
-        raise HTTPException(status_code=400, detail=f"Withdrawal cannot be rejected (status: {withdrawal['status']})")
+    async with wallet_lanes.lane(withdrawal["user_id"]):
+        # Re-read inside the lane so a concurrent rejection cannot refund twice
+        withdrawal = await withdrawals_collection.find_one({"id": withdrawal_id})
+        if withdrawal["status"] not in ("pending_approval", "pending"):
+            raise HTTPException(status_code=400, detail=f"Withdrawal cannot be rejected (status: {withdrawal['status']})")
 
-    # Refund user's wallet
-    wallets_collection = db.get_collection("wallets")
-    wallet = await wallets_collection.find_one({"user_id": withdrawal["user_id"]})
-    if wallet:
-        current_balance = wallet.get("balances", {}).get(withdrawal["currency"], 0)
+        # Refund user's wallet
         refund_amount = withdrawal.get("total_amount", withdrawal["amount"] + withdrawal.get("fee", 0))
-        await wallets_collection.update_one(
-            {"user_id": withdrawal["user_id"]},
+        await post_balance_change(
+            db, withdrawal["user_id"], {withdrawal["currency"]: refund_amount},
+            kind="withdrawal_refund",
+            reference=withdrawal_id,
+            description="Rejected withdrawal refund",
+        )
+
+        await withdrawals_collection.update_one(
+            {"id": withdrawal_id},
             {"$set": {
-                f"balances.{withdrawal['currency']}": current_balance + refund_amount,
+                "status": "rejected",
                 "updated_at": datetime.now(timezone.utc),
-            }},
+            },
+            "$push": {"rejections": {
+                "admin_id": user_id,
+                "rejected_at": datetime.now(timezone.utc).isoformat(),
+                "ip_address": request.client.host if request.client else None,
+            }}},
         )
 
-    await withdrawals_collection.update_one(
-        {"id": withdrawal_id},
-        {"$set": {
-            "status": "rejected",
-            "updated_at": datetime.now(timezone.utc),
-        },
-        "$push": {"rejections": {
-            "admin_id": user_id,
-            "rejected_at": datetime.now(timezone.utc).isoformat(),
-            "ip_address": request.client.host if request.client else None,
-        }}},
-    )
-
     await log_audit(
         db, user_id, "ADMIN_WITHDRAWAL_REJECTION",
         resource=withdrawal_id,
@@ -974,19 +802,20 @@ async def reject_withdrawal(
 
 @router.get("/withdrawals")
 async def get_withdrawal_history(
-    skip: int = 0,
+    skip: int = 0,  # Deprecated: use cursor
     limit: int = 20,
+    cursor: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
     db = Depends(get_db)
 ):
-    """Get user's withdrawal history."""
+    """Get user's withdrawal history, newest first. Pass ``next_cursor`` back as ``cursor`` for the next page."""
     withdrawals_collection = db.get_collection("withdrawals")
     
-    withdrawals = await withdrawals_collection.find(
-        {"user_id": user_id}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    withdrawals, next_cursor = await fetch_page(
+        withdrawals_collection, {"user_id": user_id}, limit=limit, cursor=cursor, skip=skip
+    )
     
-    total = await withdrawals_collection.count_documents({"user_id": user_id})
+    total = None if cursor else await withdrawals_collection.count_documents({"user_id": user_id})
     
     return {
         "withdrawals": [
@@ -1007,7 +836,8 @@ async def get_withdrawal_history(
         ],
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 
@@ -1091,7 +921,6 @@ async def create_p2p_transfer(
     users_collection = db.get_collection("users")
     wallets_collection = db.get_collection("wallets")
     transfers_collection = db.get_collection("transfers")
-    transactions_collection = db.get_collection("transactions")
 
     sender = await users_collection.find_one({"id": user_id})
     if not sender:
@@ -1109,77 +938,64 @@ async def create_p2p_transfer(
     if not recipient.get("email_verified"):
         raise HTTPException(status_code=400, detail="Recipient's email is not verified. Ask them to verify their account first.")
 
-    # Check sender's balance
-    sender_wallet = await wallets_collection.find_one({"user_id": user_id})
-    if not sender_wallet:
-        raise HTTPException(status_code=404, detail="Sender wallet not found")
+    async with wallet_lanes.lanes(user_id, recipient["id"]):
+        # Check sender's balance
+        sender_wallet = await wallets_collection.find_one({"user_id": user_id})
+        if not sender_wallet:
+            raise HTTPException(status_code=404, detail="Sender wallet not found")
 
-    sender_balance = sender_wallet.get("balances", {}).get(data.currency.upper(), 0)
+        sender_balance = sender_wallet.get("balances", {}).get(data.currency.upper(), 0)
 
-    # P2P transfers are free (no fee)
-    transfer_fee = 0.0
-    total_amount = data.amount
+        # P2P transfers are free (no fee)
+        transfer_fee = 0.0
+        total_amount = data.amount
 
-    if sender_balance < total_amount:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Insufficient balance. Required: {total_amount} {data.currency}, Available: {sender_balance} {data.currency}"
-        )
-
-    # Create transfer record
-    transfer_id = str(uuid.uuid4())
-    transfer_record = {
-        "id": transfer_id,
-        "sender_id": user_id,
-        "sender_email": sender["email"],
-        "sender_name": sender["name"],
-        "recipient_id": recipient["id"],
-        "recipient_email": recipient["email"],
-        "recipient_name": recipient["name"],
-        "amount": data.amount,
-        "currency": data.currency.upper(),
-        "fee": transfer_fee,
-        "note": data.note,
-        "status": "completed",  # P2P transfers are instant
-        "created_at": datetime.now(timezone.utc),
-        "completed_at": datetime.now(timezone.utc)
-    }
-
-    await transfers_collection.insert_one(transfer_record)
+        if sender_balance < total_amount:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Insufficient balance. Required: {total_amount} {data.currency}, Available: {sender_balance} {data.currency}"
+            )
 
-    # Deduct from sender's wallet
-    await wallets_collection.update_one(
-        {"user_id": user_id},
-        {
-            "$set": {
-                f"balances.{data.currency.upper()}": sender_balance - total_amount,
-                "updated_at": datetime.now(timezone.utc)
-            }
+        # Create transfer record
+        transfer_id = str(uuid.uuid4())
+        transfer_record = {
+            "id": transfer_id,
+            "sender_id": user_id,
+            "sender_email": sender["email"],
+            "sender_name": sender["name"],
+            "recipient_id": recipient["id"],
+            "recipient_email": recipient["email"],
+            "recipient_name": recipient["name"],
+            "amount": data.amount,
+            "currency": data.currency.upper(),
+            "fee": transfer_fee,
+            "note": data.note,
+            "status": "completed",  # P2P transfers are instant
+            "created_at": datetime.now(timezone.utc),
+            "completed_at": datetime.now(timezone.utc)
         }
-    )
 
-    # Add to recipient's wallet (create if doesn't exist)
-    recipient_wallet = await wallets_collection.find_one({"user_id": recipient["id"]})
-    if recipient_wallet:
-        recipient_balance = recipient_wallet.get("balances", {}).get(data.currency.upper(), 0)
-        await wallets_collection.update_one(
-            {"user_id": recipient["id"]},
-            {
-                "$set": {
-                    f"balances.{data.currency.upper()}": recipient_balance + data.amount,
-                    "updated_at": datetime.now(timezone.utc)
-                }
-            }
+        # Deduct from sender's wallet
+        debited = await post_balance_change(
+            db, user_id, {data.currency.upper(): -total_amount},
+            kind="transfer_out",
+            reference=transfer_id,
+            description=f"Transfer to {recipient['email']}",
+            guard={data.currency.upper(): total_amount},
+        )
+        if debited is None:
+            raise HTTPException(status_code=400, detail="Insufficient balance")
+
+        # Add to recipient's wallet (create if doesn't exist)
+        await post_balance_change(
+            db, recipient["id"], {data.currency.upper(): data.amount},
+            kind="transfer_in",
+            reference=transfer_id,
+            description=f"Transfer from {sender['email']}",
+            upsert=True,
         )
-    else:
-        # Create wallet for recipient
-        await wallets_collection.insert_one({
-            "id": str(uuid.uuid4()),
-            "user_id": recipient["id"],
-            "balances": {data.currency.upper(): data.amount},
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc)
-        })
+
+        await transfers_collection.insert_one(transfer_record)
 
     # Create transaction records for both users
     # Sender transaction
@@ -1194,7 +1010,6 @@ async def create_p2p_transfer(
         "description": f"Transfer to {recipient['name']} ({recipient['email']})",
         "created_at": datetime.now(timezone.utc)
     }
-    await transactions_collection.insert_one(sender_transaction)
 
     # Recipient transaction
     recipient_transaction = {
@@ -1208,7 +1023,7 @@ async def create_p2p_transfer(
         "description": f"Transfer from {sender['name']} ({sender['email']})",
         "created_at": datetime.now(timezone.utc)
     }
-    await transactions_collection.insert_one(recipient_transaction)
+    await insert_transactions(db, [sender_transaction, recipient_transaction])
 
     await broadcast_transaction_event(user_id, sender_transaction)
     await broadcast_transaction_event(recipient["id"], recipient_transaction)
@@ -1281,28 +1096,27 @@ async def create_p2p_transfer(
 
 @router.get("/transfers")
 async def get_transfer_history(
-    skip: int = 0,
+    skip: int = 0,  # Deprecated: use cursor
     limit: int = 50,
+    cursor: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
     db = Depends(get_db)
 ):
-    """Get user's P2P transfer history (both sent and received)."""
+    """Get user's P2P transfer history (both sent and received), newest first."""
     transfers_collection = db.get_collection("transfers")
 
     # Find transfers where user is either sender or recipient
-    transfers = await transfers_collection.find({
+    query = {
         "$or": [
             {"sender_id": user_id},
             {"recipient_id": user_id}
         ]
-    }).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    }
+    transfers, next_cursor = await fetch_page(
+        transfers_collection, query, limit=limit, cursor=cursor, skip=skip
+    )
 
-    total = await transfers_collection.count_documents({
-        "$or": [
-            {"sender_id": user_id},
-            {"recipient_id": user_id}
-        ]
-    })
+    total = None if cursor else await transfers_collection.count_documents(query)
 
     # Format transfers with direction indicator
     formatted_transfers = []
@@ -1327,5 +1141,6 @@ async def get_transfer_history(
         "transfers": formatted_transfers,
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
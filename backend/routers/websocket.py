@@ -11,50 +11,95 @@ from typing import Dict, Optional, Set
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from config import settings
 from services import price_stream_service
+from services.price_delta import DeltaPriceEncoder
+from services.realtime_encoding import (
+    FORMAT_JSON,
+    SharedFrame,
+    negotiate_format,
+    send_frame,
+    send_message,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["websocket"])
 
 
 class PriceStreamManager:
-    """Manages client WebSockets and non-blocking fan-out from central cache updates."""
+    """
+    Manages client WebSockets and non-blocking fan-out from central cache updates.
+
+    Clients connecting with ``?mode=delta`` receive a snapshot keyframe followed by
+    sequence-numbered deltas (see services.price_delta); all others get full updates.
+    Each broadcast is encoded at most once per negotiated wire format (JSON or msgpack).
+    """
 
     def __init__(self):
         self.active_connections: Set[WebSocket] = set()
+        self.delta_clients: Set[WebSocket] = set()
+        self.delta_encoder = DeltaPriceEncoder(
+            keyframe_interval_seconds=settings.ws_delta_keyframe_interval_seconds,
+            tick_size_bps=settings.ws_delta_tick_size_bps,
+        )
+        # Queues hold pre-encoded frames shared by every client of the same format.
         self.client_queues: Dict[WebSocket, asyncio.Queue] = {}
+        self.client_formats: Dict[WebSocket, str] = {}
         self.sender_tasks: Dict[WebSocket, asyncio.Task] = {}
         self.max_queue_size = 200
         self._subscriber_registered = False
+        self.frames_encoded = 0
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
+    async def connect(self, websocket: WebSocket, mode: str = "full"):
+        wire_format, subprotocol = negotiate_format(websocket)
+        await websocket.accept(subprotocol=subprotocol)
         self.active_connections.add(websocket)
+        self.client_formats[websocket] = wire_format
+        if mode == "delta":
+            self.delta_clients.add(websocket)
         self.client_queues[websocket] = asyncio.Queue(maxsize=self.max_queue_size)
         self.sender_tasks[websocket] = asyncio.create_task(self._client_sender_loop(websocket))
 
         if not self._subscriber_registered:
-            price_stream_service.subscribe(self.enqueue_price_update)
+            price_stream_service.subscribe(
+                self.enqueue_price_update,
+                conflation_ms=settings.price_stream_conflation_ms,
+            )
             self._subscriber_registered = True
 
         logger.info("📡 WebSocket connected (total: %d)", len(self.active_connections))
-        await websocket.send_json(
+        await self.send(
+            websocket,
             {
                 "type": "connection",
                 "status": "connected",
                 "message": "Connected to centralized price cache",
+                "mode": "delta" if websocket in self.delta_clients else "full",
+                "format": wire_format,
                 "timestamp": datetime.now(timezone.utc).isoformat(),
-            }
+            },
         )
+        if websocket in self.delta_clients:
+            self.send_snapshot(websocket)
+
+    async def send(self, websocket: WebSocket, message: dict):
+        """Send a direct (non-broadcast) message in the client's wire format."""
+        await send_message(websocket, message, self.client_formats.get(websocket, FORMAT_JSON))
+
+    def send_snapshot(self, websocket: WebSocket):
+        """Queue a keyframe for one delta client (on connect or resync request)."""
+        self._fan_out(SharedFrame(self.delta_encoder.snapshot()), {websocket})
 
     def disconnect(self, websocket: WebSocket):
         self.active_connections.discard(websocket)
+        self.delta_clients.discard(websocket)
 
         sender_task = self.sender_tasks.pop(websocket, None)
         if sender_task:
             sender_task.cancel()
 
         self.client_queues.pop(websocket, None)
+        self.client_formats.pop(websocket, None)
 
         if not self.active_connections and self._subscriber_registered:
             price_stream_service.unsubscribe(self.enqueue_price_update)
@@ -66,28 +111,43 @@ class PriceStreamManager:
         if not self.active_connections:
             return
 
-        message = {
-            "type": "price_update",
-            "prices": {k: str(v) for k, v in prices.items()},
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "event_timestamp_ms": int(timestamp_ms),
-            "source": price_stream_service.current_source,
-        }
+        if len(self.delta_clients) < len(self.active_connections):
+            message = {
+                "type": "price_update",
+                "prices": {k: str(v) for k, v in prices.items()},
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "event_timestamp_ms": int(timestamp_ms),
+                "source": price_stream_service.current_source,
+            }
+            self._fan_out(SharedFrame(message), self.active_connections - self.delta_clients)
+
+        if self.delta_clients:
+            delta_message = self.delta_encoder.update(prices, int(timestamp_ms))
+            if delta_message is not None:
+                self._fan_out(SharedFrame(delta_message), self.delta_clients)
+        else:
+            self.delta_encoder.observe(prices)
 
+    def _fan_out(self, shared: SharedFrame, targets: Set[WebSocket]):
         disconnected: Set[WebSocket] = set()
-        for ws, queue in list(self.client_queues.items()):
+        for ws in list(targets):
+            queue = self.client_queues.get(ws)
+            if queue is None:
+                continue
+            frame = shared.get(self.client_formats.get(ws, FORMAT_JSON))
             try:
-                queue.put_nowait(message)
+                queue.put_nowait(frame)
             except asyncio.QueueFull:
                 # Backpressure protection: drop oldest, keep latest.
                 try:
                     _ = queue.get_nowait()
-                    queue.put_nowait(message)
+                    queue.put_nowait(frame)
                 except Exception:
                     disconnected.add(ws)
             except Exception:
                 disconnected.add(ws)
 
+        self.frames_encoded += shared.encoded_count
         for ws in disconnected:
             self.disconnect(ws)
 
@@ -95,8 +155,8 @@ class PriceStreamManager:
         queue = self.client_queues[websocket]
         while websocket in self.active_connections:
             try:
-                message = await queue.get()
-                await websocket.send_json(message)
+                frame = await queue.get()
+                await send_frame(websocket, frame)
             except asyncio.CancelledError:
                 break
             except Exception as exc:
@@ -110,7 +170,7 @@ price_stream_manager = PriceStreamManager()
 
 @router.websocket("/ws/prices")
 async def websocket_price_stream(websocket: WebSocket):
-    await price_stream_manager.connect(websocket)
+    await price_stream_manager.connect(websocket, mode=websocket.query_params.get("mode", "full"))
 
     try:
         while True:
@@ -120,28 +180,34 @@ async def websocket_price_stream(websocket: WebSocket):
                 message_type = message.get("type")
 
                 if message_type == "ping":
-                    await websocket.send_json({"type": "pong", "timestamp": datetime.now(timezone.utc).isoformat()})
+                    await price_stream_manager.send(
+                        websocket, {"type": "pong", "timestamp": datetime.now(timezone.utc).isoformat()}
+                    )
                 elif message_type == "get_status":
                     status = price_stream_service.get_status()
-                    await websocket.send_json(
+                    await price_stream_manager.send(
+                        websocket,
                         {
                             "type": "status",
                             "state": status["state"],
                             "source": status["source"],
                             "prices_cached": status["prices_cached"],
                             "timestamp": datetime.now(timezone.utc).isoformat(),
-                        }
+                        },
                     )
+                elif message_type == "resync" and websocket in price_stream_manager.delta_clients:
+                    price_stream_manager.send_snapshot(websocket)
                 elif message_type == "get_price":
                     symbol = (message.get("symbol") or "").lower()
                     if symbol in price_stream_service.prices:
-                        await websocket.send_json(
+                        await price_stream_manager.send(
+                            websocket,
                             {
                                 "type": "price",
                                 "symbol": symbol,
                                 "price": str(price_stream_service.prices[symbol]),
                                 "timestamp": datetime.now(timezone.utc).isoformat(),
-                            }
+                            },
                         )
             except json.JSONDecodeError:
                 logger.debug("Invalid JSON from client")
@@ -162,16 +228,19 @@ async def websocket_single_price(websocket: WebSocket, symbol: str):
             try:
                 _ = await asyncio.wait_for(websocket.receive_text(), timeout=20)
             except asyncio.TimeoutError:
-                await websocket.send_json({"type": "keep_alive", "timestamp": datetime.now(timezone.utc).isoformat()})
+                await price_stream_manager.send(
+                    websocket, {"type": "keep_alive", "timestamp": datetime.now(timezone.utc).isoformat()}
+                )
 
             if normalized in price_stream_service.prices:
-                await websocket.send_json(
+                await price_stream_manager.send(
+                    websocket,
                     {
                         "type": "price",
                         "symbol": normalized,
                         "price": str(price_stream_service.prices[normalized]),
                         "timestamp": datetime.now(timezone.utc).isoformat(),
-                    }
+                    },
                 )
     except WebSocketDisconnect:
         price_stream_manager.disconnect(websocket)
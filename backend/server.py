@@ -505,10 +505,75 @@ async def lifespan(app: FastAPI):
         try:
             logger.info("📈 Starting price stream service...")
             await price_stream_service.start()
+            price_stream_service.subscribe(
+                socketio_manager.on_price_stream_update,
+                conflation_ms=settings.price_stream_conflation_ms,
+            )
             logger.info("✅ Price stream service started")
         except Exception as e:
             logger.warning(f"⚠️ Price stream service failed to start: {e}")
 
+        # Start write-behind audit log writer (non-critical; falls back to direct inserts)
+        if settings.audit_write_behind and db_connection.is_connected:
+            from services.audit_service import audit_writer
+            audit_writer.start(db_connection.db)
+            logger.info("✅ Audit log writer started")
+
+        # Start periodic ledger reconciliation and snapshots (non-critical)
+        if settings.ledger_compactor_enabled and db_connection.is_connected:
+            from ledger import ledger_compactor
+            ledger_compactor.start(db_connection.db)
+            logger.info("✅ Ledger compactor started")
+
+        # Start batched NOWPayments IPN processing (non-critical; webhooks apply inline without it)
+        if settings.deposit_ingest_enabled and db_connection.is_connected:
+            try:
+                from services.deposit_ingest import deposit_ingest
+                await deposit_ingest.start(db_connection.db)
+                logger.info("✅ Deposit ingest queue started")
+            except Exception as e:
+                logger.warning(f"⚠️ Deposit ingest queue failed to start: {e}")
+
+        # Listen for auth cache invalidations from other workers (needs REDIS_URL)
+        try:
+            from auth_cache import auth_cache
+            await auth_cache.start()
+        except Exception as e:
+            logger.warning(f"⚠️ Auth cache invalidation listener failed to start: {e}")
+
+        # Bloom filter in front of the token blacklist (checks go to the store until it syncs)
+        if settings.revocation_filter_enabled and db_connection.is_connected:
+            try:
+                from revocation_filter import revocation_filter
+                await revocation_filter.start()
+                logger.info("✅ Token revocation filter started")
+            except Exception as e:
+                logger.warning(f"⚠️ Token revocation filter failed to start: {e}")
+
+        # Start admin dashboard rollups (non-critical; endpoints read whatever buckets exist)
+        if settings.dashboard_rollups_enabled and db_connection.is_connected:
+            from dashboard_rollups import dashboard_rollup_job
+            dashboard_rollup_job.start(db_connection.db)
+            logger.info("✅ Dashboard rollup job started")
+
+        # Start trigger engine for resting limit/stop orders (non-critical)
+        if settings.order_trigger_engine_enabled and db_connection.is_connected:
+            try:
+                from services.order_trigger_engine import order_trigger_engine
+                await order_trigger_engine.start(db_connection.db)
+                logger.info("✅ Order trigger engine started")
+            except Exception as e:
+                logger.warning(f"⚠️ Order trigger engine failed to start: {e}")
+
+        # Start price alert engine (non-critical)
+        if settings.alert_engine_enabled and db_connection.is_connected:
+            try:
+                from services.alert_engine import alert_engine
+                await alert_engine.start(db_connection.db)
+                logger.info("✅ Price alert engine started")
+            except Exception as e:
+                logger.warning(f"⚠️ Price alert engine failed to start: {e}")
+
         # Initialize Telegram bot notifications (non-critical)
         try:
             telegram_status = await telegram_bot.get_health_status()
@@ -559,8 +624,34 @@ async def lifespan(app: FastAPI):
     logger.info("="*70)
 
     await telegram_bot.stop_command_polling()
+    from services.order_trigger_engine import order_trigger_engine
+    from services.alert_engine import alert_engine
+    await order_trigger_engine.stop()
+    await alert_engine.stop()
     await price_stream_service.stop()
 
+    from services.deposit_ingest import deposit_ingest
+    await deposit_ingest.stop()
+
+    from dashboard_rollups import dashboard_rollup_job
+    await dashboard_rollup_job.stop()
+
+    from revocation_filter import revocation_filter
+    await revocation_filter.stop()
+
+    from auth_cache import auth_cache
+    await auth_cache.stop()
+
+    from password_hashing import password_hasher
+    password_hasher.shutdown()
+
+    from ledger import ledger_compactor
+    await ledger_compactor.stop()
+
+    # Flush queued audit entries while the database is still connected
+    from services.audit_service import audit_writer
+    await audit_writer.stop()
+
     if db_connection:
         await db_connection.disconnect()
 
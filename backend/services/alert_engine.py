@@ -0,0 +1,283 @@
+"""
+In-memory price alert engine.
+
+Active alerts are kept per price stream symbol in two lists sorted by target price:
+``above`` alerts fire for every target <= price (a prefix of the list) and ``below`` alerts
+for every target >= price (a suffix), so each tick costs one bisect per list plus the
+alerts it actually triggers.
+
+Triggered alerts are marked in MongoDB with a single unordered ``bulk_write`` per batch.
+Each update is guarded on the alert still being active with the same target/condition, so
+stale in-memory entries (alerts edited or deleted through another worker) never fire, and
+stamped with this engine's token so that only the worker whose write landed sends the
+user notification.
+"""
+
+import asyncio
+import bisect
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from services.price_stream import price_stream_service
+
+logger = logging.getLogger(__name__)
+
+ABOVE = "above"
+BELOW = "below"
+
+# Sorts after any alert id, so bisecting on (price, _MAX_ID) includes every alert at ``price``
+_MAX_ID = "\U0010ffff"
+# Seconds between passes that pick up alerts created/edited through other workers
+RECONCILE_INTERVAL = 30.0
+
+
+def stream_symbol(alert_symbol: str) -> str:
+    """Map an alert symbol ("BTC") to the price stream symbol ("btcusd")."""
+    return f"{(alert_symbol or '').lower()}usd"
+
+
+class AlertEngine:
+    """Evaluates active price alerts against the live price stream."""
+
+    def __init__(self):
+        self._db = None
+        # stream symbol -> condition -> sorted [(target_price, alert_id)]
+        self._books: Dict[str, Dict[str, List[Tuple[float, str]]]] = {}
+        self._alerts: Dict[str, Dict[str, Any]] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_event = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._last_reconcile: Optional[datetime] = None
+        self.token = uuid.uuid4().hex
+        self.is_running = False
+
+        self.alerts_loaded = 0
+        self.alerts_triggered = 0
+        self.bulk_writes = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self, db) -> None:
+        if self.is_running:
+            return
+        self._db = db
+        self.is_running = True
+        await self.load()
+        price_stream_service.subscribe(self.on_prices)
+        self._tasks = [
+            asyncio.create_task(self._run_writer()),
+            asyncio.create_task(self._reconcile_loop()),
+        ]
+        logger.info("Alert engine started (%d active alerts)", len(self._alerts))
+
+    async def stop(self) -> None:
+        self.is_running = False
+        price_stream_service.unsubscribe(self.on_prices)
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as exc:
+                logger.debug("Alert engine task stop error: %s", exc)
+        self._tasks = []
+        if self._pending:
+            await self.flush()
+
+    async def load(self, since: Optional[datetime] = None) -> int:
+        """Index active alerts (all, or those created/updated since ``since``)."""
+        query: Dict[str, Any] = {"is_active": True, "triggered_at": None}
+        if since is not None:
+            query = {"updated_at": {"$gte": since}}
+        started = datetime.now(timezone.utc)
+
+        loaded = 0
+        cursor = self._db.get_collection("price_alerts").find(query, {"_id": 0})
+        async for doc in cursor:
+            self.upsert_alert(doc)
+            loaded += 1
+        self._last_reconcile = started
+        self.alerts_loaded += loaded
+        return loaded
+
+    # ------------------------------------------------------------------
+    # Index maintenance (kept in step with routers/alerts.py)
+    # ------------------------------------------------------------------
+
+    def upsert_alert(self, doc: Dict[str, Any]) -> None:
+        """Index an alert document, replacing any previous version; inactive alerts are dropped."""
+        alert_id = doc.get("id")
+        if not self.is_running or not alert_id:
+            return
+        self.remove_alert(alert_id)
+        condition = doc.get("condition")
+        if not doc.get("is_active", True) or doc.get("triggered_at") or condition not in (ABOVE, BELOW):
+            return
+
+        symbol = stream_symbol(doc.get("symbol"))
+        target = float(doc["target_price"])
+        bisect.insort(self._books.setdefault(symbol, {ABOVE: [], BELOW: []})[condition], (target, alert_id))
+        self._alerts[alert_id] = {
+            "id": alert_id,
+            "user_id": doc.get("user_id"),
+            "symbol": doc.get("symbol"),
+            "stream_symbol": symbol,
+            "condition": condition,
+            "target_price": target,
+            "notify_push": doc.get("notify_push", True),
+            "notify_email": doc.get("notify_email", True),
+        }
+
+    def remove_alert(self, alert_id: str) -> bool:
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return False
+        entries = self._books[alert["stream_symbol"]][alert["condition"]]
+        entry = (alert["target_price"], alert_id)
+        index = bisect.bisect_left(entries, entry)
+        if index < len(entries) and entries[index] == entry:
+            del entries[index]
+        return True
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    async def on_prices(self, updates: Dict[str, float], timestamp_ms: int) -> None:
+        """Price stream subscriber."""
+        for symbol, price in updates.items():
+            if symbol in self._books:
+                self.evaluate(symbol, price)
+
+    def evaluate(self, symbol: str, price: float) -> List[Dict[str, Any]]:
+        """Pop every alert on ``symbol`` crossed by ``price`` and queue it for the batch write."""
+        book = self._books.get(symbol)
+        if book is None:
+            return []
+
+        above = book[ABOVE]
+        cut = bisect.bisect_right(above, (price, _MAX_ID))
+        crossed = above[:cut]
+        del above[:cut]
+
+        below = book[BELOW]
+        cut = bisect.bisect_left(below, (price, ""))
+        crossed += below[cut:]
+        del below[cut:]
+
+        triggered = []
+        for _, alert_id in crossed:
+            alert = self._alerts.pop(alert_id, None)
+            if alert is None:
+                continue
+            alert = dict(alert, current_price=price)
+            triggered.append(alert)
+        if triggered:
+            self._pending.extend(triggered)
+            self._flush_event.set()
+        return triggered
+
+    async def flush(self) -> List[Dict[str, Any]]:
+        """
+        Mark queued alerts triggered in one bulk_write and notify their owners.
+        Returns the alerts this engine's write actually triggered.
+        """
+        batch, self._pending = self._pending, []
+        if not batch:
+            return []
+
+        alerts_collection = self._db.get_collection("price_alerts")
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne(
+                {
+                    "id": alert["id"],
+                    "is_active": True,
+                    "triggered_at": None,
+                    "target_price": alert["target_price"],
+                    "condition": alert["condition"],
+                },
+                {"$set": {
+                    "triggered_at": now,
+                    "is_active": False,
+                    "triggered_price": alert["current_price"],
+                    "triggered_by": self.token,
+                }},
+            )
+            for alert in batch
+        ]
+        try:
+            result = await alerts_collection.bulk_write(operations, ordered=False)
+        except Exception:
+            # Put the alerts back so they fire again on the next crossing tick
+            for alert in batch:
+                self.upsert_alert({**alert, "is_active": True})
+            raise
+        self.bulk_writes += 1
+        if not result.modified_count:
+            return []
+
+        # Only alerts whose write landed here (not stale or claimed by another worker)
+        mine = set()
+        cursor = alerts_collection.find(
+            {"id": {"$in": [alert["id"] for alert in batch]}, "triggered_by": self.token},
+            {"_id": 0, "id": 1},
+        )
+        async for doc in cursor:
+            mine.add(doc["id"])
+        triggered = [alert for alert in batch if alert["id"] in mine]
+        self.alerts_triggered += len(triggered)
+
+        from routers.notifications import notify_price_alert
+
+        for alert in triggered:
+            logger.info(
+                f"🔔 Alert triggered: {alert['symbol']} {alert['condition']} "
+                f"${alert['target_price']} (now: ${alert['current_price']})"
+            )
+            try:
+                await notify_price_alert(
+                    self._db, alert["user_id"], alert["symbol"], alert["target_price"], alert["current_price"]
+                )
+            except Exception as exc:
+                logger.warning("Price alert notification failed for %s: %s", alert["id"], exc)
+        return triggered
+
+    async def _run_writer(self) -> None:
+        while True:
+            await self._flush_event.wait()
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.error("Alert trigger batch write failed: %s", exc)
+
+    async def _reconcile_loop(self) -> None:
+        while self.is_running:
+            await asyncio.sleep(RECONCILE_INTERVAL)
+            try:
+                await self.load(since=self._last_reconcile)
+            except Exception as exc:
+                logger.warning("Alert reconciliation failed: %s", exc)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "active_alerts": len(self._alerts),
+            "symbols": len(self._books),
+            "pending_writes": len(self._pending),
+            "alerts_loaded": self.alerts_loaded,
+            "alerts_triggered": self.alerts_triggered,
+            "bulk_writes": self.bulk_writes,
+        }
+
+
+alert_engine = AlertEngine()
@@ -8,15 +8,32 @@ Provides structured audit logging for all financial actions:
 - Configuration changes
 
 Every log entry includes request_id, user_id, IP, timestamp, and action details.
+
+Entries are persisted write-behind: ``audit_writer`` queues them in-process (bounded) and a
+background task writes them to ``audit_logs`` with one ``insert_many`` per batch, so request
+latency never includes an audit write. Whatever is queued is flushed on shutdown; batches
+that cannot reach MongoDB are spilled to a JSON-lines file and replayed once it recovers.
 """
 
+import asyncio
 import logging
+import os
+import time
 import uuid
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Any, Dict, List, Optional
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from config import settings
 
 logger = logging.getLogger(__name__)
 
+DUPLICATE_KEY_ERROR = 11000
+# Seconds between attempts to replay spilled audit entries
+SPILL_REPLAY_INTERVAL = 30.0
+
 
 class AuditAction:
     """Constants for audit action types."""
@@ -118,15 +135,93 @@ async def log_audit_event(
         },
     )
 
-    # Persist to MongoDB
+    # Persist to MongoDB (write-behind)
+    await submit_audit_entry(db, audit_entry)
+
+
+def build_audit_entry(
+    user_id: str,
+    action: str,
+    resource: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    details: Optional[dict] = None,
+) -> Dict[str, Any]:
+    """Build a router-level audit document (``AuditLog`` shape) without persisting it."""
+    from models import AuditLog
+
+    audit_log = AuditLog(
+        user_id=user_id,
+        action=action,
+        resource=resource,
+        ip_address=ip_address,
+        details=details
+    )
+    return audit_log.dict()
+
+
+def log_audit_line(
+    user_id: str,
+    action: str,
+    resource: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    request_id: Optional[str] = None,
+) -> None:
+    logger.info(
+        f"Audit log: {action}",
+        extra={
+            "type": "audit_log",
+            "user_id": user_id,
+            "action": action,
+            "resource": resource,
+            "ip_address": ip_address,
+            "request_id": request_id
+        }
+    )
+
+
+async def log_audit(
+    db,
+    user_id: str,
+    action: str,
+    resource: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    details: Optional[dict] = None,
+    request_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Log a router-level audit event through the write-behind pipeline and return the entry."""
+    log_audit_line(user_id, action, resource, ip_address, request_id)
+    entry = build_audit_entry(user_id, action, resource, ip_address, details)
+    await submit_audit_entry(db, entry)
+    return entry
+
+
+async def submit_audit_entry(db, entry: Dict[str, Any]) -> None:
+    """Queue ``entry`` on the write-behind writer, or insert it directly if the writer is not running."""
+    if audit_writer.is_running:
+        audit_writer.enqueue(entry)
+        return
     try:
-        if db:
-            collection = db.get_collection("audit_logs")
-            await collection.insert_one(audit_entry)
+        if db is not None:
+            await db.get_collection("audit_logs").insert_one(entry)
     except Exception as exc:
         logger.error("Failed to persist audit log: %s", exc)
 
 
+async def update_audit_details(db, entry: Dict[str, Any], details: Dict[str, Any]) -> None:
+    """Merge ``details`` into an entry submitted earlier, whether it is still queued or already stored."""
+    if audit_writer.is_running and await audit_writer.amend(entry, details):
+        return
+    entry["details"] = {**(entry.get("details") or {}), **details}
+    try:
+        if db is not None:
+            await db.get_collection("audit_logs").update_one(
+                {"id": entry["id"]},
+                {"$set": {"details": entry["details"]}},
+            )
+    except Exception as exc:
+        logger.error("Failed to update audit log: %s", exc)
+
+
 def _severity_to_level(severity: str) -> int:
     mapping = {
         "debug": logging.DEBUG,
@@ -136,3 +231,196 @@ def _severity_to_level(severity: str) -> int:
         "critical": logging.CRITICAL,
     }
     return mapping.get(severity, logging.INFO)
+
+
+class AuditWriter:
+    """Bounded in-process queue that batches audit entries into ``insert_many``."""
+
+    def __init__(
+        self,
+        max_queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval_ms: int = 250,
+        spill_path: Optional[str] = None,
+    ):
+        self.max_queue_size = max_queue_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(10, flush_interval_ms) / 1000
+        self.spill_path = spill_path or None
+        self._db = None
+        self._queue: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._last_replay = 0.0
+        self.is_running = False
+
+        self.entries_enqueued = 0
+        self.entries_written = 0
+        self.entries_spilled = 0
+        self.entries_replayed = 0
+        self.entries_dropped = 0
+        self.batches_written = 0
+
+    def start(self, db) -> None:
+        if self.is_running:
+            return
+        self._db = db
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            "Audit writer started (batch=%d, interval=%.0fms, spill=%s)",
+            self.batch_size, self.flush_interval * 1000, self.spill_path or "disabled",
+        )
+
+    async def stop(self) -> None:
+        """Stop the background task and flush everything still queued."""
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue:
+            await self.flush()
+
+    def enqueue(self, entry: Dict[str, Any]) -> None:
+        """Queue an entry without blocking. When the queue is full it spills to disk (or drops)."""
+        self.entries_enqueued += 1
+        if len(self._queue) >= self.max_queue_size:
+            if not self._spill([entry]):
+                self.entries_dropped += 1
+                logger.warning("Audit queue full; dropped %s", entry.get("action"))
+            return
+        self._queue.append(entry)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    async def amend(self, entry: Dict[str, Any], details: Dict[str, Any]) -> bool:
+        """
+        Merge ``details`` into ``entry`` if it is still queued, so it is written amended.
+
+        Runs under the flush lock so the entry is never edited while a batch is being inserted.
+        Returns False if the entry has already left the queue.
+        """
+        async with self._flush_lock:
+            if not any(queued is entry for queued in self._queue):
+                return False
+            entry["details"] = {**(entry.get("details") or {}), **details}
+            return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._queue:
+                written = await self.flush()
+                if not written:
+                    break
+            now = time.monotonic()
+            if (
+                self.spill_path
+                and not self._queue
+                and now - self._last_replay >= SPILL_REPLAY_INTERVAL
+                and os.path.exists(self.spill_path)
+            ):
+                self._last_replay = now
+                await self.replay_spill()
+
+    async def flush(self) -> int:
+        """Write up to ``batch_size`` queued entries. Returns the number persisted."""
+        async with self._flush_lock:
+            batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+            if not batch:
+                return 0
+            return await self._insert(batch)
+
+    async def _insert(self, batch: List[Dict[str, Any]]) -> int:
+        try:
+            await self._db.get_collection("audit_logs").insert_many(batch, ordered=False)
+        except BulkWriteError as exc:
+            # Unordered: everything not listed failed-to-insert landed. Duplicates are already stored.
+            failed = [
+                batch[error["index"]] for error in exc.details.get("writeErrors", [])
+                if error.get("code") != DUPLICATE_KEY_ERROR
+            ]
+            if failed:
+                self._spill_or_drop(failed, exc)
+            written = len(batch) - len(exc.details.get("writeErrors", []))
+            self._record_written(written)
+            return written
+        except Exception as exc:
+            self._spill_or_drop(batch, exc)
+            return 0
+        self._record_written(len(batch))
+        return len(batch)
+
+    def _record_written(self, count: int) -> None:
+        self.entries_written += count
+        self.batches_written += 1
+
+    def _spill_or_drop(self, entries: List[Dict[str, Any]], exc: Exception) -> None:
+        if self._spill(entries):
+            logger.warning("Audit batch spilled to %s (%d entries): %s", self.spill_path, len(entries), exc)
+        else:
+            self.entries_dropped += len(entries)
+            logger.error("Failed to persist %d audit entries: %s", len(entries), exc)
+
+    def _spill(self, entries: List[Dict[str, Any]]) -> bool:
+        if not self.spill_path:
+            return False
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as spill:
+                for entry in entries:
+                    spill.write(json_util.dumps(entry) + "\n")
+        except OSError as exc:
+            logger.error("Audit spill to %s failed: %s", self.spill_path, exc)
+            return False
+        self.entries_spilled += len(entries)
+        return True
+
+    async def replay_spill(self) -> int:
+        """Re-insert spilled entries once MongoDB is reachable again."""
+        replay_path = f"{self.spill_path}.{int(time.time() * 1000)}.replay"
+        try:
+            os.replace(self.spill_path, replay_path)
+            with open(replay_path, encoding="utf-8") as spill:
+                entries = [json_util.loads(line) for line in spill if line.strip()]
+            os.remove(replay_path)
+        except (OSError, ValueError) as exc:
+            logger.error("Could not read audit spill %s: %s", self.spill_path, exc)
+            return 0
+
+        replayed = 0
+        for start in range(0, len(entries), self.batch_size):
+            # Batches that fail again are re-spilled by _insert
+            replayed += await self._insert(entries[start:start + self.batch_size])
+        self.entries_replayed += replayed
+        if replayed:
+            logger.info("Replayed %d spilled audit entries", replayed)
+        return replayed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "queued": len(self._queue),
+            "entries_enqueued": self.entries_enqueued,
+            "entries_written": self.entries_written,
+            "batches_written": self.batches_written,
+            "entries_spilled": self.entries_spilled,
+            "entries_replayed": self.entries_replayed,
+            "entries_dropped": self.entries_dropped,
+        }
+
+
+audit_writer = AuditWriter(
+    max_queue_size=settings.audit_queue_max_size,
+    batch_size=settings.audit_batch_size,
+    flush_interval_ms=settings.audit_flush_interval_ms,
+    spill_path=settings.audit_spill_path,
+)
@@ -0,0 +1,474 @@
+"""
+Batched NOWPayments IPN processing.
+
+Verified IPNs are handed to ``deposit_ingest``, which collects them for a short window and
+applies them together:
+
+- IPNs for the same ``payment_id`` waiting in the queue are collapsed into one (the most
+  advanced status wins); provider retries of an IPN that was just applied are answered from
+  a small in-memory memo without touching MongoDB.
+- One ``find`` loads every deposit in the batch and one ``bulk_write`` applies all status
+  transitions. A transition into a success status also claims the credit (``credited_at``
+  plus the batch's ``credit_batch`` token) in the same conditional update, so a deposit is
+  credited once even when ``confirmed`` and ``finished`` both arrive or several workers race.
+- Claimed deposits are credited through the ledger, their transaction records written with
+  one ``insert_many``, and the Telegram notifications dispatched in a background task.
+
+The webhook still waits for its batch to be applied before answering (group commit), so a
+failure returns 500 and NOWPayments retries; nothing is acknowledged that was not persisted.
+A credit claimed but not posted (crash between the two writes) is finished by ``recover``
+once the claim is older than ``recovery_stale_seconds``: each stranded claim is taken over
+with a conditional update before it is posted, and the ledger entry's ``reference`` is
+checked so a posted credit is never posted twice.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from config import settings
+from ledger import LEDGER_COLLECTION, post_balance_change
+from nowpayments_service import PaymentStatus
+from services.audit_service import log_audit
+from services.transactions_utils import broadcast_transaction_event
+from transaction_stats import record_transaction_stats
+from wallet_lanes import wallet_lanes
+
+logger = logging.getLogger(__name__)
+
+# Later statuses supersede earlier ones when IPNs for one payment are collapsed
+STATUS_RANK = {
+    PaymentStatus.WAITING: 0,
+    PaymentStatus.CONFIRMING: 1,
+    PaymentStatus.PARTIALLY_PAID: 2,
+    PaymentStatus.SENDING: 3,
+    PaymentStatus.CONFIRMED: 4,
+    PaymentStatus.FINISHED: 5,
+}
+TERMINAL_RANK = 6
+APPLIED_MEMO_SIZE = 10000
+
+
+def _rank(status: str) -> int:
+    return STATUS_RANK.get(status, TERMINAL_RANK if status in PaymentStatus.FAILED_STATUSES else -1)
+
+
+class _PendingIpn:
+    __slots__ = ("payload", "future", "duplicates")
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload = payload
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.duplicates = 0
+
+
+class DepositIngestQueue:
+    """Collects verified IPNs and applies them in batches."""
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        flush_interval_ms: int = 50,
+        wait_timeout_seconds: float = 10.0,
+        recovery_stale_seconds: float = 300.0,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(5, flush_interval_ms) / 1000
+        self.wait_timeout = wait_timeout_seconds
+        self.recovery_stale_seconds = recovery_stale_seconds
+        self._db = None
+        self._pending: "OrderedDict[str, _PendingIpn]" = OrderedDict()
+        self._applied: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._notify_tasks: set = set()
+        self._needs_recovery = False
+        self._next_recovery = 0.0
+        self.is_running = False
+
+        self.ipns_received = 0
+        self.ipns_collapsed = 0
+        self.ipns_memo_hits = 0
+        self.batches_applied = 0
+        self.deposits_credited = 0
+
+    async def start(self, db) -> None:
+        if self.is_running:
+            return
+        self._db = db
+        await self.recover(db)
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            "Deposit ingest started (batch=%d, window=%.0fms)", self.batch_size, self.flush_interval * 1000
+        )
+
+    async def stop(self) -> None:
+        """Stop collecting and apply whatever is still queued."""
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._pending:
+            await self._flush()
+        if self._notify_tasks:
+            await asyncio.gather(*self._notify_tasks, return_exceptions=True)
+
+    async def submit(self, db, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Apply one verified IPN and return its outcome once it is persisted.
+
+        When the queue is not running (tests, scripts, startup failures) the IPN is applied
+        directly as a batch of one.
+        """
+        self.ipns_received += 1
+        payment_id = str(payload["payment_id"])
+        memo = self._applied.get((payment_id, payload["payment_status"]))
+        if memo is not None:
+            self.ipns_memo_hits += 1
+            return {**memo, "status": "already_processed"}
+
+        if not self.is_running:
+            results = await self.apply_batch(db, [payload])
+            return results[payment_id]
+
+        pending = self._pending.get(payment_id)
+        if pending is None:
+            pending = self._pending[payment_id] = _PendingIpn(payload)
+        else:
+            self.ipns_collapsed += 1
+            pending.duplicates += 1
+            if _rank(payload["payment_status"]) >= _rank(pending.payload["payment_status"]):
+                pending.payload = payload
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return await asyncio.wait_for(asyncio.shield(pending.future), timeout=self.wait_timeout)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending:
+                await self._flush()
+            # Claims only become recoverable once stale, so also sweep periodically
+            if self._needs_recovery or time.monotonic() >= self._next_recovery:
+                self._needs_recovery = False
+                self._next_recovery = time.monotonic() + self.recovery_stale_seconds
+                try:
+                    await self.recover(self._db)
+                except Exception as exc:
+                    self._needs_recovery = True
+                    logger.warning("Deposit credit recovery failed: %s", exc)
+
+    async def _flush(self) -> None:
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popitem(last=False)[1])
+        if not batch:
+            return
+        try:
+            results = await self.apply_batch(self._db, [item.payload for item in batch])
+        except Exception as exc:
+            logger.error("Deposit IPN batch failed (%d IPNs): %s", len(batch), exc, exc_info=True)
+            # Credits may have been claimed before the failure; finish them on the next pass
+            self._needs_recovery = True
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+                    # Nobody may be waiting any more (timed out); don't warn about it
+                    item.future.exception()
+            return
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(results[str(item.payload["payment_id"])])
+
+    async def apply_batch(self, db, payloads: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Apply a batch of IPNs (at most one per payment). Returns outcomes keyed by payment id."""
+        now = datetime.now(timezone.utc)
+        batch_id = str(uuid.uuid4())
+        deposits_collection = db.get_collection("deposits")
+
+        # Several payments can report on one order; apply only its most advanced IPN so the
+        # order gets a single update (and at most one credit claim) per batch
+        by_order: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        superseded: Dict[str, str] = {}
+        for payload in payloads:
+            order_id = payload["order_id"]
+            current = by_order.get(order_id)
+            if current is not None and _rank(payload["payment_status"]) < _rank(current["payment_status"]):
+                superseded[str(payload["payment_id"])] = order_id
+                continue
+            if current is not None:
+                superseded[str(current["payment_id"])] = order_id
+            by_order[order_id] = payload
+        payloads = list(by_order.values())
+        order_ids = list(by_order)
+        deposits = {
+            d["order_id"]: d
+            for d in await deposits_collection.find(
+                {"order_id": {"$in": order_ids}},
+                {"_id": 0, "order_id": 1, "user_id": 1, "amount": 1, "pay_currency": 1,
+                 "status": 1, "webhook_processed": 1, "credited_at": 1},
+            ).to_list(len(order_ids))
+        }
+
+        results: Dict[str, Dict[str, Any]] = {}
+        operations = []
+        applied = []
+        credit_orders = []
+        for payload in payloads:
+            payment_id = str(payload["payment_id"])
+            order_id = payload["order_id"]
+            status = payload["payment_status"]
+            deposit = deposits.get(order_id)
+            if deposit is None:
+                logger.warning(f"⚠️ Deposit not found for order: {order_id}")
+                results[payment_id] = {"status": "ignored", "reason": "Order not found", "order_id": order_id}
+                continue
+            if deposit.get("status") == status and deposit.get("webhook_processed"):
+                logger.info(f"ℹ️ Webhook already processed for order: {order_id}")
+                results[payment_id] = {"status": "already_processed", "order_id": order_id}
+                continue
+
+            update = {
+                "status": status,
+                "actually_paid": payload.get("actually_paid", 0),
+                "webhook_processed": True,
+                "webhook_received_at": now,
+                "updated_at": now,
+            }
+            query: Dict[str, Any] = {"order_id": order_id}
+            if (
+                status in PaymentStatus.SUCCESS_STATUSES
+                and not deposit.get("credited_at")
+                and deposit.get("status") not in PaymentStatus.SUCCESS_STATUSES
+            ):
+                # Claim the credit in the same write; only one claimant can match
+                query.update({
+                    "credited_at": {"$exists": False},
+                    "status": {"$nin": PaymentStatus.SUCCESS_STATUSES},
+                })
+                update.update({"credited_at": now, "credit_batch": batch_id})
+                credit_orders.append(order_id)
+            operations.append(UpdateOne(query, {"$set": update}))
+            applied.append((payload, deposit))
+            results[payment_id] = {"status": "success", "order_id": order_id, "payment_status": status}
+
+        if operations:
+            await deposits_collection.bulk_write(operations, ordered=False)
+
+        credited = []
+        if credit_orders:
+            claimed = {
+                d["order_id"]
+                for d in await deposits_collection.find(
+                    {"order_id": {"$in": credit_orders}, "credit_batch": batch_id}, {"_id": 0, "order_id": 1}
+                ).to_list(len(credit_orders))
+            }
+            credited = [deposits[order_id] for order_id in credit_orders if order_id in claimed]
+        balances = await self._credit(db, credited, payloads=by_order)
+
+        for payment_id, order_id in superseded.items():
+            results[payment_id] = results[str(by_order[order_id]["payment_id"])]
+
+        for payload, deposit in applied:
+            self._remember(str(payload["payment_id"]), payload["payment_status"],
+                           results[str(payload["payment_id"])])
+        self.batches_applied += 1
+        self._dispatch_notifications(db, applied, balances)
+        return results
+
+    async def _credit(self, db, deposits: List[Dict[str, Any]], payloads: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+        """
+        Post claimed deposits to the ledger and record their transactions. Returns new USD balances.
+
+        Balances are posted one deposit at a time, and the transaction records are written in one
+        batch afterwards. If a post fails partway, the records for the deposits already posted are
+        still written before the error propagates. Their claims are already released, so recovery
+        would never write those records.
+        """
+        if not deposits:
+            return {}
+        now = datetime.now(timezone.utc)
+        balances: Dict[str, float] = {}
+        posted: List[Dict[str, Any]] = []
+        transactions = []
+        try:
+            for deposit in deposits:
+                order_id = deposit["order_id"]
+                user_id = deposit["user_id"]
+                description = f"Deposit via {deposit['pay_currency']}"
+                async with wallet_lanes.lane(user_id):
+                    wallet = await post_balance_change(
+                        db, user_id, {"USD": deposit["amount"]},
+                        kind="deposit", reference=order_id, description=description, upsert=True,
+                    )
+                posted.append(deposit)
+                transactions.append({
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "type": "deposit",
+                    "amount": deposit["amount"],
+                    "currency": "USD",
+                    "status": "completed",
+                    "reference": order_id,
+                    "description": description,
+                    "created_at": now,
+                })
+                balances[order_id] = (wallet or {}).get("balances", {}).get("USD", deposit["amount"])
+                logger.info(f"✅ Deposit completed: {order_id} - ${deposit['amount']} credited to user {user_id}")
+                # Release the claim as soon as the balance moved: recovery must never post it
+                # again, even if the ledger append was lost or a later deposit in the batch fails
+                await db.get_collection("deposits").update_one(
+                    {"order_id": order_id}, {"$unset": {"credit_batch": ""}}
+                )
+        finally:
+            if posted:
+                await self._record_credits(db, posted, transactions, payloads)
+        return balances
+
+    async def _record_credits(
+        self,
+        db,
+        deposits: List[Dict[str, Any]],
+        transactions: List[Dict[str, Any]],
+        payloads: Dict[str, Dict[str, Any]],
+    ) -> None:
+        await db.get_collection("transactions").insert_many(transactions, ordered=False)
+        await record_transaction_stats(db, transactions)
+        self.deposits_credited += len(deposits)
+
+        for deposit, transaction in zip(deposits, transactions):
+            payload = payloads.get(deposit["order_id"], {})
+            await broadcast_transaction_event(deposit["user_id"], transaction)
+            await log_audit(
+                db, deposit["user_id"], "DEPOSIT_COMPLETED",
+                resource=deposit["order_id"],
+                details={
+                    "amount": deposit["amount"],
+                    "payment_status": payload.get("payment_status"),
+                    "payment_id": payload.get("payment_id"),
+                    "actually_paid": payload.get("actually_paid", 0),
+                },
+            )
+
+    async def recover(self, db) -> int:
+        """
+        Finish credits that were claimed but never posted (the process died in between).
+
+        Only claims older than ``recovery_stale_seconds`` are touched, so a worker still between
+        its claim and its ledger post is left alone; each one is then taken over atomically by
+        swapping its ``credit_batch`` token, so concurrent recoveries cannot both post it.
+        """
+        deposits_collection = db.get_collection("deposits")
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.recovery_stale_seconds)
+        stranded = await deposits_collection.find(
+            {"credit_batch": {"$exists": True}, "credited_at": {"$lt": cutoff}},
+            {"_id": 0, "order_id": 1, "user_id": 1, "amount": 1, "pay_currency": 1, "credit_batch": 1},
+        ).to_list(None)
+        recovery_id = str(uuid.uuid4())
+        unposted = []
+        for deposit in stranded:
+            claim = {"order_id": deposit["order_id"], "credit_batch": deposit.pop("credit_batch")}
+            posted = await db.get_collection(LEDGER_COLLECTION).find_one(
+                {"reference": deposit["order_id"], "kind": "deposit"}, {"_id": 1}
+            )
+            if posted:
+                await deposits_collection.update_one(claim, {"$unset": {"credit_batch": ""}})
+                continue
+            taken = await deposits_collection.update_one(claim, {"$set": {"credit_batch": recovery_id}})
+            if taken.modified_count == 1:
+                unposted.append(deposit)
+        if unposted:
+            logger.warning("Recovering %d claimed but uncredited deposits", len(unposted))
+            await self._credit(db, unposted, payloads={})
+        return len(unposted)
+
+    def _remember(self, payment_id: str, status: str, result: Dict[str, Any]) -> None:
+        self._applied[(payment_id, status)] = result
+        self._applied.move_to_end((payment_id, status))
+        while len(self._applied) > APPLIED_MEMO_SIZE:
+            self._applied.popitem(last=False)
+
+    def _dispatch_notifications(self, db, applied: list, balances: Dict[str, float]) -> None:
+        if not applied:
+            return
+        task = asyncio.create_task(self._notify(db, applied, balances))
+        self._notify_tasks.add(task)
+        task.add_done_callback(self._notify_tasks.discard)
+
+    async def _notify(self, db, applied: list, balances: Dict[str, float]) -> None:
+        """Admin Telegram notifications for an applied batch, with one user lookup for all of it."""
+        try:
+            from services.telegram_bot import telegram_bot
+
+            user_ids = list({deposit["user_id"] for _, deposit in applied})
+            emails = {
+                u["id"]: u.get("email", "Unknown")
+                for u in await db.get_collection("users").find(
+                    {"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "email": 1}
+                ).to_list(len(user_ids))
+            }
+            for payload, deposit in applied:
+                order_id = deposit["order_id"]
+                status = payload["payment_status"]
+                payment_id = payload["payment_id"]
+                user_email = emails.get(deposit["user_id"], "Unknown")
+                await telegram_bot.notify_webhook_received(
+                    order_id=order_id, payment_status=status, payment_id=payment_id
+                )
+                if order_id in balances:
+                    await telegram_bot.notify_deposit_completed(
+                        user_id=deposit["user_id"],
+                        user_email=user_email,
+                        amount=deposit["amount"],
+                        currency=deposit["pay_currency"],
+                        order_id=order_id,
+                        payment_id=payment_id,
+                        new_balance=balances[order_id],
+                    )
+                elif status in PaymentStatus.FAILED_STATUSES:
+                    logger.warning(f"⚠️ Payment failed/expired: {order_id} - Status: {status}")
+                    await telegram_bot.notify_deposit_failed(
+                        user_id=deposit["user_id"],
+                        user_email=user_email,
+                        amount=deposit["amount"],
+                        currency=deposit["pay_currency"],
+                        order_id=order_id,
+                        payment_id=payment_id,
+                        reason=f"Payment status: {status}",
+                    )
+        except Exception as exc:
+            logger.warning(f"Failed to send deposit Telegram notifications: {exc}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "queued": len(self._pending),
+            "ipns_received": self.ipns_received,
+            "ipns_collapsed": self.ipns_collapsed,
+            "ipns_memo_hits": self.ipns_memo_hits,
+            "batches_applied": self.batches_applied,
+            "deposits_credited": self.deposits_credited,
+        }
+
+
+deposit_ingest = DepositIngestQueue(
+    batch_size=settings.deposit_ingest_batch_size,
+    flush_interval_ms=settings.deposit_ingest_flush_interval_ms,
+    wait_timeout_seconds=settings.deposit_ingest_wait_timeout_seconds,
+    recovery_stale_seconds=settings.deposit_ingest_recovery_stale_seconds,
+)
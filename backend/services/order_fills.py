@@ -0,0 +1,181 @@
+"""
+Order fill path shared by immediate (market) orders and triggered pending orders.
+
+A fill moves wallet balances and records the trade and fee transactions. Market orders hand
+their filled order document (and audit entry) to the fill so it is written in the same batch;
+triggered orders update their existing pending document afterwards.
+
+Resting buy orders with a limit price reserve their worst-case cost (``reserved_amount``) from
+the USD balance when they are created. The fill is paid out of that reserve, with any
+difference charged or refunded, and an order that closes without filling (cancelled, expired,
+rejected) releases it.
+"""
+
+from typing import Optional, Tuple
+import asyncio
+import logging
+
+from fastapi import HTTPException
+
+from ledger import post_balance_change
+from models import Transaction
+from services.audit_service import submit_audit_entry
+from services.transactions_utils import broadcast_transaction_event
+from transaction_stats import record_transaction_stats
+from wallet_lanes import wallet_lanes
+
+logger = logging.getLogger(__name__)
+
+# Trading fee configuration
+TRADING_FEE_PERCENTAGE = 0.1  # 0.1% trading fee
+MIN_TRADING_FEE = 0.01  # Minimum $0.01 fee
+
+
+def calculate_trading_fee(amount: float, price: float, fee_percentage: float = TRADING_FEE_PERCENTAGE) -> float:
+    """Calculate trading fee with minimum fee threshold."""
+    total_value = amount * price
+    fee = total_value * (fee_percentage / 100)
+    return max(fee, MIN_TRADING_FEE)
+
+
+async def execute_fill(
+    db,
+    *,
+    user_id: str,
+    order_id: str,
+    trading_pair: str,
+    side: str,
+    amount: float,
+    price: float,
+    order_doc: Optional[dict] = None,
+    audit_entry: Optional[dict] = None,
+    reserved: float = 0.0,
+) -> Tuple[float, float]:
+    """
+    Settle a fill of ``amount`` at ``price`` against the user's wallet.
+
+    The balance check and debit are one guarded ledger post (the guard is in the update
+    filter), so concurrent fills cannot overdraw the wallet; it runs in the user's wallet
+    lane so it is ordered with the other wallet mutations. The trade and fee transactions,
+    plus ``order_doc`` and ``audit_entry`` when given, are then written concurrently, one batch
+    per collection. ``reserved`` is USD already taken from the wallet for this (buy) order; only
+    the difference to the actual cost is charged, or refunded when it is negative.
+
+    Once the balance post has succeeded the fill is settled: follow-up write failures are
+    logged rather than raised (a retry would fill the order twice), and a failed ``order_doc``
+    insert is retried once as an idempotent upsert so the settled order is still recorded.
+
+    Raises HTTPException (404 no wallet, 400 insufficient funds) before touching balances.
+    Returns ``(trading_fee, total_value)``.
+    """
+    wallets_collection = db.get_collection("wallets")
+
+    trading_fee = calculate_trading_fee(amount, price)
+    total_value = amount * price
+    crypto_symbol = trading_pair.split("/")[0]
+    is_buy = side.lower() == "buy"
+
+    if is_buy:
+        required_amount = total_value + trading_fee - reserved
+        guard = {"USD": required_amount} if required_amount > 0 else None
+        changes = {"USD": -required_amount, crypto_symbol: amount}
+    else:  # sell order
+        guard = {crypto_symbol: amount}
+        changes = {crypto_symbol: -amount, "USD": total_value - trading_fee}
+
+    async with wallet_lanes.lane(user_id):
+        updated = await post_balance_change(
+            db, user_id, changes,
+            kind="trade",
+            reference=order_id,
+            description=f"{side.upper()} {amount} {trading_pair} @ ${price}",
+            guard=guard,
+        )
+        if updated is None:
+            # Slow path only: work out why the guard failed for the error message
+            wallet = await wallets_collection.find_one({"user_id": user_id}, {"balances": 1})
+            if not wallet:
+                raise HTTPException(status_code=404, detail="Wallet not found. Please create a wallet first.")
+            balances = wallet.get("balances", {})
+            if is_buy:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Insufficient balance. Required: ${required_amount:.2f} (including ${trading_fee:.2f} fee), Available: ${balances.get('USD', 0):.2f}"
+                )
+            raise HTTPException(
+                status_code=400,
+                detail=f"Insufficient {crypto_symbol}. Required: {amount}, Available: {balances.get(crypto_symbol, 0)}"
+            )
+
+    # Create trade transaction
+    transaction = Transaction(
+        user_id=user_id,
+        type="trade",
+        amount=amount if is_buy else -amount,
+        symbol=trading_pair,
+        description=f"{side.upper()} {amount} {trading_pair} @ ${price}"
+    )
+    transaction_payload = transaction.dict()
+
+    # Create fee transaction
+    fee_transaction = Transaction(
+        user_id=user_id,
+        type="fee",
+        amount=-trading_fee,
+        symbol="USD",
+        description=f"Trading fee for order {order_id[:8]}"
+    )
+    fee_payload = fee_transaction.dict()
+
+    writes = {
+        "transactions": db.get_collection("transactions").insert_many([transaction_payload, fee_payload]),
+        "stats": record_transaction_stats(db, [transaction_payload, fee_payload]),
+    }
+    if order_doc is not None:
+        writes["order"] = db.get_collection("orders").insert_one(order_doc)
+    if audit_entry is not None:
+        writes["audit"] = submit_audit_entry(db, audit_entry)
+    results = await asyncio.gather(*writes.values(), return_exceptions=True)
+
+    failed = set()
+    for name, result in zip(writes, results):
+        if isinstance(result, Exception):
+            failed.add(name)
+            logger.error("Fill of order %s settled but its %s write failed: %s", order_id, name, result)
+    if "order" in failed:
+        try:
+            await db.get_collection("orders").update_one(
+                {"id": order_doc["id"]}, {"$setOnInsert": order_doc}, upsert=True
+            )
+        except Exception as exc:
+            logger.error("Settled order %s could not be recorded: %s", order_id, exc)
+
+    if "transactions" not in failed:
+        await broadcast_transaction_event(user_id, transaction_payload)
+        await broadcast_transaction_event(user_id, fee_payload)
+
+    return trading_fee, total_value
+
+
+async def reserve_funds(db, user_id: str, order_id: str, amount: float) -> bool:
+    """Take ``amount`` USD from the wallet for a resting order. False if the balance is too low."""
+    async with wallet_lanes.lane(user_id):
+        updated = await post_balance_change(
+            db, user_id, {"USD": -amount},
+            kind="order_reserve",
+            reference=order_id,
+            description=f"Reserved funds for order {order_id[:8]}",
+            guard={"USD": amount},
+        )
+    return updated is not None
+
+
+async def release_reserve(db, user_id: str, order_id: str, amount: float, reason: str) -> None:
+    """Return an unfilled order's reserve to the wallet. Call once, after the order left ``pending``."""
+    async with wallet_lanes.lane(user_id):
+        await post_balance_change(
+            db, user_id, {"USD": amount},
+            kind="order_release",
+            reference=order_id,
+            description=f"Released reserve for {reason} order {order_id[:8]}",
+        )
@@ -0,0 +1,571 @@
+"""
+In-memory trigger engine for resting limit / stop_loss / take_profit / stop_limit orders.
+
+Pending orders are indexed per symbol in two heaps keyed by trigger price:
+- ``rises``: min-heap of thresholds that fire when the price rises to or above them
+  (sell limits, buy stops, sell take-profits)
+- ``falls``: max-heap of thresholds that fire when the price falls to or below them
+  (buy limits, sell stops, buy take-profits)
+
+A tick only pops the heap entries whose threshold it crossed, so evaluation is
+O(k log n) for k triggered orders regardless of how many orders rest on the book.
+Cancelled or re-indexed orders are removed lazily: their heap entries are skipped
+when popped and books are compacted once stale entries dominate.
+
+Triggered orders are handed to a single executor task that claims the order document
+(``pending`` -> ``triggered``) and settles it through the shared fill path, so a slow
+database never stalls the price stream and concurrent workers never fill an order twice.
+The fill is paid from the order's reserve; orders that are rejected, cancelled or expire
+release it instead. An order whose fill fails unexpectedly is resolved from the ledger: filled
+if its trade was posted, otherwise put back to ``pending``. A periodic sweep does the same for
+orders left in ``triggered`` by a crashed worker.
+
+Time in force:
+- GTC rests until triggered or cancelled
+- GTD rests until ``expire_time``, then is marked ``expired``
+- IOC / FOK never rest: they fill if marketable at the current price, else are cancelled
+  (fills are all-or-nothing, so IOC and FOK behave the same here)
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from config import settings
+from ledger import LEDGER_COLLECTION
+from services.audit_service import AuditAction, log_audit_event
+from services.order_fills import execute_fill, release_reserve
+from services.price_stream import PriceStreamService, price_stream_service
+
+logger = logging.getLogger(__name__)
+
+RISES = "rises"
+FALLS = "falls"
+
+TRIGGER_ORDER_TYPES = ("limit", "stop_loss", "take_profit", "stop_limit")
+IMMEDIATE_TIME_IN_FORCE = ("IOC", "FOK")
+
+# Seconds between expiry sweeps / pending-order reconciliation with the database
+EXPIRY_SWEEP_INTERVAL = 1.0
+RECONCILE_INTERVAL = 30.0
+# Orders still ``triggered`` this long after being claimed are assumed abandoned
+TRIGGERED_STALE_SECONDS = 300.0
+# Rebuild a heap once it holds more stale entries than this (and more than live ones)
+COMPACT_MIN_STALE = 1024
+
+
+def symbol_for_pair(trading_pair: str) -> str:
+    """Map a trading pair ("BTC/USD", "BTC-USDT") to the price stream symbol ("btcusd")."""
+    symbol = (trading_pair or "").upper().replace("/", "").replace("-", "")
+    return PriceStreamService.SYMBOL_ALIASES.get(symbol, symbol).lower()
+
+
+def _crossed(trigger: Tuple[str, float], price: float) -> bool:
+    direction, threshold = trigger
+    return price >= threshold if direction == RISES else price <= threshold
+
+
+def _to_epoch(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return None
+
+
+@dataclass
+class RestingOrder:
+    id: str
+    user_id: str
+    trading_pair: str
+    symbol: str
+    order_type: str
+    side: str
+    amount: float
+    limit_price: Optional[float]
+    stop_price: Optional[float]
+    time_in_force: str
+    expire_at: Optional[float]
+    reserved_amount: float = 0.0
+    stop_triggered: bool = False
+    version: int = 0
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> "RestingOrder":
+        return cls(
+            id=doc["id"],
+            user_id=doc["user_id"],
+            trading_pair=doc["trading_pair"],
+            symbol=symbol_for_pair(doc["trading_pair"]),
+            order_type=doc["order_type"],
+            side=(doc.get("side") or "").lower(),
+            amount=float(doc["amount"]),
+            limit_price=float(doc["price"]) if doc.get("price") else None,
+            stop_price=float(doc["stop_price"]) if doc.get("stop_price") else None,
+            time_in_force=(doc.get("time_in_force") or "GTC").upper(),
+            expire_at=_to_epoch(doc.get("expire_time")),
+            reserved_amount=float(doc.get("reserved_amount") or 0.0),
+            stop_triggered=bool(doc.get("stop_triggered")),
+        )
+
+    def trigger(self) -> Optional[Tuple[str, float]]:
+        """Return ``(direction, threshold)`` for the order's current phase."""
+        is_buy = self.side == "buy"
+        if self.order_type == "limit" or (self.order_type == "stop_limit" and self.stop_triggered):
+            if self.limit_price is None:
+                return None
+            return (FALLS if is_buy else RISES), self.limit_price
+        if self.stop_price is None:
+            return None
+        if self.order_type in ("stop_loss", "stop_limit"):
+            return (RISES if is_buy else FALLS), self.stop_price
+        if self.order_type == "take_profit":
+            return (FALLS if is_buy else RISES), self.stop_price
+        return None
+
+
+class SymbolBook:
+    """Two trigger-price heaps for one symbol. Entries are ``(key, seq, order_id, version)``."""
+
+    def __init__(self):
+        self.rises: List[Tuple[float, int, str, int]] = []
+        self.falls: List[Tuple[float, int, str, int]] = []
+        self.stale = 0
+
+    def __len__(self) -> int:
+        return len(self.rises) + len(self.falls)
+
+    def entry_for(self, direction: str, threshold: float, seq: int, order: RestingOrder):
+        key = threshold if direction == RISES else -threshold
+        return key, seq, order.id, order.version
+
+    def push(self, direction: str, entry: Tuple[float, int, str, int]) -> None:
+        heapq.heappush(self.rises if direction == RISES else self.falls, entry)
+
+    def pop_crossed(self, price: float) -> List[Tuple[str, int]]:
+        """Pop every entry whose threshold ``price`` has reached, in trigger-price order."""
+        crossed: List[Tuple[str, int]] = []
+        while self.rises and self.rises[0][0] <= price:
+            _, _, order_id, version = heapq.heappop(self.rises)
+            crossed.append((order_id, version))
+        while self.falls and -self.falls[0][0] >= price:
+            _, _, order_id, version = heapq.heappop(self.falls)
+            crossed.append((order_id, version))
+        return crossed
+
+
+class OrderTriggerEngine:
+    """Evaluates resting orders against live prices and executes the ones that trigger."""
+
+    def __init__(self):
+        self._db = None
+        self._books: Dict[str, SymbolBook] = {}
+        self._orders: Dict[str, RestingOrder] = {}
+        self._expiries: List[Tuple[float, str]] = []
+        self._seq = itertools.count()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._last_reconcile: Optional[datetime] = None
+        self.is_running = False
+
+        self.orders_loaded = 0
+        self.ticks_evaluated = 0
+        self.orders_triggered = 0
+        self.orders_filled = 0
+        self.orders_rejected = 0
+        self.orders_expired = 0
+        self.orders_cancelled = 0
+        self.orders_reverted = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self, db) -> None:
+        if self.is_running:
+            return
+        self._db = db
+        self.is_running = True
+        await self._load_pending()
+        price_stream_service.subscribe(self.on_prices)
+        self._tasks = [
+            asyncio.create_task(self._run_executor()),
+            asyncio.create_task(self._maintenance_loop()),
+        ]
+        logger.info("Order trigger engine started (%d resting orders)", len(self._orders))
+
+    async def stop(self) -> None:
+        self.is_running = False
+        price_stream_service.unsubscribe(self.on_prices)
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as exc:
+                logger.debug("Trigger engine task stop error: %s", exc)
+        self._tasks = []
+
+    async def _load_pending(self, since: Optional[datetime] = None) -> int:
+        """Index pending trigger orders from the database (all of them, or created since ``since``)."""
+        query: Dict[str, Any] = {"status": "pending", "order_type": {"$in": list(TRIGGER_ORDER_TYPES)}}
+        if since is not None:
+            query["created_at"] = {"$gte": since}
+        started = datetime.now(timezone.utc)
+
+        loaded = 0
+        cursor = self._db.get_collection("orders").find(query, {"_id": 0})
+        async for doc in cursor:
+            if doc.get("id") in self._orders:
+                continue
+            try:
+                order = RestingOrder.from_doc(doc)
+            except (KeyError, TypeError, ValueError) as exc:
+                logger.warning("Skipping malformed pending order %s: %s", doc.get("id"), exc)
+                continue
+            if order.time_in_force in IMMEDIATE_TIME_IN_FORCE:
+                # Left over from a restart; live IOC/FOK orders are handled by the creating worker
+                if since is None:
+                    self._handle_immediate(order)
+            else:
+                self._index(order, heapify=False)
+            loaded += 1
+
+        for book in self._books.values():
+            heapq.heapify(book.rises)
+            heapq.heapify(book.falls)
+        heapq.heapify(self._expiries)
+        self._last_reconcile = started
+        self.orders_loaded += loaded
+        return loaded
+
+    # ------------------------------------------------------------------
+    # Order book maintenance
+    # ------------------------------------------------------------------
+
+    def add_order(self, doc: Dict[str, Any]) -> None:
+        """Register a newly created pending order."""
+        if not self.is_running:
+            return
+        if doc.get("order_type") not in TRIGGER_ORDER_TYPES or doc.get("id") in self._orders:
+            return
+        order = RestingOrder.from_doc(doc)
+        if order.time_in_force in IMMEDIATE_TIME_IN_FORCE:
+            self._handle_immediate(order)
+            return
+        self._index(order)
+        # A GTC order that is already marketable triggers on the next tick; check now instead
+        price = price_stream_service.get_price(order.symbol)
+        if price is not None:
+            self._evaluate(order.symbol, price)
+
+    def remove_order(self, order_id: str) -> bool:
+        """Drop an order from the book (e.g. cancelled). Its heap entries are skipped lazily."""
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return False
+        book = self._books.get(order.symbol)
+        if book is not None:
+            book.stale += 1
+            self._maybe_compact(order.symbol, book)
+        return True
+
+    def _index(self, order: RestingOrder, heapify: bool = True) -> None:
+        trigger = order.trigger()
+        if trigger is None:
+            logger.warning("Order %s has no trigger price; not indexed", order.id)
+            return
+        direction, threshold = trigger
+        book = self._books.setdefault(order.symbol, SymbolBook())
+        entry = book.entry_for(direction, threshold, next(self._seq), order)
+        if heapify:
+            book.push(direction, entry)
+            if order.expire_at is not None:
+                heapq.heappush(self._expiries, (order.expire_at, order.id))
+        else:
+            (book.rises if direction == RISES else book.falls).append(entry)
+            if order.expire_at is not None:
+                self._expiries.append((order.expire_at, order.id))
+        self._orders[order.id] = order
+
+    def _maybe_compact(self, symbol: str, book: SymbolBook) -> None:
+        if book.stale < COMPACT_MIN_STALE or book.stale * 2 < len(book):
+            return
+        live = lambda entry: (  # noqa: E731
+            entry[2] in self._orders and self._orders[entry[2]].version == entry[3]
+        )
+        book.rises = [entry for entry in book.rises if live(entry)]
+        book.falls = [entry for entry in book.falls if live(entry)]
+        heapq.heapify(book.rises)
+        heapq.heapify(book.falls)
+        book.stale = 0
+        if not len(book):
+            del self._books[symbol]
+
+    # ------------------------------------------------------------------
+    # Price evaluation
+    # ------------------------------------------------------------------
+
+    async def on_prices(self, updates: Dict[str, float], timestamp_ms: int) -> None:
+        """Price stream subscriber: pop and dispatch orders whose thresholds were crossed."""
+        if not settings.feature_trading_enabled:
+            return
+        for symbol, price in updates.items():
+            if symbol in self._books:
+                self.ticks_evaluated += 1
+                self._evaluate(symbol, price)
+
+    def _evaluate(self, symbol: str, price: float) -> None:
+        book = self._books.get(symbol)
+        if book is None:
+            return
+        crossed = book.pop_crossed(price)
+        while crossed:
+            activated = False
+            for order_id, version in crossed:
+                order = self._orders.get(order_id)
+                if order is None or order.version != version:
+                    book.stale = max(0, book.stale - 1)
+                    continue
+                if order.order_type == "stop_limit" and not order.stop_triggered:
+                    self._activate_stop_limit(order, price)
+                    activated = True
+                    continue
+                self._orders.pop(order_id)
+                self._dispatch("fill", order, price)
+            # A stop_limit converted to a limit this tick may already be marketable
+            crossed = book.pop_crossed(price) if activated else []
+
+    def _activate_stop_limit(self, order: RestingOrder, price: float) -> None:
+        order.stop_triggered = True
+        order.version += 1
+        self._dispatch("activate", order, price)
+        self._index(order)
+
+    def _handle_immediate(self, order: RestingOrder) -> None:
+        """IOC/FOK: fill now if the current price satisfies the order, otherwise cancel."""
+        price = price_stream_service.get_price(order.symbol)
+        trigger = order.trigger()
+        if price is not None and trigger is not None:
+            if order.order_type == "stop_limit" and _crossed(trigger, price):
+                order.stop_triggered = True
+                trigger = order.trigger()
+            executable = order.order_type != "stop_limit" or order.stop_triggered
+            if executable and trigger is not None and _crossed(trigger, price):
+                self._dispatch("fill", order, price)
+                return
+        self._dispatch("cancel", order, price)
+
+    def _dispatch(self, action: str, order: RestingOrder, price: Optional[float]) -> None:
+        if action == "fill":
+            self.orders_triggered += 1
+        self._queue.put_nowait((action, order, price))
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    async def _run_executor(self) -> None:
+        while True:
+            action, order, price = await self._queue.get()
+            try:
+                if action == "fill":
+                    await self._execute(order, price)
+                elif action == "activate":
+                    await self._orders_collection().update_one(
+                        {"id": order.id, "status": "pending"},
+                        {"$set": {"stop_triggered": True, "stop_triggered_at": datetime.now(timezone.utc)}},
+                    )
+                else:
+                    await self._close(order, "expired" if action == "expire" else "cancelled", price)
+            except Exception as exc:
+                logger.error("Trigger engine failed to %s order %s: %s", action, order.id, exc)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, order: RestingOrder, price: float) -> None:
+        orders_collection = self._orders_collection()
+        now = datetime.now(timezone.utc)
+        claimed = await orders_collection.find_one_and_update(
+            {"id": order.id, "status": "pending"},
+            {"$set": {"status": "triggered", "triggered_at": now, "trigger_price": price}},
+        )
+        if not claimed:
+            # Cancelled, expired, or already claimed by another worker
+            return
+
+        try:
+            trading_fee, total_value = await execute_fill(
+                self._db,
+                user_id=order.user_id,
+                order_id=order.id,
+                trading_pair=order.trading_pair,
+                side=order.side,
+                amount=order.amount,
+                price=price,
+                reserved=order.reserved_amount,
+            )
+        except HTTPException as exc:
+            self.orders_rejected += 1
+            result = await orders_collection.update_one(
+                {"id": order.id, "status": "triggered"},
+                {"$set": {"status": "rejected", "reject_reason": exc.detail, "rejected_at": now}},
+            )
+            if result.modified_count == 1 and order.reserved_amount:
+                await release_reserve(self._db, order.user_id, order.id, order.reserved_amount, "rejected")
+            logger.info("Triggered order %s rejected: %s", order.id, exc.detail)
+            return
+        except Exception as exc:
+            logger.error("Fill of triggered order %s failed: %s", order.id, exc)
+            await self._resolve_triggered(order)
+            return
+
+        self.orders_filled += 1
+        await asyncio.gather(
+            orders_collection.update_one(
+                {"id": order.id},
+                {"$set": {"status": "filled", "filled_at": datetime.now(timezone.utc), "fill_price": price, "fee": trading_fee}},
+            ),
+            log_audit_event(
+                self._db,
+                AuditAction.TRADE_EXECUTED,
+                user_id=order.user_id,
+                resource_type="order",
+                resource_id=order.id,
+                details={
+                    "order_type": order.order_type,
+                    "trading_pair": order.trading_pair,
+                    "side": order.side,
+                    "amount": order.amount,
+                    "fill_price": price,
+                    "total_value": total_value,
+                    "fee": trading_fee,
+                },
+            ),
+        )
+
+    async def _resolve_triggered(self, order: RestingOrder) -> None:
+        """Settle an order stuck in ``triggered``: filled if its trade reached the ledger, else pending again."""
+        orders_collection = self._orders_collection()
+        posted = await self._db.get_collection(LEDGER_COLLECTION).find_one(
+            {"user_id": order.user_id, "reference": order.id, "kind": "trade"}, {"_id": 0, "id": 1}
+        )
+        if posted:
+            result = await orders_collection.update_one(
+                {"id": order.id, "status": "triggered"},
+                {"$set": {"status": "filled", "filled_at": datetime.now(timezone.utc)}},
+            )
+            if result.modified_count == 1:
+                self.orders_filled += 1
+            return
+
+        result = await orders_collection.update_one(
+            {"id": order.id, "status": "triggered"},
+            {"$set": {"status": "pending"}, "$unset": {"triggered_at": "", "trigger_price": ""}},
+        )
+        if result.modified_count != 1:
+            return
+        self.orders_reverted += 1
+        if order.time_in_force in IMMEDIATE_TIME_IN_FORCE:
+            await self._close(order, "cancelled", None)
+        else:
+            self._index(order)
+
+    async def _sweep_triggered(self) -> int:
+        """Resolve orders left in ``triggered`` longer than TRIGGERED_STALE_SECONDS."""
+        cutoff = datetime.fromtimestamp(time.time() - TRIGGERED_STALE_SECONDS, tz=timezone.utc)
+        cursor = self._orders_collection().find(
+            {"status": "triggered", "triggered_at": {"$lt": cutoff}}, {"_id": 0}
+        )
+        swept = 0
+        async for doc in cursor:
+            try:
+                order = RestingOrder.from_doc(doc)
+            except (KeyError, TypeError, ValueError) as exc:
+                logger.warning("Skipping malformed triggered order %s: %s", doc.get("id"), exc)
+                continue
+            await self._resolve_triggered(order)
+            swept += 1
+        return swept
+
+    async def _close(self, order: RestingOrder, status: str, price: Optional[float]) -> None:
+        if status == "expired":
+            self.orders_expired += 1
+        else:
+            self.orders_cancelled += 1
+        result = await self._orders_collection().update_one(
+            {"id": order.id, "status": "pending"},
+            {"$set": {
+                "status": status,
+                f"{status}_at": datetime.now(timezone.utc),
+                "close_reason": f"{order.time_in_force.lower()}_not_marketable" if status == "cancelled" else "gtd_expired",
+                "last_price": price,
+            }},
+        )
+        if result.modified_count == 1 and order.reserved_amount:
+            await release_reserve(self._db, order.user_id, order.id, order.reserved_amount, status)
+
+    def _orders_collection(self):
+        return self._db.get_collection("orders")
+
+    # ------------------------------------------------------------------
+    # Expiry + reconciliation
+    # ------------------------------------------------------------------
+
+    async def _maintenance_loop(self) -> None:
+        last_reconcile = time.monotonic()
+        while self.is_running:
+            await asyncio.sleep(EXPIRY_SWEEP_INTERVAL)
+            self.expire_due(time.time())
+            if time.monotonic() - last_reconcile >= RECONCILE_INTERVAL:
+                last_reconcile = time.monotonic()
+                try:
+                    # Pick up orders created through other workers since the last pass
+                    await self._load_pending(since=self._last_reconcile)
+                    await self._sweep_triggered()
+                except Exception as exc:
+                    logger.warning("Pending order reconciliation failed: %s", exc)
+
+    def expire_due(self, now: float) -> int:
+        expired = 0
+        while self._expiries and self._expiries[0][0] <= now:
+            _, order_id = heapq.heappop(self._expiries)
+            order = self._orders.get(order_id)
+            if order is None or order.expire_at is None or order.expire_at > now:
+                continue
+            self.remove_order(order_id)
+            self._dispatch("expire", order, price_stream_service.get_price(order.symbol))
+            expired += 1
+        return expired
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "resting_orders": len(self._orders),
+            "symbols": len(self._books),
+            "queue_depth": self._queue.qsize(),
+            "orders_loaded": self.orders_loaded,
+            "ticks_evaluated": self.ticks_evaluated,
+            "orders_triggered": self.orders_triggered,
+            "orders_filled": self.orders_filled,
+            "orders_rejected": self.orders_rejected,
+            "orders_expired": self.orders_expired,
+            "orders_cancelled": self.orders_cancelled,
+            "orders_reverted": self.orders_reverted,
+        }
+
+
+order_trigger_engine = OrderTriggerEngine()
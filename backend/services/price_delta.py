@@ -0,0 +1,93 @@
+"""
+Delta-encoded price frames for realtime clients.
+
+Opt-in protocol mode for price sockets: a client receives a full ``price_snapshot``
+keyframe on connect and every ``keyframe_interval_seconds``; in between it only receives
+``price_delta`` frames listing symbols whose price moved beyond ``tick_size_bps`` since it
+was last sent. Every shared frame carries a sequence number so clients can detect gaps
+(e.g. frames dropped under backpressure) and ask for a resync.
+"""
+
+import time
+from typing import Any, Dict, Optional
+
+
+class DeltaPriceEncoder:
+    """Shared delta/keyframe state for one broadcast stream."""
+
+    def __init__(self, keyframe_interval_seconds: float = 30.0, tick_size_bps: float = 1.0):
+        self.keyframe_interval_seconds = keyframe_interval_seconds
+        self.tick_size = tick_size_bps / 10_000
+        self.seq = 0
+        self._latest: Dict[str, float] = {}
+        self._sent: Dict[str, float] = {}
+        self._last_keyframe = 0.0
+
+        self.keyframes_emitted = 0
+        self.deltas_emitted = 0
+        self.updates_suppressed = 0
+
+    def observe(self, prices: Dict[str, float]) -> None:
+        """Track latest prices without emitting a frame (no delta subscribers)."""
+        self._latest.update(prices)
+
+    def update(self, prices: Dict[str, float], timestamp_ms: int) -> Optional[Dict[str, Any]]:
+        """Fold an update into the stream; returns the next shared frame, or None if nothing moved."""
+        self._latest.update(prices)
+
+        if time.monotonic() - self._last_keyframe >= self.keyframe_interval_seconds:
+            return self._keyframe(timestamp_ms)
+
+        changed = {symbol: price for symbol, price in prices.items() if self._moved(symbol, price)}
+        if not changed:
+            self.updates_suppressed += 1
+            return None
+
+        self._sent.update(changed)
+        self.seq += 1
+        self.deltas_emitted += 1
+        return {
+            "type": "price_delta",
+            "seq": self.seq,
+            "prices": {symbol: str(price) for symbol, price in changed.items()},
+            "event_timestamp_ms": int(timestamp_ms),
+        }
+
+    def snapshot(self, timestamp_ms: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Full snapshot for a single (re)syncing client.
+
+        Does not advance the shared sequence: the client should expect ``seq + 1`` next.
+        """
+        return {
+            "type": "price_snapshot",
+            "seq": self.seq,
+            "prices": {symbol: str(price) for symbol, price in self._latest.items()},
+            "event_timestamp_ms": int(timestamp_ms if timestamp_ms is not None else time.time() * 1000),
+            "keyframe_interval_seconds": self.keyframe_interval_seconds,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "seq": self.seq,
+            "symbols": len(self._latest),
+            "keyframes_emitted": self.keyframes_emitted,
+            "deltas_emitted": self.deltas_emitted,
+            "updates_suppressed": self.updates_suppressed,
+        }
+
+    def _keyframe(self, timestamp_ms: int) -> Dict[str, Any]:
+        self.seq += 1
+        self._sent = dict(self._latest)
+        self._last_keyframe = time.monotonic()
+        self.keyframes_emitted += 1
+        frame = self.snapshot(timestamp_ms)
+        frame["seq"] = self.seq
+        return frame
+
+    def _moved(self, symbol: str, price: float) -> bool:
+        previous = self._sent.get(symbol)
+        if previous is None or previous <= 0:
+            return True
+        change = abs(price - previous) / previous
+        return change > 0 and change >= self.tick_size
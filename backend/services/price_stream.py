@@ -6,13 +6,20 @@ Exchange WebSocket streams (Binance/Kraken/Coinbase) -> centralized cache -> int
 CoinGecko is used for low-frequency metadata.
 CoinMarketCap is used as fallback provider.
 Redis caching for top coins market data with 45s TTL.
+
+Cluster mode (PRICE_STREAM_CLUSTER_MODE): one worker holds a Redis leader lock, ingests the
+exchange streams and publishes conflated ticks on a Redis channel; every other worker follows
+that channel instead of opening its own upstream sockets.
 """
 
 import asyncio
 import json
 import logging
+import os
 import random
+import socket
 import time
+import uuid
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from enum import Enum
@@ -23,7 +30,9 @@ import websockets
 
 from config import settings
 from redis_cache import redis_cache
+from redis_enhanced import redis_enhanced
 from services.circuit_breaker import CircuitBreaker, CircuitState
+from services.shared_price_table import SharedPriceTable
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +42,11 @@ PriceCallback = Callable[[Dict[str, float], float], Awaitable[None]]
 MAX_WS_RETRIES = 50
 # Scheduled refresh interval for market data (seconds)
 MARKET_DATA_REFRESH_INTERVAL = 45
+# Redis keys used to coordinate ingestion across worker processes
+CLUSTER_TICKS_CHANNEL = "price_stream:ticks"
+CLUSTER_LEADER_KEY = "price_stream:leader"
+# Consecutive failed tick publishes after which the leader gives up the lock
+CLUSTER_MAX_PUBLISH_FAILURES = 3
 
 
 class ConnectionState(Enum):
@@ -74,35 +88,125 @@ class TokenBucketRateLimiter:
 
 
 class PriceCache:
-    """Centralized cache with atomic updates, monotonic timestamp checks, and Redis backing."""
-
-    def __init__(self, live_ttl_seconds: int = 5):
+    """
+    Centralized cache with atomic updates, monotonic timestamp checks, and Redis backing.
+
+    In write-behind mode ticks are applied to the in-memory maps without awaiting any I/O;
+    dirty symbols are persisted to Redis by ``run_flusher`` in one pipelined batch per interval,
+    so a slow Redis round-trip never stalls the exchange consumers.
+    """
+
+    def __init__(
+        self,
+        live_ttl_seconds: int = 5,
+        write_behind: bool = False,
+        flush_interval_ms: int = 250,
+    ):
         self.live_ttl_seconds = live_ttl_seconds
+        self.write_behind = write_behind
+        self.flush_interval_ms = max(10, flush_interval_ms)
         self._lock = asyncio.Lock()
         self._prices: Dict[str, float] = {}
         self._timestamps_ms: Dict[str, int] = {}
+        self._dirty: Dict[str, Dict[str, Any]] = {}
         self.last_update = datetime.now(timezone.utc)
 
+        self.ticks_applied = 0
+        self.ticks_coalesced = 0
+        self.flush_count = 0
+        self.flush_failures = 0
+        self.keys_flushed = 0
+        self.last_flush_duration_ms = 0.0
+
+    def apply_tick(self, tick: PriceTick, persist: bool = True) -> bool:
+        """
+        Apply a tick to the in-memory maps and mark the symbol dirty. Never awaits.
+
+        ``persist=False`` skips the dirty marking, for ticks another process already wrote.
+        """
+        current_ts = self._timestamps_ms.get(tick.symbol, 0)
+        if tick.ts_ms < current_ts:
+            return False
+
+        self._prices[tick.symbol] = tick.price
+        self._timestamps_ms[tick.symbol] = tick.ts_ms
+        self.last_update = datetime.now(timezone.utc)
+        self.ticks_applied += 1
+        if not persist:
+            return True
+
+        if tick.symbol in self._dirty:
+            self.ticks_coalesced += 1
+        self._dirty[tick.symbol] = {
+            "symbol": tick.symbol,
+            "price": tick.price,
+            "timestamp_ms": tick.ts_ms,
+            "source": tick.source,
+        }
+        return True
+
     async def update_tick(self, tick: PriceTick) -> bool:
         """Atomic price update, ignoring older ticks for same symbol."""
+        if self.write_behind:
+            return self.apply_tick(tick)
+
         async with self._lock:
-            current_ts = self._timestamps_ms.get(tick.symbol, 0)
-            if tick.ts_ms < current_ts:
+            if not self.apply_tick(tick):
                 return False
-
-            self._prices[tick.symbol] = tick.price
-            self._timestamps_ms[tick.symbol] = tick.ts_ms
-            self.last_update = datetime.now(timezone.utc)
-
-            payload = {
-                "symbol": tick.symbol,
-                "price": tick.price,
-                "timestamp_ms": tick.ts_ms,
-                "source": tick.source,
-            }
+            payload = self._dirty.pop(tick.symbol)
             await redis_cache.set(f"crypto:price:{tick.symbol}", payload, ttl=self.live_ttl_seconds)
             return True
 
+    async def flush(self) -> int:
+        """Persist all dirty symbols to Redis in one batch. Returns the number of keys written."""
+        if not self._dirty:
+            return 0
+
+        dirty, self._dirty = self._dirty, {}
+        started = time.perf_counter()
+        try:
+            await redis_cache.set_many(
+                {f"crypto:price:{symbol}": payload for symbol, payload in dirty.items()},
+                ttl=self.live_ttl_seconds,
+            )
+        except Exception:
+            # Put the batch back for the next flush; ticks applied meanwhile are newer and win
+            self._dirty = {**dirty, **self._dirty}
+            self.flush_failures += 1
+            raise
+        self.last_flush_duration_ms = (time.perf_counter() - started) * 1000
+        self.flush_count += 1
+        self.keys_flushed += len(dirty)
+        return len(dirty)
+
+    async def run_flusher(self, stop_event: asyncio.Event) -> None:
+        """Flush dirty symbols every ``flush_interval_ms`` until ``stop_event`` is set."""
+        interval = self.flush_interval_ms / 1000
+        try:
+            while not stop_event.is_set():
+                await asyncio.sleep(interval)
+                try:
+                    await self.flush()
+                except Exception as exc:
+                    logger.warning("Price cache flush failed (%d symbols pending): %s", len(self._dirty), exc)
+        finally:
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.warning("Final price cache flush failed (%d symbols lost): %s", len(self._dirty), exc)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "write_behind": self.write_behind,
+            "ticks_applied": self.ticks_applied,
+            "ticks_coalesced": self.ticks_coalesced,
+            "pending_symbols": len(self._dirty),
+            "flush_count": self.flush_count,
+            "flush_failures": self.flush_failures,
+            "keys_flushed": self.keys_flushed,
+            "last_flush_duration_ms": round(self.last_flush_duration_ms, 3),
+        }
+
     async def snapshot(self) -> Dict[str, float]:
         async with self._lock:
             return dict(self._prices)
@@ -124,6 +228,64 @@ class PriceCache:
             return len(self._prices)
 
 
+class PriceConflator:
+    """
+    Accumulates the latest price per symbol and delivers one multi-symbol update per window.
+
+    The first tick after an idle period schedules a flush ``window_ms`` later; every tick that
+    arrives before the flush only overwrites the pending price for its symbol.
+    """
+
+    def __init__(self, window_ms: int):
+        self.window_ms = window_ms
+        self.callbacks: Set[PriceCallback] = set()
+        self._pending: Dict[str, float] = {}
+        self._latest_ts_ms = 0
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.ticks_received = 0
+        self.batches_emitted = 0
+
+    def add(self, updates: Dict[str, float], timestamp_ms: int) -> None:
+        self._pending.update(updates)
+        self._latest_ts_ms = max(self._latest_ts_ms, timestamp_ms)
+        self.ticks_received += 1
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self) -> None:
+        # Ticks added while callbacks are awaited see this task still running and schedule
+        # nothing, so keep flushing window by window until a delivery leaves nothing pending
+        while True:
+            await asyncio.sleep(self.window_ms / 1000)
+            updates, self._pending = self._pending, {}
+            timestamp_ms, self._latest_ts_ms = self._latest_ts_ms, 0
+            if not updates:
+                return
+            self.batches_emitted += 1
+            for callback in list(self.callbacks):
+                try:
+                    await callback(updates, timestamp_ms)
+                except Exception as exc:
+                    logger.debug("Conflated subscriber callback failed: %s", exc)
+            if not self._pending:
+                return
+
+    def cancel(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
+        self._pending = {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window_ms,
+            "subscribers": len(self.callbacks),
+            "ticks_received": self.ticks_received,
+            "batches_emitted": self.batches_emitted,
+        }
+
+
 class PriceStreamService:
     TRACKED_SYMBOLS: List[str] = [
         "BTCUSD", "ETHUSD", "BNBUSD", "SOLUSD", "XRPUSD", "ADAUSD",
@@ -157,7 +319,11 @@ class PriceStreamService:
         self.is_running = False
         self.state = ConnectionState.DISCONNECTED
 
-        self.cache = PriceCache(live_ttl_seconds=5)
+        self.cache = PriceCache(
+            live_ttl_seconds=5,
+            write_behind=settings.price_cache_write_behind,
+            flush_interval_ms=settings.price_cache_flush_interval_ms,
+        )
         self.prices: Dict[str, float] = {}
         self.last_update = datetime.now(timezone.utc)
         self.last_successful_update: Optional[datetime] = None
@@ -177,6 +343,7 @@ class PriceStreamService:
         self._tasks: List[asyncio.Task] = []
         self._stop_event = asyncio.Event()
         self._callbacks: Set[PriceCallback] = set()
+        self._conflators: Dict[int, PriceConflator] = {}
         self._metadata_single_flight = asyncio.Lock()
         self._gecko_rate_limiter = TokenBucketRateLimiter(rate_per_second=1 / 30.0, capacity=2.0)
         self._gecko_circuit_breaker = CircuitBreaker(
@@ -195,6 +362,26 @@ class PriceStreamService:
         # Track per-exchange retry counts for max retry limit
         self._exchange_retries: Dict[str, int] = {}
 
+        # Cluster coordination: "standalone" ingests locally, "leader" ingests and publishes,
+        # "follower" only consumes the leader's ticks from Redis.
+        self.cluster_mode = settings.price_stream_cluster_mode
+        self.role = "standalone"
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._ingestion_tasks: List[asyncio.Task] = []
+        self.cluster_ticks_published = 0
+        self.cluster_ticks_received = 0
+        self.cluster_publish_failures = 0
+        self._consecutive_publish_failures = 0
+        self.leader_changes = 0
+
+        # Optional host-local shared-memory table; one worker writes, all workers read.
+        self.shared_table: Optional[SharedPriceTable] = None
+        if settings.price_shm_enabled:
+            self.shared_table = SharedPriceTable(
+                settings.price_shm_path,
+                slots=settings.price_shm_slots,
+            )
+
     async def start(self) -> None:
         if not self.is_enabled:
             self.state = ConnectionState.DISABLED
@@ -206,19 +393,34 @@ class PriceStreamService:
         self._stop_event.clear()
         self._update_state(ConnectionState.CONNECTING)
 
-        self._tasks = [
-            asyncio.create_task(self._run_exchange_loop("binance")),
-            asyncio.create_task(self._run_exchange_loop("kraken")),
-            asyncio.create_task(self._run_exchange_loop("coinbase")),
-            asyncio.create_task(self._silence_watchdog()),
-            asyncio.create_task(self._scheduled_market_data_refresh()),
-            asyncio.create_task(self._sync_prices_snapshot_loop()),
-        ]
+        if self.shared_table is not None and self.shared_table.open():
+            self.shared_table.try_acquire_writer()
+
+        self._tasks = [asyncio.create_task(self._sync_prices_snapshot_loop())]
+        if self.cache.write_behind:
+            self._tasks.append(asyncio.create_task(self.cache.run_flusher(self._stop_event)))
+
+        if self.cluster_mode and redis_enhanced.supports_pubsub:
+            self.role = "follower"
+            await redis_enhanced.listen(CLUSTER_TICKS_CHANNEL, self._on_cluster_message)
+            self._tasks.append(asyncio.create_task(self._cluster_election_loop()))
+            logger.info("Starting PriceStreamService in cluster mode (instance=%s)", self.instance_id)
+            return
+
+        if self.cluster_mode:
+            logger.warning("Price stream cluster mode needs REDIS_URL; ingesting in this process instead")
+        self.role = "standalone"
+        self._start_ingestion()
         logger.info("Starting PriceStreamService (exchange websockets + scheduled market data refresh)")
 
     async def stop(self) -> None:
         self.is_running = False
         self._stop_event.set()
+        if self.role != "standalone":
+            await redis_enhanced.unlisten(CLUSTER_TICKS_CHANNEL, self._on_cluster_message)
+        if self.role == "leader":
+            await redis_enhanced.release_lock(CLUSTER_LEADER_KEY, self.instance_id)
+        await self._stop_ingestion()
         for task in self._tasks:
             task.cancel()
         for task in self._tasks:
@@ -229,8 +431,132 @@ class PriceStreamService:
             except Exception as exc:
                 logger.debug("Task stop error: %s", exc)
         self._tasks = []
+        for conflator in self._conflators.values():
+            conflator.cancel()
+        if self.shared_table is not None:
+            self.shared_table.close()
         self._update_state(ConnectionState.DISCONNECTED)
 
+    def _start_ingestion(self) -> None:
+        """Open the upstream exchange streams and metadata refresh in this process."""
+        if self._ingestion_tasks:
+            return
+        self._ingestion_tasks = [
+            asyncio.create_task(self._run_exchange_loop("binance")),
+            asyncio.create_task(self._run_exchange_loop("kraken")),
+            asyncio.create_task(self._run_exchange_loop("coinbase")),
+            asyncio.create_task(self._silence_watchdog()),
+            asyncio.create_task(self._scheduled_market_data_refresh()),
+        ]
+
+    async def _stop_ingestion(self) -> None:
+        tasks, self._ingestion_tasks = self._ingestion_tasks, []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as exc:
+                logger.debug("Ingestion task stop error: %s", exc)
+
+    # =========================================================================
+    # CLUSTER MODE: LEADER ELECTION + REDIS PUB/SUB FAN-OUT
+    # =========================================================================
+
+    async def _cluster_election_loop(self) -> None:
+        """Acquire or renew the leader lock; the holder ingests, everyone else follows."""
+        ttl_seconds = max(3, settings.price_stream_leader_ttl_seconds)
+        while self.is_running and not self._stop_event.is_set():
+            if self.role == "leader" and self._consecutive_publish_failures >= CLUSTER_MAX_PUBLISH_FAILURES:
+                # Followers receive nothing while publishing fails; let a healthier worker lead
+                logger.warning(
+                    "Price stream leader %s cannot publish ticks; releasing leadership", self.instance_id
+                )
+                await self._step_down()
+                try:
+                    await redis_enhanced.release_lock(CLUSTER_LEADER_KEY, self.instance_id)
+                except Exception as exc:
+                    logger.debug("Leader lock release failed: %s", exc)
+                await asyncio.sleep(ttl_seconds)
+                continue
+            try:
+                held = await redis_enhanced.acquire_lock(
+                    CLUSTER_LEADER_KEY, self.instance_id, ttl_seconds * 1000
+                )
+                if held and self.role != "leader":
+                    self._become_leader()
+                elif not held and self.role == "leader":
+                    await self._step_down()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Price stream leader election failed: %s", exc)
+            await asyncio.sleep(ttl_seconds / 3)
+
+    def _become_leader(self) -> None:
+        logger.info("Price stream leader elected: %s", self.instance_id)
+        self.role = "leader"
+        self._consecutive_publish_failures = 0
+        self.leader_changes += 1
+        self.subscribe(
+            self._publish_to_cluster,
+            conflation_ms=settings.price_stream_conflation_ms or 100,
+        )
+        self._start_ingestion()
+
+    async def _step_down(self) -> None:
+        logger.warning("Price stream leadership lost: %s", self.instance_id)
+        self.role = "follower"
+        self.leader_changes += 1
+        self.unsubscribe(self._publish_to_cluster)
+        await self._stop_ingestion()
+
+    async def _publish_to_cluster(self, updates: Dict[str, float], timestamp_ms: int) -> None:
+        """Conflated subscriber on the leader: forward each batch to the follower workers."""
+        if self.role != "leader":
+            return
+        published = await redis_enhanced.publish(CLUSTER_TICKS_CHANNEL, {
+            "origin": self.instance_id,
+            "prices": updates,
+            "ts_ms": timestamp_ms,
+            "source": self.current_source,
+        })
+        if published:
+            self._consecutive_publish_failures = 0
+            self.cluster_ticks_published += len(updates)
+        else:
+            self._consecutive_publish_failures += 1
+            self.cluster_publish_failures += 1
+
+    async def _on_cluster_message(self, message: Dict[str, Any]) -> None:
+        """Apply a tick batch published by the leader to the local cache and subscribers."""
+        if self.role == "leader" or message.get("origin") == self.instance_id:
+            return
+        ts_ms = int(message.get("ts_ms") or 0)
+        source = message.get("source") or "cluster"
+
+        updates: Dict[str, float] = {}
+        for symbol, price in (message.get("prices") or {}).items():
+            try:
+                tick = PriceTick(symbol=symbol.upper(), price=float(price), ts_ms=ts_ms, source=source)
+            except (TypeError, ValueError):
+                continue
+            if self.cache.apply_tick(tick, persist=False):
+                updates[symbol.lower()] = tick.price
+                self._write_shared(symbol, tick.price, ts_ms)
+
+        self._last_message_monotonic = time.monotonic()
+        self.cluster_ticks_received += len(updates)
+        if not updates:
+            return
+        self.last_update = datetime.now(timezone.utc)
+        self.last_successful_update = self.last_update
+        self.current_source = source
+        self._update_state(ConnectionState.CONNECTED)
+        await self._notify_subscribers(updates, ts_ms)
+
     async def health_check(self) -> bool:
         """Check if price stream is healthy. Does NOT call external APIs."""
         if not self.is_enabled:
@@ -251,19 +577,64 @@ class PriceStreamService:
         }
 
     def get_price(self, symbol: str) -> Optional[float]:
+        shared = self.get_shared_price(symbol)
+        if shared is not None:
+            return shared
         return self.prices.get((symbol or "").lower())
 
+    def get_shared_price(self, symbol: str) -> Optional[float]:
+        """
+        Latest price from the host's shared-memory table, or None when it is disabled,
+        has no live writer, or does not track the symbol. Accepts "btc" or "btcusd".
+        """
+        table = self.shared_table
+        if table is None or not table.is_open or not table.is_live():
+            return None
+        key = (symbol or "").lower()
+        price = table.get(key)
+        if price is None and key and not key.endswith("usd"):
+            price = table.get(f"{key}usd")
+        return price
+
+    def _write_shared(self, symbol: str, price: float, ts_ms: int) -> None:
+        if self.shared_table is not None and self.shared_table.is_writer:
+            self.shared_table.write(symbol, price, ts_ms)
+
     def get_all_prices(self) -> Dict[str, float]:
         return self.prices.copy()
 
-    def subscribe(self, callback: PriceCallback) -> None:
-        self._callbacks.add(callback)
+    def subscribe(self, callback: PriceCallback, conflation_ms: Optional[int] = None) -> None:
+        """
+        Register a price callback.
+
+        With ``conflation_ms`` set, the callback receives at most one multi-symbol update per
+        window carrying the latest price of every symbol that ticked; otherwise it is called
+        once per tick.
+        """
+        self.unsubscribe(callback)
+        if not conflation_ms or conflation_ms <= 0:
+            self._callbacks.add(callback)
+            return
+        conflator = self._conflators.get(conflation_ms)
+        if conflator is None:
+            conflator = PriceConflator(conflation_ms)
+            self._conflators[conflation_ms] = conflator
+        conflator.callbacks.add(callback)
 
     def unsubscribe(self, callback: PriceCallback) -> None:
         self._callbacks.discard(callback)
+        for window_ms, conflator in list(self._conflators.items()):
+            conflator.callbacks.discard(callback)
+            if not conflator.callbacks:
+                conflator.cancel()
+                del self._conflators[window_ms]
 
     async def _notify_subscribers(self, updates: Dict[str, float], timestamp_ms: int) -> None:
-        if not updates or not self._callbacks:
+        if not updates:
+            return
+        for conflator in list(self._conflators.values()):
+            conflator.add(updates, timestamp_ms)
+        if not self._callbacks:
             return
         for callback in list(self._callbacks):
             try:
@@ -290,6 +661,18 @@ class PriceStreamService:
                 "rate_limit_errors": self.rate_limit_errors,
                 "stream_silence_alerts": self.stream_silence_alerts,
             },
+            "cache": self.cache.get_stats(),
+            "conflation": [c.get_stats() for c in self._conflators.values()],
+            "cluster": {
+                "enabled": self.cluster_mode,
+                "role": self.role,
+                "instance_id": self.instance_id,
+                "ticks_published": self.cluster_ticks_published,
+                "ticks_received": self.cluster_ticks_received,
+                "publish_failures": self.cluster_publish_failures,
+                "leader_changes": self.leader_changes,
+            },
+            "shared_table": self.shared_table.get_stats() if self.shared_table else None,
         }
 
     # =========================================================================
@@ -462,13 +845,28 @@ class PriceStreamService:
             self.last_update = datetime.now(timezone.utc)
             self.last_successful_update = self.last_update
             self.current_source = tick.source
+            self._write_shared(tick.symbol, tick.price, tick.ts_ms)
             await self._notify_subscribers({tick.symbol.lower(): tick.price}, tick.ts_ms)
 
     async def _sync_prices_snapshot_loop(self) -> None:
         while self.is_running and not self._stop_event.is_set():
             self.prices = {k.lower(): v for k, v in (await self.cache.snapshot()).items()}
+            self._maintain_shared_table()
             await asyncio.sleep(0.25)
 
+    def _maintain_shared_table(self) -> None:
+        """Refresh the writer heartbeat, or take over writing if the previous writer exited."""
+        table = self.shared_table
+        if table is None or not table.is_open:
+            return
+        if not table.is_writer:
+            if not table.try_acquire_writer():
+                return
+            now_ms = int(time.time() * 1000)
+            for symbol, price in self.prices.items():
+                table.write(symbol, price, self.cache._timestamps_ms.get(symbol.upper(), now_ms))
+        table.heartbeat()
+
     async def _silence_watchdog(self) -> None:
         while self.is_running and not self._stop_event.is_set():
             elapsed = time.monotonic() - self._last_message_monotonic
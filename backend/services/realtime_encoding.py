@@ -0,0 +1,117 @@
+"""
+Frame encoding for realtime WebSocket channels.
+
+Broadcast payloads are encoded once per update (and per wire format) and the resulting
+frame is shared by every client queue, instead of each sender re-serializing the same
+message. JSON frames use orjson when it is installed and enabled, otherwise the stdlib
+encoder. Clients may negotiate binary MessagePack frames with the ``msgpack``
+WebSocket subprotocol or a ``?format=msgpack`` query parameter.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+    logger.debug("orjson not installed; realtime frames use the stdlib json encoder")
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+    logger.debug("msgpack not installed; realtime channels are JSON-only")
+
+FORMAT_JSON = "json"
+FORMAT_MSGPACK = "msgpack"
+
+Frame = Union[str, bytes]
+
+
+def _orjson_enabled() -> bool:
+    return ORJSON_AVAILABLE and settings.ws_json_encoder == "orjson"
+
+
+def encode_json(message: Any) -> str:
+    """Encode a message as a compact JSON text frame."""
+    if _orjson_enabled():
+        return orjson.dumps(message).decode("utf-8")
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_msgpack(message: Any) -> bytes:
+    """Encode a message as a MessagePack binary frame."""
+    return msgpack.packb(message, use_bin_type=True)
+
+
+def encode_frame(message: Any, wire_format: str = FORMAT_JSON) -> Frame:
+    if wire_format == FORMAT_MSGPACK:
+        return encode_msgpack(message)
+    return encode_json(message)
+
+
+def negotiate_format(websocket: WebSocket) -> Tuple[str, Optional[str]]:
+    """
+    Pick the wire format for a connecting client.
+
+    Returns ``(wire_format, subprotocol)``; pass ``subprotocol`` to ``websocket.accept`` so
+    the handshake confirms the negotiated protocol. Falls back to JSON when msgpack is not
+    installed.
+    """
+    if not MSGPACK_AVAILABLE:
+        return FORMAT_JSON, None
+
+    offered = [
+        p.strip() for p in websocket.headers.get("sec-websocket-protocol", "").split(",") if p.strip()
+    ]
+    if FORMAT_MSGPACK in offered:
+        return FORMAT_MSGPACK, FORMAT_MSGPACK
+    if websocket.query_params.get("format") == FORMAT_MSGPACK:
+        return FORMAT_MSGPACK, None
+    return FORMAT_JSON, None
+
+
+class SharedFrame:
+    """A broadcast message encoded lazily, at most once per wire format."""
+
+    __slots__ = ("message", "_frames")
+
+    def __init__(self, message: Any):
+        self.message = message
+        self._frames: Dict[str, Frame] = {}
+
+    def get(self, wire_format: str = FORMAT_JSON) -> Frame:
+        frame = self._frames.get(wire_format)
+        if frame is None:
+            frame = encode_frame(self.message, wire_format)
+            self._frames[wire_format] = frame
+        return frame
+
+    @property
+    def encoded_count(self) -> int:
+        return len(self._frames)
+
+
+async def send_frame(websocket: WebSocket, frame: Frame) -> None:
+    """Send a pre-encoded frame as a text or binary WebSocket message."""
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
+
+
+async def send_message(websocket: WebSocket, message: Any, wire_format: str = FORMAT_JSON) -> None:
+    """Encode and send a one-off (non-broadcast) message in the client's wire format."""
+    await send_frame(websocket, encode_frame(message, wire_format))
@@ -0,0 +1,236 @@
+"""
+Host-local shared-memory price table.
+
+A fixed-slot array in an mmap-backed file (``/dev/shm`` by default) that lets every worker
+process on a host read the latest prices without a Redis round-trip or IPC.
+
+Layout: a 64-byte header followed by ``slots`` 64-byte slots. Each slot is guarded by a
+seqlock: the writer bumps the slot's sequence to an odd value, writes symbol/price/timestamp,
+then bumps it to the next even value. Readers retry while the sequence is odd or changed
+under them, so reads never take a lock.
+
+Exactly one process per host writes: whichever holds an exclusive ``flock`` on the file.
+The writer refreshes a heartbeat in the header; readers ignore the table once it goes stale
+(e.g. the writing worker died and no other worker has taken over yet).
+"""
+
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CVPRICE1"
+VERSION = 1
+HEADER_SIZE = 64
+SLOT_SIZE = 64
+SYMBOL_BYTES = 16
+# magic, version, slot count, writer heartbeat (ms since epoch)
+_HEADER = struct.Struct("<8sIIq")
+_SEQ = struct.Struct("<Q")
+# symbol, price, tick timestamp (ms)
+_SLOT_BODY = struct.Struct(f"<{SYMBOL_BYTES}sdq")
+_HEARTBEAT_OFFSET = 16
+
+WRITER_STALE_MS = 5000
+MAX_READ_RETRIES = 16
+RESCAN_INTERVAL_SECONDS = 1.0
+
+
+class SharedPriceTable:
+    """Single-writer, lock-free-reader price table shared by the workers of one host."""
+
+    def __init__(self, path: str, slots: int = 256):
+        self.path = path
+        self.slots = slots
+        self.size = HEADER_SIZE + slots * SLOT_SIZE
+        self._fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+        self._index: Dict[str, int] = {}
+        self._last_scan = 0.0
+        self.is_writer = False
+
+        self.writes = 0
+        self.reads = 0
+        self.read_retries = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._mm is not None
+
+    def open(self) -> bool:
+        """Map the table file, creating it if needed. Returns False if unavailable."""
+        if self._mm is not None:
+            return True
+        if not FCNTL_AVAILABLE:
+            logger.warning("Shared price table needs POSIX flock; disabled on this platform")
+            return False
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(fd).st_size < self.size:
+                os.ftruncate(fd, self.size)
+            self._mm = mmap.mmap(fd, self.size)
+            self._fd = fd
+            return True
+        except OSError as exc:
+            logger.warning("Shared price table unavailable at %s: %s", self.path, exc)
+            return False
+
+    def close(self) -> None:
+        if self._fd is not None and self.is_writer:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self.is_writer = False
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._index = {}
+
+    def try_acquire_writer(self) -> bool:
+        """Become the host's writer if no other process holds the table. Never blocks."""
+        if self.is_writer:
+            return True
+        if self._mm is None:
+            return False
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+
+        self.is_writer = True
+        magic, version, slots, _ = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or slots != self.slots:
+            self._mm[:] = bytes(self.size)
+            _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, self.slots, 0)
+        self._scan()
+        self.heartbeat()
+        logger.info("Shared price table writer acquired (pid=%s, path=%s)", os.getpid(), self.path)
+        return True
+
+    # ------------------------------------------------------------------
+    # Writer side
+    # ------------------------------------------------------------------
+
+    def heartbeat(self) -> None:
+        if self.is_writer:
+            struct.pack_into("<q", self._mm, _HEARTBEAT_OFFSET, int(time.time() * 1000))
+
+    def write(self, symbol: str, price: float, ts_ms: int) -> bool:
+        if not self.is_writer:
+            return False
+        key = symbol.lower()
+        slot = self._index.get(key)
+        if slot is None:
+            if len(self._index) >= self.slots:
+                return False
+            slot = len(self._index)
+            self._index[key] = slot
+
+        offset = HEADER_SIZE + slot * SLOT_SIZE
+        (seq,) = _SEQ.unpack_from(self._mm, offset)
+        _SEQ.pack_into(self._mm, offset, seq + 1)
+        _SLOT_BODY.pack_into(self._mm, offset + _SEQ.size, key.encode()[:SYMBOL_BYTES], price, ts_ms)
+        _SEQ.pack_into(self._mm, offset, seq + 2)
+        self.writes += 1
+        return True
+
+    # ------------------------------------------------------------------
+    # Reader side
+    # ------------------------------------------------------------------
+
+    def is_live(self) -> bool:
+        """True when a writer has refreshed the heartbeat recently."""
+        if self._mm is None:
+            return False
+        magic, version, _, heartbeat_ms = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            return False
+        return int(time.time() * 1000) - heartbeat_ms <= WRITER_STALE_MS
+
+    def read(self, symbol: str) -> Optional[Tuple[float, int]]:
+        """Return ``(price, ts_ms)`` for ``symbol`` or None if it is not in the table."""
+        if self._mm is None:
+            return None
+        key = symbol.lower()
+        slot = self._index.get(key)
+        if slot is None:
+            if time.monotonic() - self._last_scan < RESCAN_INTERVAL_SECONDS:
+                return None
+            self._scan()
+            slot = self._index.get(key)
+            if slot is None:
+                return None
+
+        entry = self._read_slot(slot)
+        if entry is None or entry[0] != key:
+            return None
+        self.reads += 1
+        return entry[1], entry[2]
+
+    def get(self, symbol: str) -> Optional[float]:
+        entry = self.read(symbol)
+        return entry[0] if entry else None
+
+    def snapshot(self) -> Dict[str, float]:
+        self._scan()
+        prices: Dict[str, float] = {}
+        for slot in self._index.values():
+            entry = self._read_slot(slot)
+            if entry is not None:
+                prices[entry[0]] = entry[1]
+        return prices
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "open": self.is_open,
+            "writer": self.is_writer,
+            "live": self.is_live(),
+            "symbols": len(self._index),
+            "slots": self.slots,
+            "writes": self.writes,
+            "reads": self.reads,
+            "read_retries": self.read_retries,
+        }
+
+    def _read_slot(self, slot: int) -> Optional[Tuple[str, float, int]]:
+        offset = HEADER_SIZE + slot * SLOT_SIZE
+        for _ in range(MAX_READ_RETRIES):
+            (seq_before,) = _SEQ.unpack_from(self._mm, offset)
+            if seq_before & 1:
+                self.read_retries += 1
+                continue
+            raw_symbol, price, ts_ms = _SLOT_BODY.unpack_from(self._mm, offset + _SEQ.size)
+            (seq_after,) = _SEQ.unpack_from(self._mm, offset)
+            if seq_before != seq_after:
+                self.read_retries += 1
+                continue
+            if seq_before == 0:
+                return None
+            return raw_symbol.rstrip(b"\x00").decode(), price, ts_ms
+        return None
+
+    def _scan(self) -> None:
+        """Rebuild the symbol -> slot index from the table (slots are filled in order)."""
+        self._last_scan = time.monotonic()
+        if self._mm is None:
+            return
+        index: Dict[str, int] = {}
+        for slot in range(self.slots):
+            entry = self._read_slot(slot)
+            if entry is None:
+                break
+            index[entry[0]] = slot
+        self._index = index
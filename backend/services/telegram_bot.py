@@ -11,6 +11,8 @@ from datetime import datetime, timezone
 
 import httpx
 from config import settings
+from ledger import post_balance_change
+from wallet_lanes import wallet_lanes
 
 # Phase 3 Fault Tolerance
 from circuit_breaker import with_circuit_breaker, BREAKER_TELEGRAM
@@ -891,38 +893,31 @@ Created: {user.get('created_at', 'N/A')}
                 if not withdrawal:
                     return f"❌ Withdrawal {withdrawal_id} not found"
                 
-                if withdrawal['status'] != 'pending':
-                    return f"❌ Withdrawal {withdrawal_id} is not pending (status: {withdrawal['status']})"
-                
-                # Update withdrawal status
-                await db.get_collection("withdrawals").update_one(
-                    {"id": withdrawal_id},
-                    {
-                        "$set": {
-                            "status": "cancelled",
-                            "notes": reason,
-                            "processed_at": datetime.now(timezone.utc)
-                        }
-                    }
-                )
-                
-                # Refund amount to wallet
-                total_amount = withdrawal['total_amount']
-                currency = withdrawal['currency']
-                user_id = withdrawal['user_id']
-                
-                wallet = await db.get_collection("wallets").find_one({"user_id": user_id})
-                if wallet:
-                    current_balance = wallet.get('balances', {}).get(currency, 0)
-                    await db.get_collection("wallets").update_one(
-                        {"user_id": user_id},
+                async with wallet_lanes.lane(withdrawal['user_id']):
+                    # Re-read inside the lane so a concurrent rejection cannot refund twice
+                    withdrawal = await db.get_collection("withdrawals").find_one({"id": withdrawal_id})
+                    if withdrawal['status'] != 'pending':
+                        return f"❌ Withdrawal {withdrawal_id} is not pending (status: {withdrawal['status']})"
+
+                    # Update withdrawal status
+                    await db.get_collection("withdrawals").update_one(
+                        {"id": withdrawal_id},
                         {
                             "$set": {
-                                f"balances.{currency}": current_balance + total_amount,
-                                "updated_at": datetime.now(timezone.utc)
+                                "status": "cancelled",
+                                "notes": reason,
+                                "processed_at": datetime.now(timezone.utc)
                             }
                         }
                     )
+
+                    # Refund amount to wallet
+                    await post_balance_change(
+                        db, withdrawal['user_id'], {withdrawal['currency']: withdrawal['total_amount']},
+                        kind="withdrawal_refund",
+                        reference=withdrawal_id,
+                        description=f"Withdrawal rejected via Telegram: {reason}",
+                    )
                 
                 return f"✅ Withdrawal {withdrawal_id} rejected and amount refunded: {reason}"
                     
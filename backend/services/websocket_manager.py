@@ -9,13 +9,15 @@ Features:
 - Graceful shutdown with connection draining
 - Metrics collection for observability
 - Memory-efficient connection tracking
+- Concurrent broadcast with per-send deadlines; a connection whose write fails or misses
+  its deadline is closed (a cancelled write may have left a partial frame on the socket)
 """
 
 import asyncio
 import json
 import logging
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
 from enum import Enum
@@ -39,13 +41,14 @@ class ConnectionState(Enum):
 @dataclass
 class ConnectionMetrics:
     """Metrics for a single connection."""
-    connected_at: datetime = field(default_factory=datetime.utcnow)
-    last_activity: datetime = field(default_factory=datetime.utcnow)
+    connected_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    last_activity: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
     messages_sent: int = 0
     messages_received: int = 0
     bytes_sent: int = 0
     bytes_received: int = 0
     errors: int = 0
+    send_timeouts: int = 0
 
 
 @dataclass
@@ -59,6 +62,8 @@ class ConnectionInfo:
     metrics: ConnectionMetrics = field(default_factory=ConnectionMetrics)
     rate_limit_tokens: float = 10.0  # Token bucket for rate limiting
     last_rate_refill: float = field(default_factory=time.time)
+    # Serializes writes so concurrent broadcasts never interleave on one socket
+    send_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
 
 
 class RateLimiter:
@@ -106,6 +111,8 @@ class EnterpriseWebSocketManager:
     MESSAGE_RATE_LIMIT: float = 10.0  # messages per second
     MAX_MESSAGE_SIZE: int = 65536  # 64KB
     HEALTH_CHECK_INTERVAL: int = 30  # seconds
+    SEND_TIMEOUT_SECONDS: float = 2.0  # per-send deadline during broadcasts
+    LATENCY_SAMPLE_SIZE: int = 1000
     
     def __init__(
         self,
@@ -113,13 +120,15 @@ class EnterpriseWebSocketManager:
         max_connections_per_user: int = None,
         max_total_connections: int = None,
         message_rate_limit: float = None,
-        connection_timeout: int = None
+        connection_timeout: int = None,
+        send_timeout: float = None
     ):
         # Configuration
         self.max_connections_per_ip = max_connections_per_ip or self.MAX_CONNECTIONS_PER_IP
         self.max_connections_per_user = max_connections_per_user or self.MAX_CONNECTIONS_PER_USER
         self.max_total_connections = max_total_connections or self.MAX_TOTAL_CONNECTIONS
         self.connection_timeout = connection_timeout or self.CONNECTION_TIMEOUT_SECONDS
+        self.send_timeout = send_timeout or self.SEND_TIMEOUT_SECONDS
         
         # Connection tracking
         self._connections: Dict[WebSocket, ConnectionInfo] = {}
@@ -137,6 +146,10 @@ class EnterpriseWebSocketManager:
         self._total_messages_sent: int = 0
         self._total_messages_received: int = 0
         self._start_time: datetime = datetime.now(timezone.utc)
+        self._total_send_timeouts: int = 0
+        self._total_laggards_disconnected: int = 0
+        self._send_latencies_ms: deque = deque(maxlen=self.LATENCY_SAMPLE_SIZE)
+        self._broadcast_latencies_ms: deque = deque(maxlen=self.LATENCY_SAMPLE_SIZE)
         
         # Background tasks
         self._health_check_task: Optional[asyncio.Task] = None
@@ -290,22 +303,92 @@ class EnterpriseWebSocketManager:
         if not info:
             return False
         
+        message = json.dumps(data)
+        return await self._send_text(websocket, info, message, len(message.encode()))
+    
+    async def _send_text(
+        self,
+        websocket: WebSocket,
+        info: ConnectionInfo,
+        message: str,
+        message_bytes: int,
+        timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Write a pre-encoded frame, optionally bounded by a deadline.
+        
+        A write that fails or is cancelled at its deadline may have left a partial frame on
+        the socket, so the connection is closed rather than reused.
+        """
+        started = time.perf_counter()
         try:
-            message = json.dumps(data)
-            message_bytes = len(message.encode())
-            
-            await websocket.send_text(message)
-            
-            info.metrics.messages_sent += 1
-            info.metrics.bytes_sent += message_bytes
-            info.metrics.last_activity = datetime.now(timezone.utc)
-            self._total_messages_sent += 1
-            
-            return True
+            if timeout is None:
+                async with info.send_lock:
+                    await websocket.send_text(message)
+            else:
+                await asyncio.wait_for(self._locked_send(websocket, info, message), timeout=timeout)
+        except asyncio.TimeoutError:
+            info.metrics.send_timeouts += 1
+            self._total_send_timeouts += 1
+            self._total_laggards_disconnected += 1
+            logger.warning(f"🐢 Disconnecting slow WebSocket consumer {info.client_ip} (send exceeded {timeout}s)")
+            self._drop(websocket, code=1008, reason="Slow consumer")
+            return False
         except Exception as e:
             info.metrics.errors += 1
             logger.debug(f"Send error: {e}")
+            self._drop(websocket, code=1011, reason="Send failed")
             return False
+        
+        self._send_latencies_ms.append((time.perf_counter() - started) * 1000)
+        info.metrics.messages_sent += 1
+        info.metrics.bytes_sent += message_bytes
+        info.metrics.last_activity = datetime.now(timezone.utc)
+        self._total_messages_sent += 1
+        return True
+    
+    @staticmethod
+    async def _locked_send(websocket: WebSocket, info: ConnectionInfo, message: str) -> None:
+        async with info.send_lock:
+            await websocket.send_text(message)
+    
+    def _drop(self, websocket: WebSocket, code: int, reason: str) -> None:
+        """Forget a connection whose stream can no longer be trusted and close it in the background."""
+        if websocket not in self._connections:
+            return
+        self.disconnect(websocket)
+        asyncio.create_task(self._close_quietly(websocket, code=code, reason=reason))
+    
+    async def _broadcast(self, targets: List[WebSocket], data: Dict[str, Any]) -> int:
+        """
+        Deliver one message to many connections concurrently.
+        
+        The payload is encoded once and every write is bounded by ``send_timeout``, so total
+        latency is that of the slowest client rather than the sum over all clients. Each
+        socket has at most one write in flight (``send_lock``) instead of an outbound queue:
+        a client that cannot take a frame within the deadline is closed, which bounds the
+        backlog per connection to the frame being written.
+        """
+        pairs = [(ws, self._connections[ws]) for ws in targets if ws in self._connections]
+        if not pairs:
+            return 0
+        
+        started = time.perf_counter()
+        message = json.dumps(data)
+        message_bytes = len(message.encode())
+        results = await asyncio.gather(*(
+            self._send_text(ws, info, message, message_bytes, timeout=self.send_timeout)
+            for ws, info in pairs
+        ))
+        self._broadcast_latencies_ms.append((time.perf_counter() - started) * 1000)
+        return sum(results)
+    
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int, reason: str) -> None:
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
     
     async def receive_json(
         self,
@@ -411,24 +494,10 @@ class EnterpriseWebSocketManager:
             return 0
         
         exclude = exclude or set()
-        sent_count = 0
-        failed = set()
-        
-        for websocket in subscribers:
-            if websocket in exclude:
-                continue
-            
-            success = await self.send_json(websocket, data)
-            if success:
-                sent_count += 1
-            else:
-                failed.add(websocket)
-        
-        # Clean up failed connections
-        for ws in failed:
-            self.disconnect(ws)
-        
-        return sent_count
+        return await self._broadcast(
+            [ws for ws in subscribers if ws not in exclude],
+            data
+        )
     
     async def broadcast_all(
         self,
@@ -436,23 +505,13 @@ class EnterpriseWebSocketManager:
         only_authenticated: bool = False
     ) -> int:
         """Broadcast message to all connections."""
-        sent_count = 0
-        failed = set()
-        
-        for websocket, info in list(self._connections.items()):
-            if only_authenticated and info.state != ConnectionState.AUTHENTICATED:
-                continue
-            
-            success = await self.send_json(websocket, data)
-            if success:
-                sent_count += 1
-            else:
-                failed.add(websocket)
-        
-        for ws in failed:
-            self.disconnect(ws)
-        
-        return sent_count
+        return await self._broadcast(
+            [
+                websocket for websocket, info in self._connections.items()
+                if not only_authenticated or info.state == ConnectionState.AUTHENTICATED
+            ],
+            data
+        )
     
     async def broadcast_to_user(
         self,
@@ -464,12 +523,7 @@ class EnterpriseWebSocketManager:
         if not connections:
             return 0
         
-        sent_count = 0
-        for websocket in list(connections):
-            if await self.send_json(websocket, data):
-                sent_count += 1
-        
-        return sent_count
+        return await self._broadcast(list(connections), data)
     
     # ============================================
     # HEALTH MONITORING
@@ -614,6 +668,13 @@ class EnterpriseWebSocketManager:
                 channel: len(subscribers)
                 for channel, subscribers in self._channel_subscribers.items()
             },
+            "delivery": {
+                "send_timeout_seconds": self.send_timeout,
+                "send_timeouts": self._total_send_timeouts,
+                "laggards_disconnected": self._total_laggards_disconnected,
+                "send_latency_ms": self._latency_percentiles(self._send_latencies_ms),
+                "broadcast_latency_ms": self._latency_percentiles(self._broadcast_latencies_ms),
+            },
             "uptime_seconds": uptime,
             "is_shutting_down": self._is_shutting_down,
             "limits": {
@@ -664,6 +725,20 @@ class EnterpriseWebSocketManager:
         
         return "unknown"
     
+    @staticmethod
+    def _latency_percentiles(samples: deque) -> Dict[str, float]:
+        """Compute p50/p95/p99 over a window of latency samples."""
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "samples": 0}
+        ordered = sorted(samples)
+        last = len(ordered) - 1
+        return {
+            "p50": round(ordered[int(last * 0.50)], 3),
+            "p95": round(ordered[int(last * 0.95)], 3),
+            "p99": round(ordered[int(last * 0.99)], 3),
+            "samples": len(ordered),
+        }
+    
     def _check_connection_limits(self, client_ip: str) -> bool:
         """Check if connection should be allowed based on limits."""
         # Check total connections
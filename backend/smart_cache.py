@@ -11,6 +11,8 @@ from datetime import datetime, timezone, timedelta
 from dataclasses import dataclass
 import json
 
+from tiered_cache import TieredCache, estimate_size, tiered_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -53,12 +55,16 @@ class SmartCacheManager:
     - Priority-based TTL: Important items stay longer
     - Predictive refresh: Refresh cache before expiry based on access patterns
     - Cold cache handling: Backoff strategy for newly cached items
-    - Access-based eviction: Removes least-accessed items when capacity exceeded
+    - LRU eviction: Items live in the tiered cache's "smart" namespace, which drops the
+      least recently used entry in O(1) once capacity is exceeded
     """
     
-    def __init__(self, max_items: int = 10000):
-        self.cache: Dict[str, CachedItem] = {}
+    def __init__(self, max_items: int = 10000, namespace: str = "smart", engine: Optional[TieredCache] = None):
+        self._engine = engine or tiered_cache
+        self._namespace = namespace
         self.max_items = max_items
+        # Expiry stays on CachedItem (ttl 0 here) so expired items can still be served stale
+        self._engine.configure(namespace, ttl_seconds=0, max_entries=max_items)
         self.refresh_tasks: Dict[str, asyncio.Task] = {}
         self.total_hits = 0
         self.total_misses = 0
@@ -83,8 +89,8 @@ class SmartCacheManager:
         Returns:
             Cached value (may be stale if fetch_func not provided)
         """
-        if key in self.cache:
-            item = self.cache[key]
+        item = self._engine.get_local(self._namespace, key)
+        if item is not None:
             item.last_accessed = datetime.now(timezone.utc)
             item.access_count += 1
             
@@ -111,7 +117,7 @@ class SmartCacheManager:
                         raise
                 
                 # Cache expired and no fetch_func
-                del self.cache[key]
+                self._engine.delete_local(self._namespace, key)
                 return None
             
             # Cache hit (fresh)
@@ -141,20 +147,17 @@ class SmartCacheManager:
     def _update_cache(self, key: str, value: Any, ttl_seconds: int, priority: int):
         """Update cache entry"""
         now = datetime.now(timezone.utc)
-        
-        # Check capacity
-        if len(self.cache) >= self.max_items and key not in self.cache:
-            self._evict_least_accessed()
+        item = self._engine.peek_local(self._namespace, key)
         
         # Update or create entry
-        if key in self.cache:
-            self.cache[key].value = value
-            self.cache[key].created_at = now
-            self.cache[key].ttl_seconds = ttl_seconds
-            self.cache[key].priority = priority
-            self.cache[key].is_stale = False
+        if item is not None:
+            item.value = value
+            item.created_at = now
+            item.ttl_seconds = ttl_seconds
+            item.priority = priority
+            item.is_stale = False
         else:
-            self.cache[key] = CachedItem(
+            item = CachedItem(
                 key=key,
                 value=value,
                 created_at=now,
@@ -162,6 +165,9 @@ class SmartCacheManager:
                 ttl_seconds=ttl_seconds,
                 priority=priority
             )
+        # Re-inserting refreshes the entry's size and LRU position; at capacity the
+        # engine evicts the coldest item in O(1)
+        self._engine.set_local(self._namespace, key, item, size=estimate_size(value)[0])
         
         logger.debug(f"💾 Cached: {key} (ttl={ttl_seconds}s, priority={priority})")
     
@@ -184,23 +190,6 @@ class SmartCacheManager:
             if key in self.refresh_tasks:
                 del self.refresh_tasks[key]
     
-    def _evict_least_accessed(self):
-        """Evict least accessed item (respecting priority)"""
-        if not self.cache:
-            return
-        
-        # Sort by (priority desc, access_count asc) and evict lowest
-        least_accessed = min(
-            self.cache.values(),
-            key=lambda x: (x.priority * -1, x.access_count)
-        )
-        
-        logger.warning(
-            f"🗑️  Evicting {least_accessed.key} "
-            f"(priority={least_accessed.priority}, accesses={least_accessed.access_count})"
-        )
-        del self.cache[least_accessed.key]
-    
     async def invalidate(self, pattern: Optional[str] = None):
         """
         Invalidate cache entries matching pattern.
@@ -210,43 +199,44 @@ class SmartCacheManager:
         """
         if not pattern:
             # Invalidate all
-            self.cache.clear()
+            self._engine.invalidate(self._namespace)
             logger.info("💣 All cache invalidated")
             return
         
         # Pattern-based invalidation
         if pattern.endswith("*"):
-            prefix = pattern[:-1]
-            keys_to_remove = [k for k in self.cache.keys() if k.startswith(prefix)]
-            for k in keys_to_remove:
-                del self.cache[k]
-            logger.info(f"💣 Invalidated {len(keys_to_remove)} items matching {pattern}")
+            removed = self._engine.invalidate(self._namespace, pattern)
+            logger.info(f"💣 Invalidated {removed} items matching {pattern}")
     
     async def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
         total_requests = self.total_hits + self.total_misses
         hit_rate = (self.total_hits / total_requests * 100) if total_requests > 0 else 0
+        items = [item for _, item in self._engine.items(self._namespace)]
+        namespace = self._engine.namespace_stats(self._namespace)
         
         return {
-            "total_items": len(self.cache),
-            "capacity": f"{len(self.cache)}/{self.max_items}",
+            "total_items": len(items),
+            "capacity": f"{len(items)}/{self.max_items}",
             "cache_hits": self.total_hits,
             "cache_misses": self.total_misses,
             "hit_rate_percentage": round(hit_rate, 2),
             "times_served_stale": self.staleness_served,
             "in_flight_refreshes": len(self.refresh_tasks),
             "avg_item_age_seconds": round(
-                sum(item.age_seconds() for item in self.cache.values()) / len(self.cache)
-                if self.cache else 0,
+                sum(item.age_seconds() for item in items) / len(items)
+                if items else 0,
                 2
-            )
+            ),
+            "bytes": namespace["bytes"],
+            "evictions": namespace["evictions"],
         }
     
     async def cleanup_expired(self) -> int:
         """Remove expired items from cache"""
-        expired_keys = [k for k, v in self.cache.items() if v.is_expired()]
+        expired_keys = [k for k, v in self._engine.items(self._namespace) if v.is_expired()]
         for k in expired_keys:
-            del self.cache[k]
+            self._engine.delete_local(self._namespace, k)
         
         if expired_keys:
             logger.info(f"🧹 Removed {len(expired_keys)} expired cache items")
@@ -7,6 +7,7 @@ Enterprise Features:
 - JWT token validation for authenticated connections
 - Room-based broadcasting (user-specific, global)
 - Connection state tracking with heartbeat
+- Optional MessagePack payloads per channel subscription
 """
 import logging
 import socketio
@@ -15,6 +16,8 @@ from typing import Dict, Set, Optional, List
 from datetime import datetime, timezone
 
 from config import settings
+from services.price_delta import DeltaPriceEncoder
+from services.realtime_encoding import FORMAT_MSGPACK, MSGPACK_AVAILABLE, encode_msgpack
 
 logger = logging.getLogger(__name__)
 
@@ -61,6 +64,15 @@ class SocketIOManager:
         # Track user sessions: {user_id: [sid1, sid2, ...]}
         self.user_sessions: Dict[str, Set[str]] = {}
         
+        # Channel subscribers that asked for binary MessagePack payloads: {channel: {sid, ...}}
+        self.msgpack_subscribers: Dict[str, Set[str]] = {}
+        
+        # Shared delta/keyframe state for the opt-in 'prices_delta' channel
+        self.price_delta_encoder = DeltaPriceEncoder(
+            keyframe_interval_seconds=settings.ws_delta_keyframe_interval_seconds,
+            tick_size_bps=settings.ws_delta_tick_size_bps,
+        )
+        
         # Setup event handlers
         self._setup_handlers()
         
@@ -100,6 +112,8 @@ class SocketIOManager:
                         del self.user_sessions[user_id]
                 
                 del self.connections[sid]
+                for subscribers in self.msgpack_subscribers.values():
+                    subscribers.discard(sid)
                 logger.info(f"🔴 Client disconnected: {sid} (user: {user_id})")
         
         @self.sio.event
@@ -171,21 +185,40 @@ class SocketIOManager:
         
         @self.sio.event
         async def subscribe(sid, data):
-            """Subscribe to specific channels (prices, notifications, etc.)."""
+            """
+            Subscribe to specific channels (prices, notifications, etc.).
+            
+            Pass ``"format": "msgpack"`` to receive channel events as binary MessagePack
+            payloads instead of JSON objects.
+            """
             try:
                 channels = data.get("channels", [])
+                use_msgpack = data.get("format") == FORMAT_MSGPACK and MSGPACK_AVAILABLE
                 
                 for channel in channels:
-                    await self.sio.enter_room(sid, f"channel:{channel}")
+                    if use_msgpack:
+                        await self.sio.enter_room(sid, f"channel:{channel}:msgpack")
+                        self.msgpack_subscribers.setdefault(channel, set()).add(sid)
+                    else:
+                        await self.sio.enter_room(sid, f"channel:{channel}")
                     logger.debug(f"📡 {sid} subscribed to {channel}")
                 
                 await self.sio.emit('subscribed', {
-                    "channels": channels
+                    "channels": channels,
+                    "format": FORMAT_MSGPACK if use_msgpack else "json"
                 }, room=sid)
+                
+                if "prices_delta" in channels:
+                    await self._emit_price_snapshot(sid)
             
             except Exception as e:
                 logger.error(f"Subscribe error: {e}")
         
+        @self.sio.event
+        async def resync(sid, data=None):
+            """Resend a price keyframe to a delta-channel client that detected a sequence gap."""
+            await self._emit_price_snapshot(sid)
+        
         @self.sio.event
         async def unsubscribe(sid, data):
             """Unsubscribe from channels."""
@@ -194,6 +227,8 @@ class SocketIOManager:
                 
                 for channel in channels:
                     await self.sio.leave_room(sid, f"channel:{channel}")
+                    await self.sio.leave_room(sid, f"channel:{channel}:msgpack")
+                    self.msgpack_subscribers.get(channel, set()).discard(sid)
                     logger.debug(f"📡 {sid} unsubscribed from {channel}")
                 
                 await self.sio.emit('unsubscribed', {
@@ -232,9 +267,11 @@ class SocketIOManager:
         logger.debug(f"📤 Broadcast to user {user_id}: {event}")
     
     async def broadcast_to_channel(self, channel: str, event: str, data: Dict):
-        """Broadcast message to all subscribers of a channel."""
+        """Broadcast message to all subscribers of a channel, once per payload format."""
         room = f"channel:{channel}"
         await self.sio.emit(event, data, room=room)
+        if self.msgpack_subscribers.get(channel):
+            await self.sio.emit(event, encode_msgpack(data), room=f"{room}:msgpack")
         logger.debug(f"📤 Broadcast to channel {channel}: {event}")
     
     async def broadcast_global(self, event: str, data: Dict):
@@ -249,6 +286,21 @@ class SocketIOManager:
             "timestamp": datetime.now(timezone.utc).isoformat()
         })
     
+    async def on_price_stream_update(self, prices: Dict[str, float], timestamp_ms: int):
+        """PriceStreamService subscriber that relays conflated updates to the price channels."""
+        await self.broadcast_price_update({symbol: str(price) for symbol, price in prices.items()})
+        
+        frame = self.price_delta_encoder.update(prices, timestamp_ms)
+        if frame is not None:
+            await self.broadcast_to_channel('prices_delta', frame["type"], frame)
+
+    async def _emit_price_snapshot(self, sid: str):
+        snapshot = self.price_delta_encoder.snapshot()
+        if sid in self.msgpack_subscribers.get("prices_delta", set()):
+            await self.sio.emit('price_snapshot', encode_msgpack(snapshot), room=sid)
+        else:
+            await self.sio.emit('price_snapshot', snapshot, room=sid)
+    
     async def send_notification(self, user_id: str, notification: Dict):
         """Send notification to specific user."""
         await self.broadcast_to_user(user_id, 'notification', {
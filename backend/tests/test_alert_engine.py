@@ -0,0 +1,152 @@
+"""
+Price alert engine tests.
+
+Tests cover:
+- Sorted per-symbol indexes releasing only crossed alerts
+- Staying in step with create/update/delete
+- Marking a batch triggered with one bulk_write and notifying only our own writes
+- Reloading active alerts on start
+"""
+
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.alert_engine import AlertEngine
+
+
+def _alert(alert_id, condition, target, symbol="BTC", **extra):
+    doc = {
+        "id": alert_id,
+        "user_id": "u1",
+        "symbol": symbol,
+        "target_price": target,
+        "condition": condition,
+        "is_active": True,
+        "triggered_at": None,
+    }
+    doc.update(extra)
+    return doc
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._docs:
+            raise StopAsyncIteration
+        return self._docs.pop(0)
+
+
+@pytest.fixture
+def engine():
+    engine = AlertEngine()
+    engine.is_running = True
+    return engine
+
+
+class TestAlertIndex:
+
+    def test_only_crossed_alerts_trigger(self, engine):
+        engine.upsert_alert(_alert("a100", "above", 100))
+        engine.upsert_alert(_alert("a110", "above", 110))
+        engine.upsert_alert(_alert("b90", "below", 90))
+        engine.upsert_alert(_alert("b80", "below", 80))
+        engine.upsert_alert(_alert("eth", "above", 1, symbol="ETH"))
+
+        assert engine.evaluate("btcusd", 95) == []
+        assert [a["id"] for a in engine.evaluate("btcusd", 100)] == ["a100"]
+        assert [a["id"] for a in engine.evaluate("btcusd", 85)] == ["b90"]
+        assert {a["id"] for a in engine.evaluate("btcusd", 200)} == {"a110"}
+        assert set(engine._alerts) == {"b80", "eth"}
+        assert [a["id"] for a in engine._pending] == ["a100", "b90", "a110"]
+
+    def test_update_reindexes_and_delete_removes(self, engine):
+        engine.upsert_alert(_alert("a1", "above", 100))
+        engine.upsert_alert(_alert("a1", "above", 150))
+        engine.upsert_alert(_alert("a2", "below", 50))
+        engine.remove_alert("a2")
+
+        assert engine.evaluate("btcusd", 120) == []
+        assert engine.evaluate("btcusd", 10) == []
+        assert [a["target_price"] for a in engine.evaluate("btcusd", 150)] == [150.0]
+
+    def test_deactivated_alert_is_dropped(self, engine):
+        engine.upsert_alert(_alert("a1", "above", 100))
+        engine.upsert_alert(_alert("a1", "above", 100, is_active=False))
+        assert engine.evaluate("btcusd", 100) == []
+
+
+class TestAlertFlush:
+
+    def _db(self, modified, mine):
+        alerts = MagicMock()
+        alerts.bulk_write = AsyncMock(return_value=MagicMock(modified_count=modified))
+        alerts.find.return_value = _Cursor([{"id": alert_id} for alert_id in mine])
+        db = MagicMock()
+        db.get_collection.return_value = alerts
+        return db, alerts
+
+    @pytest.mark.asyncio
+    async def test_batch_is_one_bulk_write(self, engine):
+        db, alerts = self._db(modified=2, mine=["a1", "a2"])
+        engine._db = db
+        for i, target in enumerate([100, 101, 102], start=1):
+            engine.upsert_alert(_alert(f"a{i}", "above", target))
+        engine.evaluate("btcusd", 105)
+
+        with patch("routers.notifications.notify_price_alert", AsyncMock()) as notify:
+            triggered = await engine.flush()
+
+        alerts.bulk_write.assert_awaited_once()
+        operations = alerts.bulk_write.call_args[0][0]
+        assert len(operations) == 3
+        assert alerts.bulk_write.call_args[1]["ordered"] is False
+        assert [a["id"] for a in triggered] == ["a1", "a2"]
+        assert notify.await_count == 2
+        assert engine._pending == []
+
+    @pytest.mark.asyncio
+    async def test_no_modified_documents_sends_nothing(self, engine):
+        db, alerts = self._db(modified=0, mine=[])
+        engine._db = db
+        engine.upsert_alert(_alert("a1", "above", 100))
+        engine.evaluate("btcusd", 105)
+
+        with patch("routers.notifications.notify_price_alert", AsyncMock()) as notify:
+            assert await engine.flush() == []
+
+        alerts.find.assert_not_called()
+        notify.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_failed_write_restores_alerts(self, engine):
+        alerts = MagicMock()
+        alerts.bulk_write = AsyncMock(side_effect=RuntimeError("mongo down"))
+        engine._db = MagicMock()
+        engine._db.get_collection.return_value = alerts
+        engine.upsert_alert(_alert("a1", "above", 100))
+        engine.evaluate("btcusd", 105)
+
+        with pytest.raises(RuntimeError):
+            await engine.flush()
+        assert [a["id"] for a in engine.evaluate("btcusd", 105)] == ["a1"]
+
+    @pytest.mark.asyncio
+    async def test_load_indexes_active_alerts(self, engine):
+        alerts = MagicMock()
+        alerts.find.return_value = _Cursor([_alert("a1", "above", 100), _alert("b1", "below", 50)])
+        engine._db = MagicMock()
+        engine._db.get_collection.return_value = alerts
+
+        assert await engine.load() == 2
+        assert alerts.find.call_args[0][0] == {"is_active": True, "triggered_at": None}
+        assert engine.get_stats()["active_alerts"] == 2
@@ -0,0 +1,154 @@
+"""
+Write-behind audit log tests.
+
+Tests cover:
+- Batching queued entries into insert_many
+- Direct insert fallback when the writer is not running
+- Spilling failed batches (but not duplicates) to disk and replaying them
+- Flushing the queue on stop
+- Amending an entry whether it is still queued or already stored
+"""
+
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import audit_service
+from services.audit_service import AuditWriter, log_audit, update_audit_details
+
+
+def _db(insert_many=None):
+    audit_logs = MagicMock()
+    audit_logs.insert_many = insert_many or AsyncMock()
+    audit_logs.insert_one = AsyncMock()
+    audit_logs.update_one = AsyncMock()
+    db = MagicMock()
+    db.get_collection.return_value = audit_logs
+    return db, audit_logs
+
+
+def _writer(db, tmp_path, **kwargs):
+    writer = AuditWriter(spill_path=str(tmp_path / "spill.jsonl"), **kwargs)
+    writer._db = db
+    writer.is_running = True
+    return writer
+
+
+@pytest.mark.asyncio
+async def test_entries_are_written_in_batches(tmp_path):
+    db, audit_logs = _db()
+    writer = _writer(db, tmp_path, batch_size=2)
+    for i in range(3):
+        writer.enqueue({"id": f"a{i}"})
+
+    assert await writer.flush() == 2
+    assert await writer.flush() == 1
+    assert audit_logs.insert_many.await_count == 2
+    assert audit_logs.insert_many.call_args_list[0][0][0] == [{"id": "a0"}, {"id": "a1"}]
+    assert audit_logs.insert_many.call_args.kwargs["ordered"] is False
+    assert writer.get_stats()["entries_written"] == 3
+
+
+@pytest.mark.asyncio
+async def test_log_audit_inserts_directly_when_writer_stopped(monkeypatch):
+    monkeypatch.setattr(audit_service, "audit_writer", AuditWriter())
+    db, audit_logs = _db()
+
+    await log_audit(db, "u1", "WALLET_DEPOSIT", resource="dep-1", ip_address="1.2.3.4")
+
+    entry = audit_logs.insert_one.call_args[0][0]
+    assert entry["user_id"] == "u1"
+    assert entry["action"] == "WALLET_DEPOSIT"
+    assert entry["resource"] == "dep-1"
+
+
+@pytest.mark.asyncio
+async def test_log_audit_enqueues_when_writer_running(monkeypatch, tmp_path):
+    db, audit_logs = _db()
+    writer = _writer(db, tmp_path)
+    monkeypatch.setattr(audit_service, "audit_writer", writer)
+
+    await log_audit(db, "u1", "USER_LOGIN")
+
+    audit_logs.insert_one.assert_not_called()
+    assert writer.get_stats()["queued"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_spilled_and_replayed(tmp_path):
+    db, audit_logs = _db(AsyncMock(side_effect=RuntimeError("mongo down")))
+    writer = _writer(db, tmp_path)
+    writer.enqueue({"id": "a1", "action": "USER_LOGIN"})
+
+    assert await writer.flush() == 0
+    assert os.path.exists(writer.spill_path)
+    assert writer.entries_spilled == 1
+
+    audit_logs.insert_many = AsyncMock()
+    assert await writer.replay_spill() == 1
+    assert audit_logs.insert_many.call_args[0][0] == [{"id": "a1", "action": "USER_LOGIN"}]
+    assert not os.path.exists(writer.spill_path)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_keys_are_not_spilled(tmp_path):
+    error = BulkWriteError({"writeErrors": [
+        {"index": 0, "code": 11000},
+        {"index": 2, "code": 121},
+    ]})
+    db, _ = _db(AsyncMock(side_effect=error))
+    writer = _writer(db, tmp_path)
+    for i in range(3):
+        writer.enqueue({"id": f"a{i}"})
+
+    assert await writer.flush() == 1
+    with open(writer.spill_path) as spill:
+        assert [line for line in spill] == ['{"id": "a2"}\n']
+
+
+@pytest.mark.asyncio
+async def test_full_queue_spills_new_entries(tmp_path):
+    db, _ = _db()
+    writer = _writer(db, tmp_path, max_queue_size=1)
+    writer.enqueue({"id": "a1"})
+    writer.enqueue({"id": "a2"})
+
+    assert writer.get_stats()["queued"] == 1
+    assert writer.entries_spilled == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_queue(tmp_path):
+    db, audit_logs = _db()
+    writer = _writer(db, tmp_path, batch_size=2)
+    for i in range(5):
+        writer.enqueue({"id": f"a{i}"})
+
+    await writer.stop()
+
+    assert audit_logs.insert_many.await_count == 3
+    assert writer.get_stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_update_audit_details_amends_queued_or_stored_entry(monkeypatch, tmp_path):
+    db, audit_logs = _db()
+    writer = _writer(db, tmp_path)
+    monkeypatch.setattr(audit_service, "audit_writer", writer)
+
+    queued = await log_audit(db, "u1", "TRANSACTIONS_EXPORTED", details={"count": None})
+    await update_audit_details(db, queued, {"count": 3})
+    audit_logs.update_one.assert_not_called()
+
+    await writer.flush()
+    assert audit_logs.insert_many.call_args[0][0][0]["details"] == {"count": 3}
+
+    await update_audit_details(db, queued, {"count": 4})
+    audit_logs.update_one.assert_awaited_once_with(
+        {"id": queued["id"]}, {"$set": {"details": {"count": 4}}}
+    )
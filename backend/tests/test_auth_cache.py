@@ -0,0 +1,110 @@
+"""
+Authentication context cache tests.
+
+Tests cover:
+- Serving password-change times and blacklist misses from the cache
+- Never caching a revoked token
+- Dropping fills that raced an invalidation
+- LRU bound and TTL expiry
+- get_current_user_id skipping the blacklist and users lookups on a warm cache
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dependencies
+from auth import create_access_token
+from auth_cache import MISSING, AuthContextCache
+
+
+def _request(token):
+    request = MagicMock()
+    request.headers = {"Authorization": f"Bearer {token}"}
+    request.cookies = {}
+    return request
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = AuthContextCache()
+    monkeypatch.setattr(dependencies, "auth_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def users(monkeypatch):
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value={})
+    db = MagicMock()
+    db.get_collection.return_value = collection
+    monkeypatch.setattr(dependencies, "get_db", lambda: db)
+    return collection
+
+
+def test_fill_after_invalidation_is_dropped():
+    cache = AuthContextCache()
+    epoch = cache.begin()
+    cache.invalidate(user_id="u1")
+    cache.remember_password_changed_at("u1", None, epoch)
+    cache.remember_unrevoked("jti-1", epoch)
+
+    assert cache.password_changed_at("u1") is MISSING
+    assert not cache.is_known_unrevoked("jti-1")
+
+
+def test_entries_are_bounded_and_expire():
+    cache = AuthContextCache(max_entries=2, ttl_seconds=60, negative_ttl_seconds=0)
+    for user_id in ("u1", "u2", "u3"):
+        cache.remember_password_changed_at(user_id, None, cache.begin())
+    cache.remember_unrevoked("jti-1", cache.begin())
+
+    assert cache.password_changed_at("u1") is MISSING
+    assert cache.password_changed_at("u3") is None
+    assert not cache.is_known_unrevoked("jti-1")
+
+
+@pytest.mark.asyncio
+async def test_warm_cache_skips_blacklist_and_user_lookup(monkeypatch, cache, users):
+    blacklisted = AsyncMock(return_value=False)
+    monkeypatch.setattr(dependencies, "is_token_blacklisted", blacklisted)
+    token = create_access_token({"sub": "u1"})
+
+    assert await dependencies.get_current_user_id(_request(token)) == "u1"
+    assert await dependencies.get_current_user_id(_request(token)) == "u1"
+
+    assert blacklisted.await_count == 1
+    assert users.find_one.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_never_cached(monkeypatch, cache, users):
+    blacklisted = AsyncMock(return_value=True)
+    monkeypatch.setattr(dependencies, "is_token_blacklisted", blacklisted)
+    token = create_access_token({"sub": "u1"})
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc:
+            await dependencies.get_current_user_id(_request(token))
+        assert exc.value.detail == "Token has been revoked"
+    assert blacklisted.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_password_change_invalidates_cached_time(monkeypatch, cache, users):
+    monkeypatch.setattr(dependencies, "is_token_blacklisted", AsyncMock(return_value=False))
+    token = create_access_token({"sub": "u1"})
+    await dependencies.get_current_user_id(_request(token))
+
+    users.find_one.return_value = {"password_changed_at": datetime.now(timezone.utc) + timedelta(minutes=1)}
+    await cache.password_changed("u1")
+
+    with pytest.raises(HTTPException) as exc:
+        await dependencies.get_current_user_id(_request(token))
+    assert "password change" in exc.value.detail
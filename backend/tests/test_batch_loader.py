@@ -0,0 +1,93 @@
+"""
+Batch loader tests.
+
+Tests cover:
+- Concurrent loads coalescing into one $in query
+- Results returned in key order, with None for missing documents
+- Request-lifetime caching of hits and misses
+- Key field added to inclusion projections
+- Failed queries raising to every waiter without being cached
+"""
+
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from batch_loader import BatchLoader
+
+
+def _collection(docs):
+    collection = MagicMock()
+
+    def find(query, *args):
+        (field, condition), = query.items()
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(return_value=[d for d in docs if d[field] in condition["$in"]])
+        return cursor
+
+    collection.find = MagicMock(side_effect=find)
+    return collection
+
+
+@pytest.mark.asyncio
+async def test_load_many_is_one_query_in_key_order():
+    collection = _collection([{"id": "u2", "name": "Bo"}, {"id": "u1", "name": "Al"}])
+    loader = BatchLoader(collection)
+
+    users = await loader.load_many(["u1", "u2", "u3", "u1"])
+
+    assert [u and u["name"] for u in users] == ["Al", "Bo", None, "Al"]
+    collection.find.assert_called_once_with({"id": {"$in": ["u1", "u2", "u3"]}})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_share_a_query():
+    collection = _collection([{"user_id": "u1", "balances": {"USD": 5}}])
+    loader = BatchLoader(collection, key_field="user_id")
+
+    first, second = await asyncio.gather(loader.load("u1"), loader.load("u2"))
+
+    assert first["balances"] == {"USD": 5}
+    assert second is None
+    assert loader.queries == 1
+
+
+@pytest.mark.asyncio
+async def test_hits_and_misses_are_cached():
+    collection = _collection([{"id": "u1"}])
+    loader = BatchLoader(collection)
+
+    await loader.load_many(["u1", "u2"])
+    await loader.load_many(["u2", "u1"])
+
+    assert collection.find.call_count == 1
+    await loader.load("u3")
+    assert collection.find.call_args[0][0] == {"id": {"$in": ["u3"]}}
+
+
+@pytest.mark.asyncio
+async def test_inclusion_projection_keeps_key_field():
+    collection = _collection([{"id": "u1", "email": "a@b.c"}])
+
+    await BatchLoader(collection, projection={"_id": 0, "email": 1}).load("u1")
+    assert collection.find.call_args[0][1] == {"_id": 0, "email": 1, "id": 1}
+
+    await BatchLoader(collection, projection={"_id": 0, "password_hash": 0}).load("u1")
+    assert collection.find.call_args[0][1] == {"_id": 0, "password_hash": 0}
+
+
+@pytest.mark.asyncio
+async def test_failed_query_is_not_cached():
+    collection = MagicMock()
+    collection.find.return_value.to_list = AsyncMock(side_effect=[RuntimeError("down"), [{"id": "u1"}]])
+    loader = BatchLoader(collection)
+
+    with pytest.raises(RuntimeError):
+        await loader.load_many(["u1", "u2"])
+
+    assert (await loader.load("u1"))["id"] == "u1"
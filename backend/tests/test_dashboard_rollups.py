@@ -0,0 +1,144 @@
+"""
+Admin dashboard rollup tests.
+
+Tests cover:
+- Recomputing only the hours from the watermark's hour onwards
+- Folding per-pair groups into one hour document and re-summing its day
+- Advancing watermarks only after the buckets are written
+- Gauges computed on demand before the job has run
+- Summing nested bucket sub-documents
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dashboard_rollups
+from dashboard_rollups import DAY, HOUR, get_gauges, roll_up, sum_buckets
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+
+    def sort(self, *args):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._docs:
+            raise StopAsyncIteration
+        return self._docs.pop(0)
+
+
+def _db(groups=None, watermarks=None, hour_buckets=(), gauges=None):
+    groups = groups or {}
+    names = ("users", "transactions", "orders", "withdrawals", "deposits",
+             "dashboard_buckets", "dashboard_rollup_state")
+    collections = {name: MagicMock() for name in names}
+    for name, collection in collections.items():
+        collection.aggregate = MagicMock(side_effect=lambda *a, _n=name: _Cursor(groups.get(_n, [])))
+        collection.count_documents = AsyncMock(return_value=0)
+        collection.estimated_document_count = AsyncMock(return_value=0)
+        collection.bulk_write = AsyncMock()
+        collection.replace_one = AsyncMock()
+        collection.update_one = AsyncMock()
+    collections["dashboard_buckets"].find = MagicMock(return_value=_Cursor(hour_buckets))
+    state = collections["dashboard_rollup_state"]
+    state.find_one = AsyncMock(side_effect=lambda query: watermarks if query["_id"] == "watermarks" else gauges)
+    db = MagicMock()
+    db.get_collection.side_effect = collections.__getitem__
+    return db, collections
+
+
+NOW = datetime(2026, 3, 2, 10, 30, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_rollup_starts_at_the_watermarks_hour():
+    watermark = datetime(2026, 3, 2, 9, 45)
+    db, c = _db(watermarks={"_id": "watermarks", "users": watermark})
+
+    await roll_up(db, settle_seconds=30, now=NOW)
+
+    match = c["users"].aggregate.call_args[0][0][0]["$match"]
+    assert match["created_at"]["$gte"] == datetime(2026, 3, 2, 9, tzinfo=timezone.utc)
+    assert match["created_at"]["$lte"] == datetime(2026, 3, 2, 10, 29, 30, tzinfo=timezone.utc)
+    # Sources without a watermark are backfilled from the start
+    assert "$gte" not in c["orders"].aggregate.call_args[0][0][0]["$match"]["filled_at"]
+
+
+@pytest.mark.asyncio
+async def test_pair_groups_fold_into_hour_and_day_buckets():
+    groups = {"orders": [
+        {"_id": {"hour": "2026-03-02T09", "key": "BTC/USD"}, "trades": 2, "volume": 100.0, "buy_volume": 100.0, "sell_volume": 0},
+        {"_id": {"hour": "2026-03-02T09", "key": "ETH.USD"}, "trades": 1, "volume": 50.0, "buy_volume": 0, "sell_volume": 50.0},
+    ]}
+    hour = datetime(2026, 3, 2, 9)
+    stored = [{"granularity": HOUR, "start": hour, "orders": {"trades": 3, "volume": 150.0}},
+              {"granularity": HOUR, "start": datetime(2026, 3, 2, 8), "users": {"signups": 4}}]
+    db, c = _db(groups=groups, hour_buckets=stored)
+
+    assert await roll_up(db, now=NOW) == 1
+
+    (hour_op,) = c["dashboard_buckets"].bulk_write.call_args_list[0][0][0]
+    assert hour_op._filter == {"granularity": HOUR, "start": hour.replace(tzinfo=timezone.utc)}
+    orders = hour_op._doc["$set"]["orders"]
+    assert orders["trades"] == 3 and orders["volume"] == 150.0
+    assert set(orders["pairs"]) == {"BTC/USD", "ETH_USD"}
+
+    (day_op,) = c["dashboard_buckets"].bulk_write.call_args_list[1][0][0]
+    assert day_op._filter == {"granularity": DAY, "start": datetime(2026, 3, 2, tzinfo=timezone.utc)}
+    assert day_op._doc["orders"] == {"trades": 3, "volume": 150.0}
+    assert day_op._doc["users"] == {"signups": 4}
+
+
+@pytest.mark.asyncio
+async def test_watermarks_advance_after_buckets_are_written():
+    db, c = _db(groups={"users": [{"_id": {"hour": "2026-03-02T10"}, "signups": 1}]})
+    c["dashboard_buckets"].bulk_write.side_effect = RuntimeError("write failed")
+
+    with pytest.raises(RuntimeError):
+        await roll_up(db, now=NOW)
+    c["dashboard_rollup_state"].update_one.assert_not_called()
+
+    c["dashboard_buckets"].bulk_write.side_effect = None
+    await roll_up(db, settle_seconds=0, now=NOW)
+    marks = c["dashboard_rollup_state"].update_one.call_args[0][1]["$set"]
+    assert marks == {name: NOW for name in dashboard_rollups.SOURCES}
+
+
+@pytest.mark.asyncio
+async def test_gauges_are_computed_when_missing():
+    groups = {"withdrawals": [{"_id": "pending_approval", "count": 2, "amount": 30000.0, "high_value": 1}]}
+    db, c = _db(groups=groups)
+
+    gauges = await get_gauges(db)
+
+    assert gauges["withdrawals"]["pending_approval"] == {"count": 2, "amount": 30000.0, "high_value": 1}
+    assert gauges["withdrawals"]["pending"]["count"] == 0
+    c["dashboard_rollup_state"].replace_one.assert_awaited_once()
+
+    stored = {"_id": "gauges", "users": {"total": 7}}
+    db, c = _db(gauges=stored)
+    assert await get_gauges(db) is stored
+    c["users"].count_documents.assert_not_called()
+
+
+def test_sum_buckets_adds_nested_fields():
+    buckets = [
+        {"orders": {"trades": 1, "volume": 10.0, "pairs": {"BTC/USD": {"trades": 1, "volume": 10.0}}}},
+        {"users": {"signups": 3}},
+        {"orders": {"trades": 2, "volume": 5.0, "pairs": {"BTC/USD": {"trades": 2, "volume": 5.0}}}},
+    ]
+
+    totals = sum_buckets(buckets, "orders")
+
+    assert totals == {"trades": 3, "volume": 15.0, "pairs": {"BTC/USD": {"trades": 3, "volume": 15.0}}}
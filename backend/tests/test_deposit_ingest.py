@@ -0,0 +1,230 @@
+"""
+Batched NOWPayments IPN processing tests.
+
+Tests cover:
+- One find and one bulk_write per batch, with the credit claimed in the status update
+- Crediting only deposits whose claim this batch won
+- Not crediting a deposit twice when confirmed and finished both arrive
+- Applying one IPN per order when several payments report on it
+- Recording the deposits already posted when a later post in the batch fails
+- Collapsing queued duplicates and answering applied retries from memory
+- Recovering stale credits that were claimed but never posted, taking each claim over first
+"""
+
+import asyncio
+import os
+import sys
+import types
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import nowpayments_service  # noqa: F401
+except Exception:
+    nowpayments_stub = types.ModuleType("nowpayments_service")
+
+    class PaymentStatus:
+        WAITING = "waiting"
+        CONFIRMING = "confirming"
+        CONFIRMED = "confirmed"
+        SENDING = "sending"
+        PARTIALLY_PAID = "partially_paid"
+        FINISHED = "finished"
+        FAILED = "failed"
+        REFUNDED = "refunded"
+        EXPIRED = "expired"
+        SUCCESS_STATUSES = [FINISHED, CONFIRMED]
+        PENDING_STATUSES = [WAITING, CONFIRMING, SENDING, PARTIALLY_PAID]
+        FAILED_STATUSES = [FAILED, REFUNDED, EXPIRED]
+
+    nowpayments_stub.PaymentStatus = PaymentStatus
+    sys.modules["nowpayments_service"] = nowpayments_stub
+
+from services import deposit_ingest as ingest_module
+from services.deposit_ingest import DepositIngestQueue
+
+
+def _cursor(docs):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=list(docs))
+    return cursor
+
+
+def _deposit(order_id, status="waiting", **extra):
+    return {"order_id": order_id, "user_id": f"user-{order_id}", "amount": 100.0,
+            "pay_currency": "btc", "status": status, **extra}
+
+
+def _ipn(order_id, status, payment_id=None):
+    return {"payment_id": payment_id or f"pay-{order_id}", "order_id": order_id,
+            "payment_status": status, "actually_paid": 0.01}
+
+
+def _db(*finds, ledger_entry=None):
+    deposits = MagicMock()
+    deposits.find = MagicMock(side_effect=[_cursor(docs) for docs in finds])
+    deposits.bulk_write = AsyncMock()
+    deposits.update_many = AsyncMock()
+    deposits.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+    transactions = MagicMock()
+    transactions.insert_many = AsyncMock()
+    ledger_entries = MagicMock()
+    ledger_entries.find_one = AsyncMock(return_value=ledger_entry)
+    collections = {"deposits": deposits, "transactions": transactions, "ledger_entries": ledger_entries}
+    db = MagicMock()
+    db.get_collection.side_effect = collections.__getitem__
+    return db, collections
+
+
+@pytest.fixture(autouse=True)
+def _side_effects(monkeypatch):
+    post = AsyncMock(return_value={"balances": {"USD": 250.0}, "ledger_seq": 3})
+    monkeypatch.setattr(ingest_module, "post_balance_change", post)
+    monkeypatch.setattr(ingest_module, "broadcast_transaction_event", AsyncMock())
+    monkeypatch.setattr(ingest_module, "log_audit", AsyncMock())
+    monkeypatch.setattr(DepositIngestQueue, "_dispatch_notifications", lambda *args: None)
+    return post
+
+
+@pytest.mark.asyncio
+async def test_batch_applies_transitions_in_one_bulk_write_and_credits_claims(_side_effects):
+    db, c = _db(
+        [_deposit("o1"), _deposit("o2")],
+        [{"order_id": "o1"}],
+    )
+    queue = DepositIngestQueue()
+
+    results = await queue.apply_batch(db, [_ipn("o1", "finished"), _ipn("o2", "confirming"), _ipn("o3", "finished")])
+
+    assert results["pay-o1"]["status"] == "success"
+    assert results["pay-o2"]["status"] == "success"
+    assert results["pay-o3"]["status"] == "ignored"
+    operations = c["deposits"].bulk_write.call_args[0][0]
+    assert len(operations) == 2
+    assert operations[0]._filter["credited_at"] == {"$exists": False}
+    assert "credit_batch" in operations[0]._doc["$set"]
+    assert "credited_at" not in operations[1]._filter
+
+    _side_effects.assert_awaited_once()
+    assert _side_effects.call_args[0][1:3] == ("user-o1", {"USD": 100.0})
+    assert _side_effects.call_args.kwargs["reference"] == "o1"
+    transactions = c["transactions"].insert_many.call_args[0][0]
+    assert [(t["reference"], t["type"]) for t in transactions] == [("o1", "deposit")]
+    c["deposits"].update_one.assert_awaited_once_with({"order_id": "o1"}, {"$unset": {"credit_batch": ""}})
+
+
+@pytest.mark.asyncio
+async def test_lost_claim_is_not_credited(_side_effects):
+    db, c = _db([_deposit("o1")], [])
+
+    await DepositIngestQueue().apply_batch(db, [_ipn("o1", "confirmed")])
+
+    _side_effects.assert_not_called()
+    c["transactions"].insert_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_finished_after_confirmed_does_not_credit_again(_side_effects):
+    db, c = _db([_deposit("o1", status="confirmed", webhook_processed=True, credited_at="earlier")])
+
+    results = await DepositIngestQueue().apply_batch(db, [_ipn("o1", "finished")])
+
+    assert results["pay-o1"]["status"] == "success"
+    operation = c["deposits"].bulk_write.call_args[0][0][0]
+    assert operation._filter == {"order_id": "o1"}
+    assert "credit_batch" not in operation._doc["$set"]
+    _side_effects.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_two_payments_for_one_order_credit_once(_side_effects):
+    db, c = _db([_deposit("o1")], [{"order_id": "o1"}])
+
+    results = await DepositIngestQueue().apply_batch(
+        db, [_ipn("o1", "finished", payment_id="pay-a"), _ipn("o1", "confirmed", payment_id="pay-b")]
+    )
+
+    assert len(c["deposits"].bulk_write.call_args[0][0]) == 1
+    assert c["deposits"].find.call_args_list[1][0][0]["order_id"] == {"$in": ["o1"]}
+    _side_effects.assert_awaited_once()
+    assert results["pay-a"] == results["pay-b"]
+    assert results["pay-a"]["payment_status"] == "finished"
+
+
+@pytest.mark.asyncio
+async def test_failed_post_still_records_earlier_credits(_side_effects):
+    _side_effects.side_effect = [{"balances": {"USD": 100.0}, "ledger_seq": 1}, RuntimeError("mongo down")]
+    db, c = _db([_deposit("o1"), _deposit("o2")], [{"order_id": "o1"}, {"order_id": "o2"}])
+
+    with pytest.raises(RuntimeError):
+        await DepositIngestQueue().apply_batch(db, [_ipn("o1", "finished"), _ipn("o2", "finished")])
+
+    transactions = c["transactions"].insert_many.call_args[0][0]
+    assert [t["reference"] for t in transactions] == ["o1"]
+    c["deposits"].update_one.assert_awaited_once_with({"order_id": "o1"}, {"$unset": {"credit_batch": ""}})
+    ingest_module.log_audit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_queued_duplicates_collapse_and_retries_hit_memo():
+    queue = DepositIngestQueue(flush_interval_ms=10)
+    applied = []
+
+    async def apply_batch(db, payloads):
+        applied.append(payloads)
+        for payload in payloads:
+            queue._remember(payload["payment_id"], payload["payment_status"], {"status": "success"})
+        return {p["payment_id"]: {"status": "success", "payment_status": p["payment_status"]} for p in payloads}
+
+    queue.apply_batch = apply_batch
+    queue.recover = AsyncMock(return_value=0)
+    await queue.start(MagicMock())
+    try:
+        results = await asyncio.gather(
+            queue.submit(None, _ipn("o1", "confirming")),
+            queue.submit(None, _ipn("o1", "finished")),
+            queue.submit(None, _ipn("o1", "confirmed")),
+            queue.submit(None, _ipn("o2", "waiting")),
+        )
+        retry = await queue.submit(None, _ipn("o1", "finished"))
+    finally:
+        await queue.stop()
+
+    assert len(applied) == 1
+    assert [p["payment_status"] for p in applied[0]] == ["finished", "waiting"]
+    assert {r["payment_status"] for r in results[:3]} == {"finished"}
+    assert retry["status"] == "already_processed"
+    assert queue.get_stats()["ipns_collapsed"] == 2
+    assert queue.get_stats()["ipns_memo_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_recover_takes_over_stale_claims_only(_side_effects):
+    db, c = _db([_deposit("o1", status="finished", credit_batch="b1")])
+
+    assert await DepositIngestQueue().recover(db) == 1
+    assert "$lt" in c["deposits"].find.call_args[0][0]["credited_at"]
+    claim = c["deposits"].update_one.call_args_list[0]
+    assert claim[0][0] == {"order_id": "o1", "credit_batch": "b1"}
+    assert "credit_batch" in claim[0][1]["$set"]
+    _side_effects.assert_awaited_once()
+    c["transactions"].insert_many.assert_awaited_once()
+
+    _side_effects.reset_mock()
+    db, c = _db([_deposit("o1", status="finished", credit_batch="b1")])
+    c["deposits"].update_one.return_value = MagicMock(modified_count=0)
+
+    # Another recovery (or the original worker) got there first
+    assert await DepositIngestQueue().recover(db) == 0
+    _side_effects.assert_not_called()
+
+    db, c = _db([_deposit("o1", status="finished", credit_batch="b1")], ledger_entry={"_id": "x"})
+
+    assert await DepositIngestQueue().recover(db) == 0
+    _side_effects.assert_not_called()
+    c["deposits"].update_one.assert_awaited_once_with(
+        {"order_id": "o1", "credit_batch": "b1"}, {"$unset": {"credit_batch": ""}}
+    )
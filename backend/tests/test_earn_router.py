@@ -73,6 +73,11 @@ config_stub = types.ModuleType("config")
 
 class _Settings:
     feature_staking_enabled = True
+    wallet_lanes_distributed = False
+    wallet_lane_lock_ttl_ms = 10000
+    wallet_lane_wait_timeout_ms = 5000
+    ledger_snapshot_interval_seconds = 300.0
+    ledger_snapshot_min_entries = 50
 
 
 config_stub.settings = _Settings()
@@ -144,11 +149,41 @@ class FakeCollection:
             current = _get_nested(target, key) or 0
             _assign_nested(target, key, current + value)
 
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            await self.insert_one(doc)
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None, upsert=False):
+        target = next((d for d in self.docs if _matches(d, query)), None)
+        if target is None and upsert:
+            target = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            target.update(update.get("$setOnInsert", {}))
+            self.docs.append(target)
+        if target is None:
+            return None
+
+        for key, value in update.get("$set", {}).items():
+            _assign_nested(target, key, value)
+        for key, value in update.get("$inc", {}).items():
+            _assign_nested(target, key, (_get_nested(target, key) or 0) + value)
+        return target
+
     def find(self, query):
         matches = [d for d in self.docs if all(d.get(k) == v for k, v in query.items())]
         return FakeCursor(matches)
 
 
+def _matches(doc, query):
+    for key, expected in query.items():
+        value = _get_nested(doc, key)
+        if isinstance(expected, dict) and "$gte" in expected:
+            if value is None or value < expected["$gte"]:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
 def _assign_nested(data, dotted_key, value):
     keys = dotted_key.split(".")
     cur = data
@@ -192,7 +227,12 @@ def test_create_stake_uses_usd_fallback_when_token_balance_missing(monkeypatch):
     stakes = FakeCollection()
     transactions = FakeCollection()
 
-    db = FakeDB({"wallets": wallets, "stakes": stakes, "transactions": transactions})
+    ledger = FakeCollection()
+
+    db = FakeDB({
+        "wallets": wallets, "stakes": stakes, "transactions": transactions,
+        "ledger_entries": ledger, "wallet_snapshots": FakeCollection(),
+    })
 
     payload = earn.CreateStakeRequest(product_id="eth-30d", amount=0.1)
     result = asyncio.run(earn.create_stake(payload=payload, user_id="u1", db=db))
@@ -201,6 +241,8 @@ def test_create_stake_uses_usd_fallback_when_token_balance_missing(monkeypatch):
     wallet = asyncio.run(wallets.find_one({"user_id": "u1"}))
     assert wallet["balances"]["USD"] == pytest.approx(650.0)
     assert stakes.docs[0]["funding_currency"] == "USD"
+    assert [(e["seq"], e["kind"], e["currency"]) for e in ledger.docs] == [(1, "stake_create", "USD")]
+    assert ledger.docs[0]["amount"] == pytest.approx(-350.0)
 
 
 def test_redeem_stake_blocks_locked_position_until_mature(monkeypatch):
@@ -253,7 +295,10 @@ def test_redeem_stake_credits_usd_for_usd_funded_stake(monkeypatch):
     wallets = FakeCollection(docs=[{"user_id": "u1", "balances": {"USD": 0.0}}])
     stakes = FakeCollection(docs=[stake_doc])
     transactions = FakeCollection()
-    db = FakeDB({"wallets": wallets, "stakes": stakes, "transactions": transactions})
+    db = FakeDB({
+        "wallets": wallets, "stakes": stakes, "transactions": transactions,
+        "ledger_entries": FakeCollection(), "wallet_snapshots": FakeCollection(),
+    })
 
     result = asyncio.run(earn.redeem_stake(payload=earn.CloseStakeRequest(stake_id="s1"), user_id="u1", db=db))
 
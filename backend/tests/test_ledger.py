@@ -0,0 +1,160 @@
+"""
+Append-only balance ledger tests.
+
+Tests cover:
+- One guarded wallet update per post with sequenced ledger entries
+- Opening snapshot on the first post
+- Balance-at-time and reconciliation replaying only entries after the snapshot
+- Compaction folding the ledger (not the wallet) into a new snapshot
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ledger import balance_at, compact_wallet, post_balance_change, reconcile
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._docs:
+            raise StopAsyncIteration
+        return self._docs.pop(0)
+
+
+def _db(wallet=None, snapshot=None, entries=()):
+    wallets = MagicMock()
+    wallets.find_one_and_update = AsyncMock(return_value=wallet)
+    wallets.find_one = AsyncMock(return_value=wallet)
+    wallets.update_one = AsyncMock()
+    ledger_entries = MagicMock()
+    ledger_entries.insert_many = AsyncMock()
+    ledger_entries.find = MagicMock(return_value=_Cursor(entries))
+    snapshots = MagicMock()
+    snapshots.find_one = AsyncMock(return_value=snapshot)
+    snapshots.update_one = AsyncMock()
+    collections = {"wallets": wallets, "ledger_entries": ledger_entries, "wallet_snapshots": snapshots}
+    db = MagicMock()
+    db.get_collection.side_effect = collections.__getitem__
+    return db, collections
+
+
+@pytest.mark.asyncio
+async def test_post_appends_sequenced_entries_and_opening_snapshot():
+    db, c = _db(wallet={"balances": {"USD": 70.0, "BTC": 1.0}, "ledger_seq": 2})
+
+    wallet = await post_balance_change(
+        db, "u1", {"USD": -30.0, "BTC": 1.0}, kind="trade", reference="o1", guard={"USD": 30.0}
+    )
+
+    assert wallet["ledger_seq"] == 2
+    query, update = c["wallets"].find_one_and_update.call_args[0]
+    assert query == {"user_id": "u1", "balances.USD": {"$gte": 30.0}}
+    assert update["$inc"] == {"balances.USD": -30.0, "balances.BTC": 1.0, "ledger_seq": 2}
+    assert c["wallets"].find_one_and_update.call_args.kwargs["upsert"] is False
+
+    entries = c["ledger_entries"].insert_many.call_args[0][0]
+    assert [(e["seq"], e["currency"], e["amount"], e["balance_after"]) for e in entries] == [
+        (1, "BTC", 1.0, 1.0),
+        (2, "USD", -30.0, 70.0),
+    ]
+    assert all(e["reference"] == "o1" and e["kind"] == "trade" for e in entries)
+
+    snapshot_filter, snapshot_update = c["wallet_snapshots"].update_one.call_args[0]
+    assert snapshot_filter == {"user_id": "u1", "seq": 0}
+    assert snapshot_update["$setOnInsert"]["balances"] == {"USD": 100.0, "BTC": 0.0}
+
+
+@pytest.mark.asyncio
+async def test_failed_guard_writes_no_entries():
+    db, c = _db(wallet=None)
+
+    assert await post_balance_change(db, "u1", {"USD": -30.0}, kind="withdrawal", guard={"USD": 30.0}) is None
+    c["ledger_entries"].insert_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_later_posts_do_not_rewrite_the_opening_snapshot():
+    db, c = _db(wallet={"balances": {"USD": 120.0}, "ledger_seq": 8})
+
+    await post_balance_change(db, "u1", {"USD": 20.0}, kind="deposit", upsert=True)
+
+    assert c["ledger_entries"].insert_many.call_args[0][0][0]["seq"] == 8
+    assert "$setOnInsert" in c["wallets"].find_one_and_update.call_args[0][1]
+    c["wallet_snapshots"].update_one.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_balance_at_replays_entries_after_nearest_snapshot():
+    at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    db, c = _db(
+        snapshot={"user_id": "u1", "seq": 10, "balances": {"USD": 100.0}, "as_of": at},
+        entries=[{"currency": "USD", "amount": -40.0}, {"currency": "BTC", "amount": 0.5}],
+    )
+
+    result = await balance_at(db, "u1", at)
+
+    assert result["balances"] == {"USD": 60.0, "BTC": 0.5}
+    assert result["snapshot_seq"] == 10
+    assert result["entries_replayed"] == 2
+    query = c["ledger_entries"].find.call_args[0][0]
+    assert query == {"user_id": "u1", "seq": {"$gt": 10}, "created_at": {"$lte": at}}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_reports_drift_and_missing_entries():
+    db, _ = _db(
+        wallet={"balances": {"USD": 75.0}, "ledger_seq": 13},
+        snapshot={"user_id": "u1", "seq": 10, "balances": {"USD": 100.0}},
+        entries=[{"currency": "USD", "amount": -30.0}, {"currency": "USD", "amount": 10.0}],
+    )
+
+    report = await reconcile(db, "u1")
+
+    assert report["missing_entries"] == 1
+    assert report["drift"] == {"USD": pytest.approx(-5.0)}
+    assert report["ok"] is False
+
+
+@pytest.mark.asyncio
+async def test_compact_folds_ledger_into_new_snapshot():
+    db, c = _db(
+        wallet={"balances": {"USD": 80.0}, "ledger_seq": 12},
+        snapshot={"user_id": "u1", "seq": 10, "balances": {"USD": 100.0}},
+        entries=[{"currency": "USD", "amount": -30.0}, {"currency": "USD", "amount": 10.0}],
+    )
+
+    report = await compact_wallet(db, "u1")
+
+    assert report["ok"] is True
+    assert report["snapshot_written"] is True
+    snapshot_filter, snapshot_update = c["wallet_snapshots"].update_one.call_args[0]
+    assert snapshot_filter == {"user_id": "u1", "seq": 12}
+    assert snapshot_update["$setOnInsert"]["balances"] == {"USD": 80.0}
+    c["wallets"].update_one.assert_awaited_once_with({"user_id": "u1"}, {"$max": {"snapshot_seq": 12}})
+
+
+@pytest.mark.asyncio
+async def test_compact_leaves_wallets_with_gaps_alone():
+    db, c = _db(
+        wallet={"balances": {"USD": 80.0}, "ledger_seq": 12},
+        snapshot={"user_id": "u1", "seq": 10, "balances": {"USD": 100.0}},
+        entries=[{"currency": "USD", "amount": -20.0}],
+    )
+
+    report = await compact_wallet(db, "u1")
+
+    assert report["missing_entries"] == 1
+    assert "snapshot_written" not in report
+    c["wallet_snapshots"].update_one.assert_not_called()
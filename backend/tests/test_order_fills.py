@@ -0,0 +1,204 @@
+"""
+Order fill path tests.
+
+Tests cover:
+- Balance guard carried in the find_one_and_update filter
+- 400/404 errors resolved only on the slow path
+- Batched transaction/order/audit writes, never failing the fill once balances moved
+- Ledger entries carrying the wallet's sequence numbers
+- Reserving a resting buy order's cost up front and paying its fill from the reserve
+- Cancelling only while the order is still pending, releasing funds once
+"""
+
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.order_fills import execute_fill
+
+
+def _db(wallet_after_update, wallet=None):
+    names = ("wallets", "transactions", "orders", "audit_logs", "ledger_entries", "wallet_snapshots",
+             "transaction_stats", "transaction_stats_daily")
+    collections = {name: MagicMock() for name in names}
+    collections["wallets"].find_one_and_update = AsyncMock(return_value=wallet_after_update)
+    collections["wallets"].find_one = AsyncMock(return_value=wallet)
+    collections["wallet_snapshots"].update_one = AsyncMock()
+    for name in ("transactions", "orders", "audit_logs", "ledger_entries"):
+        collections[name].insert_many = AsyncMock()
+        collections[name].insert_one = AsyncMock()
+    for name in ("transaction_stats", "transaction_stats_daily"):
+        collections[name].bulk_write = AsyncMock()
+    db = MagicMock()
+    db.get_collection.side_effect = lambda name: collections[name]
+    return db, collections
+
+
+@pytest.mark.asyncio
+async def test_buy_guards_balance_in_filter_and_batches_writes():
+    db, collections = _db({"balances": {"USD": 50, "BTC": 2}, "ledger_seq": 12})
+
+    with patch("services.order_fills.broadcast_transaction_event", AsyncMock()):
+        fee, total = await execute_fill(
+            db, user_id="u1", order_id="order-1234", trading_pair="BTC/USD",
+            side="buy", amount=2, price=100,
+            order_doc={"id": "order-1234"}, audit_entry={"action": "ORDER_CREATED"},
+        )
+
+    assert total == 200
+    query, update = collections["wallets"].find_one_and_update.call_args[0]
+    assert query == {"user_id": "u1", "balances.USD": {"$gte": 200 + fee}}
+    assert update["$inc"] == {"balances.USD": -(200 + fee), "balances.BTC": 2, "ledger_seq": 2}
+    collections["wallets"].find_one.assert_not_called()
+
+    entries = collections["ledger_entries"].insert_many.call_args[0][0]
+    assert [(e["seq"], e["currency"], e["kind"]) for e in entries] == [(11, "BTC", "trade"), (12, "USD", "trade")]
+    assert entries[0]["reference"] == "order-1234"
+
+    trade, fee_tx = collections["transactions"].insert_many.call_args[0][0]
+    assert trade["type"] == "trade" and fee_tx["type"] == "fee"
+    collections["transaction_stats"].bulk_write.assert_awaited_once()
+    collections["orders"].insert_one.assert_awaited_once_with({"id": "order-1234"})
+    collections["audit_logs"].insert_one.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_sell_guards_crypto_balance():
+    db, collections = _db({"balances": {"ETH": 0.5, "USD": 15}, "ledger_seq": 2})
+
+    with patch("services.order_fills.broadcast_transaction_event", AsyncMock()):
+        await execute_fill(
+            db, user_id="u1", order_id="o1", trading_pair="ETH/USD",
+            side="sell", amount=1.5, price=10,
+        )
+
+    query, _ = collections["wallets"].find_one_and_update.call_args[0]
+    assert query == {"user_id": "u1", "balances.ETH": {"$gte": 1.5}}
+    collections["orders"].insert_one.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_insufficient_balance_is_rejected_without_writes():
+    db, collections = _db(None, wallet={"balances": {"USD": 50}})
+
+    with pytest.raises(HTTPException) as exc:
+        await execute_fill(
+            db, user_id="u1", order_id="o1", trading_pair="BTC/USD",
+            side="buy", amount=1, price=100,
+        )
+
+    assert exc.value.status_code == 400
+    assert "Available: $50.00" in exc.value.detail
+    collections["transactions"].insert_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_missing_wallet_is_404():
+    db, _ = _db(None, wallet=None)
+
+    with pytest.raises(HTTPException) as exc:
+        await execute_fill(
+            db, user_id="u1", order_id="o1", trading_pair="BTC/USD",
+            side="sell", amount=1, price=100,
+        )
+
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_follow_up_write_failures_do_not_fail_a_settled_fill():
+    db, collections = _db({"balances": {"USD": 50, "BTC": 2}, "ledger_seq": 12})
+    collections["transactions"].insert_many = AsyncMock(side_effect=RuntimeError("mongo down"))
+    collections["orders"].insert_one = AsyncMock(side_effect=RuntimeError("mongo down"))
+    collections["orders"].update_one = AsyncMock()
+
+    with patch("services.order_fills.broadcast_transaction_event", AsyncMock()) as broadcast:
+        fee, total = await execute_fill(
+            db, user_id="u1", order_id="order-1234", trading_pair="BTC/USD",
+            side="buy", amount=2, price=100,
+            order_doc={"id": "order-1234", "status": "filled"}, audit_entry={"action": "ORDER_CREATED"},
+        )
+
+    assert total == 200
+    collections["audit_logs"].insert_one.assert_awaited_once()
+    collections["orders"].update_one.assert_awaited_once_with(
+        {"id": "order-1234"}, {"$setOnInsert": {"id": "order-1234", "status": "filled"}}, upsert=True
+    )
+    broadcast.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fill_is_paid_from_reserve_and_refunds_difference():
+    db, collections = _db({"balances": {"USD": 50, "BTC": 2}, "ledger_seq": 4})
+
+    with patch("services.order_fills.broadcast_transaction_event", AsyncMock()):
+        fee, total = await execute_fill(
+            db, user_id="u1", order_id="o1", trading_pair="BTC/USD",
+            side="buy", amount=1, price=90, reserved=100.1,
+        )
+
+    query, update = collections["wallets"].find_one_and_update.call_args[0]
+    assert query == {"user_id": "u1"}
+    assert update["$inc"]["balances.USD"] == pytest.approx(100.1 - (total + fee))
+    assert update["$inc"]["balances.BTC"] == 1
+
+
+@pytest.mark.asyncio
+async def test_resting_buy_order_reserves_its_cost():
+    from routers import trading
+
+    db, collections = _db({"balances": {"USD": 0}, "ledger_seq": 1})
+    request = MagicMock()
+    order = trading.AdvancedOrderCreate(
+        trading_pair="BTC/USD", order_type="limit", side="buy", amount=1, price=100,
+    )
+
+    with patch.object(trading, "order_trigger_engine"), patch.object(trading, "log_audit", AsyncMock()):
+        response = await trading.create_advanced_order(order, request, user_id="u1", db=db, limiter=None)
+
+    reserved = response["order"]["reserved_amount"]
+    query, update = collections["wallets"].find_one_and_update.call_args[0]
+    assert query == {"user_id": "u1", "balances.USD": {"$gte": reserved}}
+    assert update["$inc"]["balances.USD"] == -reserved
+    assert collections["ledger_entries"].insert_many.call_args[0][0][0]["kind"] == "order_reserve"
+
+    collections["wallets"].find_one_and_update.return_value = None
+    collections["wallets"].find_one.return_value = {"balances": {"USD": 5}}
+    with pytest.raises(HTTPException) as exc:
+        await trading.create_advanced_order(order, request, user_id="u1", db=db, limiter=None)
+    assert exc.value.status_code == 400
+    collections["orders"].insert_one.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_cancel_loses_to_a_concurrent_fill():
+    from routers import trading
+
+    orders = MagicMock()
+    orders.find_one = AsyncMock(return_value={
+        "id": "order-1", "user_id": "u1", "status": "pending", "side": "buy", "reserved_amount": 100.0,
+    })
+    orders.update_one = AsyncMock(return_value=MagicMock(modified_count=0))
+    db = MagicMock()
+    db.get_collection.return_value = orders
+
+    with patch.object(trading, "release_reserve", AsyncMock()) as release, \
+            patch.object(trading, "order_trigger_engine") as engine, \
+            patch.object(trading, "log_audit", AsyncMock()):
+        with pytest.raises(HTTPException) as exc:
+            await trading.cancel_order("order-1", user_id="u1", db=db)
+
+        assert exc.value.status_code == 400
+        assert orders.update_one.call_args[0][0] == {"id": "order-1", "user_id": "u1", "status": "pending"}
+        release.assert_not_called()
+        engine.remove_order.assert_not_called()
+
+        orders.update_one.return_value = MagicMock(modified_count=1)
+        await trading.cancel_order("order-1", user_id="u1", db=db)
+        release.assert_awaited_once_with(db, "u1", "order-1", 100.0, "cancelled")
+        engine.remove_order.assert_called_once_with("order-1")
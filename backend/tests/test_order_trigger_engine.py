@@ -0,0 +1,274 @@
+"""
+Order trigger engine tests.
+
+Tests cover:
+- Per-symbol trigger heaps only releasing crossed orders
+- stop_limit activation into a resting limit
+- IOC/FOK and GTD time-in-force handling
+- Claim-then-fill execution through the shared fill path
+- Releasing the reserve of orders that close without filling
+- Resolving orders whose fill failed unexpectedly from the ledger
+- Loading pending orders from the database
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.order_trigger_engine import OrderTriggerEngine, RestingOrder, symbol_for_pair
+
+
+def _order(order_id, order_type, side, price=None, stop_price=None, tif="GTC", **extra):
+    doc = {
+        "id": order_id,
+        "user_id": "u1",
+        "trading_pair": "BTC/USD",
+        "order_type": order_type,
+        "side": side,
+        "amount": 0.5,
+        "price": price,
+        "stop_price": stop_price,
+        "time_in_force": tif,
+        "status": "pending",
+    }
+    doc.update(extra)
+    return doc
+
+
+def _drain(engine):
+    actions = []
+    while not engine._queue.empty():
+        action, order, price = engine._queue.get_nowait()
+        actions.append((action, order.id, price))
+    return actions
+
+
+@pytest.fixture
+def engine():
+    engine = OrderTriggerEngine()
+    engine.is_running = True
+    with patch("services.order_trigger_engine.price_stream_service") as stream:
+        stream.get_price.return_value = None
+        engine.stream = stream
+        yield engine
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._docs:
+            raise StopAsyncIteration
+        return self._docs.pop(0)
+
+
+class TestTriggerBook:
+
+    def test_symbol_for_pair(self):
+        assert symbol_for_pair("BTC/USD") == "btcusd"
+        assert symbol_for_pair("eth-usdt") == "ethusd"
+
+    @pytest.mark.asyncio
+    async def test_only_crossed_orders_trigger(self, engine):
+        engine.add_order(_order("buy-limit", "limit", "buy", price=95))
+        engine.add_order(_order("sell-limit", "limit", "sell", price=110))
+        engine.add_order(_order("sell-stop", "stop_loss", "sell", stop_price=90))
+        engine.add_order(_order("sell-tp", "take_profit", "sell", stop_price=105))
+
+        await engine.on_prices({"btcusd": 100.0}, 1)
+        assert _drain(engine) == []
+
+        await engine.on_prices({"btcusd": 106.0}, 2)
+        assert _drain(engine) == [("fill", "sell-tp", 106.0)]
+
+        await engine.on_prices({"btcusd": 89.0}, 3)
+        assert sorted(_drain(engine)) == [("fill", "buy-limit", 89.0), ("fill", "sell-stop", 89.0)]
+        assert set(engine._orders) == {"sell-limit"}
+
+    @pytest.mark.asyncio
+    async def test_removed_order_is_skipped(self, engine):
+        engine.add_order(_order("o1", "limit", "buy", price=95))
+        assert engine.remove_order("o1") is True
+
+        await engine.on_prices({"btcusd": 90.0}, 1)
+        assert _drain(engine) == []
+        assert engine._books["btcusd"].stale == 0
+
+    @pytest.mark.asyncio
+    async def test_stop_limit_activates_then_rests_as_limit(self, engine):
+        engine.add_order(_order("sl", "stop_limit", "buy", price=101, stop_price=100))
+
+        await engine.on_prices({"btcusd": 102.0}, 1)
+        assert _drain(engine) == [("activate", "sl", 102.0)]
+        assert engine._orders["sl"].stop_triggered is True
+
+        await engine.on_prices({"btcusd": 100.5}, 2)
+        assert _drain(engine) == [("fill", "sl", 100.5)]
+
+    @pytest.mark.asyncio
+    async def test_stop_limit_fills_on_activation_tick_when_marketable(self, engine):
+        engine.add_order(_order("sl", "stop_limit", "sell", price=99, stop_price=100))
+
+        await engine.on_prices({"btcusd": 99.5}, 1)
+        assert _drain(engine) == [("activate", "sl", 99.5), ("fill", "sl", 99.5)]
+
+    def test_marketable_gtc_order_triggers_on_add(self, engine):
+        engine.stream.get_price.return_value = 90.0
+        engine.add_order(_order("o1", "limit", "buy", price=95))
+        assert _drain(engine) == [("fill", "o1", 90.0)]
+
+
+class TestTimeInForce:
+
+    def test_ioc_not_marketable_is_cancelled(self, engine):
+        engine.stream.get_price.return_value = 100.0
+        engine.add_order(_order("ioc", "limit", "buy", price=95, tif="IOC"))
+        assert _drain(engine) == [("cancel", "ioc", 100.0)]
+        assert engine._orders == {}
+
+    def test_fok_marketable_fills(self, engine):
+        engine.stream.get_price.return_value = 100.0
+        engine.add_order(_order("fok", "limit", "sell", price=95, tif="FOK"))
+        assert _drain(engine) == [("fill", "fok", 100.0)]
+
+    def test_gtd_order_expires(self, engine):
+        expire = time.time() + 60
+        expire_time = datetime.fromtimestamp(expire, timezone.utc)
+        engine.add_order(_order("gtd", "limit", "buy", price=95, tif="GTD", expire_time=expire_time))
+
+        assert engine.expire_due(time.time()) == 0
+        assert engine.expire_due(expire + 1) == 1
+        assert _drain(engine) == [("expire", "gtd", None)]
+        assert "gtd" not in engine._orders
+
+
+class TestExecution:
+
+    def _db(self, claimed=True):
+        orders = MagicMock()
+        orders.find_one_and_update = AsyncMock(return_value={"id": "o1"} if claimed else None)
+        orders.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+        db = MagicMock()
+        db.get_collection.return_value = orders
+        return db, orders
+
+    @pytest.mark.asyncio
+    async def test_claimed_order_is_filled(self, engine):
+        db, orders = self._db()
+        engine._db = db
+        order = RestingOrder.from_doc(_order("o1", "limit", "buy", price=95))
+
+        with patch("services.order_trigger_engine.execute_fill", AsyncMock(return_value=(0.05, 47.0))) as fill, \
+                patch("services.order_trigger_engine.log_audit_event", AsyncMock()):
+            await engine._execute(order, 94.0)
+
+        assert fill.call_args.kwargs["price"] == 94.0
+        assert orders.update_one.call_args[0][1]["$set"]["status"] == "filled"
+        assert engine.orders_filled == 1
+
+    @pytest.mark.asyncio
+    async def test_unclaimed_order_is_not_filled(self, engine):
+        db, orders = self._db(claimed=False)
+        engine._db = db
+        order = RestingOrder.from_doc(_order("o1", "limit", "buy", price=95))
+
+        with patch("services.order_trigger_engine.execute_fill", AsyncMock()) as fill:
+            await engine._execute(order, 94.0)
+
+        fill.assert_not_called()
+        orders.update_one.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_insufficient_funds_rejects_order(self, engine):
+        db, orders = self._db()
+        engine._db = db
+        order = RestingOrder.from_doc(_order("o1", "limit", "buy", price=95))
+
+        error = HTTPException(status_code=400, detail="Insufficient balance")
+        with patch("services.order_trigger_engine.execute_fill", AsyncMock(side_effect=error)):
+            await engine._execute(order, 94.0)
+
+        update = orders.update_one.call_args[0][1]["$set"]
+        assert update["status"] == "rejected"
+        assert update["reject_reason"] == "Insufficient balance"
+
+    @pytest.mark.asyncio
+    async def test_unfilled_orders_release_their_reserve(self, engine):
+        db, orders = self._db()
+        engine._db = db
+        order = RestingOrder.from_doc(_order("o1", "limit", "buy", price=95, tif="IOC", reserved_amount=47.6))
+
+        with patch("services.order_trigger_engine.release_reserve", AsyncMock()) as release:
+            await engine._close(order, "cancelled", 99.0)
+            release.assert_awaited_once_with(db, "u1", "o1", 47.6, "cancelled")
+
+            orders.update_one.return_value = MagicMock(modified_count=0)
+            await engine._close(order, "expired", 99.0)
+            assert release.await_count == 1
+
+            orders.update_one.return_value = MagicMock(modified_count=1)
+            error = HTTPException(status_code=400, detail="Insufficient balance")
+            with patch("services.order_trigger_engine.execute_fill", AsyncMock(side_effect=error)) as fill:
+                await engine._execute(order, 94.0)
+            assert fill.call_args.kwargs["reserved"] == 47.6
+            assert release.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_fill_is_resolved_from_ledger(self, engine):
+        db, orders = self._db()
+        orders.find_one = AsyncMock(return_value=None)
+        engine._db = db
+        order = RestingOrder.from_doc(_order("o1", "limit", "buy", price=95))
+
+        with patch("services.order_trigger_engine.execute_fill", AsyncMock(side_effect=RuntimeError("mongo down"))):
+            await engine._execute(order, 94.0)
+
+        query, update = orders.update_one.call_args[0]
+        assert query == {"id": "o1", "status": "triggered"}
+        assert update["$set"] == {"status": "pending"}
+        assert "o1" in engine._orders
+        assert engine.orders_reverted == 1
+
+        orders.find_one.return_value = {"id": "ledger-1"}
+        with patch("services.order_trigger_engine.execute_fill", AsyncMock(side_effect=RuntimeError("mongo down"))):
+            await engine._execute(order, 94.0)
+
+        assert orders.update_one.call_args[0][1]["$set"]["status"] == "filled"
+        assert engine.orders_filled == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_triggered_orders_are_swept(self, engine):
+        db, orders = self._db()
+        orders.find.return_value = _Cursor([_order("o1", "limit", "sell", price=105, status="triggered")])
+        orders.find_one = AsyncMock(return_value=None)
+        engine._db = db
+
+        assert await engine._sweep_triggered() == 1
+        assert orders.find.call_args[0][0]["status"] == "triggered"
+        assert orders.update_one.call_args[0][1]["$set"] == {"status": "pending"}
+        assert "o1" in engine._orders
+
+    @pytest.mark.asyncio
+    async def test_load_pending_indexes_orders(self, engine):
+        docs = [_order(f"o{i}", "limit", "buy", price=100 - i) for i in range(100)]
+        orders = MagicMock()
+        orders.find.return_value = _Cursor(docs)
+        db = MagicMock()
+        db.get_collection.return_value = orders
+        engine._db = db
+
+        assert await engine._load_pending() == 100
+        await engine.on_prices({"btcusd": 97.5}, 1)
+        assert sorted(action[1] for action in _drain(engine)) == ["o0", "o1", "o2"]
+        assert len(engine._orders) == 97
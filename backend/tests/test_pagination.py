@@ -0,0 +1,105 @@
+"""
+Keyset pagination tests.
+
+Tests cover:
+- Opaque cursor round trip and rejection of malformed cursors
+- Fetching one extra document to decide whether a next page exists
+- Cursor pages filtering after (created_at, id) instead of skipping
+- Deprecated skip fallback on the first page
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pagination import decode_cursor, encode_cursor, fetch_page, keyset_query
+
+
+def _collection(docs):
+    find = MagicMock()
+    find.sort.return_value = find
+    find.skip.return_value = find
+    find.limit.return_value = find
+    find.to_list = AsyncMock(return_value=docs)
+    collection = MagicMock()
+    collection.find.return_value = find
+    return collection, find
+
+
+def _doc(i):
+    return {"id": f"tx-{i}", "created_at": datetime(2026, 1, 1, 12, 0, 59 - i)}
+
+
+def test_cursor_round_trip():
+    at = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    token = encode_cursor(at, "tx-1")
+
+    assert "=" not in token
+    assert decode_cursor(token) == (at, "tx-1")
+    # Mongo hands back naive UTC datetimes
+    assert decode_cursor(encode_cursor(at.replace(tzinfo=None), "tx-1")) == (at, "tx-1")
+
+
+def test_malformed_cursor_is_400():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_keyset_query_breaks_ties_on_id():
+    at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    query = keyset_query({"user_id": "u1"}, encode_cursor(at, "tx-5"))
+
+    assert query == {"$and": [
+        {"user_id": "u1"},
+        {"$or": [{"created_at": {"$lt": at}}, {"created_at": at, "id": {"$lt": "tx-5"}}]},
+    ]}
+
+
+@pytest.mark.asyncio
+async def test_full_page_returns_cursor_for_last_document():
+    collection, find = _collection([_doc(i) for i in range(3)])
+
+    docs, next_cursor = await fetch_page(collection, {"user_id": "u1"}, limit=2)
+
+    assert [d["id"] for d in docs] == ["tx-0", "tx-1"]
+    find.sort.assert_called_once_with([("created_at", -1), ("id", -1)])
+    find.limit.assert_called_once_with(3)
+    assert decode_cursor(next_cursor)[1] == "tx-1"
+
+
+@pytest.mark.asyncio
+async def test_last_page_has_no_cursor():
+    collection, _ = _collection([_doc(0)])
+
+    docs, next_cursor = await fetch_page(collection, {"user_id": "u1"}, limit=2)
+
+    assert len(docs) == 1
+    assert next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_cursor_replaces_skip():
+    collection, find = _collection([])
+    cursor = encode_cursor(datetime(2026, 1, 1, tzinfo=timezone.utc), "tx-9")
+
+    await fetch_page(collection, {"user_id": "u1"}, limit=10, cursor=cursor, skip=500)
+
+    find.skip.assert_not_called()
+    assert "$and" in collection.find.call_args[0][0]
+
+
+@pytest.mark.asyncio
+async def test_skip_is_still_honoured_without_cursor():
+    collection, find = _collection([])
+
+    await fetch_page(collection, {}, limit=10, skip=20, time_field="timestamp")
+
+    find.skip.assert_called_once_with(20)
+    find.sort.assert_called_once_with([("timestamp", -1), ("id", -1)])
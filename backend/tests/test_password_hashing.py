@@ -0,0 +1,57 @@
+"""
+Password hashing pool tests.
+
+Tests cover:
+- Hashing and verifying on the pool, off the event loop
+- Fast 503 with Retry-After once workers and queue are full
+- Queue depth and completion metrics
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from password_hashing import PasswordHasher
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_run_off_the_loop():
+    hasher = PasswordHasher(workers=2)
+    loop_thread = threading.get_ident()
+    seen = []
+
+    hashed = await hasher.hash("Correct-Horse-1")
+    await hasher.run(lambda: seen.append(threading.get_ident()))
+
+    assert await hasher.verify("Correct-Horse-1", hashed) is True
+    assert await hasher.verify("wrong", hashed) is False
+    assert seen and seen[0] != loop_thread
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_rejects_immediately():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    release = threading.Event()
+    blocked = [asyncio.ensure_future(hasher.run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HTTPException) as exc:
+        await hasher.run(lambda: None)
+
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "2"
+    stats = hasher.get_stats()
+    assert stats["in_flight"] == 2 and stats["queued"] == 1 and stats["rejected"] == 1
+
+    release.set()
+    await asyncio.gather(*blocked)
+    assert hasher.get_stats()["completed"] == 2
+    assert hasher.get_stats()["in_flight"] == 0
+    hasher.shutdown()
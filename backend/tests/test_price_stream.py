@@ -0,0 +1,457 @@
+"""
+Price stream tests.
+
+Tests cover:
+- Write-behind PriceCache ingestion and batched Redis flushes
+- Per-subscriber tick conflation in PriceStreamService
+- Serialize-once (per wire format) fan-out in the /ws/prices manager
+- Delta/keyframe price frame encoding
+- Leader/follower cross-worker fan-out over Redis pub/sub
+- Host-local shared-memory price table
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.price_delta import DeltaPriceEncoder
+from services.price_stream import PriceCache, PriceStreamService, PriceTick
+from services.shared_price_table import SharedPriceTable
+
+
+def _tick(symbol: str, price: float, ts_ms: int) -> PriceTick:
+    return PriceTick(symbol=symbol, price=price, ts_ms=ts_ms, source="binance")
+
+
+class TestWriteBehindPriceCache:
+    """Tests for the write-behind ingestion mode."""
+
+    @pytest.mark.asyncio
+    async def test_update_tick_does_not_touch_redis(self):
+        cache = PriceCache(write_behind=True)
+        with patch("services.price_stream.redis_cache") as redis_mock:
+            redis_mock.set = AsyncMock()
+            assert await cache.update_tick(_tick("BTCUSD", 100.0, 1)) is True
+
+        redis_mock.set.assert_not_called()
+        assert (await cache.snapshot())["BTCUSD"] == 100.0
+
+    @pytest.mark.asyncio
+    async def test_flush_coalesces_dirty_symbols_into_one_batch(self):
+        cache = PriceCache(write_behind=True, live_ttl_seconds=5)
+        for i in range(10):
+            await cache.update_tick(_tick("BTCUSD", 100.0 + i, i))
+        await cache.update_tick(_tick("ETHUSD", 10.0, 1))
+
+        with patch("services.price_stream.redis_cache") as redis_mock:
+            redis_mock.set_many = AsyncMock(return_value=True)
+            written = await cache.flush()
+
+        assert written == 2
+        redis_mock.set_many.assert_awaited_once()
+        items = redis_mock.set_many.call_args[0][0]
+        assert items["crypto:price:BTCUSD"]["price"] == 109.0
+        assert items["crypto:price:ETHUSD"]["price"] == 10.0
+        assert redis_mock.set_many.call_args[1]["ttl"] == 5
+        assert cache.get_stats()["ticks_coalesced"] == 9
+        assert cache.get_stats()["pending_symbols"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_batch_for_next_flush(self):
+        cache = PriceCache(write_behind=True)
+        await cache.update_tick(_tick("BTCUSD", 100.0, 1))
+        await cache.update_tick(_tick("ETHUSD", 10.0, 1))
+
+        async def fail_after_newer_tick(*_args, **_kwargs):
+            await cache.update_tick(_tick("BTCUSD", 101.0, 2))
+            raise ConnectionError("redis down")
+
+        with patch("services.price_stream.redis_cache") as redis_mock:
+            redis_mock.set_many = AsyncMock(side_effect=fail_after_newer_tick)
+            with pytest.raises(ConnectionError):
+                await cache.flush()
+
+            redis_mock.set_many = AsyncMock(return_value=True)
+            assert await cache.flush() == 2
+
+        items = redis_mock.set_many.call_args[0][0]
+        assert items["crypto:price:BTCUSD"]["price"] == 101.0
+        assert items["crypto:price:ETHUSD"]["price"] == 10.0
+        assert cache.get_stats()["flush_failures"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_ticks_are_ignored(self):
+        cache = PriceCache(write_behind=True)
+        await cache.update_tick(_tick("BTCUSD", 100.0, 10))
+        assert await cache.update_tick(_tick("BTCUSD", 90.0, 5)) is False
+        assert (await cache.snapshot())["BTCUSD"] == 100.0
+
+    @pytest.mark.asyncio
+    async def test_flusher_flushes_on_stop(self):
+        cache = PriceCache(write_behind=True, flush_interval_ms=10_000)
+        stop_event = asyncio.Event()
+
+        with patch("services.price_stream.redis_cache") as redis_mock:
+            redis_mock.set_many = AsyncMock(return_value=True)
+            task = asyncio.create_task(cache.run_flusher(stop_event))
+            await cache.update_tick(_tick("SOLUSD", 20.0, 1))
+            await asyncio.sleep(0)
+            stop_event.set()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        redis_mock.set_many.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_legacy_mode_writes_through(self):
+        cache = PriceCache(write_behind=False)
+        with patch("services.price_stream.redis_cache") as redis_mock:
+            redis_mock.set = AsyncMock(return_value=True)
+            await cache.update_tick(_tick("BTCUSD", 100.0, 1))
+
+        redis_mock.set.assert_awaited_once()
+        assert cache.get_stats()["pending_symbols"] == 0
+
+
+class TestPriceConflation:
+    """Tests for per-subscriber tick conflation."""
+
+    @pytest.mark.asyncio
+    async def test_conflated_subscriber_receives_one_batched_update(self):
+        service = PriceStreamService()
+        received = []
+
+        async def callback(updates, timestamp_ms):
+            received.append((dict(updates), timestamp_ms))
+
+        service.subscribe(callback, conflation_ms=20)
+        for i in range(50):
+            await service._notify_subscribers({"btcusd": 100.0 + i}, i)
+        await service._notify_subscribers({"ethusd": 10.0}, 60)
+
+        assert received == []
+        await asyncio.sleep(0.05)
+
+        assert received == [({"btcusd": 149.0, "ethusd": 10.0}, 60)]
+
+    @pytest.mark.asyncio
+    async def test_ticks_arriving_during_delivery_are_flushed(self):
+        service = PriceStreamService()
+        received = []
+
+        async def callback(updates, timestamp_ms):
+            received.append(dict(updates))
+            if len(received) == 1:
+                # A tick lands while the first batch is still being delivered
+                await service._notify_subscribers({"ethusd": 10.0}, 2)
+
+        service.subscribe(callback, conflation_ms=20)
+        await service._notify_subscribers({"btcusd": 1.0}, 1)
+        await asyncio.sleep(0.08)
+
+        assert received == [{"btcusd": 1.0}, {"ethusd": 10.0}]
+
+    @pytest.mark.asyncio
+    async def test_unconflated_subscriber_still_called_per_tick(self):
+        service = PriceStreamService()
+        received = []
+
+        async def callback(updates, timestamp_ms):
+            received.append(updates)
+
+        service.subscribe(callback)
+        await service._notify_subscribers({"btcusd": 1.0}, 1)
+        await service._notify_subscribers({"btcusd": 2.0}, 2)
+
+        assert received == [{"btcusd": 1.0}, {"btcusd": 2.0}]
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe_drops_empty_conflation_window(self):
+        service = PriceStreamService()
+
+        async def callback(updates, timestamp_ms):
+            pass
+
+        service.subscribe(callback, conflation_ms=50)
+        assert 50 in service._conflators
+        service.unsubscribe(callback)
+        assert service._conflators == {}
+
+
+class TestPriceStreamManagerFanout:
+    """Tests for the serialize-once /ws/prices broadcast."""
+
+    @pytest.mark.asyncio
+    async def test_update_is_encoded_once_per_format_and_shared(self):
+        import msgpack
+        from routers.websocket import PriceStreamManager
+
+        manager = PriceStreamManager()
+        json_clients = [object() for _ in range(3)]
+        msgpack_client = object()
+        for ws, wire_format in [(ws, "json") for ws in json_clients] + [(msgpack_client, "msgpack")]:
+            manager.active_connections.add(ws)
+            manager.client_formats[ws] = wire_format
+            manager.client_queues[ws] = asyncio.Queue(maxsize=manager.max_queue_size)
+
+        await manager.enqueue_price_update({"btcusd": 100.5}, 1000)
+
+        assert manager.frames_encoded == 2
+        frames = [manager.client_queues[ws].get_nowait() for ws in json_clients]
+        assert all(frame is frames[0] for frame in frames)
+        assert json.loads(frames[0])["prices"] == {"btcusd": "100.5"}
+
+        binary = manager.client_queues[msgpack_client].get_nowait()
+        assert isinstance(binary, bytes)
+        assert msgpack.unpackb(binary)["prices"] == {"btcusd": "100.5"}
+
+    def test_negotiate_format_prefers_msgpack_subprotocol(self):
+        from services.realtime_encoding import negotiate_format
+
+        ws = MagicMock()
+        ws.headers = {"sec-websocket-protocol": "chat, msgpack"}
+        ws.query_params = {}
+        assert negotiate_format(ws) == ("msgpack", "msgpack")
+
+        ws.headers = {}
+        ws.query_params = {"format": "msgpack"}
+        assert negotiate_format(ws) == ("msgpack", None)
+
+        ws.query_params = {}
+        assert negotiate_format(ws) == ("json", None)
+
+
+class TestDeltaPriceEncoder:
+    """Tests for delta-encoded price frames with keyframes."""
+
+    def test_first_update_is_keyframe_then_deltas(self):
+        encoder = DeltaPriceEncoder(keyframe_interval_seconds=60, tick_size_bps=10)
+
+        keyframe = encoder.update({"btcusd": 100.0, "ethusd": 10.0}, 1)
+        assert keyframe["type"] == "price_snapshot"
+        assert keyframe["seq"] == 1
+
+        # 5 bps move on btc is below the 10 bps tick size
+        assert encoder.update({"btcusd": 100.05}, 2) is None
+
+        delta = encoder.update({"btcusd": 100.2, "ethusd": 10.0}, 3)
+        assert delta == {
+            "type": "price_delta",
+            "seq": 2,
+            "prices": {"btcusd": "100.2"},
+            "event_timestamp_ms": 3,
+        }
+
+    def test_snapshot_does_not_advance_sequence(self):
+        encoder = DeltaPriceEncoder(keyframe_interval_seconds=60, tick_size_bps=0)
+        encoder.update({"btcusd": 100.0}, 1)
+        encoder.update({"btcusd": 101.0}, 2)
+
+        snapshot = encoder.snapshot()
+        assert snapshot["seq"] == 2
+        assert snapshot["prices"] == {"btcusd": "101.0"}
+        assert encoder.update({"btcusd": 102.0}, 3)["seq"] == 3
+
+    def test_periodic_keyframe(self):
+        encoder = DeltaPriceEncoder(keyframe_interval_seconds=0, tick_size_bps=1)
+        encoder.update({"btcusd": 100.0}, 1)
+        frame = encoder.update({"ethusd": 10.0}, 2)
+
+        assert frame["type"] == "price_snapshot"
+        assert frame["prices"] == {"btcusd": "100.0", "ethusd": "10.0"}
+
+
+class TestClusterFanout:
+    """Tests for leader/follower ingestion in cluster mode."""
+
+    @pytest.mark.asyncio
+    async def test_follower_applies_leader_ticks_without_persisting(self):
+        service = PriceStreamService()
+        service.role = "follower"
+        received = []
+
+        async def callback(updates, timestamp_ms):
+            received.append((updates, timestamp_ms))
+
+        service.subscribe(callback)
+        await service._on_cluster_message({
+            "origin": "other-worker",
+            "prices": {"btcusd": 100.5, "ethusd": 10.0},
+            "ts_ms": 42,
+            "source": "binance",
+        })
+
+        assert received == [({"btcusd": 100.5, "ethusd": 10.0}, 42)]
+        assert (await service.cache.snapshot())["BTCUSD"] == 100.5
+        assert service.cache.get_stats()["pending_symbols"] == 0
+        assert service.get_status()["cluster"]["ticks_received"] == 2
+
+    @pytest.mark.asyncio
+    async def test_own_messages_are_ignored(self):
+        service = PriceStreamService()
+        service.role = "follower"
+        await service._on_cluster_message({
+            "origin": service.instance_id,
+            "prices": {"btcusd": 1.0},
+            "ts_ms": 1,
+        })
+        assert await service.cache.snapshot() == {}
+
+    @pytest.mark.asyncio
+    async def test_leader_publishes_conflated_batches(self):
+        service = PriceStreamService()
+        with patch("services.price_stream.redis_enhanced") as redis_mock, \
+                patch.object(service, "_start_ingestion"):
+            redis_mock.publish = AsyncMock(return_value=True)
+            service._become_leader()
+            await service._notify_subscribers({"btcusd": 1.0}, 1)
+            await service._notify_subscribers({"btcusd": 2.0}, 2)
+            await asyncio.sleep(0.15)
+
+        redis_mock.publish.assert_awaited_once()
+        channel, payload = redis_mock.publish.call_args[0]
+        assert channel == "price_stream:ticks"
+        assert payload["origin"] == service.instance_id
+        assert payload["prices"] == {"btcusd": 2.0}
+
+    @pytest.mark.asyncio
+    async def test_leader_steps_down_when_lock_is_lost(self):
+        service = PriceStreamService()
+        service.is_running = True
+        with patch("services.price_stream.redis_enhanced") as redis_mock, \
+                patch("services.price_stream.settings") as settings_mock, \
+                patch.object(service, "_start_ingestion"):
+            settings_mock.price_stream_leader_ttl_seconds = 3
+            settings_mock.price_stream_conflation_ms = 100
+            redis_mock.acquire_lock = AsyncMock(side_effect=[True, False])
+            task = asyncio.create_task(service._cluster_election_loop())
+            await asyncio.sleep(0)
+            assert service.role == "leader"
+            await asyncio.sleep(1.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        assert service.role == "follower"
+        assert service.leader_changes == 2
+        assert service._conflators == {}
+
+    @pytest.mark.asyncio
+    async def test_leader_releases_lock_when_publishing_fails(self):
+        service = PriceStreamService()
+        service.is_running = True
+        with patch("services.price_stream.redis_enhanced") as redis_mock, \
+                patch("services.price_stream.settings") as settings_mock, \
+                patch.object(service, "_start_ingestion"):
+            settings_mock.price_stream_leader_ttl_seconds = 3
+            settings_mock.price_stream_conflation_ms = 100
+            redis_mock.acquire_lock = AsyncMock(return_value=True)
+            redis_mock.release_lock = AsyncMock(return_value=True)
+            redis_mock.publish = AsyncMock(return_value=False)
+            service._become_leader()
+            for ts in range(3):
+                await service._publish_to_cluster({"btcusd": 1.0}, ts)
+            task = asyncio.create_task(service._cluster_election_loop())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        assert service.role == "follower"
+        redis_mock.release_lock.assert_awaited_once_with("price_stream:leader", service.instance_id)
+        redis_mock.acquire_lock.assert_not_called()
+        assert service.get_status()["cluster"]["publish_failures"] == 3
+
+    def test_redis_breaker_closes_after_cooldown(self):
+        from redis_enhanced import RedisEnhanced
+
+        redis = RedisEnhanced(failure_cooldown_seconds=60)
+        redis.use_redis = True
+        for _ in range(3):
+            redis._record_failure()
+        assert redis.use_redis is False
+
+        with patch("redis_enhanced.time.monotonic", return_value=time.monotonic() + 61):
+            assert redis.use_redis is True
+
+
+class TestSharedPriceTable:
+    """Tests for the mmap-backed seqlock price table."""
+
+    def test_single_writer_and_lock_free_reader(self, tmp_path):
+        path = str(tmp_path / "prices")
+        writer = SharedPriceTable(path, slots=8)
+        reader = SharedPriceTable(path, slots=8)
+        try:
+            assert writer.open() and reader.open()
+            assert writer.try_acquire_writer() is True
+            assert reader.try_acquire_writer() is False
+
+            writer.write("BTCUSD", 100.5, 10)
+            writer.write("ethusd", 10.0, 11)
+            writer.write("btcusd", 101.0, 12)
+
+            assert reader.is_live()
+            assert reader.read("btcusd") == (101.0, 12)
+            assert reader.snapshot() == {"btcusd": 101.0, "ethusd": 10.0}
+            assert reader.get("solusd") is None
+        finally:
+            writer.close()
+            reader.close()
+
+    def test_reader_takes_over_when_writer_exits(self, tmp_path):
+        path = str(tmp_path / "prices")
+        writer = SharedPriceTable(path, slots=8)
+        reader = SharedPriceTable(path, slots=8)
+        try:
+            writer.open()
+            reader.open()
+            writer.try_acquire_writer()
+            writer.write("btcusd", 100.0, 1)
+            writer.close()
+
+            assert reader.try_acquire_writer() is True
+            assert reader.get("btcusd") == 100.0
+            reader.write("ethusd", 10.0, 2)
+            assert reader.snapshot() == {"btcusd": 100.0, "ethusd": 10.0}
+        finally:
+            reader.close()
+
+    def test_torn_slot_is_not_returned(self, tmp_path):
+        import struct
+        from services.shared_price_table import HEADER_SIZE
+
+        table = SharedPriceTable(str(tmp_path / "prices"), slots=4)
+        try:
+            table.open()
+            table.try_acquire_writer()
+            table.write("btcusd", 100.0, 1)
+            # Simulate a write in progress: odd sequence number
+            struct.pack_into("<Q", table._mm, HEADER_SIZE, 3)
+            assert table.read("btcusd") is None
+            assert table.read_retries > 0
+        finally:
+            table.close()
+
+    @pytest.mark.asyncio
+    async def test_service_serves_prices_from_shared_table(self, tmp_path):
+        service = PriceStreamService()
+        service.shared_table = SharedPriceTable(str(tmp_path / "prices"), slots=16)
+        service.shared_table.open()
+        service.shared_table.try_acquire_writer()
+        try:
+            await service._handle_tick(_tick("BTCUSD", 100.0, int(time.time() * 1000)))
+            assert service.get_shared_price("btc") == 100.0
+            assert service.get_shared_price("BTCUSD") == 100.0
+            assert service.get_price("btcusd") == 100.0
+        finally:
+            service.shared_table.close()
+        assert service.get_shared_price("btcusd") is None
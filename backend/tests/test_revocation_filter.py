@@ -0,0 +1,142 @@
+"""
+Token revocation Bloom filter tests.
+
+Tests cover:
+- No false negatives and a bounded false-positive rate
+- Answering every check with "maybe" until synced
+- Dropping partitions whose tokens have all expired
+- Keeping revocations added while a rebuild reads the store
+- is_token_blacklisted skipping the store for certain misses
+- Trust following the live subscription, with a rebuild after every resubscribe
+- Desyncing and retrying when a revocation publish fails
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import auth_cache as auth_cache_module
+import blacklist
+import revocation_filter as revocation_module
+from auth_cache import AuthContextCache
+from revocation_filter import BloomFilter, RevocationFilter
+
+
+def _filter(**kwargs):
+    revocations = RevocationFilter(require_pubsub=False, **kwargs)
+    revocations._synced = True
+    return revocations
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    revoked = [f"jti-{i}" for i in range(1000)]
+    for jti in revoked:
+        bloom.add(jti)
+
+    assert all(jti in bloom for jti in revoked)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_untrusted_filter_always_defers_to_store():
+    revocations = RevocationFilter()
+    assert revocations.might_be_revoked("jti-1")
+
+    revocations._synced = True
+    # Still untrusted: other workers' revocations can't reach it without pub/sub
+    assert revocations.might_be_revoked("jti-1")
+
+
+def test_expired_partitions_are_dropped():
+    revocations = _filter(partition_seconds=60)
+    revocations.add("old", time.time() - 120)
+    revocations.add("live", time.time() + 600)
+
+    assert not revocations.might_be_revoked("old")
+    assert revocations.might_be_revoked("live")
+    assert len(revocations._partitions) == 1
+
+
+@pytest.mark.asyncio
+async def test_rebuild_keeps_revocations_added_meanwhile(monkeypatch):
+    revocations = _filter()
+    expires = datetime.now(timezone.utc) + timedelta(hours=1)
+
+    async def load():
+        revocations.add("during", time.time() + 3600)
+        return [("stored", expires.timestamp())]
+
+    revocations.add("stale", time.time() + 3600)
+    monkeypatch.setattr(revocations, "_load", load)
+    assert await revocations.rebuild() == 1
+
+    assert revocations.might_be_revoked("stored")
+    assert revocations.might_be_revoked("during")
+    assert not revocations.might_be_revoked("stale")
+
+
+@pytest.mark.asyncio
+async def test_blacklist_check_skips_store_for_certain_misses(monkeypatch):
+    revocations = _filter()
+    client = MagicMock()
+    client.set = AsyncMock()
+    client.exists = AsyncMock(return_value=1)
+    monkeypatch.setattr(blacklist, "revocation_filter", revocations)
+    monkeypatch.setattr(blacklist, "get_redis_client", AsyncMock(return_value=client))
+    monkeypatch.setattr(blacklist.auth_cache, "token_revoked", AsyncMock())
+
+    assert await blacklist.is_token_blacklisted("token", jti="jti-1") is False
+    client.exists.assert_not_called()
+
+    monkeypatch.setattr("auth.get_token_jti", lambda token: "jti-1")
+    await blacklist.blacklist_token("token", 900)
+    assert await blacklist.is_token_blacklisted("token", jti="jti-1") is True
+    client.exists.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_trust_requires_live_subscription_and_rebuild_after_reconnect(monkeypatch):
+    redis = MagicMock(pubsub_connected=True, pubsub_epoch=1)
+    monkeypatch.setattr(revocation_module, "redis_enhanced", redis)
+    revocations = RevocationFilter()
+    revocations._listening = True
+    monkeypatch.setattr(revocations, "_load", AsyncMock(return_value=[]))
+
+    await revocations.rebuild()
+    assert revocations.trusted
+
+    redis.pubsub_connected = False
+    assert not revocations.trusted
+
+    # Reconnected: events published in between may be lost until the next rebuild
+    redis.pubsub_connected, redis.pubsub_epoch = True, 2
+    assert not revocations.trusted
+    assert revocations._needs_rebuild()
+    await revocations.rebuild()
+    assert revocations.trusted
+
+
+@pytest.mark.asyncio
+async def test_failed_revocation_publish_desyncs_and_retries(monkeypatch):
+    revocations = _filter()
+    monkeypatch.setattr(revocation_module, "revocation_filter", revocations)
+    monkeypatch.setattr(auth_cache_module, "PUBLISH_RETRY_SECONDS", 0)
+    publish = AsyncMock(side_effect=[False, True])
+    monkeypatch.setattr("redis_enhanced.redis_enhanced.publish", publish)
+    cache = AuthContextCache()
+    cache._listening = True
+
+    await cache.token_revoked("jti-1", time.time() + 600)
+
+    assert not revocations.trusted
+    assert cache.get_stats()["publish_failures"] == 1
+    await cache._retry_task
+    assert publish.await_count == 2
+    assert cache.get_stats()["unpublished"] == 0
@@ -0,0 +1,109 @@
+"""
+Tiered cache tests.
+
+Tests cover:
+- O(1) LRU eviction by entry count and by estimated bytes
+- Per-namespace TTLs, including overrides from settings
+- Read-through to L2 with a capped L1 copy, and L1-only storage of non-JSON values
+- SmartCacheManager and ResponseCache delegating to the engine
+"""
+
+import os
+import sys
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tiered_cache as tiered_cache_module
+from performance_optimizations import ResponseCache
+from smart_cache import SmartCacheManager
+from tiered_cache import TieredCache
+
+
+def test_lru_evicts_coldest_by_count_and_bytes():
+    cache = TieredCache(max_bytes=100)
+    cache.configure("a", max_entries=2)
+    cache.set_local("a", "k1", 1)
+    cache.set_local("a", "k2", 2)
+    cache.get_local("a", "k1")
+    cache.set_local("a", "k3", 3)
+
+    assert cache.peek_local("a", "k2") is None
+    assert cache.peek_local("a", "k1") == 1
+
+    cache.set_local("b", "big", "x" * 90)
+    cache.set_local("b", "bigger", "y" * 90)
+    stats = cache.get_stats()
+    assert stats["l1"]["bytes"] <= 100
+    assert cache.peek_local("b", "big") is None
+    assert stats["namespaces"]["b"]["evictions"] == 1
+
+
+def test_namespace_ttls_and_overrides():
+    cache = TieredCache(namespace_ttls={"short": 1})
+    cache.configure("short", ttl_seconds=600)
+    cache.configure("long", ttl_seconds=600)
+    cache.set_local("short", "k", "v")
+    cache.set_local("long", "k", "v")
+
+    with patch.object(tiered_cache_module.time, "time", return_value=time.time() + 5):
+        assert cache.get_local("short", "k") is None
+        assert cache.get_local("long", "k") == "v"
+    assert cache.namespace_stats("short")["expirations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_l2_read_through_and_write_through(monkeypatch):
+    remote = MagicMock(use_redis=True)
+    remote.get = AsyncMock(return_value={"total": 5})
+    remote.set = AsyncMock(return_value=True)
+    monkeypatch.setattr("redis_cache.redis_cache", remote)
+
+    cache = TieredCache()
+    cache.configure("endpoints", ttl_seconds=300, local_ttl_seconds=30, l2=True)
+
+    assert await cache.get("endpoints", "k") == {"total": 5}
+    assert await cache.get("endpoints", "k") == {"total": 5}
+    remote.get.assert_awaited_once()
+
+    await cache.set("endpoints", "json", {"a": 1})
+    remote.set.assert_awaited_once_with("json", {"a": 1}, 300)
+    await cache.set("endpoints", "object", object())
+    assert remote.set.await_count == 1
+    assert cache.get_stats()["l2"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_smart_cache_delegates_to_engine():
+    engine = TieredCache()
+    smart = SmartCacheManager(max_items=2, engine=engine)
+    fetch = AsyncMock(return_value={"price": 1})
+
+    assert await smart.get("prices:btc", fetch) == {"price": 1}
+    assert await smart.get("prices:btc", fetch) == {"price": 1}
+    fetch.assert_awaited_once()
+
+    await smart.set("prices:eth", 2)
+    await smart.set("other", 3)
+    stats = await smart.get_stats()
+    assert stats["total_items"] == 2 and stats["evictions"] == 1
+
+    await smart.invalidate("prices:*")
+    assert engine.size("smart") == 1
+
+
+def test_response_cache_stats_come_from_engine():
+    engine = TieredCache()
+    responses = ResponseCache(max_size=10, engine=engine)
+    key = responses._generate_key("crypto", 1)
+    responses.set(key, [1, 2])
+
+    assert responses.get(key) == [1, 2]
+    assert responses.get("missing") is None
+    assert responses.invalidate() == 1
+    stats = responses.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["size"] == 0
+    assert engine.get_stats()["namespaces"]["responses"]["sets"] == 1
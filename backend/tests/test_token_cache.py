@@ -0,0 +1,71 @@
+"""
+JWT decode cache tests.
+
+Tests cover:
+- Verifying a token once and serving repeats from the cache
+- Sharing cached claims with jti extraction
+- Not caching invalid tokens
+- Dropping claims once the token expires
+- Type checks and mutation isolation on cached claims
+"""
+
+import os
+import sys
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import auth
+from auth import DecodedTokenCache, create_access_token, decode_token, get_token_jti
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    cache = DecodedTokenCache(max_entries=100)
+    monkeypatch.setattr(auth, "token_cache", cache)
+    return cache
+
+
+def test_repeat_decode_skips_verification(cache):
+    token = create_access_token({"sub": "u1"})
+
+    with patch.object(auth.jwt, "decode", wraps=auth.jwt.decode) as verify:
+        first = decode_token(token, expected_type="access")
+        second = decode_token(token, expected_type="access")
+        jti = get_token_jti(token)
+
+    assert first == second and first["sub"] == "u1"
+    assert jti == first["jti"]
+    assert verify.call_count == 1
+    assert cache.get_stats()["hits"] == 2
+
+
+def test_invalid_tokens_are_not_cached(cache):
+    token = create_access_token({"sub": "u1"})
+    tampered = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+
+    assert decode_token(tampered) is None
+    assert decode_token(tampered) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_expired_claims_are_dropped(cache):
+    token = create_access_token({"sub": "u1"}, expires_delta=timedelta(seconds=30))
+    decode_token(token)
+
+    with patch.object(auth.time, "time", return_value=time.time() + 60):
+        assert cache.get(token) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_type_check_and_copy_apply_to_cached_claims():
+    token = create_access_token({"sub": "u1"})
+    claims = decode_token(token)
+    claims["sub"] = "someone-else"
+
+    assert decode_token(token, expected_type="refresh") is None
+    assert decode_token(token)["sub"] == "u1"
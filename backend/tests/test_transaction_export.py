@@ -0,0 +1,146 @@
+"""
+Streaming transaction export tests.
+
+Tests cover:
+- Reading the cursor in batches and yielding one chunk per batch
+- CSV, NDJSON and JSON encodings
+- A single gzip stream across chunks
+- Reporting the exported count once the stream is done
+- Auditing the export before streaming starts, then recording the final count
+"""
+
+import csv
+import gzip
+import json
+import os
+import sys
+from datetime import datetime
+from io import StringIO
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from routers import transactions as transactions_router
+from routers.transactions import _export_batches, stream_export
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+        self.close = AsyncMock()
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    def batch_size(self, *args):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._docs:
+            raise StopAsyncIteration
+        return self._docs.pop(0)
+
+
+def _tx(i):
+    return {"id": f"tx-{i}", "type": "deposit", "amount": float(i), "currency": "USD",
+            "status": "completed", "created_at": datetime(2026, 1, 1, 12, 0, i)}
+
+
+async def _collect(generator):
+    return [chunk async for chunk in generator]
+
+
+async def _batches(*sizes):
+    start = 0
+    for size in sizes:
+        yield [{"id": f"tx-{i}", "amount": i} for i in range(start, start + size)]
+        start += size
+
+
+@pytest.mark.asyncio
+async def test_cursor_is_read_in_batches_and_closed(monkeypatch):
+    monkeypatch.setattr(transactions_router, "EXPORT_BATCH_SIZE", 2)
+    cursor = _Cursor([_tx(i) for i in range(5)])
+    collection = MagicMock()
+    collection.find.return_value = cursor
+
+    batches = await _collect(_export_batches(collection, {"user_id": "u1"}, 5))
+
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert batches[0][0]["createdAt"] == "2026-01-01T12:00:00"
+    cursor.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_csv_streams_header_then_one_chunk_per_batch():
+    on_complete = AsyncMock()
+
+    chunks = await _collect(stream_export(_batches(2, 1), "csv", on_complete=on_complete))
+
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(StringIO(b"".join(chunks).decode())))
+    assert [row["id"] for row in rows] == ["tx-0", "tx-1", "tx-2"]
+    on_complete.assert_awaited_once_with(3)
+
+
+@pytest.mark.asyncio
+async def test_ndjson_is_one_object_per_line():
+    chunks = await _collect(stream_export(_batches(2, 2), "ndjson"))
+
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["tx-0", "tx-1", "tx-2", "tx-3"]
+
+
+@pytest.mark.asyncio
+async def test_json_keeps_document_shape():
+    chunks = await _collect(stream_export(_batches(2, 1), "json"))
+
+    document = json.loads(b"".join(chunks))
+    assert document["count"] == 3
+    assert [t["id"] for t in document["transactions"]] == ["tx-0", "tx-1", "tx-2"]
+
+    empty = json.loads(b"".join(await _collect(stream_export(_batches(), "json"))))
+    assert empty == {"transactions": [], "count": 0}
+
+
+@pytest.mark.asyncio
+async def test_gzip_chunks_form_one_stream():
+    chunks = await _collect(stream_export(_batches(2, 2), "ndjson", compress=True))
+
+    assert all(chunks[:-1])
+    lines = gzip.decompress(b"".join(chunks)).decode().splitlines()
+    assert len(lines) == 4
+
+
+@pytest.mark.asyncio
+async def test_export_is_audited_before_streaming(monkeypatch):
+    monkeypatch.setattr(transactions_router, "enforce_transactions_limit", AsyncMock())
+    entry = {"id": "audit-1", "details": {}}
+    log_audit = AsyncMock(return_value=entry)
+    update_details = AsyncMock()
+    monkeypatch.setattr(transactions_router, "log_audit", log_audit)
+    monkeypatch.setattr(transactions_router, "update_audit_details", update_details)
+    collection = MagicMock()
+    collection.find.return_value = _Cursor([_tx(i) for i in range(2)])
+    db = MagicMock()
+    db.get_collection.return_value = collection
+    request = MagicMock()
+    request.client.host = "1.2.3.4"
+
+    response = await transactions_router.export_transactions(
+        transactions_router.TransactionExportRequest(format="ndjson"), request, user_id="u1", db=db
+    )
+
+    assert log_audit.call_args.kwargs["details"]["status"] == "started"
+    update_details.assert_not_called()
+
+    await _collect(response.body_iterator)
+    update_details.assert_awaited_once_with(db, entry, {"count": 2, "status": "completed"})
@@ -0,0 +1,132 @@
+"""
+Transaction stats rollup tests.
+
+Tests cover:
+- Folding inserted transactions into one user and one daily update per user/day
+- Skipping transactions that are not completed
+- Serving stats from the rollup document without aggregating
+- Rebuilding a user that has never been backfilled
+- Summing daily buckets for a day range
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from transaction_stats import get_user_stats, insert_transactions, record_transaction_stats
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._docs:
+            raise StopAsyncIteration
+        return self._docs.pop(0)
+
+
+def _db(stats=None, groups=(), daily=()):
+    names = ("transactions", "transaction_stats", "transaction_stats_daily")
+    collections = {name: MagicMock() for name in names}
+    for collection in collections.values():
+        collection.bulk_write = AsyncMock()
+        collection.insert_many = AsyncMock()
+        collection.replace_one = AsyncMock()
+        collection.delete_many = AsyncMock()
+    collections["transaction_stats"].find_one = AsyncMock(return_value=stats)
+    collections["transactions"].aggregate = MagicMock(return_value=_Cursor(groups))
+    collections["transaction_stats_daily"].find = MagicMock(return_value=_Cursor(daily))
+    db = MagicMock()
+    db.get_collection.side_effect = collections.__getitem__
+    return db, collections
+
+
+def _tx(user_id, tx_type, amount, currency="USD", status="completed", day=1):
+    return {"user_id": user_id, "type": tx_type, "amount": amount, "currency": currency,
+            "status": status, "created_at": datetime(2026, 3, day, 12, tzinfo=timezone.utc)}
+
+
+@pytest.mark.asyncio
+async def test_inserts_fold_into_one_update_per_user_and_day():
+    db, c = _db()
+    transactions = [
+        _tx("u1", "trade", -100.0),
+        _tx("u1", "fee", -1.0),
+        _tx("u1", "trade", 50.0, currency="BTC", day=2),
+        _tx("u2", "withdrawal", -20.0, status="pending"),
+    ]
+
+    await insert_transactions(db, transactions)
+
+    c["transactions"].insert_many.assert_awaited_once_with(transactions)
+    (user_update,) = c["transaction_stats"].bulk_write.call_args[0][0]
+    assert user_update._filter == {"user_id": "u1"}
+    assert user_update._doc["$inc"] == {
+        "types.trade.count": 2, "types.trade.total_amount": -50.0,
+        "types.trade.currencies.USD.count": 1, "types.trade.currencies.USD.total_amount": -100.0,
+        "types.trade.currencies.BTC.count": 1, "types.trade.currencies.BTC.total_amount": 50.0,
+        "types.fee.count": 1, "types.fee.total_amount": -1.0,
+        "types.fee.currencies.USD.count": 1, "types.fee.currencies.USD.total_amount": -1.0,
+    }
+    daily = c["transaction_stats_daily"].bulk_write.call_args[0][0]
+    assert [op._filter for op in daily] == [{"user_id": "u1", "day": "2026-03-01"}, {"user_id": "u1", "day": "2026-03-02"}]
+
+
+@pytest.mark.asyncio
+async def test_only_pending_transactions_write_no_rollup():
+    db, c = _db()
+
+    await record_transaction_stats(db, [_tx("u1", "withdrawal", -20.0, status="pending")])
+
+    c["transaction_stats"].bulk_write.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_complete_rollup_is_served_without_aggregating():
+    types = {"deposit": {"count": 3, "total_amount": 300.0, "currencies": {}}}
+    db, c = _db(stats={"user_id": "u1", "complete": True, "types": types})
+
+    assert await get_user_stats(db, "u1") == types
+    c["transactions"].aggregate.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_missing_rollup_is_rebuilt_from_history():
+    db, c = _db(
+        stats={"user_id": "u1", "types": {"deposit": {"count": 1, "total_amount": 10.0}}},
+        groups=[
+            {"_id": {"type": "deposit", "currency": "USD", "day": "2026-03-01"}, "count": 2, "total_amount": 150.0},
+            {"_id": {"type": "deposit", "currency": "USD", "day": "2026-03-02"}, "count": 1, "total_amount": 10.0},
+        ],
+    )
+
+    types = await get_user_stats(db, "u1")
+
+    assert types["deposit"]["count"] == 3
+    assert types["deposit"]["total_amount"] == 160.0
+    replaced = c["transaction_stats"].replace_one.call_args[0][1]
+    assert replaced["complete"] is True
+    assert len(c["transaction_stats_daily"].bulk_write.call_args[0][0]) == 2
+
+
+@pytest.mark.asyncio
+async def test_day_range_sums_daily_buckets():
+    bucket = {"types": {"trade": {"count": 1, "total_amount": 5.0,
+                                  "currencies": {"USD": {"count": 1, "total_amount": 5.0}}}}}
+    db, c = _db(stats={"user_id": "u1", "complete": True, "types": {}}, daily=[bucket, bucket])
+
+    types = await get_user_stats(db, "u1", days=7)
+
+    assert types["trade"]["count"] == 2
+    assert types["trade"]["currencies"]["USD"]["total_amount"] == 10.0
+    query = c["transaction_stats_daily"].find.call_args[0][0]
+    assert set(query) == {"user_id", "day"}
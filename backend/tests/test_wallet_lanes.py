@@ -0,0 +1,79 @@
+"""
+Per-user wallet lane tests.
+
+Tests cover:
+- Same-user mutations running one at a time, in arrival order
+- Different users not blocking each other
+- Multi-user lanes taken in a deadlock-free order
+- Timing out with 409 and cleaning up idle lanes
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wallet_lanes import WalletLanes
+
+
+@pytest.mark.asyncio
+async def test_same_user_is_serialized_in_order():
+    lanes = WalletLanes()
+    events = []
+
+    async def mutate(tag):
+        async with lanes.lane("u1"):
+            events.append(f"start-{tag}")
+            await asyncio.sleep(0.01)
+            events.append(f"end-{tag}")
+
+    await asyncio.gather(*(mutate(i) for i in range(3)))
+
+    assert events == ["start-0", "end-0", "start-1", "end-1", "start-2", "end-2"]
+    assert lanes.get_stats()["contended"] == 2
+    assert lanes.get_stats()["active_lanes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_different_users_run_concurrently():
+    lanes = WalletLanes()
+    inside = asyncio.Event()
+
+    async def first():
+        async with lanes.lane("u1"):
+            await asyncio.wait_for(inside.wait(), timeout=1)
+
+    async def second():
+        async with lanes.lane("u2"):
+            inside.set()
+
+    await asyncio.gather(first(), second())
+
+
+@pytest.mark.asyncio
+async def test_opposite_transfers_do_not_deadlock():
+    lanes = WalletLanes(wait_timeout_ms=1000)
+
+    async def transfer(sender, recipient):
+        async with lanes.lanes(sender, recipient):
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(asyncio.gather(transfer("a", "b"), transfer("b", "a")), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_raises_409_and_releases_lane():
+    lanes = WalletLanes(wait_timeout_ms=20)
+
+    async with lanes.lane("u1"):
+        with pytest.raises(HTTPException) as exc:
+            async with lanes.lane("u1"):
+                pass
+
+    assert exc.value.status_code == 409
+    assert lanes.get_stats()["timeouts"] == 1
+    assert lanes.get_stats()["active_lanes"] == 0
@@ -452,6 +452,63 @@ class TestBroadcasting:
         
         assert count == 3
 
+    @pytest.mark.asyncio
+    async def test_broadcast_is_not_delayed_by_slow_client(self, mock_websockets):
+        """Test that a slow client only costs one send deadline, not N."""
+        manager = EnterpriseWebSocketManager(max_connections_per_ip=5, send_timeout=0.05)
+        for i in range(5):
+            await manager.accept_connection(mock_websockets[i])
+
+        async def slow_send(_message):
+            await asyncio.sleep(1)
+
+        mock_websockets[0].send_text = AsyncMock(side_effect=slow_send)
+
+        started = asyncio.get_running_loop().time()
+        count = await manager.broadcast_all({"type": "system"})
+        elapsed = asyncio.get_running_loop().time() - started
+
+        assert count == 4
+        assert elapsed < 0.5
+
+    @pytest.mark.asyncio
+    async def test_timed_out_send_closes_connection(self, mock_websockets):
+        """Test that a cancelled write is never followed by another on the same socket."""
+        manager = EnterpriseWebSocketManager(max_connections_per_ip=5, send_timeout=0.01)
+        for i in range(2):
+            await manager.accept_connection(mock_websockets[i])
+
+        async def slow_send(_message):
+            await asyncio.sleep(1)
+
+        mock_websockets[0].send_text = AsyncMock(side_effect=slow_send)
+
+        await manager.broadcast_all({"type": "tick"})
+        await asyncio.sleep(0)
+
+        assert mock_websockets[0] not in manager._connections
+        assert manager.connection_count == 1
+        mock_websockets[0].close.assert_awaited_once_with(code=1008, reason="Slow consumer")
+        delivery = manager.get_metrics()["delivery"]
+        assert delivery["laggards_disconnected"] == 1
+        assert delivery["send_timeouts"] == 1
+
+        await manager.broadcast_all({"type": "tick"})
+        assert mock_websockets[0].send_text.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_send_closes_connection(self, mock_websockets):
+        """Test that a write error drops the connection instead of reusing it."""
+        manager = EnterpriseWebSocketManager(max_connections_per_ip=5)
+        await manager.accept_connection(mock_websockets[0])
+        mock_websockets[0].send_text = AsyncMock(side_effect=RuntimeError("broken pipe"))
+
+        assert await manager.send_json(mock_websockets[0], {"type": "ping"}) is False
+        await asyncio.sleep(0)
+
+        assert manager.connection_count == 0
+        mock_websockets[0].close.assert_awaited_once_with(code=1011, reason="Send failed")
+
 
 # ============================================
 # METRICS TESTS
@@ -0,0 +1,376 @@
+"""
+Tiered cache engine shared by every in-process cache in the backend.
+
+L1 is an in-process LRU split into namespaces ("smart", "responses", "endpoints", "portfolio",
+"redis"), each an OrderedDict so lookups, promotion and eviction are O(1). Entries carry an
+estimated byte size; a namespace is trimmed from its cold end once it passes its own entry or
+byte cap, and the whole L1 is held under ``max_bytes`` by trimming the namespace using the most
+memory. L2 is Redis through ``redis_cache``: namespaces created with ``l2=True`` read through to
+it on an L1 miss and write through on set, with the L1 copy's lifetime capped by the namespace's
+``local_ttl_seconds`` so workers don't serve each other's stale data for long.
+
+SmartCacheManager, ResponseCache, ``cached_endpoint``, ``cache(ttl)`` and RedisCache's
+in-memory fallback all store through ``tiered_cache``, so ``get_stats()`` covers all of them.
+"""
+
+import json
+import logging
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> Tuple[int, bool]:
+    """Approximate bytes held by ``value`` and whether it can be stored in Redis as JSON."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value), False
+    if isinstance(value, str):
+        return len(value.encode("utf-8", "ignore")), True
+    try:
+        return len(json.dumps(value, separators=(",", ":"))), True
+    except (TypeError, ValueError):
+        body = getattr(value, "body", None)
+        if isinstance(body, (bytes, bytearray)):
+            return len(body), False
+        try:
+            return len(json.dumps(value, separators=(",", ":"), default=str)), False
+        except (TypeError, ValueError):
+            return sys.getsizeof(value), False
+
+
+def parse_namespace_ttls(raw: str) -> Dict[str, int]:
+    """Parse ``"endpoints=30,portfolio=120"`` into a namespace -> seconds map."""
+    ttls: Dict[str, int] = {}
+    for part in (raw or "").split(","):
+        name, sep, seconds = part.partition("=")
+        if not sep:
+            continue
+        try:
+            ttls[name.strip()] = int(seconds)
+        except ValueError:
+            logger.warning("Ignoring invalid cache TTL override %r", part)
+    return ttls
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: Optional[float]
+    size: int
+    storable: bool
+
+
+@dataclass
+class _Namespace:
+    name: str
+    ttl_seconds: Optional[int]
+    local_ttl_seconds: Optional[int]
+    max_entries: Optional[int]
+    max_bytes: Optional[int]
+    l2: bool
+    entries: "OrderedDict[str, _Entry]" = field(default_factory=OrderedDict)
+    bytes: int = 0
+    hits: int = 0
+    misses: int = 0
+    l2_hits: int = 0
+    l2_misses: int = 0
+    sets: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "l2": self.l2,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0,
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class TieredCache:
+    """Namespaced O(1) LRU with byte accounting (L1) in front of Redis (L2)."""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: int = 300,
+        namespace_ttls: Optional[Dict[str, int]] = None,
+        use_l2: bool = True,
+    ):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.namespace_ttls = dict(namespace_ttls or {})
+        self.use_l2 = use_l2
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._bytes = 0
+
+    # ==================================================
+    # NAMESPACES
+    # ==================================================
+
+    def configure(
+        self,
+        name: str,
+        ttl_seconds: Optional[int] = None,
+        local_ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        l2: bool = False,
+    ) -> None:
+        """Create or reconfigure a namespace. TTL overrides from settings win over ``ttl_seconds``."""
+        ttl = self.namespace_ttls.get(name, ttl_seconds)
+        ns = self._namespaces.get(name)
+        if ns is None:
+            self._namespaces[name] = _Namespace(name, ttl, local_ttl_seconds, max_entries, max_bytes, l2)
+            return
+        ns.ttl_seconds, ns.local_ttl_seconds = ttl, local_ttl_seconds
+        ns.max_entries, ns.max_bytes, ns.l2 = max_entries, max_bytes, l2
+        self._trim(ns)
+
+    def _ns(self, name: str) -> _Namespace:
+        ns = self._namespaces.get(name)
+        if ns is None:
+            self.configure(name)
+            ns = self._namespaces[name]
+        return ns
+
+    def _resolve_ttl(self, ns: _Namespace, ttl: Optional[int]) -> Optional[int]:
+        """Per-call TTL, else the namespace's, else the engine default; 0 means no expiry."""
+        if ttl is None:
+            ttl = ns.ttl_seconds if ns.ttl_seconds is not None else self.default_ttl
+        return ttl or None
+
+    # ==================================================
+    # L1 (IN-PROCESS)
+    # ==================================================
+
+    def get_local(self, namespace: str, key: str, default: Any = None) -> Any:
+        ns = self._ns(namespace)
+        entry = ns.entries.get(key)
+        if entry is not None and entry.expires_at is not None and entry.expires_at <= time.time():
+            self._remove(ns, key)
+            ns.expirations += 1
+            entry = None
+        if entry is None:
+            ns.misses += 1
+            return default
+        ns.entries.move_to_end(key)
+        ns.hits += 1
+        return entry.value
+
+    def peek_local(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Read an unexpired entry without counting a lookup or refreshing its LRU position."""
+        entry = self._ns(namespace).entries.get(key)
+        if entry is None or (entry.expires_at is not None and entry.expires_at <= time.time()):
+            return default
+        return entry.value
+
+    def set_local(
+        self,
+        namespace: str,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        size: Optional[int] = None,
+    ) -> None:
+        ns = self._ns(namespace)
+        seconds = self._resolve_ttl(ns, ttl)
+        if ns.l2 and ns.local_ttl_seconds and (seconds is None or seconds > ns.local_ttl_seconds):
+            seconds = ns.local_ttl_seconds
+        if size is None:
+            size, storable = estimate_size(value)
+        else:
+            storable = False
+        self._put(ns, key, _Entry(value, time.time() + seconds if seconds else None, size, storable))
+
+    def delete_local(self, namespace: str, key: str) -> bool:
+        ns = self._ns(namespace)
+        if key not in ns.entries:
+            return False
+        self._remove(ns, key)
+        return True
+
+    def items(self, namespace: str) -> Iterator[Tuple[str, Any]]:
+        """Snapshot of live (unexpired) entries in a namespace, coldest first, without touching LRU order."""
+        ns = self._ns(namespace)
+        now = time.time()
+        return iter([
+            (key, entry.value) for key, entry in ns.entries.items()
+            if entry.expires_at is None or entry.expires_at > now
+        ])
+
+    def size(self, namespace: str) -> int:
+        return len(self._ns(namespace).entries)
+
+    def _put(self, ns: _Namespace, key: str, entry: _Entry) -> None:
+        if key in ns.entries:
+            self._remove(ns, key)
+        ns.entries[key] = entry
+        ns.bytes += entry.size
+        self._bytes += entry.size
+        ns.sets += 1
+        self._trim(ns)
+        while self._bytes > self.max_bytes:
+            largest = max(self._namespaces.values(), key=lambda n: n.bytes)
+            if not largest.entries:
+                break
+            self._evict(largest)
+
+    def _trim(self, ns: _Namespace) -> None:
+        while ns.entries and (
+            (ns.max_entries is not None and len(ns.entries) > ns.max_entries)
+            or (ns.max_bytes is not None and ns.bytes > ns.max_bytes)
+        ):
+            self._evict(ns)
+
+    def _evict(self, ns: _Namespace) -> None:
+        key, entry = ns.entries.popitem(last=False)
+        ns.bytes -= entry.size
+        self._bytes -= entry.size
+        ns.evictions += 1
+        logger.debug("Evicted %s:%s (%d bytes)", ns.name, key, entry.size)
+
+    def _remove(self, ns: _Namespace, key: str) -> None:
+        entry = ns.entries.pop(key)
+        ns.bytes -= entry.size
+        self._bytes -= entry.size
+
+    def invalidate(self, namespace: Optional[str] = None, pattern: Optional[str] = None) -> int:
+        """
+        Drop L1 entries. ``pattern`` ending in ``*`` matches a key prefix, anything else a
+        substring; no pattern clears the namespace (or every namespace).
+        """
+        targets = [self._ns(namespace)] if namespace else list(self._namespaces.values())
+        removed = 0
+        for ns in targets:
+            if pattern is None:
+                keys = list(ns.entries)
+            elif pattern.endswith("*"):
+                keys = [k for k in ns.entries if k.startswith(pattern[:-1])]
+            else:
+                keys = [k for k in ns.entries if pattern in k]
+            for key in keys:
+                self._remove(ns, key)
+            removed += len(keys)
+        return removed
+
+    def cleanup_expired(self, namespace: Optional[str] = None) -> int:
+        targets = [self._ns(namespace)] if namespace else list(self._namespaces.values())
+        now = time.time()
+        removed = 0
+        for ns in targets:
+            expired = [k for k, e in ns.entries.items() if e.expires_at is not None and e.expires_at <= now]
+            for key in expired:
+                self._remove(ns, key)
+            ns.expirations += len(expired)
+            removed += len(expired)
+        return removed
+
+    # ==================================================
+    # L1 + L2
+    # ==================================================
+
+    def _l2(self, ns: _Namespace):
+        if not (self.use_l2 and ns.l2):
+            return None
+        from redis_cache import redis_cache
+        return redis_cache if redis_cache.use_redis else None
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        """L1, then Redis for L2-backed namespaces (backfilling L1 on a hit)."""
+        value = self.get_local(namespace, key, _MISSING)
+        if value is not _MISSING:
+            return value
+        ns = self._ns(namespace)
+        remote = self._l2(ns)
+        if remote is None:
+            return None
+        try:
+            value = await remote.get(key)
+        except Exception as exc:
+            logger.warning("L2 cache read failed for %s: %s", key, exc)
+            value = None
+        if value is None:
+            ns.l2_misses += 1
+            return None
+        ns.l2_hits += 1
+        self.set_local(namespace, key, value)
+        return value
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Write to L1 and, when the value is JSON-serialisable, through to Redis."""
+        ns = self._ns(namespace)
+        self.set_local(namespace, key, value, ttl)
+        remote = self._l2(ns)
+        entry = ns.entries.get(key)
+        if remote is None or entry is None or not entry.storable:
+            return
+        try:
+            await remote.set(key, value, self._resolve_ttl(ns, ttl) or self.default_ttl)
+        except Exception as exc:
+            logger.warning("L2 cache write failed for %s: %s", key, exc)
+
+    async def delete(self, namespace: str, key: str) -> None:
+        ns = self._ns(namespace)
+        self.delete_local(namespace, key)
+        remote = self._l2(ns)
+        if remote is not None:
+            try:
+                await remote.delete(key)
+            except Exception as exc:
+                logger.warning("L2 cache delete failed for %s: %s", key, exc)
+
+    # ==================================================
+    # STATS
+    # ==================================================
+
+    def namespace_stats(self, namespace: str) -> Dict[str, Any]:
+        return self._ns(namespace).stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        namespaces = {name: ns.stats() for name, ns in self._namespaces.items()}
+        hits = sum(ns["hits"] for ns in namespaces.values())
+        misses = sum(ns["misses"] for ns in namespaces.values())
+        return {
+            "l1": {
+                "entries": sum(ns["entries"] for ns in namespaces.values()),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses) * 100, 2) if hits + misses else 0,
+                "evictions": sum(ns["evictions"] for ns in namespaces.values()),
+            },
+            "l2": {
+                "enabled": self.use_l2,
+                "hits": sum(ns["l2_hits"] for ns in namespaces.values()),
+                "misses": sum(ns["l2_misses"] for ns in namespaces.values()),
+            },
+            "namespaces": namespaces,
+        }
+
+
+tiered_cache = TieredCache(
+    max_bytes=settings.tiered_cache_max_bytes,
+    namespace_ttls=parse_namespace_ttls(settings.tiered_cache_namespace_ttls),
+    use_l2=settings.tiered_cache_l2_enabled,
+)
@@ -0,0 +1,199 @@
+"""
+Incrementally maintained per-user transaction statistics.
+
+Every completed transaction is folded into two rollups when it is inserted:
+
+- ``transaction_stats``: one document per user with count and amount sums per type, and per
+  currency within each type.
+- ``transaction_stats_daily``: the same breakdown per user per UTC day (``day`` is
+  ``YYYY-MM-DD``), for range queries.
+
+``get_transaction_stats`` then reads one document (or one per day in the range) instead of
+aggregating the user's whole history. Rollups are derived data: a failed rollup write is
+logged, not raised, and ``rebuild_user_stats`` recomputes a user from ``transactions``.
+Users whose rollup has never been rebuilt (``complete`` is not set) are rebuilt on first
+read; ``python transaction_stats.py [user_id ...]`` backfills everyone (or the given users).
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = "transaction_stats"
+DAILY_COLLECTION = "transaction_stats_daily"
+COUNTED_STATUS = "completed"
+
+
+def _key(value: Any, default: str) -> str:
+    # Field names can't contain "." or start with "$"
+    return str(value or default).replace(".", "_").replace("$", "_")
+
+
+def _day(created_at: Any) -> str:
+    if isinstance(created_at, datetime):
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc)
+        return created_at.strftime("%Y-%m-%d")
+    return str(created_at)[:10]
+
+
+def _add(increments: Dict[str, float], tx_type: str, currency: str, count: int, amount: float) -> None:
+    for path in (f"types.{tx_type}", f"types.{tx_type}.currencies.{currency}"):
+        increments[f"{path}.count"] = increments.get(f"{path}.count", 0) + count
+        increments[f"{path}.total_amount"] = increments.get(f"{path}.total_amount", 0.0) + amount
+
+
+def _fold(types: Dict[str, Any], tx_type: str, currency: str, count: int, amount: float) -> None:
+    entry = types.setdefault(tx_type, {"count": 0, "total_amount": 0.0, "currencies": {}})
+    entry["count"] += count
+    entry["total_amount"] += amount
+    by_currency = entry["currencies"].setdefault(currency, {"count": 0, "total_amount": 0.0})
+    by_currency["count"] += count
+    by_currency["total_amount"] += amount
+
+
+async def record_transaction_stats(db, transactions: Iterable[Dict[str, Any]]) -> None:
+    """Fold newly inserted transactions into the user and daily rollups (one bulk write each)."""
+    per_user: Dict[str, Dict[str, float]] = defaultdict(dict)
+    per_day: Dict[tuple, Dict[str, float]] = defaultdict(dict)
+    for tx in transactions:
+        if tx.get("status") != COUNTED_STATUS:
+            continue
+        tx_type = _key(tx.get("type"), "unknown")
+        currency = _key(tx.get("currency"), "USD")
+        amount = tx.get("amount") or 0.0
+        _add(per_user[tx["user_id"]], tx_type, currency, 1, amount)
+        _add(per_day[(tx["user_id"], _day(tx.get("created_at")))], tx_type, currency, 1, amount)
+    if not per_user:
+        return
+
+    now = datetime.now(timezone.utc)
+    try:
+        await db.get_collection(STATS_COLLECTION).bulk_write([
+            UpdateOne(
+                {"user_id": user_id},
+                {"$inc": increments, "$set": {"updated_at": now}, "$setOnInsert": {"complete": False}},
+                upsert=True,
+            )
+            for user_id, increments in per_user.items()
+        ], ordered=False)
+        await db.get_collection(DAILY_COLLECTION).bulk_write([
+            UpdateOne({"user_id": user_id, "day": day}, {"$inc": increments}, upsert=True)
+            for (user_id, day), increments in per_day.items()
+        ], ordered=False)
+    except Exception as exc:
+        logger.error("Transaction stats rollup failed for %s: %s", list(per_user), exc)
+
+
+async def insert_transactions(db, transactions: List[Dict[str, Any]]) -> None:
+    """Insert transaction records and fold them into the stats rollups."""
+    if not transactions:
+        return
+    await db.get_collection("transactions").insert_many(transactions)
+    await record_transaction_stats(db, transactions)
+
+
+async def rebuild_user_stats(db, user_id: str) -> Dict[str, Any]:
+    """
+    Recompute a user's rollups from ``transactions`` and mark them complete. Returns the types.
+
+    Transactions inserted while the aggregation runs can be counted twice or not at all;
+    run it again if the user was active during a rebuild.
+    """
+    pipeline = [
+        {"$match": {"user_id": user_id, "status": COUNTED_STATUS}},
+        {"$group": {
+            "_id": {
+                "type": "$type",
+                "currency": "$currency",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            },
+            "count": {"$sum": 1},
+            "total_amount": {"$sum": "$amount"},
+        }},
+    ]
+    types: Dict[str, Any] = {}
+    days: Dict[str, Dict[str, Any]] = defaultdict(dict)
+    async for group in db.get_collection("transactions").aggregate(pipeline):
+        tx_type = _key(group["_id"].get("type"), "unknown")
+        currency = _key(group["_id"].get("currency"), "USD")
+        _fold(types, tx_type, currency, group["count"], group["total_amount"] or 0.0)
+        _fold(days[group["_id"].get("day") or "unknown"], tx_type, currency, group["count"], group["total_amount"] or 0.0)
+
+    now = datetime.now(timezone.utc)
+    await db.get_collection(STATS_COLLECTION).replace_one(
+        {"user_id": user_id},
+        {"user_id": user_id, "types": types, "complete": True, "rebuilt_at": now, "updated_at": now},
+        upsert=True,
+    )
+    daily = db.get_collection(DAILY_COLLECTION)
+    await daily.delete_many({"user_id": user_id, "day": {"$nin": list(days)}})
+    if days:
+        await daily.bulk_write([
+            ReplaceOne({"user_id": user_id, "day": day}, {"user_id": user_id, "day": day, "types": day_types}, upsert=True)
+            for day, day_types in days.items()
+        ], ordered=False)
+    return types
+
+
+async def get_user_stats(db, user_id: str, days: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Per-type stats for a user: all time from the user rollup, or the last ``days`` UTC days
+    (today included) from the daily buckets.
+    """
+    stats = await db.get_collection(STATS_COLLECTION).find_one({"user_id": user_id}, {"_id": 0})
+    if not stats or not stats.get("complete"):
+        all_time = await rebuild_user_stats(db, user_id)
+    else:
+        all_time = stats.get("types", {})
+    if not days:
+        return all_time
+
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    types: Dict[str, Any] = {}
+    cursor = db.get_collection(DAILY_COLLECTION).find({"user_id": user_id, "day": {"$gte": since}}, {"_id": 0})
+    async for bucket in cursor:
+        for tx_type, entry in bucket.get("types", {}).items():
+            for currency, by_currency in entry.get("currencies", {}).items():
+                _fold(types, tx_type, currency, by_currency.get("count", 0), by_currency.get("total_amount", 0.0))
+    return types
+
+
+async def rebuild_all_stats(db, user_ids: Optional[List[str]] = None) -> int:
+    """Backfill rollups for the given users, or every user with transactions. Returns the count."""
+    if not user_ids:
+        user_ids = [
+            group["_id"]
+            async for group in db.get_collection("transactions").aggregate([{"$group": {"_id": "$user_id"}}])
+            if group["_id"]
+        ]
+    for done, user_id in enumerate(user_ids, start=1):
+        await rebuild_user_stats(db, user_id)
+        if done % 1000 == 0:
+            logger.info("Rebuilt transaction stats for %d/%d users", done, len(user_ids))
+    logger.info("Rebuilt transaction stats for %d users", len(user_ids))
+    return len(user_ids)
+
+
+if __name__ == "__main__":
+    # Backfill/rebuild: python transaction_stats.py [user_id ...]
+    import asyncio
+    import sys
+    from database import initialize_database
+    from config import settings
+
+    async def main():
+        db_conn = await initialize_database(
+            mongo_url=settings.mongo_url,
+            db_name=settings.db_name
+        )
+        await rebuild_all_stats(db_conn.db, sys.argv[1:] or None)
+        await db_conn.disconnect()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+"""
+Per-user execution lanes for wallet mutations.
+
+Deposits, withdrawals, transfers, stakes and trades all read a wallet and then write it back.
+``wallet_lanes.lane(user_id)`` serializes those sequences per user: requests for the same
+user run one after another in arrival order, while different users never wait on each other.
+
+In-process the lane is a keyed ``asyncio.Lock`` (created on first use, dropped when idle).
+With ``wallet_lanes_distributed`` enabled and a native Redis connection available, the
+lane additionally holds a short-lived Redis lock (``wallet_lane:<user_id>``) so workers
+on other processes/hosts are serialized as well. Multi-user operations (P2P transfers)
+take their lanes in sorted user order, so two opposite transfers cannot deadlock.
+"""
+
+import asyncio
+import logging
+import random
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+LANE_KEY_PREFIX = "wallet_lane:"
+
+
+class _Lane:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class WalletLanes:
+    """Keyed async locks (optionally Redis-backed) that order wallet mutations per user."""
+
+    def __init__(
+        self,
+        distributed: bool = False,
+        lock_ttl_ms: int = 10000,
+        wait_timeout_ms: int = 5000,
+    ):
+        self.distributed = distributed
+        self.lock_ttl_ms = lock_ttl_ms
+        self.wait_timeout = wait_timeout_ms / 1000
+        self._lanes: Dict[str, _Lane] = {}
+
+        self.acquisitions = 0
+        self.contended = 0
+        self.timeouts = 0
+
+    @asynccontextmanager
+    async def lane(self, user_id: str) -> AsyncIterator[None]:
+        """Run the enclosed block exclusively for ``user_id``."""
+        async with self.lanes(user_id):
+            yield
+
+    @asynccontextmanager
+    async def lanes(self, *user_ids: Optional[str]) -> AsyncIterator[None]:
+        """Run the enclosed block exclusively for every user in ``user_ids``."""
+        ordered = sorted({user_id for user_id in user_ids if user_id})
+        held: List[str] = []
+        tokens: Dict[str, str] = {}
+        try:
+            for user_id in ordered:
+                await self._acquire_local(user_id)
+                held.append(user_id)
+                if self._use_redis():
+                    tokens[user_id] = await self._acquire_remote(user_id)
+            yield
+        finally:
+            for user_id in reversed(held):
+                token = tokens.get(user_id)
+                if token:
+                    from redis_enhanced import redis_enhanced
+                    await redis_enhanced.release_lock(LANE_KEY_PREFIX + user_id, token)
+                self._release_local(user_id)
+
+    async def _acquire_local(self, user_id: str) -> None:
+        lane = self._lanes.get(user_id)
+        if lane is None:
+            lane = self._lanes[user_id] = _Lane()
+        lane.users += 1
+        try:
+            if lane.lock.locked():
+                self.contended += 1
+                await asyncio.wait_for(lane.lock.acquire(), timeout=self.wait_timeout)
+            else:
+                await lane.lock.acquire()
+        except asyncio.TimeoutError:
+            self._drop_user(user_id, lane)
+            self._timed_out(user_id)
+        except BaseException:
+            self._drop_user(user_id, lane)
+            raise
+        self.acquisitions += 1
+
+    def _release_local(self, user_id: str) -> None:
+        lane = self._lanes[user_id]
+        lane.lock.release()
+        self._drop_user(user_id, lane)
+
+    def _drop_user(self, user_id: str, lane: _Lane) -> None:
+        lane.users -= 1
+        if lane.users == 0:
+            self._lanes.pop(user_id, None)
+
+    def _use_redis(self) -> bool:
+        if not self.distributed:
+            return False
+        from redis_enhanced import redis_enhanced
+        return redis_enhanced.supports_pubsub
+
+    async def _acquire_remote(self, user_id: str) -> str:
+        """Spin on the Redis lock with jittered backoff until acquired or the wait times out."""
+        from redis_enhanced import redis_enhanced
+
+        key = LANE_KEY_PREFIX + user_id
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        delay = 0.005
+        while not await redis_enhanced.acquire_lock(key, token, self.lock_ttl_ms):
+            if loop.time() >= deadline:
+                self._timed_out(user_id)
+            await asyncio.sleep(delay * (0.5 + random.random()))
+            delay = min(delay * 2, 0.1)
+        return token
+
+    def _timed_out(self, user_id: str) -> None:
+        self.timeouts += 1
+        logger.warning("Wallet lane wait timed out for user %s", user_id)
+        raise HTTPException(
+            status_code=409,
+            detail="Another wallet operation is in progress. Please retry."
+        )
+
+    def get_stats(self) -> dict:
+        return {
+            "distributed": self._use_redis(),
+            "active_lanes": len(self._lanes),
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "timeouts": self.timeouts,
+        }
+
+
+wallet_lanes = WalletLanes(
+    distributed=settings.wallet_lanes_distributed,
+    lock_ttl_ms=settings.wallet_lane_lock_ttl_ms,
+    wait_timeout_ms=settings.wallet_lane_wait_timeout_ms,
+)